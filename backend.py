@@ -0,0 +1,318 @@
+import time
+import contextlib
+
+
+class ModuleProxy(object):
+    """ Stands in for one of the Maya modules and passes every attribute on to the module of the active backend, so
+    the modules that import it do not have to know which backend is used.
+    :param name: String name of the module, one of Backend.module_names
+    """
+    def __init__(self, name):
+        self.module_name = name
+
+    def __getattr__(self, attribute):
+        return getattr(Backend.get_module(self.module_name), attribute)
+
+
+# Every component used to import maya.api.OpenMaya and maya.cmds itself, so nothing in this project could be run,
+# planned or profiled outside of a Maya session. The modules now import om, oma, cmds and mel from here instead.
+class Backend(object):
+    """ This class decides which implementation of the Maya modules the proxies pass on to. There are two backends:
+    maya: the modules of the running Maya session
+    memory: the modules of memory_maya, which work on a pure Python scene graph
+    The default is maya when it can be imported and memory otherwise. A dry run copies the nodes that a build starts
+    from into an empty memory scene and switches to the memory backend, so a build can be validated and its nodes
+    counted before it touches the real scene.
+    """
+    module_names = ('OpenMaya', 'OpenMayaAnim', 'cmds', 'mel')
+    name = None
+    modules = {}
+    loaded = {}
+
+    @classmethod
+    def get_module(cls, module_name):
+        """ Get a module of the active backend, the default backend is used when none has been chosen yet
+        :param module_name: String name of the module
+        :return: Module
+        """
+        if cls.name is None:
+            cls.use(cls.get_default())
+        return cls.modules[module_name]
+
+    @staticmethod
+    def get_default():
+        """ Get the backend that is used when none has been chosen
+        :return: String 'maya' if the Maya modules can be imported, 'memory' if not
+        """
+        try:
+            import maya.cmds  # noqa: F401
+            return 'maya'
+        except ImportError:
+            return 'memory'
+
+    @classmethod
+    def use(cls, name):
+        """ Switch to a backend
+        :param name: String 'maya' or 'memory'
+        :return: String name of the backend that was active before, None if there was none
+        """
+        if name not in cls.loaded:
+            cls.loaded[name] = cls.load(name)
+        previous = cls.name
+        cls.name = name
+        cls.modules = cls.loaded[name]
+        return previous
+
+    @staticmethod
+    def load(name):
+        """ Import the modules of a backend
+        :param name: String 'maya' or 'memory'
+        :return: Dictionary with the module names as keys
+        """
+        if name == 'maya':
+            from maya import cmds, mel
+            from maya.api import OpenMaya, OpenMayaAnim
+        elif name == 'memory':
+            from memory_maya import cmds, mel, OpenMaya, OpenMayaAnim
+        else:
+            raise ValueError('Unknown backend {0}'.format(name))
+        return {'OpenMaya': OpenMaya, 'OpenMayaAnim': OpenMayaAnim, 'cmds': cmds, 'mel': mel}
+
+    @classmethod
+    @contextlib.contextmanager
+    def dry_run(cls, nodes):
+        """ Copy the hierarchies of the given nodes, and the skinned meshes of their joints, into an empty memory scene
+        and use the memory backend inside the with statement. The scene and the backend that were active are restored
+        afterwards, whether the build inside succeeded or not.
+        :param nodes: List of MObjects, the full hierarchy above and below every node is copied
+        :return: DryRun
+        """
+        from memory_maya.scene import SCENE
+        snapshot = SceneSnapshot.capture(nodes)
+        previous = cls.use('memory')
+        saved = dict(SCENE.__dict__)
+        # Unlike clear this drops the callbacks too, so nothing that watches the scene in use sees the dry run
+        SCENE.__init__()
+        dry_run = DryRun()
+        try:
+            snapshot.restore()
+            dry_run.start()
+            yield dry_run
+        finally:
+            dry_run.stop()
+            SCENE.__dict__.clear()
+            SCENE.__dict__.update(saved)
+            cls.use(previous)
+
+
+class DryRun(object):
+    """ Counts the nodes that are created during a dry run, per node type """
+    def __init__(self):
+        self.nodes = {}
+        self.seconds = 0.0
+        self.start_time = None
+        self.callback_id = None
+
+    def start(self):
+        """ Start counting
+        :return:
+        """
+        self.start_time = time.time()
+        self.callback_id = om.MDGMessage.addNodeAddedCallback(self.node_added, 'dependNode')
+
+    def stop(self):
+        """ Stop counting
+        :return:
+        """
+        if self.callback_id is not None:
+            om.MMessage.removeCallback(self.callback_id)
+            self.callback_id = None
+            self.seconds = time.time() - self.start_time
+
+    def node_added(self, node, client_data):
+        """ Callback that counts the created nodes
+        :param node: MObject containing the new node
+        :param client_data: Unused
+        :return:
+        """
+        type_name = om.MFnDependencyNode(node).typeName
+        self.nodes[type_name] = self.nodes.get(type_name, 0) + 1
+
+    def report(self):
+        """ Get the result of the dry run
+        :return: Dictionary with the total number of nodes, the nodes per type and the time the build took
+        """
+        return {'nodes': sum(self.nodes.values()), 'types': dict(self.nodes), 'seconds': self.seconds}
+
+
+# Only plain values are kept, so the snapshot can be taken with one backend and restored with another.
+class SceneSnapshot(object):
+    """ This class holds a copy of the transforms, joints, curves and meshes of a set of hierarchies, and of the skin
+    clusters that bind the meshes to the joints. The offsetParentMatrix is copied as well, for joints that are driven
+    through it. Other node types, and everything below them, are left out.
+    """
+    dag_types = ('transform', 'joint', 'nurbsCurve', 'mesh')
+    attributes = ('translate', 'rotate', 'scale', 'jointOrient')
+
+    def __init__(self):
+        self.dag_nodes = []
+        self.skin_clusters = []
+
+    @classmethod
+    def capture(cls, nodes):
+        """ Take a snapshot of the hierarchies of the nodes
+        :param nodes: List of MObjects
+        :return: SceneSnapshot
+        """
+        from helper import Helper
+        from skin_index import SkinIndex
+        snapshot = cls()
+        roots = []
+        for node in nodes:
+            snapshot.add_root(roots, node)
+        skin_index = SkinIndex()
+        skin_clusters = []
+        input_roots = len(roots)
+        for root in list(roots):
+            for entry in snapshot.capture_hierarchy(root):
+                if entry['type'] != 'joint':
+                    continue
+                for skin_cluster in skin_index.get_skin_clusters(Helper.get_node(entry['path'])):
+                    if not any(skin_cluster == other for other in skin_clusters):
+                        skin_clusters.append(skin_cluster)
+                        for mesh in skin_index.meshes.get(om.MObjectHandle(skin_cluster).hashCode(), []):
+                            snapshot.add_root(roots, mesh)
+        for root in roots[input_roots:]:
+            snapshot.capture_hierarchy(root)
+        for skin_cluster in skin_clusters:
+            snapshot.capture_skin_cluster(skin_cluster)
+        return snapshot
+
+    @staticmethod
+    def add_root(roots, node):
+        """ Add the top node of the hierarchy of a node to the roots
+        :param roots: List of MObjects
+        :param node: MObject
+        :return:
+        """
+        path = om.MFnDagNode(node).getPath()
+        while path.length() > 1:
+            path.pop()
+        if not any(path.node() == root for root in roots):
+            roots.append(path.node())
+
+    def capture_hierarchy(self, root):
+        """ Copy a hierarchy, the nodes that are already in the snapshot are skipped
+        :param root: MObject containing the top node
+        :return: List of the entries of the hierarchy
+        """
+        entries = []
+        paths = set(entry['path'] for entry in self.dag_nodes)
+        stack = [om.MFnDagNode(root).getPath()]
+        while stack:
+            path = stack.pop(0)
+            dag_node = om.MFnDagNode(path)
+            if dag_node.typeName not in self.dag_types:
+                continue
+            entry = self.capture_node(path)
+            entries.append(entry)
+            if entry['path'] not in paths:
+                paths.add(entry['path'])
+                self.dag_nodes.append(entry)
+            for index in range(dag_node.childCount()):
+                child_path = om.MDagPath(path)
+                child_path.push(dag_node.child(index))
+                stack.append(child_path)
+        return entries
+
+    def capture_node(self, path):
+        """ Copy a single dag node
+        :param path: MDagPath of the node
+        :return: Dictionary with the name, path, parent path, type and the values of the node
+        """
+        dag_node = om.MFnDagNode(path)
+        full_path = path.fullPathName()
+        entry = {'name': dag_node.name(), 'path': full_path, 'parent': full_path.rsplit('|', 1)[0],
+                 'type': dag_node.typeName, 'values': {}}
+        if entry['type'] == 'nurbsCurve':
+            curve_fn = om.MFnNurbsCurve(path)
+            entry['curve'] = {'cvs': [tuple(point)[:3] for point in curve_fn.cvPositions(om.MSpace.kObject)],
+                              'knots': list(curve_fn.knots()), 'degree': curve_fn.degree, 'form': curve_fn.form}
+        elif entry['type'] == 'mesh':
+            mesh_fn = om.MFnMesh(path)
+            counts, connects = mesh_fn.getVertices()
+            entry['mesh'] = {'points': [tuple(point)[:3] for point in mesh_fn.getPoints(om.MSpace.kObject)],
+                             'counts': list(counts), 'connects': list(connects)}
+        else:
+            for attribute in self.attributes:
+                if dag_node.hasAttribute(attribute):
+                    plug = dag_node.findPlug(attribute, False)
+                    entry['values'][attribute] = [plug.child(index).asDouble() for index in range(3)]
+            entry['rotate_order'] = dag_node.findPlug('rotateOrder', False).asInt()
+            if dag_node.hasAttribute('offsetParentMatrix'):
+                offset_parent = dag_node.findPlug('offsetParentMatrix', False).asMObject()
+                entry['offset_parent'] = list(om.MFnMatrixData(offset_parent).matrix())
+        return entry
+
+    def capture_skin_cluster(self, skin_cluster):
+        """ Copy the influences, the mesh and the weights of a skin cluster
+        :param skin_cluster: MObject containing the skin cluster
+        :return:
+        """
+        skin_fn = oma.MFnSkinCluster(skin_cluster)
+        influences = [path.fullPathName() for path in skin_fn.influenceObjects()]
+        for geometry in skin_fn.getOutputGeometry():
+            if not geometry.hasFn(om.MFn.kMesh):
+                continue
+            mesh_path = om.MFnDagNode(geometry).getPath()
+            component_fn = om.MFnSingleIndexedComponent()
+            components = component_fn.create(om.MFn.kMeshVertComponent)
+            component_fn.setCompleteData(om.MFnMesh(mesh_path).numVertices)
+            weights = skin_fn.getWeights(mesh_path, components)[0]
+            self.skin_clusters.append({'name': skin_fn.name(), 'influences': influences,
+                                       'mesh': mesh_path.fullPathName(), 'weights': list(weights)})
+
+    def restore(self):
+        """ Create the nodes of the snapshot in the scene of the active backend
+        :return:
+        """
+        from helper import Helper
+        for entry in self.dag_nodes:
+            parent = Helper.get_node(entry['parent']) if entry['parent'] else om.MObject.kNullObj
+            if entry['type'] == 'nurbsCurve':
+                curve = entry['curve']
+                node = om.MFnNurbsCurve().create([om.MPoint(cv) for cv in curve['cvs']], curve['knots'],
+                                                 curve['degree'], curve['form'], False, True, parent)
+                om.MFnDependencyNode(node).setName(entry['name'])
+            elif entry['type'] == 'mesh':
+                mesh = entry['mesh']
+                node = om.MFnMesh().create([om.MPoint(point) for point in mesh['points']], mesh['counts'],
+                                           mesh['connects'], parent=parent)
+                om.MFnDependencyNode(node).setName(entry['name'])
+            else:
+                cmds.createNode(entry['type'], name=entry['name'], parent=entry['parent'] or None, skipSelect=True)
+                dag_node = om.MFnDagNode(Helper.get_node(entry['path']))
+                for attribute, values in entry['values'].items():
+                    plug = dag_node.findPlug(attribute, False)
+                    for index, value in enumerate(values):
+                        plug.child(index).setDouble(value)
+                dag_node.findPlug('rotateOrder', False).setInt(entry['rotate_order'])
+                if 'offset_parent' in entry:
+                    offset_parent = om.MFnMatrixData().create(om.MMatrix(entry['offset_parent']))
+                    dag_node.findPlug('offsetParentMatrix', False).setMObject(offset_parent)
+        for entry in self.skin_clusters:
+            skin_cluster = cmds.skinCluster(entry['influences'] + [entry['mesh']], toSelectedBones=True,
+                                            name=entry['name'])[0]
+            mesh_path = om.MFnDagNode(Helper.get_node(entry['mesh'])).getPath()
+            component_fn = om.MFnSingleIndexedComponent()
+            components = component_fn.create(om.MFn.kMeshVertComponent)
+            component_fn.setCompleteData(om.MFnMesh(mesh_path).numVertices)
+            oma.MFnSkinCluster(Helper.get_node(skin_cluster)).setWeights(
+                mesh_path, components, om.MIntArray(range(len(entry['influences']))),
+                om.MDoubleArray(entry['weights']), False)
+
+
+om = ModuleProxy('OpenMaya')
+oma = ModuleProxy('OpenMayaAnim')
+cmds = ModuleProxy('cmds')
+mel = ModuleProxy('mel')
@@ -0,0 +1,181 @@
+import os
+import sys
+import json
+import time
+import argparse
+import traceback
+import subprocess
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+
+# Characters arrive by the hundred, and building them one by one in the GUI does not scale. This module builds them
+# from a json recipe without Qt. Every file gets its own mayapy process, so a crash in one scene can not take the
+# others down and the builds run on all cores.
+class BatchBuilder(object):
+    """ This class builds the rigs of a recipe. The recipe is a json file with a dictionary containing:
+    output_directory: String directory that the rigged scenes and the report are written to
+    workers: Integer number of files that are built at the same time, defaults to the number of cores
+    mayapy: String path of the mayapy executable, defaults to the interpreter that runs this module
+    jobs: List of dictionaries with the file to open, optionally the output file, and the rigs to build in it. Every rig
+    has a start_joint and an end_joint name and optionally a side, group_name, blend, foot and matrix_drive, the same as
+    the options of the leg rigger. The group name defaults to the side followed by _LEG_RIG, rigs in the same file need
+    different group names. The foot uses the foot roll guides and the foot profile that are in the scene.
+    Relative paths in the recipe are relative to the recipe itself.
+    :param recipe_path: String path of the recipe
+    :param workers: Integer that overrides the number of workers of the recipe
+    :param mayapy: String that overrides the mayapy of the recipe
+    """
+    def __init__(self, recipe_path, workers=None, mayapy=None):
+        self.recipe_path = os.path.abspath(recipe_path)
+        with open(self.recipe_path) as recipe_file:
+            self.recipe = json.load(recipe_file)
+        base_directory = os.path.dirname(self.recipe_path)
+        self.output_directory = os.path.join(base_directory, self.recipe.get('output_directory', 'rigs'))
+        self.workers = workers or self.recipe.get('workers') or multiprocessing.cpu_count()
+        self.mayapy = mayapy or self.recipe.get('mayapy') or sys.executable
+        self.jobs = []
+        for index, job in enumerate(self.recipe.get('jobs', [])):
+            job = dict(job)
+            job['file'] = os.path.join(base_directory, job['file'])
+            name = os.path.splitext(os.path.basename(job['file']))[0]
+            job.setdefault('output', os.path.join(self.output_directory, name + '_rig' +
+                                                  os.path.splitext(job['file'])[1]))
+            job['result'] = os.path.join(self.output_directory, '{0:04d}_{1}.result.json'.format(index, name))
+            self.jobs.append(job)
+
+    def run(self):
+        """ Build every job of the recipe in its own process and write the report
+        :return: List of dictionaries with the result of every job, in the order of the recipe
+        """
+        if not os.path.isdir(self.output_directory):
+            os.makedirs(self.output_directory)
+        start = time.time()
+        pool = ThreadPool(max(1, min(self.workers, len(self.jobs) or 1)))
+        try:
+            results = pool.map(self.run_job, self.jobs)
+        finally:
+            pool.close()
+            pool.join()
+        report = {'recipe': self.recipe_path, 'workers': self.workers, 'seconds': time.time() - start,
+                  'results': results}
+        with open(os.path.join(self.output_directory, 'report.json'), 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+        print(self.format_report(report))
+        return results
+
+    def run_job(self, job):
+        """ Build a single job in a mayapy process
+        :param job: Dictionary out of the jobs
+        :return: Dictionary with the result that the worker wrote, or a failure if the worker did not write one
+        """
+        if os.path.exists(job['result']):
+            os.remove(job['result'])
+        job_path = job['result'] + '.job'
+        with open(job_path, 'w') as job_file:
+            json.dump(job, job_file)
+        start = time.time()
+        process = subprocess.Popen([self.mayapy, os.path.abspath(__file__), '--worker', job_path],
+                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        log = process.communicate()[0]
+        os.remove(job_path)
+        if os.path.exists(job['result']):
+            with open(job['result']) as result_file:
+                return json.load(result_file)
+        return {'file': job['file'], 'status': 'crashed', 'seconds': {'total': time.time() - start},
+                'error': 'mayapy exited with code {0}\n{1}'.format(process.returncode, log.decode('utf-8', 'replace'))}
+
+    @staticmethod
+    def format_report(report):
+        """ Turn a report into a table with the timings of every file
+        :param report: Dictionary with the results
+        :return: String table
+        """
+        columns = ('open', 'build', 'save', 'total')
+        lines = ['{0:<40} {1:<8} '.format('file', 'status') + ' '.join('{0:>8}'.format(column) for column in columns)]
+        for result in report['results']:
+            seconds = result.get('seconds', {})
+            lines.append('{0:<40} {1:<8} '.format(os.path.basename(result['file'])[:40], result['status']) +
+                         ' '.join('{0:>8.2f}'.format(seconds.get(column, 0.0)) for column in columns))
+        failed = [result for result in report['results'] if result['status'] != 'built']
+        lines.append('{0} files, {1} failed, {2:.2f} seconds with {3} workers'.format(
+            len(report['results']), len(failed), report['seconds'], report['workers']))
+        return '\n'.join(lines)
+
+    @staticmethod
+    def build_file(job):
+        """ Open a scene, build its rigs and save it. This runs inside the mayapy worker.
+        :param job: Dictionary out of the jobs
+        :return: Dictionary with the status and the timings of the file
+        """
+        from backend import cmds
+        from helper import Helper
+        from rig_builder import LegRigBuilder
+        from build_profiler import BuildProfiler
+        from rig_report import RigReport
+        result = {'file': job['file'], 'output': job['output'], 'status': 'built', 'rigs': [],
+                  'seconds': {'open': 0.0, 'build': 0.0, 'save': 0.0}}
+        start = time.time()
+        try:
+            cmds.file(job['file'], open=True, force=True)
+            result['seconds']['open'] = time.time() - start
+            for rig in job.get('rigs', []):
+                rig_start = time.time()
+                joints = [Helper.get_node(rig[name]) for name in ('start_joint', 'end_joint')]
+                if any(joint.isNull() for joint in joints):
+                    raise ValueError('Joint {0} or {1} does not exist'.format(rig['start_joint'], rig['end_joint']))
+                side = rig.get('side', 'l')
+                group_name = rig.get('group_name', side.upper()+'_LEG_RIG')
+                builder = LegRigBuilder(joints[0], joints[1], group_name=group_name, side=side,
+                                        blend=rig.get('blend', False), foot=rig.get('foot', False),
+                                        matrix_drive=rig.get('matrix_drive', False))
+                steps = builder.build()
+                result['seconds']['build'] += time.time() - rig_start
+                result['rigs'].append({'group_name': group_name, 'steps': len(steps),
+                                       'seconds': time.time() - rig_start, 'profile': BuildProfiler.last_report,
+                                       'cost': RigReport.create(builder.leg.root).as_dict()})
+            save_start = time.time()
+            file_type = 'mayaBinary' if job['output'].endswith('.mb') else 'mayaAscii'
+            cmds.file(rename=job['output'])
+            cmds.file(save=True, force=True, type=file_type)
+            result['seconds']['save'] = time.time() - save_start
+        except Exception:
+            result['status'] = 'failed'
+            result['error'] = traceback.format_exc()
+        result['seconds']['total'] = time.time() - start
+        return result
+
+    @staticmethod
+    def worker(job_path):
+        """ Entry point of the mayapy worker, it starts Maya without a user interface and writes the result
+        :param job_path: String path of the json file with the job
+        :return:
+        """
+        with open(job_path) as job_file:
+            job = json.load(job_file)
+        import maya.standalone
+        maya.standalone.initialize(name='python')
+        try:
+            result = BatchBuilder.build_file(job)
+            with open(job['result'], 'w') as result_file:
+                json.dump(result, result_file, indent=2)
+        finally:
+            maya.standalone.uninitialize()
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Build leg rigs for many Maya scenes from a json recipe.')
+    parser.add_argument('recipe', help='path of the json recipe')
+    parser.add_argument('--workers', type=int, help='number of files that are built at the same time')
+    parser.add_argument('--mayapy', help='path of the mayapy executable used for the workers')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(args)
+    if args.worker:
+        BatchBuilder.worker(args.recipe)
+        return 0
+    results = BatchBuilder(args.recipe, args.workers, args.mayapy).run()
+    return 0 if all(result['status'] == 'built' for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
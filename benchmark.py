@@ -0,0 +1,440 @@
+import sys
+import json
+import math
+import time
+import argparse
+from backend import Backend, om, cmds
+
+
+# Each scene is generated from scratch so a change to a builder can be measured on the same skeletons every time.
+class SyntheticSkeleton(object):
+    """ This class generates the skeletons that the benchmark builds on: a pelvis with one or more limbs below it and
+    a skinned tube around every limb. It only uses cmds and the API, so it works with both backends.
+    """
+    @staticmethod
+    def create_limb(prefix, joint_count, parent, offset, length=10.0):
+        """ Create a chain of joints that goes down from the parent, with a slight bend forward so the IK has a pole
+        :param prefix: String prefix of the joint names
+        :param joint_count: Integer number of joints in the chain, at least 3
+        :param parent: String name of the parent joint
+        :param offset: Float offset along x from the parent
+        :param length: Float length of the chain
+        :return: List of String names of the joints
+        """
+        names = ['{0}_hip'.format(prefix)]
+        if joint_count == 3:
+            names.append('{0}_knee'.format(prefix))
+        else:
+            names += ['{0}_joint{1}'.format(prefix, index) for index in range(1, joint_count - 1)]
+        names.append('{0}_ankle'.format(prefix))
+        step = length / (joint_count - 1)
+        for index, name in enumerate(names):
+            cmds.createNode('joint', n=name, p=parent if index == 0 else names[index - 1])
+            if index == 0:
+                cmds.setAttr(name + '.t', offset, 0, 0)
+            else:
+                bend = 0.3 * math.sin(math.pi * index / (joint_count - 1)) - 0.3 * math.sin(
+                    math.pi * (index - 1) / (joint_count - 1))
+                cmds.setAttr(name + '.t', 0, -step, bend)
+        return names
+
+    @staticmethod
+    def create_mesh(name, joints, vertices):
+        """ Create a tube around a chain of joints and skin it to them
+        :param name: String name of the mesh
+        :param joints: List of String names of the joints
+        :param vertices: Integer number of vertices, rounded to whole rings of 20
+        :return: String name of the skinCluster
+        """
+        positions = [om.MPoint(cmds.xform(joint, q=True, ws=True, t=True)) for joint in joints]
+        sides = 20
+        rings = max(vertices // sides, 2)
+        points = []
+        for ring in range(rings):
+            position = ring * (len(positions) - 1.0) / (rings - 1)
+            index = min(int(position), len(positions) - 2)
+            center = positions[index] + (positions[index + 1] - positions[index]) * (position - index)
+            radius = 1.2 - 0.6 * ring / (rings - 1)
+            for side in range(sides):
+                angle = 2 * math.pi * side / sides
+                points.append(om.MPoint(center.x + radius * math.cos(angle), center.y,
+                                        center.z + radius * math.sin(angle)))
+        counts = [4] * ((rings - 1) * sides)
+        connects = []
+        for ring in range(rings - 1):
+            for side in range(sides):
+                next_side = (side + 1) % sides
+                connects += [ring * sides + side, ring * sides + next_side, (ring + 1) * sides + next_side,
+                             (ring + 1) * sides + side]
+        transform = om.MFnMesh().create(points, counts, connects)
+        om.MFnDependencyNode(transform).setName(name)
+        return cmds.skinCluster(joints + [name], toSelectedBones=True, name=name + '_skinCluster')[0]
+
+    @classmethod
+    def create_scene(cls, limbs=1, joint_count=3, vertices=2000):
+        """ Create a new scene with a pelvis, the limbs and a skinned mesh per limb
+        :param limbs: Integer number of limbs
+        :param joint_count: Integer number of joints per limb
+        :param vertices: Integer number of vertices per mesh
+        :return: List of tuples with the prefix, the first and the last joint name of every limb
+        """
+        cmds.file(new=True, force=True)
+        cmds.createNode('joint', n='pelvis')
+        cmds.setAttr('pelvis.t', 0, 10, 0)
+        result = []
+        for index in range(limbs):
+            prefix = 'limb{0}'.format(index)
+            joints = cls.create_limb(prefix, joint_count, 'pelvis', 2.0 * index - limbs + 1)
+            cls.create_mesh(prefix + '_geo', ['pelvis'] + joints, vertices)
+            result.append((prefix, joints[0], joints[-1]))
+        return result
+
+
+# Counting the calls with sys.setprofile slows a build down a lot, so the calls are counted in a separate run.
+class ApiCounter(object):
+    """ This class counts the calls that are made from the rig code into maya.cmds, maya.mel and the Maya API. In Maya
+    these are calls to built-in functions, with the stand-in they are calls into the memory_maya modules. Calls that
+    Maya or the stand-in make themselves are not counted.
+    """
+    def __init__(self):
+        self.counts = {}
+
+    def __enter__(self):
+        sys.setprofile(self.profile)
+        return self
+
+    def __exit__(self, *args):
+        sys.setprofile(None)
+
+    @staticmethod
+    def is_maya(module):
+        """ Check if a module belongs to Maya or the stand-in
+        :param module: String name of the module
+        :return: Boolean
+        """
+        return module.startswith(('maya', 'memory_maya', 'OpenMaya'))
+
+    def profile(self, frame, event, arg):
+        """ The function that sys.setprofile calls for every call
+        :param frame: Frame that makes the call, or the frame of the called Python function
+        :param event: String event
+        :param arg: The built-in function for a c_call
+        :return:
+        """
+        if event == 'call':
+            module = frame.f_globals.get('__name__', '')
+            if not module.startswith('memory_maya') or frame.f_back is None:
+                return
+            if self.is_maya(frame.f_back.f_globals.get('__name__', '')):
+                return
+            owner = frame.f_locals.get('self')
+            name = frame.f_code.co_name
+            if owner is not None:
+                name = type(owner).__name__ + '.' + name
+            self.add(module.split('.')[-1], name)
+        elif event == 'c_call':
+            owner = getattr(arg, '__self__', None)
+            module = getattr(arg, '__module__', None) or type(owner).__module__
+            if not module or not self.is_maya(module) or self.is_maya(frame.f_globals.get('__name__', '')):
+                return
+            name = arg.__name__
+            if owner is not None and not isinstance(owner, type(sys)):
+                name = type(owner).__name__ + '.' + name
+            self.add(module.split('.')[-1], name)
+
+    def add(self, module, name):
+        """ Count a call
+        :param module: String short name of the module, e.g. OpenMaya or cmds
+        :param name: String name of the function
+        :return:
+        """
+        key = module + '.' + name
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def get_modules(self):
+        """ Get the number of calls per module
+        :return: Dictionary with the module names as keys
+        """
+        modules = {}
+        for key, count in self.counts.items():
+            module = key.split('.', 1)[0]
+            modules[module] = modules.get(module, 0) + count
+        return modules
+
+    def get_top(self, count=10):
+        """ Get the functions that were called the most
+        :param count: Integer number of functions
+        :return: List of [name, calls] pairs
+        """
+        return [[key, calls] for key, calls in sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))[:count]]
+
+
+# The sizes are small enough to finish in a few minutes with the stand-in, quick runs only use the first two.
+class BuildBenchmark(object):
+    """ This class builds leg rigs on synthetic skeletons of growing size and reports the build time, the API calls and
+    the nodes per size. The cases are:
+    leg: a single three joint leg, the size is the number of vertices of the skinned mesh
+    chain: a single chain, the size is the number of joints
+    limbs: several three joint legs under the same pelvis, the size is the number of legs
+    :param repeat: Integer number of builds per size, the fastest one is reported
+    """
+    cases = {
+        'leg': [1000, 4000, 16000],
+        'chain': [3, 25, 100, 300],
+        'limbs': [1, 2, 4, 8],
+    }
+
+    def __init__(self, repeat=3):
+        self.repeat = repeat
+
+    @staticmethod
+    def create_scene(case, size):
+        """ Create the scene of a case
+        :param case: String name of the case
+        :param size: Integer size
+        :return: List of limbs made by SyntheticSkeleton.create_scene
+        """
+        if case == 'leg':
+            return SyntheticSkeleton.create_scene(vertices=size)
+        if case == 'chain':
+            return SyntheticSkeleton.create_scene(joint_count=size)
+        return SyntheticSkeleton.create_scene(limbs=size)
+
+    @staticmethod
+    def build(limbs):
+        """ Build a leg rig on every limb
+        :param limbs: List of limbs made by SyntheticSkeleton.create_scene
+        :return:
+        """
+        from helper import Helper
+        from rig_builder import LegRigBuilder
+        for prefix, start_joint, end_joint in limbs:
+            LegRigBuilder(Helper.get_node(start_joint), Helper.get_node(end_joint), group_name=prefix.upper() + '_RIG',
+                          side=prefix).build()
+
+    def run_size(self, case, size):
+        """ Benchmark a single size of a case
+        :param case: String name of the case
+        :param size: Integer size
+        :return: Dictionary with the results
+        """
+        times = []
+        nodes_created = 0
+        for _ in range(self.repeat):
+            limbs = self.create_scene(case, size)
+            node_count = len(cmds.ls())
+            start = time.time()
+            self.build(limbs)
+            times.append(time.time() - start)
+            nodes_created = len(cmds.ls()) - node_count
+        limbs = self.create_scene(case, size)
+        with ApiCounter() as counter:
+            self.build(limbs)
+        return {'case': case, 'size': size, 'seconds': min(times), 'mean_seconds': sum(times) / len(times),
+                'api_calls': sum(counter.counts.values()), 'api_modules': counter.get_modules(),
+                'top_calls': counter.get_top(), 'nodes_created': nodes_created, 'nodes': len(cmds.ls())}
+
+    def run(self, cases=None, quick=False):
+        """ Run the benchmark
+        :param cases: List of String case names, defaults to all of them
+        :param quick: Boolean, if true only the two smallest sizes of every case are used
+        :return: Dictionary with the backend and a list with the results of every size
+        """
+        from build_profiler import BuildProfiler
+        enabled = BuildProfiler.enabled
+        BuildProfiler.enabled = False
+        results = []
+        try:
+            for case in cases or sorted(self.cases):
+                for size in self.cases[case][:2] if quick else self.cases[case]:
+                    results.append(self.run_size(case, size))
+                    print(self.format_row(results[-1]))
+        finally:
+            BuildProfiler.enabled = enabled
+        return {'backend': Backend.name,
+                'repeat': self.repeat, 'results': results}
+
+    @staticmethod
+    def format_row(result, baseline=None):
+        """ Turn the result of a size into a line of the table, compared to the baseline if there is one
+        :param result: Dictionary made by run_size
+        :param baseline: Dictionary made by run_size in an earlier run
+        :return: String line
+        """
+        line = '{0:<6} {1:>6} {2:>9.4f}s {3:>8} calls {4:>6} nodes'.format(
+            result['case'], result['size'], result['seconds'], result['api_calls'], result['nodes_created'])
+        if baseline:
+            line += '   {0:+7.1%} time {1:+6} calls {2:+5} nodes'.format(
+                result['seconds'] / (baseline['seconds'] or 1e-9) - 1, result['api_calls'] - baseline['api_calls'],
+                result['nodes_created'] - baseline['nodes_created'])
+        return line
+
+    @classmethod
+    def compare(cls, report, baseline, tolerance=0.25):
+        """ Compare a report with a baseline. A size is a regression when it is more than the tolerance slower, or when
+        it makes more API calls or creates a different number of nodes.
+        :param report: Dictionary made by run
+        :param baseline: Dictionary made by run in an earlier run
+        :param tolerance: Float fraction that a build may be slower than the baseline
+        :return: List of String lines of the sizes that regressed
+        """
+        previous = dict(((result['case'], result['size']), result) for result in baseline['results'])
+        regressions = []
+        for result in report['results']:
+            before = previous.get((result['case'], result['size']))
+            if before is None:
+                continue
+            line = cls.format_row(result, before)
+            print(line)
+            if result['seconds'] > before['seconds'] * (1 + tolerance) or result['api_calls'] > before['api_calls'] \
+                    or result['nodes_created'] != before['nodes_created']:
+                regressions.append(line)
+        return regressions
+
+
+# The drive networks are evaluated on every frame, so their cost shows on playback rather than in the build time.
+class PlaybackBenchmark(object):
+    """ This class compares the two ways a rig can drive its FK and skinned joints: a decomposeMatrix into translate,
+    rotate and scale, or the offsetParentMatrix. A rig is built on a long chain in each mode, the FK controls are keyed
+    and the frames are played by pulling the world matrix of the last skinned joint, which evaluates the whole chain.
+    The stand-in does not evaluate the dependency graph, so with it only the drive nodes and the connections into the
+    joints are reported.
+    :param joint_count: Integer number of joints in the chain
+    :param frames: Integer number of frames that are played
+    :param repeat: Integer number of times the frames are played, the fastest one is reported
+    """
+    modes = {'decompose': False, 'matrix': True}
+    drive_types = ('multMatrix', 'blendMatrix', 'decomposeMatrix')
+
+    def __init__(self, joint_count=100, frames=100, repeat=3):
+        self.joint_count = joint_count
+        self.frames = frames
+        self.repeat = repeat
+
+    def build(self, matrix_drive):
+        """ Build a rig on a new chain
+        :param matrix_drive: Boolean, passed on to the LegRigBuilder
+        :return: LegRigBuilder
+        """
+        from helper import Helper
+        from rig_builder import LegRigBuilder
+        prefix, start_joint, end_joint = SyntheticSkeleton.create_scene(joint_count=self.joint_count, vertices=1000)[0]
+        builder = LegRigBuilder(Helper.get_node(start_joint), Helper.get_node(end_joint), group_name='CHAIN_RIG',
+                                side=prefix, matrix_drive=matrix_drive)
+        builder.build()
+        return builder
+
+    def animate(self, builder):
+        """ Switch the rig to FK and key a bend on every FK control from the first to the last frame
+        :param builder: LegRigBuilder that built the rig
+        :return:
+        """
+        switch = om.MFnDagNode(builder.leg.ik_fk_switch).fullPathName()
+        cmds.setAttr(switch + '.IKFK', 1)
+        controls = builder.leg.fk_controls
+        for index in range(controls.length()):
+            control = om.MFnDagNode(controls.getDependNode(index)).fullPathName()
+            cmds.setKeyframe(control, attribute='rotateZ', time=1, value=0)
+            cmds.setKeyframe(control, attribute='rotateZ', time=self.frames, value=90.0 / controls.length())
+
+    def play(self, joint):
+        """ Play the frames and pull the world matrix of a joint on every frame
+        :param joint: String name of the joint
+        :return: Float seconds of the fastest playback
+        """
+        times = []
+        for _ in range(self.repeat):
+            start = time.time()
+            for frame in range(1, self.frames + 1):
+                cmds.currentTime(frame, update=True)
+                cmds.getAttr(joint + '.worldMatrix')
+            times.append(time.time() - start)
+        return min(times)
+
+    def run_mode(self, mode):
+        """ Build, animate and play the rig of a mode
+        :param mode: String name of the mode
+        :return: Dictionary with the results
+        """
+        builder = self.build(self.modes[mode])
+        leg = builder.leg
+        joints = [leg.fk_chain.getDependNode(index) for index in range(leg.fk_chain.length())]
+        joints += [leg.skinned_chain.getDependNode(index) for index in range(leg.skinned_chain.length())]
+        connections = 0
+        for joint in joints:
+            connections += len(cmds.listConnections(om.MFnDagNode(joint).fullPathName(), source=True,
+                                                    destination=False, plugs=True) or [])
+        result = {'mode': mode, 'joints': self.joint_count, 'frames': self.frames, 'connections': connections,
+                  'nodes': dict((type_name, len(cmds.ls(type=type_name))) for type_name in self.drive_types),
+                  'frame_seconds': None}
+        if Backend.name != 'memory':
+            self.animate(builder)
+            last_joint = leg.skinned_chain.getDependNode(leg.skinned_chain.length() - 1)
+            result['frame_seconds'] = self.play(om.MFnDagNode(last_joint).fullPathName()) / self.frames
+        return result
+
+    def run(self):
+        """ Run every mode
+        :return: Dictionary with the backend and a list with the results of every mode
+        """
+        from build_profiler import BuildProfiler
+        enabled = BuildProfiler.enabled
+        BuildProfiler.enabled = False
+        results = []
+        try:
+            for mode in sorted(self.modes):
+                results.append(self.run_mode(mode))
+                print(self.format_row(results[-1]))
+        finally:
+            BuildProfiler.enabled = enabled
+        return {'backend': Backend.name, 'repeat': self.repeat, 'results': results}
+
+    @staticmethod
+    def format_row(result):
+        """ Turn the result of a mode into a line of the table
+        :param result: Dictionary made by run_mode
+        :return: String line
+        """
+        line = '{0:<9} {1:>4} joints {2:>5} drive nodes {3:>5} connections'.format(
+            result['mode'], result['joints'], sum(result['nodes'].values()), result['connections'])
+        if result['frame_seconds'] is not None:
+            line += ' {0:>9.3f}ms per frame'.format(result['frame_seconds'] * 1000)
+        return line
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmark the leg rig builds on synthetic skeletons.')
+    parser.add_argument('--cases', nargs='+', choices=sorted(BuildBenchmark.cases), help='cases to run')
+    parser.add_argument('--quick', action='store_true', help='only run the two smallest sizes of every case')
+    parser.add_argument('--repeat', type=int, default=3, help='number of builds per size')
+    parser.add_argument('--stand-in', action='store_true', help='use the memory backend even when Maya can be imported')
+    parser.add_argument('--output', help='path of the json report')
+    parser.add_argument('--baseline', help='path of an earlier json report to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='fraction that a build may be slower')
+    parser.add_argument('--playback', action='store_true',
+                        help='compare the playback of the decomposeMatrix and offsetParentMatrix drives instead')
+    parser.add_argument('--joints', type=int, default=100, help='number of joints of the playback chain')
+    parser.add_argument('--frames', type=int, default=100, help='number of frames that are played')
+    args = parser.parse_args(args)
+    if args.stand_in:
+        Backend.use('memory')
+    if args.playback:
+        report = PlaybackBenchmark(args.joints, args.frames, args.repeat).run()
+    else:
+        report = BuildBenchmark(args.repeat).run(args.cases, args.quick)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+    if args.playback or not args.baseline:
+        return 0
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    if baseline.get('backend') != report['backend']:
+        print('The baseline was made with {0}, this run used {1}'.format(baseline.get('backend'), report['backend']))
+    regressions = BuildBenchmark.compare(report, baseline, args.tolerance)
+    print('{0} regressions'.format(len(regressions)))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,186 @@
+from backend import om
+from helper import Helper
+from build_transaction import BuildTransaction
+
+
+# While building a rig the same nodes are looked up over and over again, every step asks for the dag path, the
+# function sets, the name and the plugs of the joints and controls that the step before it already asked for.
+class BuildContext(object):
+    """ This class memoises the queries that are made on nodes during a single build. Dag paths, function sets, names,
+    plugs and world matrices are kept per MObjectHandle. Renaming and reparenting should go through the context, so
+    the entries of the nodes that are changed are thrown away once the modifier has been executed with
+    BuildTransaction.execute. After changing a transform directly invalidate has to be called for the world matrices to
+    be correct. Every cached dag path is linked to its parents in an index, so invalidating a node only visits the
+    cached nodes under it. The SkinIndex of the scene is kept on the context as well.
+    """
+    def __init__(self):
+        self.entries = {}
+        self.children = {}
+        self.parents = {}
+        self.skin_index = None
+
+    def get_entry(self, m_obj):
+        """ Get the dictionary that holds the cached queries of a node
+        :param m_obj: MObject containing the node
+        :return: Dictionary
+        """
+        handle = om.MObjectHandle(m_obj)
+        key = handle.hashCode()
+        entry = self.entries.get(key)
+        if entry is None or not entry['handle'].isValid() or entry['handle'] != handle:
+            entry = {'handle': handle, 'plugs': {}}
+            self.entries[key] = entry
+        return entry
+
+    def get_path(self, m_obj):
+        """ Get the dag path of a node
+        :param m_obj: MObject containing the node
+        :return: MDagPath, a copy so extending it does not change the cached path
+        """
+        entry = self.get_entry(m_obj)
+        if 'path' not in entry:
+            entry['path'] = om.MFnDagNode(m_obj).getPath()
+            self.add_links(entry['path'])
+        return om.MDagPath(entry['path'])
+
+    def add_links(self, path):
+        """ Link the nodes of a dag path to their parents in the index, up to the first parent whose path is cached
+        already, as the nodes above that one are linked
+        :param path: MDagPath
+        :return:
+        """
+        path = om.MDagPath(path)
+        key = om.MObjectHandle(path.node()).hashCode()
+        while path.length() > 1:
+            path.pop()
+            parent_key = om.MObjectHandle(path.node()).hashCode()
+            old_parent_key = self.parents.get(key)
+            if old_parent_key is not None and old_parent_key != parent_key:
+                self.children[old_parent_key].discard(key)
+            self.parents[key] = parent_key
+            self.children.setdefault(parent_key, set()).add(key)
+            parent_entry = self.entries.get(parent_key)
+            if parent_entry is not None and 'path' in parent_entry:
+                break
+            key = parent_key
+
+    def get_dag_node(self, m_obj):
+        """ Get a MFnDagNode for a node
+        :param m_obj: MObject containing the node
+        :return: MFnDagNode
+        """
+        entry = self.get_entry(m_obj)
+        if 'dag_node' not in entry:
+            entry['dag_node'] = om.MFnDagNode(self.get_path(m_obj))
+        return entry['dag_node']
+
+    def get_transform(self, m_obj):
+        """ Get a MFnTransform for a node, attached to the dag path of the node so world space can be used
+        :param m_obj: MObject containing the node
+        :return: MFnTransform
+        """
+        entry = self.get_entry(m_obj)
+        if 'transform' not in entry:
+            entry['transform'] = om.MFnTransform(self.get_path(m_obj))
+        return entry['transform']
+
+    def get_dependency_node(self, m_obj):
+        """ Get a MFnDependencyNode for a node
+        :param m_obj: MObject containing the node
+        :return: MFnDependencyNode
+        """
+        entry = self.get_entry(m_obj)
+        if 'dependency_node' not in entry:
+            entry['dependency_node'] = om.MFnDependencyNode(m_obj)
+        return entry['dependency_node']
+
+    def get_name(self, m_obj):
+        """ Get the name of a node
+        :param m_obj: MObject containing the node
+        :return: String name
+        """
+        entry = self.get_entry(m_obj)
+        if 'name' not in entry:
+            entry['name'] = self.get_dependency_node(m_obj).name()
+        return entry['name']
+
+    def get_plug(self, m_obj, plug_name):
+        """ Get a plug of a node by its name, same as Helper.get_plug
+        :param m_obj: MObject containing the node
+        :param plug_name: String name of the plug
+        :return: MPlug
+        """
+        plugs = self.get_entry(m_obj)['plugs']
+        if plug_name not in plugs:
+            plugs[plug_name] = Helper.get_plug(m_obj, plug_name)
+        return plugs[plug_name]
+
+    def get_world_matrix(self, m_obj):
+        """ Get the world matrix of a node
+        :param m_obj: MObject containing the node
+        :return: MMatrix
+        """
+        entry = self.get_entry(m_obj)
+        if 'world_matrix' not in entry:
+            entry['world_matrix'] = self.get_path(m_obj).inclusiveMatrix()
+        return entry['world_matrix']
+
+    def rename(self, dag_mod, m_obj, name):
+        """ Add a rename to the modifier, the name of the node is forgotten when the modifier is executed
+        :param dag_mod: MDagModifier or MDGModifier
+        :param m_obj: MObject containing the node
+        :param name: String new name
+        :return:
+        """
+        dag_mod.renameNode(m_obj, name)
+        node = om.MObject(m_obj)
+        BuildTransaction.after_execute(dag_mod, lambda: self.get_entry(node).pop('name', None))
+
+    def reparent(self, dag_mod, m_obj, parent=om.MObject.kNullObj):
+        """ Add a reparent to the modifier, the dag paths of the node and everything under it are forgotten when the
+        modifier is executed
+        :param dag_mod: MDagModifier
+        :param m_obj: MObject containing the node
+        :param parent: MObject containing the new parent
+        :return:
+        """
+        dag_mod.reparentNode(m_obj, parent)
+        node = om.MObject(m_obj)
+        BuildTransaction.after_execute(dag_mod, lambda: self.invalidate(node))
+
+    def invalidate(self, m_obj=None):
+        """ Forget the dag paths, function sets and world matrices of a node and of every cached node under it. Names
+        and plugs do not depend on the hierarchy and are kept. The node is unlinked from its parent, the links below it
+        stay as the hierarchy under the node has not changed.
+        :param m_obj: MObject containing the node. If it is None the hierarchy of every node is forgotten.
+        :return:
+        """
+        if m_obj is None:
+            keys = list(self.entries)
+            self.children = {}
+            self.parents = {}
+        else:
+            keys = [om.MObjectHandle(m_obj).hashCode()]
+            parent_key = self.parents.pop(keys[0], None)
+            if parent_key is not None:
+                self.children[parent_key].discard(keys[0])
+        visited = set()
+        while keys:
+            key = keys.pop()
+            if key in visited:
+                continue
+            visited.add(key)
+            entry = self.entries.get(key)
+            if entry is not None:
+                for name in ('path', 'dag_node', 'transform', 'world_matrix'):
+                    entry.pop(name, None)
+            keys.extend(self.children.get(key, ()))
+
+    def clear(self):
+        """ Forget everything, used when a new build starts
+        :return:
+        """
+        self.entries = {}
+        self.children = {}
+        self.parents = {}
+        self.skin_index = None
@@ -0,0 +1,225 @@
+import json
+from backend import om, cmds
+from build_transaction import BuildTransaction
+
+
+# A step of a build only needs to know what it reads and what it leaves behind. Knowing that is enough to store the
+# result of every step on the rig and to pick up a failed or changed build where it went wrong.
+class BuildStep(object):
+    """ This class describes one named step of a build.
+    :param name: String name of the step, unique within a pipeline
+    :param function: Callable without arguments that performs the step
+    :param target: Object that the outputs are read from after the step, and written back to when it is skipped
+    :param inputs: List of String names of the pipeline parameters the step depends on
+    :param outputs: List of String names of the attributes that the step sets on the target
+    """
+    def __init__(self, name, function, target=None, inputs=(), outputs=()):
+        self.name = name
+        self.function = function
+        self.target = target
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+
+
+# Nodes are stored by their UUID, which survives renaming, reparenting and saving the scene, so a checkpoint can be
+# picked up again in a later session.
+class BuildPipeline(object):
+    """ This class runs a list of BuildSteps and keeps a checkpoint of them in a string attribute on a node, usually
+    the root of the rig. For every finished step the checkpoint holds the parameters it was run with, its outputs and
+    the nodes that were created while it ran. When the pipeline is run again the steps are compared with the
+    checkpoint, the steps up to the first one that is invalid are skipped and their outputs restored. The nodes of the
+    invalid step and of every step after it are deleted, after which the build continues from there. A step is invalid
+    when it was not finished, when its parameters changed or when one of its nodes has been deleted. The nodes of a
+    step that fails are deleted right away.
+    :param steps: List of BuildSteps in the order they are run
+    :param parameters: Dictionary with the values of the parameters, MObjects are stored by UUID
+    :param holder: Callable returning the MObject that the checkpoint is stored on, it may return a null object until
+    the step that creates the node has run
+    """
+    attribute = 'buildCheckpoint'
+
+    def __init__(self, steps, parameters=None, holder=None):
+        self.steps = steps
+        self.parameters = parameters or {}
+        self.holder = holder
+        self.checkpoint = []
+        self.executed = []
+        self.skipped = []
+
+    def run(self, node=om.MObject()):
+        """ Run the pipeline, resuming from the checkpoint on the given node
+        :param node: MObject holding the checkpoint of an earlier run, or a null object to build from scratch
+        :return: List of the names of the steps that were executed
+        """
+        recorded = self.read_checkpoint(node)
+        self.executed = []
+        self.skipped = []
+        self.checkpoint = []
+        for step, entry in zip(self.steps, recorded):
+            outputs = self.get_valid_outputs(step, entry)
+            if outputs is None:
+                break
+            for name, value in outputs.items():
+                setattr(step.target, name, value)
+            self.checkpoint.append(entry)
+            self.skipped.append(step.name)
+        self.delete_nodes([uuid for entry in recorded[len(self.checkpoint):] for uuid in entry['created']])
+        for step in self.steps[len(self.checkpoint):]:
+            self.checkpoint.append(self.run_step(step))
+            self.executed.append(step.name)
+            self.write_checkpoint()
+        if len(recorded) > len(self.steps) and not self.executed:
+            self.write_checkpoint()
+        return self.executed
+
+    def run_step(self, step):
+        """ Run a single step while keeping track of the nodes that are created
+        :param step: BuildStep
+        :return: Dictionary with the checkpoint entry of the step
+        """
+        created = []
+        callback_id = om.MDGMessage.addNodeAddedCallback(self.node_added, 'dependNode', created)
+        try:
+            step.function()
+        except Exception:
+            om.MMessage.removeCallback(callback_id)
+            self.delete_nodes(self.get_uuids(created))
+            raise
+        om.MMessage.removeCallback(callback_id)
+        return {'name': step.name, 'inputs': self.get_inputs(step),
+                'outputs': dict((name, self.encode(getattr(step.target, name))) for name in step.outputs),
+                'created': self.get_uuids(created)}
+
+    @staticmethod
+    def node_added(node, created):
+        """ Callback that collects the nodes created during a step
+        :param node: MObject containing the new node
+        :param created: List that the MObjectHandle of the node is added to
+        :return:
+        """
+        created.append(om.MObjectHandle(node))
+
+    def get_inputs(self, step):
+        """ Get the encoded parameters that a step depends on
+        :param step: BuildStep
+        :return: Dictionary with the parameter names as keys
+        """
+        return dict((name, self.encode(self.parameters.get(name))) for name in step.inputs)
+
+    def get_valid_outputs(self, step, entry):
+        """ Check a checkpoint entry against a step
+        :param step: BuildStep
+        :param entry: Dictionary out of the checkpoint
+        :return: Dictionary with the decoded outputs of the step, or None if the step has to be run again
+        """
+        if entry['name'] != step.name or entry['inputs'] != self.get_inputs(step):
+            return None
+        if any(self.get_node(uuid).isNull() for uuid in entry['created']):
+            return None
+        try:
+            return dict((name, self.decode(entry['outputs'][name])) for name in step.outputs)
+        except KeyError:
+            return None
+
+    def read_checkpoint(self, node):
+        """ Read the checkpoint that is stored on a node
+        :param node: MObject
+        :return: List of checkpoint entries, empty if the node has no checkpoint
+        """
+        if node.isNull():
+            return []
+        dep_node = om.MFnDependencyNode(node)
+        if not dep_node.hasAttribute(self.attribute):
+            return []
+        value = dep_node.findPlug(self.attribute, False).asString()
+        return json.loads(value) if value else []
+
+    def write_checkpoint(self):
+        """ Store the checkpoint on the node that the holder returns
+        :return:
+        """
+        node = self.holder() if self.holder is not None else om.MObject()
+        if node.isNull():
+            return
+        dep_node = om.MFnDependencyNode(node)
+        if not dep_node.hasAttribute(self.attribute):
+            dg_mod = om.MDGModifier()
+            attribute = om.MFnTypedAttribute().create(self.attribute, self.attribute, om.MFnData.kString)
+            dg_mod.addAttribute(node, attribute)
+            BuildTransaction.execute(dg_mod)
+        dg_mod = om.MDGModifier()
+        dg_mod.newPlugValueString(dep_node.findPlug(self.attribute, False), json.dumps(self.checkpoint))
+        BuildTransaction.execute(dg_mod)
+
+    @staticmethod
+    def get_uuids(handles):
+        """ Get the UUIDs of the nodes that still exist
+        :param handles: List of MObjectHandles
+        :return: List of String UUIDs
+        """
+        return [om.MFnDependencyNode(handle.object()).uuid().asString() for handle in handles if handle.isValid()]
+
+    @staticmethod
+    def delete_nodes(uuids):
+        """ Delete the nodes that still exist out of a list of UUIDs
+        :param uuids: List of String UUIDs
+        :return:
+        """
+        names = cmds.ls(uuids, long=True) if uuids else []
+        if names:
+            cmds.delete(names)
+
+    @staticmethod
+    def get_node(uuid):
+        """ Find a node by its UUID
+        :param uuid: String UUID
+        :return: MObject containing the node, a null object if it does not exist
+        """
+        sel = om.MSelectionList()
+        try:
+            sel.add(om.MUuid(uuid))
+        except RuntimeError:
+            return om.MObject()
+        if sel.isEmpty():
+            return om.MObject()
+        return sel.getDependNode(0)
+
+    @staticmethod
+    def encode(value):
+        """ Turn a value into something that can be stored as json, nodes are replaced by their UUIDs
+        :param value: MObject, MSelectionList, list, tuple, dictionary or a plain value
+        :return: Encoded value
+        """
+        if isinstance(value, om.MObject):
+            return {'node': None if value.isNull() else om.MFnDependencyNode(value).uuid().asString()}
+        if isinstance(value, om.MSelectionList):
+            return {'list': [BuildPipeline.encode(value.getDependNode(index)) for index in range(value.length())]}
+        if isinstance(value, (list, tuple)):
+            return [BuildPipeline.encode(item) for item in value]
+        if isinstance(value, dict):
+            return {'dict': dict((key, BuildPipeline.encode(item)) for key, item in value.items())}
+        return value
+
+    @staticmethod
+    def decode(value):
+        """ Turn an encoded value back into the original
+        :param value: Value made by encode
+        :return: Decoded value, raises a KeyError if one of the nodes no longer exists
+        """
+        if isinstance(value, list):
+            return [BuildPipeline.decode(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+        if 'node' in value:
+            if value['node'] is None:
+                return om.MObject()
+            node = BuildPipeline.get_node(value['node'])
+            if node.isNull():
+                raise KeyError(value['node'])
+            return node
+        if 'list' in value:
+            sel = om.MSelectionList()
+            for item in value['list']:
+                sel.add(BuildPipeline.decode(item))
+            return sel
+        return dict((key, BuildPipeline.decode(item)) for key, item in value['dict'].items())
@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import functools
+import contextlib
+from backend import om
+
+
+class ProfileFrame(object):
+    """ The measurements of a profiled function within its caller. Calls with the same name under the same caller are
+    added up in a single frame.
+    :param name: String name of the function
+    """
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.seconds = 0.0
+        self.nodes = 0
+        self.children = []
+
+    def get_child(self, name):
+        """ Get the frame of a function that is called from this one, it is created the first time it is called
+        :param name: String name of the function
+        :return: ProfileFrame
+        """
+        for child in self.children:
+            if child.name == name:
+                return child
+        child = ProfileFrame(name)
+        self.children.append(child)
+        return child
+
+    def get_self_seconds(self):
+        """ Get the time that was spent in this function and not in the profiled functions it called
+        :return: Float seconds
+        """
+        return max(0.0, self.seconds - sum(child.seconds for child in self.children))
+
+    def as_dict(self):
+        """ Get the frame and the frames below it as something that can be written to json
+        :return: Dictionary
+        """
+        return {'name': self.name, 'calls': self.calls, 'seconds': self.seconds,
+                'self_seconds': self.get_self_seconds(), 'nodes': self.nodes,
+                'children': [child.as_dict() for child in self.children]}
+
+
+# We could not see which of the build steps was slow on a given character. Every build step of the components and the
+# operations of the ControllerManager are wrapped with profiled, so every build leaves a report behind.
+class BuildProfiler(object):
+    """ This class records the wall time, the number of calls and the number of nodes created by the profiled functions.
+    The frames are nested the same way the calls are, and the outermost profiled call is seen as a build. When it
+    returns the report is printed as a table, kept in last_report and, when a directory is set, written to json.
+    The nodes are counted with a node added callback that only exists while a build is running.
+    """
+    enabled = True
+    directory = None
+    stack = []
+    node_count = 0
+    callback_id = None
+    last_report = None
+
+    @classmethod
+    @contextlib.contextmanager
+    def measure(cls, name):
+        """ Measure the code inside a with statement, this can also be used to make a single report out of steps that
+        are called one after the other
+        :param name: String name in the report
+        :return:
+        """
+        if not cls.enabled:
+            yield
+            return
+        frame, start_time, start_count = cls.start(name)
+        try:
+            yield
+        finally:
+            cls.stop(frame, start_time, start_count)
+
+    @classmethod
+    def start(cls, name):
+        """ Start measuring a call
+        :param name: String name of the function
+        :return: Tuple of the frame, the start time and the node count at the start
+        """
+        if not cls.stack:
+            cls.node_count = 0
+            cls.callback_id = om.MDGMessage.addNodeAddedCallback(cls.node_added, 'dependNode')
+            frame = ProfileFrame(name)
+        else:
+            frame = cls.stack[-1].get_child(name)
+        cls.stack.append(frame)
+        return frame, time.time(), cls.node_count
+
+    @classmethod
+    def stop(cls, frame, start_time, start_count):
+        """ Stop measuring a call, when it is the outermost call the report is made
+        :param frame: ProfileFrame returned by start
+        :param start_time: Float time returned by start
+        :param start_count: Integer node count returned by start
+        :return:
+        """
+        frame.calls += 1
+        frame.seconds += time.time() - start_time
+        frame.nodes += cls.node_count - start_count
+        cls.stack.pop()
+        if cls.stack:
+            return
+        om.MMessage.removeCallback(cls.callback_id)
+        cls.callback_id = None
+        cls.last_report = frame.as_dict()
+        print(cls.format_report(cls.last_report))
+        if cls.directory:
+            cls.write_report(cls.last_report, cls.directory)
+
+    @classmethod
+    def node_added(cls, node, client_data):
+        """ Callback that counts the nodes created during a build
+        :param node: MObject containing the new node
+        :param client_data: Unused
+        :return:
+        """
+        cls.node_count += 1
+
+    @staticmethod
+    def format_report(report):
+        """ Turn a report into a table, the names are indented by how deep the call was
+        :param report: Dictionary made by ProfileFrame.as_dict
+        :return: String table
+        """
+        total = report['seconds'] or 1.0
+        lines = ['{0:<60} {1:>6} {2:>9} {3:>9} {4:>6} {5:>6}'.format('step', 'calls', 'seconds', 'self', '%', 'nodes')]
+        rows = [(report, 0)]
+        while rows:
+            row, depth = rows.pop(0)
+            lines.append('{0:<60} {1:>6} {2:>9.4f} {3:>9.4f} {4:>6.1f} {5:>6}'.format(
+                ('  ' * depth + row['name'])[:60], row['calls'], row['seconds'], row['self_seconds'],
+                100.0 * row['seconds'] / total, row['nodes']))
+            rows = [(child, depth + 1) for child in row['children']] + rows
+        return '\n'.join(lines)
+
+    @staticmethod
+    def write_report(report, directory):
+        """ Write a report to a json file named after the build and the time it finished
+        :param report: Dictionary made by ProfileFrame.as_dict
+        :param directory: String directory, it is created when it does not exist
+        :return: String path of the file
+        """
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        path = os.path.join(directory, '{0}_{1}.json'.format(report['name'], time.strftime('%Y%m%d_%H%M%S')))
+        with open(path, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+        return path
+
+
+def profiled(function):
+    """ Decorator that measures a function with the BuildProfiler. The name in the report is the module and the name of
+    the function, so a method is listed under the module that defines it.
+    :param function: Function or method
+    :return: Wrapped function
+    """
+    name = function.__module__ + '.' + function.__name__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with BuildProfiler.measure(name):
+            return function(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,139 @@
+import os
+from backend import om, cmds
+
+
+# Every doIt of a modifier and every cmds call used to end up as a separate entry in the undo queue, so undoing a leg
+# took thousands of steps. The modifiers are now run through a small command, which makes them undoable, and the whole
+# build is put in one undo chunk.
+class BuildTransaction(object):
+    """ This class groups everything that is done during a build into a single undo entry. It is used as a context
+    manager around the build, and the components execute their modifiers with BuildTransaction.execute. Inside a
+    transaction the modifiers are executed by the command in build_transaction_plugin, so Maya can undo and redo them in
+    the right order together with the cmds calls of the build. Outside of a transaction, or when the plugin can not be
+    loaded, execute simply calls doIt.
+    Only what goes through a modifier or a cmds call is recorded, so the components place their nodes with plug values
+    on their modifiers. Every modifier is executed once in a transaction, so every execution is its own undo entry.
+    :param name: String name of the undo chunk
+    """
+    command = 'buildingBlocksModifier'
+    plugin = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'build_transaction_plugin.py')
+    plugin_loaded = None
+    active = None
+    pending = None
+    callbacks = {}
+    instances = {}
+
+    def __init__(self, name='BuildingBlocks'):
+        self.name = name
+        self.modifiers = []
+        self.executions = 0
+
+    def __enter__(self):
+        cmds.undoInfo(openChunk=True, chunkName=self.name)
+        BuildTransaction.active = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        BuildTransaction.active = None
+        self.clear()
+        cmds.undoInfo(closeChunk=True)
+        return False
+
+    @classmethod
+    def clear(cls):
+        """ Forget the instances and callbacks of modifiers that were never executed, so they do not keep those
+        modifiers alive after the transaction
+        :return:
+        """
+        cls.callbacks = {}
+        cls.instances = {}
+
+    @classmethod
+    def execute(cls, modifier):
+        """ Execute a MDGModifier or MDagModifier. Inside a transaction a modifier can only be executed once, because
+        undoing it undoes everything it has ever done, a new modifier is needed for the next changes.
+        :param modifier: MDGModifier or MDagModifier
+        :return: The modifier
+        """
+        transaction = cls.active
+        if transaction is not None and any(executed is modifier for executed in transaction.modifiers):
+            raise ValueError('A modifier can only be executed once in a build transaction')
+        instances = cls.instances.pop(modifier, [])
+        if transaction is not None:
+            transaction.modifiers.append(modifier)
+        if transaction is None or not cls.load_plugin():
+            modifier.doIt()
+            cls.add_instances(instances)
+            cls.run_callbacks(modifier)
+            return modifier
+        cls.pending = (modifier, instances)
+        try:
+            getattr(cmds, cls.command)()
+        finally:
+            cls.pending = None
+        transaction.executions += 1
+        cls.run_callbacks(modifier)
+        return modifier
+
+    @classmethod
+    def add_instance(cls, modifier, node, parent):
+        """ Add an existing node, or one that the modifier creates, as an instance under another parent once the
+        modifier is executed. The instance is added with MFnDagNode.addChild inside the same undoable command as the
+        modifier, so it is undone and redone together with it.
+        :param modifier: MDagModifier
+        :param node: MObject containing the node, usually a shape
+        :param parent: MObject containing the transform that the instance is added under
+        :return:
+        """
+        cls.instances.setdefault(modifier, []).append((node, parent))
+
+    @staticmethod
+    def add_instances(instances):
+        """ Add the instances that were waiting for a modifier
+        :param instances: List of tuples with the MObjects of the node and the parent
+        :return:
+        """
+        for node, parent in instances:
+            om.MFnDagNode(parent).addChild(node, om.MFnDagNode.kNextPos, True)
+
+    @staticmethod
+    def remove_instances(instances):
+        """ Remove instances that were added with add_instances, in reverse order
+        :param instances: List of tuples with the MObjects of the node and the parent
+        :return:
+        """
+        for node, parent in reversed(instances):
+            om.MFnDagNode(parent).removeChild(node)
+
+    @classmethod
+    def after_execute(cls, modifier, callback):
+        """ Call a function the next time a modifier is executed, for example to forget cached queries of the nodes
+        that the modifier changes
+        :param modifier: MDGModifier or MDagModifier
+        :param callback: Function without arguments
+        :return:
+        """
+        cls.callbacks.setdefault(modifier, []).append(callback)
+
+    @classmethod
+    def run_callbacks(cls, modifier):
+        """ Call the functions that were waiting for a modifier to be executed
+        :param modifier: MDGModifier or MDagModifier
+        :return:
+        """
+        for callback in cls.callbacks.pop(modifier, []):
+            callback()
+
+    @classmethod
+    def load_plugin(cls):
+        """ Load the plugin with the modifier command, this is only tried once per session
+        :return: Boolean, true if the command can be used
+        """
+        if cls.plugin_loaded is None:
+            try:
+                if not cmds.pluginInfo(cls.plugin, query=True, loaded=True):
+                    cmds.loadPlugin(cls.plugin, quiet=True)
+                cls.plugin_loaded = True
+            except RuntimeError:
+                cls.plugin_loaded = False
+        return cls.plugin_loaded
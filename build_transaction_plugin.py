@@ -0,0 +1,52 @@
+from backend import om
+
+
+def maya_useNewAPI():
+    """ Tells Maya that this plugin uses the Python API 2.0 """
+    pass
+
+
+# This command is never called by hand. BuildTransaction hands it the modifier that has to be executed, and because it
+# is a command Maya keeps it in the undo queue.
+class ModifierCommand(om.MPxCommand):
+    """ This class executes the modifier that BuildTransaction has waiting, and undoes and redoes it with the undo
+    queue.
+    """
+    name = 'buildingBlocksModifier'
+
+    def __init__(self):
+        super(ModifierCommand, self).__init__()
+        self.modifier = None
+        self.instances = []
+
+    @staticmethod
+    def creator():
+        return ModifierCommand()
+
+    def doIt(self, args):
+        from build_transaction import BuildTransaction
+        if BuildTransaction.pending is None:
+            return
+        self.modifier, self.instances = BuildTransaction.pending
+        self.redoIt()
+
+    def undoIt(self):
+        from build_transaction import BuildTransaction
+        BuildTransaction.remove_instances(self.instances)
+        self.modifier.undoIt()
+
+    def redoIt(self):
+        from build_transaction import BuildTransaction
+        self.modifier.doIt()
+        BuildTransaction.add_instances(self.instances)
+
+    def isUndoable(self):
+        return self.modifier is not None
+
+
+def initializePlugin(plugin):
+    om.MFnPlugin(plugin, 'BuildingBlocks', '1.0').registerCommand(ModifierCommand.name, ModifierCommand.creator)
+
+
+def uninitializePlugin(plugin):
+    om.MFnPlugin(plugin).deregisterCommand(ModifierCommand.name)
@@ -1,8 +1,13 @@
+import math
 from controller_template import ControllerTemplate
-from maya import cmds
-from maya.api import OpenMaya as om
+from backend import om, cmds
 import names
 from helper import Helper
+from mesh_index import MeshIndex
+from build_context import BuildContext
+from shape_registry import ShapeRegistry
+from build_transaction import BuildTransaction
+from build_profiler import profiled
 
 
 # noinspection PyUnresolvedReferences
@@ -11,88 +16,354 @@ class ControllerManager(object):
     This class manages the creation of controls and the offsets of these controls. Anything relating to the creation
     of controls will also be handled in this class.
     Most use cases of the number 4 will be referring to MSpace.kWorld = 4.
+    :param instance_shapes: Boolean, if true controls of the same type and about the same size share their shapes
+    :param context: BuildContext that is shared with the components, if None a new one is created
     """
-    def __init__(self):
+    # Number of size buckets per doubling in size, used to decide which controls can share their shapes
+    size_steps = 4
+
+    def __init__(self, instance_shapes=False, context=None):
+        self.context = context if context is not None else BuildContext()
         self.manager = ControllerTemplate()
-        self.manager.update_templates()
-        self.controls = self.manager.get_controller_templates()
+        self.instance_shapes = instance_shapes
+        self.shared_shapes = {}
+        if ShapeRegistry.load():
+            self.manager.update_templates()
+        self.controls = ShapeRegistry.shape_names()
         self.default_control = None
-        for control in self.controls:
-            if control == names.default_control + '_template.ma':
-                self.default_control = control
+        if ShapeRegistry.resolve_name(names.default_control) in self.controls:
+            self.default_control = ShapeRegistry.resolve_name(names.default_control)
         self.control = om.MObject()
         self.offset = om.MObject()
         self.control_transform = om.MFnTransform()
 
-    def create_control(self, object1, control=None, name=None):
+    @profiled
+    def create_control(self, object1, control=None, name=None, instance_shapes=None):
         """ This method creates controls and uses the object1 variable for the name handling
         :param object1: MObject containing an object that the control will be created for
         :param control: String of the type of control that will be created
         :param name: String of alternative name if desired
+        :param instance_shapes: Boolean, if true the shapes are shared with other controls. If None the instance_shapes
+        attribute of the manager is used.
         :return: returns the created control
         """
         if not control:
             control = self.default_control
-        selection = om.MSelectionList()
         object1 = om.MObject(object1)
-        object1_dag = om.MFnDagNode(object1)
-        object1_name = object1_dag.name()
         if name is None:
-            name = object1_name
+            name = self.context.get_name(object1)
+        if instance_shapes is None:
+            instance_shapes = self.instance_shapes
         dag_mod = om.MDagModifier()
-        control_import = self.manager.import_controller(ctrl_type=control)
-        if control_import:
-            control_import = control_import[0]
-            selection.add(control_import)
-            self.control = selection.getDependNode(0)
-            dag_mod.renameNode(self.control, name+'_ctrl')
-        dag_mod.doIt()
+        if instance_shapes:
+            control_build = self.build_instanced_control(control, object1, name, dag_mod)
+        else:
+            control_build = self.manager.build_controller(ctrl_type=control, dag_mod=dag_mod)
+        if control_build is not None:
+            self.control = control_build
+            self.context.rename(dag_mod, self.control, name+'_ctrl')
+        BuildTransaction.execute(dag_mod)
         return self.control
 
+    @profiled
     def create_offset(self, control):
         """ Create an offset and parent object under offset
         :param control: MObject containing the control that will be parented under the offset
         :return: MObject containing the offset
         """
-        control_dag = om.MFnDagNode(control)
-        control_name = control_dag.name()
+        control_name = self.context.get_name(control)
         dag_mod = om.MDagModifier()
         self.offset = dag_mod.createNode('transform')
         dag_mod.renameNode(self.offset, control_name + '_offset')
-        dag_mod.reparentNode(control, self.offset)
-        dag_mod.doIt()
+        self.context.reparent(dag_mod, control, self.offset)
+        BuildTransaction.execute(dag_mod)
         return self.offset
 
-    def match_control(self, object1, control=None, rotation=True, space=4):
-        """ This method will match the control in given space to the object
+    @profiled
+    def create_controls(self, specs, parent=om.MObject(), chain=False, space=4, rotation=True, mesh=om.MObject(),
+                        scale_modifier=3, fit=False, instance_shapes=None, sizes=None, dag_mod=None, matrices=None):
+        """ Create the controls and offsets for a whole list of objects at once. Creating, renaming, placing and
+        parenting all happen in one MDagModifier, the offsets are placed with plug values on that modifier and the
+        controls are sized before they are created, so nothing is read back from Maya once a control is made. An unknown
+        type of control raises a ValueError before anything is created.
+        :param specs: List of (object, control, name) tuples. The object is an MObject the control is created for, the
+        control a String type of control (None for the default control) and the name a String (None for the name of the
+        object).
+        :param parent: MObject containing the node the offsets are parented under. If chain is true only the first
+        offset is parented under it.
+        :param chain: Boolean, if true every offset is parented under the control that comes before it
+        :param space: The space of the object that the offsets are matched to. 4 is world, 1 copies the local
+        translation and rotation of the object, like match_control does with space 1.
+        :param rotation: Boolean if rotation has to be matched
+        :param mesh: MObject or list of MObjects containing the meshes the controls are sized against, like
+        resize_control. If it is null or empty the controls keep the size of the template.
+        :param scale_modifier: Modifier to increase the scale of the controls, same as in resize_control
+        :param fit: Boolean, if true the controls are fit to the length of their joint, same as fit_control
+        :param instance_shapes: Boolean, if true the shapes are shared with other controls. If None the instance_shapes
+        attribute of the manager is used.
+        :param sizes: List of float sizes in the order of the specs, for example from SkinSizing. A size is used
+        instead of the distance to the mesh, the mesh is only used for the sizes that are None.
+        :param dag_mod: MDagModifier to add the nodes to. If none is given a new modifier is created and executed.
+        :param matrices: List of MMatrix world matrices in the order of the specs. With space 4 an offset that has a
+        matrix is placed at it instead of at its object, None uses the object.
+        :return: List of MObjects containing the controls and a list of MObjects containing the offsets, both in the
+        order of the specs
+        """
+        for object1, control, name in specs:
+            control = control or self.default_control
+            if not control or ShapeRegistry.get(control) is None:
+                raise ValueError('Unknown control type {0}'.format(control))
+        if instance_shapes is None:
+            instance_shapes = self.instance_shapes
+        execute = dag_mod is None
+        if execute:
+            dag_mod = om.MDagModifier()
+        mesh_distances = list(sizes) if sizes is not None else [None] * len(specs)
+        missing = [index for index, size in enumerate(mesh_distances) if size is None]
+        mesh_index = MeshIndex.get(mesh) if missing else None
+        if mesh_index is not None:
+            distances = mesh_index.closest_distances([Helper.get_point(specs[index][0]) for index in missing])
+            for index, distance in zip(missing, distances):
+                mesh_distances[index] = distance
+        world_matrices = list(matrices) if matrices is not None else [None] * len(specs)
+        parent_matrix = om.MMatrix()
+        if not parent.isNull() and space == 4:
+            parent_matrix = self.context.get_path(parent).inclusiveMatrix()
+        controls = []
+        offsets = []
+        for (object1, control, name), mesh_distance, world_matrix in zip(specs, mesh_distances, world_matrices):
+            object1 = om.MObject(object1)
+            if not control:
+                control = self.default_control
+            if name is None:
+                name = self.context.get_name(object1)
+            if instance_shapes:
+                control_build = self.build_instanced_control(control, object1, name, dag_mod, mesh_distance,
+                                                             scale_modifier, fit)
+            else:
+                points = self.get_control_points(control, object1, mesh_distance, scale_modifier, fit)
+                control_build = self.manager.build_controller(ctrl_type=control, dag_mod=dag_mod, points=points)
+            offset = dag_mod.createNode('transform')
+            self.context.rename(dag_mod, control_build, name+'_ctrl')
+            self.context.rename(dag_mod, offset, name+'_ctrl_offset')
+            self.context.reparent(dag_mod, control_build, offset)
+            offset_parent = parent
+            if chain and controls:
+                offset_parent = controls[-1]
+            if not offset_parent.isNull():
+                self.context.reparent(dag_mod, offset, offset_parent)
+            object1_transform = self.context.get_transform(object1)
+            if space == 4:
+                if world_matrix is None:
+                    matrix = om.MTransformationMatrix()
+                    matrix.setTranslation(object1_transform.translation(4), 4)
+                    if rotation:
+                        matrix.setRotation(object1_transform.rotation(4, asQuaternion=True))
+                    world_matrix = matrix.asMatrix()
+                matrix = om.MTransformationMatrix(world_matrix * parent_matrix.inverse())
+                if chain:
+                    parent_matrix = world_matrix
+                translation = matrix.translation(1)
+                quaternion = matrix.rotation(asQuaternion=True)
+            else:
+                translation = object1_transform.translation(space)
+                quaternion = object1_transform.rotation(space, asQuaternion=True)
+            Helper.set_plug_values(dag_mod, Helper.get_plug(offset, 'translate'), translation)
+            if rotation:
+                Helper.set_plug_values(dag_mod, Helper.get_plug(offset, 'rotate'), quaternion.asEulerRotation())
+            controls.append(control_build)
+            offsets.append(offset)
+        if execute:
+            BuildTransaction.execute(dag_mod)
+        if controls:
+            self.control = controls[-1]
+            self.offset = offsets[-1]
+        return controls, offsets
+
+    @profiled
+    def build_instanced_control(self, control, object1, name, dag_mod, mesh_distance=None, scale_modifier=3,
+                                fit=False):
+        """ Build a control whose shapes are instances of shapes that are shared with the other controls of the same
+        type and about the same size, the same way the IK FK switch is instanced. The shared shapes are scaled to a size
+        bucket, and a transform between the control and the shapes makes up the difference. Fitting to the joint is
+        done with that transform as well, by stretching the bounding box of the shapes, which matches fit_control for
+        box shaped controls.
+        :param control: String type of control
+        :param object1: MObject containing the object the control is created for
+        :param name: String name of the control, without the '_ctrl' suffix
+        :param dag_mod: MDagModifier to add the nodes to. Shapes that are already shared are added as instances when it
+        is executed, see BuildTransaction.add_instance.
+        :param mesh_distance: Float distance from the object to the mesh the control is sized against. If it is None
+        the control keeps the size of the template.
+        :param scale_modifier: Modifier to increase the scale of the control, same as in resize_control
+        :param fit: Boolean, if true the control is fit to the length of the joint, same as fit_control
+        :return: MObject containing the control, or None if the control does not exist
+        """
+        control_build = self.manager.build_controller(ctrl_type=control, dag_mod=dag_mod, shapes=False)
+        if control_build is None:
+            return None
+        bounding_box = self.get_template_bounding_box(control)
+        scale = self.get_control_scale(bounding_box, mesh_distance, scale_modifier)
+        bucket = int(round(math.log(scale, 2) * self.size_steps)) if scale > 0 else 0
+        bucket_scale = 2 ** (float(bucket) / self.size_steps)
+        shape_transform = dag_mod.createNode('transform', control_build)
+        dag_mod.renameNode(shape_transform, name+'_'+names.control+'_'+names.shape)
+        key = (ShapeRegistry.resolve_name(control), bucket)
+        shapes = [handle.object() for handle in self.shared_shapes.get(key, []) if handle.isValid()]
+        if shapes and len(shapes) == len(self.shared_shapes[key]):
+            for shape in shapes:
+                BuildTransaction.add_instance(dag_mod, shape, shape_transform)
+        else:
+            points = {}
+            for node in ShapeRegistry.get(control).nodes:
+                if node.geometry is not None:
+                    points[node.name] = [(cv[0] * bucket_scale, cv[1] * bucket_scale, cv[2] * bucket_scale)
+                                         for cv in node.geometry.cvs]
+            shapes = self.manager.build_shapes(control, shape_transform, dag_mod, points)
+            self.shared_shapes[key] = [om.MObjectHandle(shape) for shape in shapes]
+        residual = scale / bucket_scale
+        scale_x = residual
+        translate_x = 0.0
+        length = Helper.get_joint_length(object1) if fit else 0.0
+        x_min = bounding_box.min.x * scale
+        x_max = bounding_box.max.x * scale
+        if length and x_max > x_min:
+            bounding_box_size = bounding_box.center.distanceTo(bounding_box.max) * scale
+            new_min = x_min + bounding_box_size * 0.5 if x_min < 0 else x_min
+            new_max = x_max + length - bounding_box_size if x_max > 0 else x_max
+            ratio = (new_max - new_min) / (x_max - x_min)
+            scale_x = ratio * residual
+            translate_x = new_min - ratio * x_min
+        Helper.set_plug_values(dag_mod, Helper.get_plug(shape_transform, 'scale'), [scale_x, residual, residual])
+        Helper.set_plug_values(dag_mod, Helper.get_plug(shape_transform, 'translate'), [translate_x, 0.0, 0.0])
+        return control_build
+
+    @staticmethod
+    def get_control_display(control):
+        """ Get the node that shows and hides the shapes of a control. That is the transform holding the shared shapes
+        for controls that were built with instance_shapes, and the first shape for all other controls.
+        :param control: MObject or MDagPath containing the control
+        :return: MObject containing the node
+        """
+        if isinstance(control, om.MDagPath):
+            control_dag_path = om.MDagPath(control)
+        else:
+            control_dag_path = om.MFnDagNode(control).getPath()
+        for index in range(control_dag_path.childCount()):
+            child = control_dag_path.child(index)
+            if child.hasFn(om.MFn.kTransform) and \
+                    om.MFnDependencyNode(child).name().endswith('_'+names.control+'_'+names.shape):
+                return child
+        control_dag_path.extendToShape(0)
+        return control_dag_path.node()
+
+    @staticmethod
+    def get_template_bounding_box(control):
+        """ Get the bounding box of all the CVs of a control template
+        :param control: String type of control
+        :return: MBoundingBox
+        """
+        bounding_box = om.MBoundingBox()
+        shape = ShapeRegistry.get(control)
+        if shape is None:
+            return bounding_box
+        for node in shape.nodes:
+            if node.geometry is not None:
+                for cv in node.geometry.cvs:
+                    bounding_box.expand(om.MPoint(cv))
+        return bounding_box
+
+    @staticmethod
+    def get_control_scale(bounding_box, mesh_distance=None, scale_modifier=3):
+        """ Get the scale that resize_control would give a control
+        :param bounding_box: MBoundingBox of the control template
+        :param mesh_distance: Float distance from the object to the mesh. If it is None the scale is 1.
+        :param scale_modifier: Modifier to increase the scale of the control, same as in resize_control
+        :return: Float scale
+        """
+        bounding_box_size = bounding_box.center.distanceTo(bounding_box.max)
+        if mesh_distance is None or bounding_box_size <= 0:
+            return 1.0
+        return mesh_distance / bounding_box_size * scale_modifier
+
+    @classmethod
+    def get_control_points(cls, control, object1, mesh_distance=None, scale_modifier=3, fit=False):
+        """ Work out the CV positions of a control as they would be after resize_control and fit_control, so the
+        control can be created at its final size instead of being changed after it has been created.
+        :param control: String type of control
+        :param object1: MObject containing the object the control is created for
+        :param mesh_distance: Float distance from the object to the mesh the control is sized against. If it is None
+        the control keeps the size of the template.
+        :param scale_modifier: Modifier to increase the scale of the control, same as in resize_control
+        :param fit: Boolean, if true the control is fit to the length of the joint, same as fit_control
+        :return: Dictionary of shape node names and lists of points, or None if the template is used as it is
+        """
+        shape = ShapeRegistry.get(control)
+        if shape is None or (mesh_distance is None and not fit):
+            return None
+        bounding_box = cls.get_template_bounding_box(control)
+        scale = cls.get_control_scale(bounding_box, mesh_distance, scale_modifier)
+        bounding_box_size = bounding_box.center.distanceTo(bounding_box.max) * scale
+        length = 0.0
+        if fit:
+            length = Helper.get_joint_length(object1)
+        points = {}
+        for node in shape.nodes:
+            if node.geometry is None:
+                continue
+            node_points = []
+            for cv in node.geometry.cvs:
+                x = cv[0] * scale
+                if fit and x > 0:
+                    x += (length or bounding_box_size) - bounding_box_size
+                elif fit and x < 0 and length:
+                    x += bounding_box_size * 0.5
+                node_points.append((x, cv[1] * scale, cv[2] * scale))
+            points[node.name] = node_points
+        return points
+
+    @profiled
+    def match_control(self, object1, control=None, rotation=True, space=4, dag_mod=None):
+        """ This method will match the control in given space to the object. The values are set through a modifier, so
+        the match is undone and redone with the rest of the build.
         :param object1: MObject containing object that control will be matched to
         :param control: MObject containing the control to be matched
         :param rotation: Boolean if rotation has to be matched
         :param space: The space to be used for setting the value. 4 is world and 2 is object.
+        :param dag_mod: MDagModifier that the values are added to, if None a modifier is created and executed
         :return: MTransform of the control
         """
         if not control:
             control = self.control
-        object1_dag_node = om.MFnDagNode(object1)
-        control_dag_node = om.MFnDagNode(control)
-        object1_dag_path = object1_dag_node.getPath()
-        control_dag_path = control_dag_node.getPath()
-        object1_transform = om.MFnTransform(object1_dag_path)
-        control_transform = om.MFnTransform(control_dag_path)
+        object1_transform = self.context.get_transform(object1)
+        control_transform = self.context.get_transform(control)
         object1_translation = object1_transform.translation(space)
         object1_rotation = object1_transform.rotation(space, asQuaternion=True)
-        control_transform.setTranslation(object1_translation, space)
+        if space == 4:
+            parent_inverse = self.context.get_path(control).exclusiveMatrixInverse()
+            object1_translation = om.MVector(om.MPoint(object1_translation) * parent_inverse)
+            object1_rotation = om.MTransformationMatrix(object1_rotation.asMatrix() * parent_inverse).rotation(True)
+        execute = dag_mod is None
+        if execute:
+            dag_mod = om.MDagModifier()
+        Helper.set_plug_values(dag_mod, Helper.get_plug(control, 'translate'), object1_translation)
         if rotation:
-            control_transform.setRotation(object1_rotation, space)
+            Helper.set_plug_values(dag_mod, Helper.get_plug(control, 'rotate'), object1_rotation.asEulerRotation())
+        BuildTransaction.after_execute(dag_mod, lambda: self.context.invalidate(control))
+        if execute:
+            BuildTransaction.execute(dag_mod)
         self.control_transform = control_transform
         return control_transform
 
-    def resize_control(self, mesh=om.MObject(), control=None, scale_modifier=3):
+    @profiled
+    def resize_control(self, mesh=om.MObject(), control=None, scale_modifier=3, size=None):
         """ Resize the control based on the size of the mesh. While not foolproof should be good enough for most cases
         in terms of scaling
-        :param mesh: MObject containing the mesh
+        :param mesh: MObject or list of MObjects containing the meshes, the closest vertex is looked up in a MeshIndex.
+        Without a mesh or a size the control keeps its size.
         :param control: MObject containing the control
         :param scale_modifier: Modifier to increase the scale of the object, should the given result not be enough
+        :param size: Float size to use instead of the distance to the mesh, for example from SkinSizing
         :return: MObject containing the control
         """
         control_transform = None
@@ -105,22 +376,30 @@ class ControllerManager(object):
             control_transform = om.MFnTransform(control_dag_path)
         else:
             return
-        mesh = om.MFnMesh(om.MFnDagNode(mesh).getPath())
-        bounding_box = om.MFnDagNode(control).boundingBox
+        mesh_distance = size
+        if mesh_distance is None:
+            mesh_index = MeshIndex.get(mesh)
+            if mesh_index is None:
+                return control
+            mesh_distance = mesh_index.closest_distance(om.MPoint(control_transform.translation(4)))
+        shapes, bounding_box = self.get_control_cvs(control)
         bounding_box_size = bounding_box.center.distanceTo(bounding_box.max)
-        control_point = om.MPoint(control_transform.translation(4))
-        closest_point = mesh.getClosestPoint(control_point, 4)
-        mesh_distance = control_point.distanceTo(closest_point[0])
-        scale = mesh_distance / bounding_box_size
-        curve_iterator = om.MItGeometry(control)
-        while not curve_iterator.isDone():
-            curve_iterator.setPosition(curve_iterator.position() * (scale * scale_modifier))
-            curve_iterator.next()
+        scale = mesh_distance / bounding_box_size * scale_modifier
+        dag_mod = om.MDagModifier()
+        shape_transform = self.get_shape_transform(control)
+        if not shape_transform.isNull():
+            self.scale_shape_transform(dag_mod, shape_transform, (scale, scale, scale))
+        else:
+            for shape_fn, points in shapes:
+                self.set_control_cvs(dag_mod, shape_fn, [om.MPoint(point.x * scale, point.y * scale, point.z * scale)
+                                                         for point in points])
+        BuildTransaction.execute(dag_mod)
         return control
 
+    @profiled
     def fit_control(self, joint=om.MObject(), control=None, scale=1):
         """ Fit this control to the size of the bone. This uses the joint, and it's first child to determine the size
-        of the control
+        of the control. A joint without a length keeps the shape of the control.
         :param joint: MObject containing the joint
         :param control: MObject containing the control
         :param scale: Scale modifier if somehow the control would end up being too small
@@ -129,24 +408,116 @@ class ControllerManager(object):
         if not control:
             control = self.control
         length = Helper.get_joint_length(joint)
-        curve_iterator = om.MItGeometry(control)
-        bounding_box = om.MFnDagNode(control).boundingBox
-        bounding_box_size = om.MFnDagNode(control).boundingBox.center.distanceTo(bounding_box.max)
-        while not curve_iterator.isDone():
-            position = curve_iterator.position()
-            if curve_iterator.position().x > 0:
-                if length == 0.0:
-                    length = bounding_box_size
-                new_position = om.MPoint((position.x - bounding_box_size + length) * scale, position.y, position.z, 1)
-                curve_iterator.setPosition(new_position)
-            elif curve_iterator.position().x < 0:
-                bb_size = bounding_box_size * 0.5
-                if length == 0.0:
-                    bb_size = 0
-                new_position = om.MPoint((position.x + bb_size) * scale, position.y, position.z, 1)
-                curve_iterator.setPosition(new_position)
-            curve_iterator.next()
+        shapes, bounding_box = self.get_control_cvs(control)
+        bounding_box_size = bounding_box.center.distanceTo(bounding_box.max)
+        positive_offset = 0.0
+        negative_offset = 0.0
+        if length:
+            positive_offset = length - bounding_box_size
+            negative_offset = bounding_box_size * 0.5
+        dag_mod = om.MDagModifier()
+        shape_transform = self.get_shape_transform(control)
+        if not shape_transform.isNull():
+            ratio = 1.0
+            offset = 0.0
+            x_min = bounding_box.min.x
+            x_max = bounding_box.max.x
+            if length and x_max > x_min:
+                new_min = x_min + negative_offset if x_min < 0 else x_min
+                new_max = x_max + positive_offset if x_max > 0 else x_max
+                ratio = (new_max - new_min) / (x_max - x_min)
+                offset = new_min - ratio * x_min
+            self.scale_shape_transform(dag_mod, shape_transform, (ratio * scale, 1.0, 1.0), offset * scale)
+        else:
+            for shape_fn, points in shapes:
+                self.set_control_cvs(dag_mod, shape_fn, [om.MPoint((point.x + (positive_offset if point.x > 0 else
+                                                                               negative_offset if point.x < 0 else
+                                                                               0)) * scale, point.y, point.z)
+                                                         for point in points])
+        BuildTransaction.execute(dag_mod)
+
+    @staticmethod
+    def get_shape_transform(control):
+        """ Get the transform between a control and its shapes, which only controls that were built with
+        instance_shapes have
+        :param control: MObject containing the control
+        :return: MObject containing the transform, a null object if the shapes are directly below the control
+        """
+        display = ControllerManager.get_control_display(control)
+        if display.hasFn(om.MFn.kTransform):
+            return display
+        return om.MObject()
+
+    @staticmethod
+    def scale_shape_transform(dag_mod, shape_transform, scale, offset=0.0):
+        """ Resize the shapes of an instanced control with the transform above them, the shapes themselves are shared
+        with other controls and are left alone. Every point of the control is scaled per axis in the space of the
+        control, after which it is moved along x by the offset.
+        :param dag_mod: MDagModifier that the values are set with
+        :param shape_transform: MObject containing the transform above the shapes
+        :param scale: List of three Floats
+        :param offset: Float distance along x
+        :return:
+        """
+        transform_fn = om.MFnTransform(om.MFnDagNode(shape_transform).getPath())
+        old_scale = transform_fn.scale()
+        old_translation = transform_fn.translation(1)
+        Helper.set_plug_values(dag_mod, Helper.get_plug(shape_transform, 'scale'),
+                               [old_scale[index] * scale[index] for index in range(3)])
+        Helper.set_plug_values(dag_mod, Helper.get_plug(shape_transform, 'translate'),
+                               [old_translation[index] * scale[index] + (offset if index == 0 else 0.0)
+                                for index in range(3)])
+
+    @staticmethod
+    def get_control_cvs(control):
+        """ Read the CVs of all the curves and surfaces of a control at once. The shapes of an instanced control are
+        read through the transform above them, and their points are in the space of the control.
+        :param control: MObject containing the control
+        :return: List of tuples with the function set and the MPointArray in object space of every shape, and the
+        MBoundingBox of all the CVs together
+        """
+        control_dag_path = om.MFnDagNode(control).getPath()
+        shape_transform = ControllerManager.get_shape_transform(control)
+        matrix = om.MMatrix()
+        if not shape_transform.isNull():
+            control_dag_path.push(shape_transform)
+            matrix = om.MFnTransform(control_dag_path).transformation().asMatrix()
+        shapes = []
+        bounding_box = om.MBoundingBox()
+        for index in range(control_dag_path.childCount()):
+            child = control_dag_path.child(index)
+            if child.hasFn(om.MFn.kNurbsCurve):
+                shape_fn = om.MFnNurbsCurve(child)
+            elif child.hasFn(om.MFn.kNurbsSurface):
+                shape_fn = om.MFnNurbsSurface(child)
+            else:
+                continue
+            points = shape_fn.cvPositions()
+            for point in points:
+                bounding_box.expand(point * matrix)
+            shapes.append((shape_fn, points))
+        return shapes, bounding_box
+
+    @staticmethod
+    def set_control_cvs(dag_mod, shape_fn, points):
+        """ Write all the CVs of a shape back at once. The shape gets new geometry with the same knots, degree and form
+        through the modifier, so the change is undone together with the rest of the build.
+        :param dag_mod: MDagModifier that the geometry is set with
+        :param shape_fn: MFnNurbsCurve or MFnNurbsSurface of the shape
+        :param points: List of MPoints in object space
+        :return:
+        """
+        if isinstance(shape_fn, om.MFnNurbsCurve):
+            data = om.MFnNurbsCurveData().create()
+            om.MFnNurbsCurve().create(points, shape_fn.knots(), shape_fn.degree, shape_fn.form, False, False,
+                                      parent=data)
+        else:
+            data = om.MFnNurbsSurfaceData().create()
+            om.MFnNurbsSurface().create(points, shape_fn.knotsInU(), shape_fn.knotsInV(), shape_fn.degreeInU,
+                                        shape_fn.degreeInV, shape_fn.formInU, shape_fn.formInV, False, parent=data)
+        dag_mod.newPlugValue(Helper.get_plug(shape_fn.object(), 'cached'), data)
 
+    @profiled
     def rename_control(self, control=None, new_name=""):
         """ Rename the given control
         :param control: MObject containing the to be renamed control.
@@ -156,6 +527,6 @@ class ControllerManager(object):
         if not control:
             control = self.control
         dag_mod = om.MDagModifier()
-        dag_mod.renameNode(control, new_name)
-        dag_mod.doIt()
+        self.context.rename(dag_mod, control, new_name)
+        BuildTransaction.execute(dag_mod)
         return control
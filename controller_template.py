@@ -1,8 +1,11 @@
+import json
 import os
 import sys
-from maya import cmds
-from maya import mel
+from backend import om, cmds
+from helper import Helper
 import names
+from shape_registry import ShapeRegistry
+from build_transaction import BuildTransaction
 
 
 # This class makes use of a file called __templates__.ma which contains all my controls that I've made. It then parses
@@ -19,37 +22,50 @@ class ControllerTemplate(object):
 
     def update_templates(self):
         """ This method will update all the template files (except for '__templates__'). It will create new files
-        if previously they did not exist.
+        if previously they did not exist. A manifest with the hash of every shape is kept next to the templates, so
+        only the shapes that were added or changed are written and the files of removed shapes are deleted.
+        :return: Dictionary with the names of the shapes that were added, changed, removed and unchanged
         """
-        template_file = open(self.path + self.template + '.ma', 'r')
-        lines = template_file.readlines()
-        line_numbers = []
-        for line in enumerate(lines):
-            if 'transform' in line[1] and 'template' in line[1]:
-                line_numbers.append(line[0])
-            elif 'createNode lightLinker' in line[1]:
-                line_numbers.append(line[0])
-        ctrl_names = []
-        for num in line_numbers:
-            line_split = lines[num].split(' ')
-            name = line_split[-1].strip().rstrip('";\n').lstrip('"')
-            if 'lightLinker' in name:
-                pass
+        ShapeRegistry.load()
+        manifest_path = self.path + self.template + '.json'
+        manifest = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r') as manifest_file:
+                manifest = json.load(manifest_file)
+        summary = {'added': [], 'changed': [], 'removed': [], 'unchanged': []}
+        new_manifest = {}
+        for name in sorted(ShapeRegistry.shapes):
+            shape = ShapeRegistry.shapes[name]
+            new_manifest[name] = shape.digest
+            file_path = self.path + name + '.ma'
+            exists = os.path.exists(file_path)
+            if exists and manifest.get(name) == shape.digest:
+                summary['unchanged'].append(name)
+                continue
+            ShapeRegistry.read_lines()
+            header = ShapeRegistry.header
+            content = ''.join([header[0], '//Name: ' + str(name) + '.ma\n'] + header[2:5] + shape.lines +
+                              ['// End of ' + str(name) + '.ma\n'])
+            if exists:
+                with open(file_path, 'r') as old_file:
+                    if old_file.read() == content:
+                        summary['unchanged'].append(name)
+                        continue
+                summary['changed'].append(name)
             else:
-                ctrl_names.append(name)
-        for i in enumerate(zip(line_numbers, ctrl_names)):
-            start = line_numbers[i[0]]
-            if i[0] == len(line_numbers):
-                break
-            end = line_numbers[i[0]+1]
-            open(self.path + i[1][1] + '.ma', 'w').close()
-            new_file = open(self.path + i[1][1] + '.ma', 'w')
-            new_file.writelines(lines[0])
-            new_file.write('//Name: ' + str(i[1][1]) + '.ma\n')
-            new_file.writelines(lines[2:5])
-            new_file.writelines(lines[start:end])
-            new_file.write('// End of ' + str(i[1][1]) + '.ma\n')
-            new_file.close()
+                summary['added'].append(name)
+            with open(file_path, 'w') as new_file:
+                new_file.write(content)
+        for name in sorted(manifest):
+            if name in new_manifest:
+                continue
+            if os.path.exists(self.path + name + '.ma'):
+                os.remove(self.path + name + '.ma')
+            summary['removed'].append(name)
+        if new_manifest != manifest:
+            with open(manifest_path, 'w') as manifest_file:
+                json.dump(new_manifest, manifest_file, indent=4, sort_keys=True)
+        return summary
 
     def get_controller_templates(self):
         """ This method lists all the files in the directory, except the '__templates__' file. It will then return that
@@ -66,52 +82,105 @@ class ControllerTemplate(object):
         return controllers
 
     def import_controller(self, ctrl_type='square'):
-        """ Import controller from created template.ma files
-        :param ctrl_type: Type is a string argument that will look for that controller in the files, if there's nothing
-        that matches it does nothing.
+        """ Import controller from the shapes in the ShapeRegistry, it is built the same way as build_controller
+        :param ctrl_type: Type is a string argument that will look for that controller in the registry, if there's
+        nothing that matches it does nothing.
+        :return: List with the String name of the transform of the controller, empty if nothing was imported
+        """
+        if ctrl_type in self.template:
+            cmds.warning("Can't import default file")
+            return []
+        control = self.build_controller(ctrl_type)
+        if control is None:
+            return []
+        return [om.MFnDependencyNode(control).name()]
+
+    def build_controller(self, ctrl_type='square', dag_mod=None, points=None, shapes=True):
+        """ Build controller straight from the compiled nodes in the ShapeRegistry. The curves are created with
+        MFnNurbsCurve under the new transform and the attributes are set through the modifier, so no MEL is evaluated.
+        :param ctrl_type: String name of the controller, if there's nothing that matches it does nothing.
+        :param dag_mod: MDagModifier to add the nodes to. If none is given a new modifier is created and executed.
+        :param points: Dictionary of shape node names and lists of points, used instead of the CVs of the template so
+        a control can be created at its final size.
+        :param shapes: Boolean, if false only the transforms are created and the curves are left out
+        :return: MObject containing the transform of the controller, or None if the controller does not exist
+        """
+        shape = ShapeRegistry.get(ctrl_type)
+        if shape is None:
+            return None
+        execute = dag_mod is None
+        if execute:
+            dag_mod = om.MDagModifier()
+        transforms = {}
+        control = None
+        for node in shape.nodes:
+            if node.node_type != 'transform' and not shapes:
+                continue
+            m_obj = self.build_node(node, transforms.get(node.parent, om.MObject.kNullObj), dag_mod, points)
+            if node.node_type == 'transform':
+                transforms[node.name] = m_obj
+                if control is None:
+                    control = m_obj
+        if execute:
+            BuildTransaction.execute(dag_mod)
+        return control
+
+    def build_shapes(self, ctrl_type, parent, dag_mod=None, points=None):
+        """ Build only the curves and surfaces of a controller under an existing transform
+        :param ctrl_type: String name of the controller
+        :param parent: MObject containing the transform the shapes are created under
+        :param dag_mod: MDagModifier to add the nodes to. If none is given a new modifier is created and executed.
+        :param points: Dictionary of shape node names and lists of points, same as in build_controller
+        :return: List of MObjects containing the shapes
+        """
+        shape = ShapeRegistry.get(ctrl_type)
+        if shape is None:
+            return []
+        execute = dag_mod is None
+        if execute:
+            dag_mod = om.MDagModifier()
+        shapes = [self.build_node(node, parent, dag_mod, points) for node in shape.nodes
+                  if node.node_type != 'transform']
+        if execute:
+            BuildTransaction.execute(dag_mod)
+        return shapes
+
+    @staticmethod
+    def build_node(node, parent, dag_mod, points=None):
+        """ Create a single compiled node of a controller, rename it and set its attributes through the modifier
+        :param node: ShapeNode out of the ShapeRegistry
+        :param parent: MObject containing the parent, kNullObj for a transform without a parent
+        :param dag_mod: MDagModifier that the renaming and the attributes are added to
+        :param points: Dictionary of shape node names and lists of points, same as in build_controller
+        :return: MObject containing the created node
         """
-        control = []
-        for name in os.listdir(self.path):
-            if ctrl_type in self.template:
-                cmds.warning("Can't import default file")
-                break
-            if ctrl_type in str(name):
-                control_file = open(self.path+name, 'r')
-                lines = control_file.readlines()
-                concatenated_lines = []
-                node_lines = lines[5:-1]
-                list_length = len(node_lines)
-                line_number = 0
-                new_line = ''
-                while not line_number == list_length:
-                    raw_line = r'{}'.format(node_lines[line_number])
-                    if raw_line.strip() == ';':
-                        new_line += raw_line
-                        concatenated_lines.append(new_line)
-                        new_line = ''
-                    elif ';' in raw_line:
-                        concatenated_lines.append(raw_line)
-                    elif ';' not in raw_line:
-                        new_line += raw_line
-                    line_number += 1
-                control_transform = ''
-                result = None
-                for command in concatenated_lines:
-                    if 'uid' in command.strip():
-                        pass
-                    else:
-                        if 'template' in command and 'Shape' in command:
-                            new_command = command.split('-p')[0]+'-p "'+control_transform+'" ;'
-                            mel.eval(new_command.strip())
-                        else:
-                            result = mel.eval(command.strip())
-                    if result is not None:
-                        if 'template' in result and 'Shape' not in result:
-                            control_transform = result
-                            control.append(result)
-                open(self.path+name, 'r').close()
-        control = list(set(control))
-        if len(control) < 2:
-            return control
+        if node.node_type == 'transform':
+            m_obj = dag_mod.createNode('transform', parent)
+        elif node.node_type == 'nurbsCurve':
+            curve = node.geometry
+            cvs = curve.cvs if points is None else points.get(node.name, curve.cvs)
+            data = om.MFnNurbsCurveData().create()
+            om.MFnNurbsCurve().create([om.MPoint(cv) for cv in cvs], curve.knots, curve.degree, curve.form+1, False,
+                                      False, parent=data)
+            m_obj = dag_mod.createNode('nurbsCurve', parent)
+            dag_mod.newPlugValue(Helper.get_plug(m_obj, 'cached'), data)
         else:
-            return control
+            surface = node.geometry
+            cvs = surface.cvs if points is None else points.get(node.name, surface.cvs)
+            data = om.MFnNurbsSurfaceData().create()
+            om.MFnNurbsSurface().create([om.MPoint(cv) for cv in cvs], surface.knots[0], surface.knots[1],
+                                        surface.degree[0], surface.degree[1], surface.form[0]+1, surface.form[1]+1,
+                                        False, parent=data)
+            m_obj = dag_mod.createNode('nurbsSurface', parent)
+            dag_mod.newPlugValue(Helper.get_plug(m_obj, 'cached'), data)
+        dag_mod.renameNode(m_obj, node.name)
+        for attribute, values, keyable in node.attributes:
+            plug = Helper.get_plug(m_obj, attribute)
+            if keyable:
+                plug.isKeyable = keyable > 0
+            if len(values) == 1:
+                Helper.set_plug_value(dag_mod, plug, values[0])
+                continue
+            for index, value in enumerate(values):
+                Helper.set_plug_value(dag_mod, plug.child(index), value)
+        return m_obj
@@ -1,7 +1,8 @@
-from maya import cmds
-from maya.api import OpenMaya as om
+from backend import om, cmds
 import names
 import math
+from build_transaction import BuildTransaction
+from joint_index import SceneJointIndex
 
 
 # This is a helper class that contains various commonly used by me methods
@@ -9,8 +10,9 @@ class Helper(object):
     """This class contains several methods that are used during the construction of various parts of the rig"""
     @staticmethod
     def get_attached_node(m_obj, node_type, direction=om.MItDependencyGraph.kUpstream,
-                          level=om.MItDependencyGraph.kPlugLevel):
-        """ This gets the node attached to the MObject of the node type that is asked
+                          level=om.MItDependencyGraph.kPlugLevel, max_depth=None):
+        """ This gets the node attached to the MObject of the node type that is asked. The search is breadth first, so
+        the closest node of that type is found, and nodes of other types are skipped by the iterator itself.
         MFn class documentation dictates that:
         kIkHandle = 120
         kMesh = 296
@@ -19,16 +21,38 @@ class Helper(object):
         :param node_type: The type of node you want to get
         :param direction: The direction in which should be searched, either upstream or downstream
         :param level: The level that you want to search for (e.g. plug level or node level)
-        :return: Returns the attached node
+        :param max_depth: Integer, the largest number of connections between m_obj and the node. If it is given the
+        connections are followed at node level and the search stops at that depth, if None the whole graph is searched.
+        :return: Returns the attached node, or None if there is none
         """
-        depend_it = om.MItDependencyGraph(m_obj, direction, level=level)
-        node = None
-        while not depend_it.isDone():
-            if depend_it.currentNode().apiType() == node_type:
-                node = depend_it.currentNode()
+        if m_obj.hasFn(node_type):
+            return m_obj
+        if max_depth is None:
+            depend_it = om.MItDependencyGraph(m_obj, filter=node_type, direction=direction,
+                                              traversal=om.MItDependencyGraph.kBreadthFirst, level=level)
+            if depend_it.isDone():
+                return None
+            return depend_it.currentNode()
+        upstream = direction == om.MItDependencyGraph.kUpstream
+        visited = set([om.MObjectHandle(m_obj).hashCode()])
+        nodes = [m_obj]
+        for _ in range(max_depth):
+            next_nodes = []
+            for node in nodes:
+                for plug in om.MFnDependencyNode(node).getConnections():
+                    for connected_plug in plug.connectedTo(upstream, not upstream):
+                        connected_node = connected_plug.node()
+                        key = om.MObjectHandle(connected_node).hashCode()
+                        if key in visited:
+                            continue
+                        visited.add(key)
+                        if connected_node.hasFn(node_type):
+                            return connected_node
+                        next_nodes.append(connected_node)
+            if not next_nodes:
                 break
-            depend_it.next()
-        return node
+            nodes = next_nodes
+        return None
 
     @staticmethod
     def get_plug(obj, plug_name='message'):
@@ -40,6 +64,79 @@ class Helper(object):
         dep_node = om.MFnDependencyNode(obj)
         return dep_node.findPlug(plug_name, True)
 
+    @staticmethod
+    def get_node(name):
+        """ Get a node by its name, used for nodes that a component did not create itself
+        :param name: String name of the node
+        :return: MObject containing the node, which is a null object if there is no node with that name
+        """
+        sel = om.MSelectionList()
+        try:
+            sel.add(name)
+        except RuntimeError:
+            return om.MObject()
+        return sel.getDependNode(0)
+
+    @staticmethod
+    def set_plug_value(modifier, plug, value):
+        """ Set the value of a plug through a modifier, using the type of the attribute to pick the right method.
+        Angles are expected in degrees, like they are in Maya ASCII files and in setAttr.
+        :param modifier: MDGModifier or MDagModifier that the value is set with
+        :param plug: MPlug of a numeric, enum or unit attribute
+        :param value: Number that the plug will be set to
+        :return: Nothing
+        """
+        attribute = plug.attribute()
+        if attribute.hasFn(om.MFn.kUnitAttribute):
+            if om.MFnUnitAttribute(attribute).unitType() == om.MFnUnitAttribute.kAngle:
+                modifier.newPlugValueMAngle(plug, om.MAngle(value, om.MAngle.kDegrees))
+                return
+        elif attribute.hasFn(om.MFn.kEnumAttribute):
+            modifier.newPlugValueInt(plug, int(value))
+            return
+        elif attribute.hasFn(om.MFn.kNumericAttribute):
+            numeric_type = om.MFnNumericAttribute(attribute).numericType()
+            if numeric_type == om.MFnNumericData.kBoolean:
+                modifier.newPlugValueBool(plug, bool(value))
+                return
+            if numeric_type in (om.MFnNumericData.kByte, om.MFnNumericData.kChar, om.MFnNumericData.kShort,
+                                om.MFnNumericData.kInt):
+                modifier.newPlugValueInt(plug, int(value))
+                return
+        modifier.newPlugValueDouble(plug, float(value))
+
+    @staticmethod
+    def set_plug_values(modifier, plug, values):
+        """ Set the children of a compound plug, like translate, rotate or jointOrient, through a modifier. The values
+        are in internal units, so centimeters and radians, the same as MVector and MEulerRotation hold them.
+        :param modifier: MDGModifier or MDagModifier that the values are set with
+        :param plug: MPlug of a compound attribute with three children
+        :param values: MVector, MEulerRotation or a list with a value per child
+        :return: Nothing
+        """
+        for index in range(3):
+            modifier.newPlugValueDouble(plug.child(index), float(values[index]))
+
+    @staticmethod
+    def set_transformation(modifier, m_obj, matrix):
+        """ Set the translate, rotate and scale of a transform through a modifier, so it ends up with a matrix relative
+        to its parent. The joint orient of a joint is kept and taken out of the rotation.
+        :param modifier: MDGModifier or MDagModifier that the values are set with
+        :param m_obj: MObject containing the transform or joint
+        :param matrix: MMatrix relative to the parent
+        :return: Nothing
+        """
+        transformation = om.MTransformationMatrix(matrix)
+        rotation = transformation.rotation(asQuaternion=True)
+        if m_obj.hasFn(om.MFn.kJoint):
+            orient_plug = Helper.get_plug(m_obj, 'jointOrient')
+            orient = om.MEulerRotation([orient_plug.child(index).asDouble() for index in range(3)])
+            rotation = rotation * orient.asQuaternion().inverse()
+        translation = transformation.translation(om.MSpace.kTransform)
+        Helper.set_plug_values(modifier, Helper.get_plug(m_obj, 'translate'), translation)
+        Helper.set_plug_values(modifier, Helper.get_plug(m_obj, 'rotate'), rotation.asEulerRotation())
+        Helper.set_plug_values(modifier, Helper.get_plug(m_obj, 'scale'), transformation.scale(om.MSpace.kTransform))
+
     @staticmethod
     def get_plug_nodes(plug, plug_name='message', source=True, destinations=True):
         """ Get nodes that are attached to certain plug
@@ -51,10 +148,11 @@ class Helper(object):
         """
         dep_node = om.MFnDependencyNode(plug.node())
         msg_plug = dep_node.findPlug(plug_name, False)
+        sources = [msg_plug.source().node()] if msg_plug.isDestination else []
         if source == True and destinations == True:
-            return [plug.node() for plug in msg_plug.destinations()] + [msg_plug.source().node()]
+            return [plug.node() for plug in msg_plug.destinations()] + sources
         elif source == True and destinations == False:
-            return [msg_plug.source().node()]
+            return sources
         elif source == False and destinations == True:
             return [plug.node() for plug in msg_plug.destinations()]
 
@@ -123,10 +221,12 @@ class Helper(object):
         return ((elbow_point - projected_point).normal() * arm_length * mult) + elbow_point
 
     @staticmethod
-    def match_transforms(object1=om.MObject(), object2=om.MObject()):
+    def match_transforms(object1=om.MObject(), object2=om.MObject(), modifier=None):
         """ Match transform of one object to another
         :param object1: MObject containing desired object to be matched
         :param object2: MObject containing object to be matched to
+        :param modifier: MDGModifier or MDagModifier that the values are added to, if None a modifier is created and
+        executed
         :return: MTransform of the second object
         """
         object1_dag_node = om.MFnDagNode(object1)
@@ -135,10 +235,17 @@ class Helper(object):
         object2_dag_path = object2_dag_node.getPath()
         object1_transform = om.MFnTransform(object1_dag_path)
         object2_transform = om.MFnTransform(object2_dag_path)
-        object1_translation = object1_transform.translation(4)
-        object1_rotation = object1_transform.rotation(4, asQuaternion=True)
-        object2_transform.setTranslation(object1_translation, 4)
-        object2_transform.setRotation(object1_rotation, 4)
+        parent_inverse = object2_dag_path.exclusiveMatrixInverse()
+        object1_translation = om.MVector(om.MPoint(object1_transform.translation(4)) * parent_inverse)
+        object1_rotation = object1_transform.rotation(4, asQuaternion=True).asMatrix() * parent_inverse
+        execute = modifier is None
+        if execute:
+            modifier = om.MDagModifier()
+        Helper.set_plug_values(modifier, Helper.get_plug(object2, 'translate'), object1_translation)
+        Helper.set_plug_values(modifier, Helper.get_plug(object2, 'rotate'),
+                               om.MTransformationMatrix(object1_rotation).rotation())
+        if execute:
+            BuildTransaction.execute(modifier)
         return object2_transform
 
     @staticmethod
@@ -167,28 +274,39 @@ class Helper(object):
             value = 0
         return value
 
-    def straighten_rotation(self, obj=om.MObject()):
+    @classmethod
+    def straighten_euler(cls, rotation):
+        """ Straighten a rotation, every axis is snapped the same way as compare_radians does
+        :param rotation: MEulerRotation
+        :return: MEulerRotation containing the straightened values
+        """
+        return om.MEulerRotation(cls.compare_radians(rotation.x), cls.compare_radians(rotation.y),
+                                 cls.compare_radians(rotation.z))
+
+    def straighten_rotation(self, obj=om.MObject(), modifier=None):
         """ Straighten rotation of object meaning that the object will appear straight in some plane in the world
         :param obj: MObject containing objected to be straightened
+        :param modifier: MDGModifier or MDagModifier that the rotation is added to, if None a modifier is created and
+        executed
         :return: MEulerRotation containing the new rotation values
         """
         dag_node = om.MFnDagNode(obj)
         dag_path = dag_node.getPath()
         obj_transform = om.MFnTransform(dag_path)
         quaternion = obj_transform.rotation(4, asQuaternion=True)
-        x = quaternion.asEulerRotation().x
-        y = quaternion.asEulerRotation().y
-        z = quaternion.asEulerRotation().z
-        new_x = self.compare_radians(x)
-        new_y = self.compare_radians(y)
-        new_z = self.compare_radians(z)
-        new_rot = om.MEulerRotation(new_x, new_y, new_z)
-        obj_transform.setRotation(new_rot, 1)
+        new_rot = self.straighten_euler(quaternion.asEulerRotation())
+        execute = modifier is None
+        if execute:
+            modifier = om.MDagModifier()
+        self.set_plug_values(modifier, self.get_plug(obj, 'rotate'), new_rot)
+        if execute:
+            BuildTransaction.execute(modifier)
         return new_rot
 
     def add_and_connect_messages(self, to_connect, to_connect_to=om.MObject, name=None):
         """ This method can add and connect message attributes to an object from another object.
-        The to connect attribute can be an MObject or an MSelectionList
+        The to connect attribute can be an MObject or an MSelectionList. An attribute that already exists is reused, so
+        the messages can be connected again when part of a rig is rebuilt.
         :param to_connect: MObject or MSelectionList
         :param to_connect_to: MObject
         :param name: String, optional name to give to the attribute
@@ -198,36 +316,41 @@ class Helper(object):
         if isinstance(to_connect, om.MObject):
             if name is None:
                 name = om.MFnDependencyNode(to_connect).name()
-            new_message = om.MFnMessageAttribute().create(name, name)
-            message = self.get_plug(to_connect, 'message')
-            dag_mod.addAttribute(to_connect_to, new_message)
-            new_message = om.MPlug(to_connect_to, new_message)
-            dag_mod.connect(message, new_message)
-            dag_mod.doIt()
+            self.connect_message(dag_mod, to_connect, to_connect_to, name)
+            BuildTransaction.execute(dag_mod)
         elif isinstance(to_connect, om.MSelectionList):
             sel_it = om.MItSelectionList(to_connect)
             while not sel_it.isDone():
                 name = om.MFnDependencyNode(sel_it.getDependNode()).name()
-                new_message = om.MFnMessageAttribute().create(name, name)
-                message = self.get_plug(sel_it.getDependNode(), 'message')
-                dag_mod.addAttribute(to_connect_to, new_message)
-                new_message = om.MPlug(to_connect_to, new_message)
-                dag_mod.connect(message, new_message)
-                dag_mod.doIt()
+                self.connect_message(dag_mod, sel_it.getDependNode(), to_connect_to, name)
                 sel_it.next()
+            BuildTransaction.execute(dag_mod)
         else:
             print("Method not compatible")
 
+    def connect_message(self, dag_mod, to_connect, to_connect_to, name):
+        """ Add the connection of the message of a node to a message attribute to a modifier
+        :param dag_mod: MDagModifier
+        :param to_connect: MObject whose message is connected
+        :param to_connect_to: MObject that gets the message attribute
+        :param name: String name of the message attribute
+        :return:
+        """
+        message = self.get_plug(to_connect, 'message')
+        dep_node = om.MFnDependencyNode(to_connect_to)
+        if dep_node.hasAttribute(name):
+            new_message = dep_node.findPlug(name, False)
+            if new_message.isDestination:
+                dag_mod.disconnect(new_message.source(), new_message)
+        else:
+            new_message = om.MFnMessageAttribute().create(name, name)
+            dag_mod.addAttribute(to_connect_to, new_message)
+            new_message = om.MPlug(to_connect_to, new_message)
+        dag_mod.connect(message, new_message)
+
     @staticmethod
     def get_root_joints():
-        dag_it = om.MItDag()
-        root_joint_list = om.MSelectionList()
-        while not dag_it.isDone():
-            if dag_it.depth() > 1:
-                dag_it.next()
-            else:
-                dag_path = dag_it.getPath()
-                if dag_path.apiType() == 121:
-                    root_joint_list.add(dag_it.currentItem())
-                dag_it.next()
-        return root_joint_list
+        """ Get the joints that are directly under the world out of the SceneJointIndex
+        :return: MSelectionList containing the joints
+        """
+        return SceneJointIndex.get().get_roots()
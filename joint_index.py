@@ -0,0 +1,212 @@
+from backend import om
+
+
+# Helper.get_root_joints used to walk every node of the DAG whenever a dialog was opened, which takes seconds in scenes
+# with a hundred thousand nodes. The joints are now visited once and the index is kept up to date with callbacks.
+class SceneJointIndex(object):
+    """ This class keeps the joints of the scene with their parents and children. It is built the first time it is
+    asked for, with an MItDag that only visits joints. After that joints that are created, deleted or reparented are
+    updated through node and parent callbacks, so the root joints and the joints below a joint can be looked up without
+    walking the DAG. Opening a scene or starting a new one clears the index, and it is built again on the next lookup.
+    There is a single index per session, use SceneJointIndex.get().
+    """
+    instance = None
+
+    def __init__(self):
+        self.handles = {}
+        self.parents = {}
+        self.children = {}
+        self.roots = []
+        self.built = False
+        self.suspended = False
+        self.callback_ids = []
+
+    @classmethod
+    def get(cls):
+        """ Get the index of the session, the callbacks are added when it is made
+        :return: SceneJointIndex
+        """
+        if cls.instance is None:
+            cls.instance = cls()
+            cls.instance.add_callbacks()
+        return cls.instance
+
+    @classmethod
+    def remove(cls):
+        """ Remove the callbacks and drop the index of the session, for example before the module is reloaded
+        :return:
+        """
+        if cls.instance is not None:
+            om.MMessage.removeCallbacks(cls.instance.callback_ids)
+            cls.instance = None
+
+    def add_callbacks(self):
+        """ Add the callbacks that keep the index up to date
+        :return: List of callback ids
+        """
+        self.callback_ids = [
+            om.MDGMessage.addNodeAddedCallback(self.node_added, 'joint'),
+            om.MDGMessage.addNodeRemovedCallback(self.node_removed, 'joint'),
+            om.MDagMessage.addParentAddedCallback(self.parent_changed),
+            om.MDagMessage.addParentRemovedCallback(self.parent_changed),
+        ]
+        for message in (om.MSceneMessage.kBeforeNew, om.MSceneMessage.kBeforeOpen, om.MSceneMessage.kBeforeImport):
+            self.callback_ids.append(om.MSceneMessage.addCallback(message, self.suspend))
+        for message in (om.MSceneMessage.kAfterNew, om.MSceneMessage.kAfterOpen, om.MSceneMessage.kAfterImport):
+            self.callback_ids.append(om.MSceneMessage.addCallback(message, self.clear))
+        return self.callback_ids
+
+    @staticmethod
+    def get_key(node):
+        """ Get the key that a joint is stored with
+        :param node: MObject
+        :return: Integer
+        """
+        return om.MObjectHandle(node).hashCode()
+
+    def build(self):
+        """ Visit all the joints in the scene
+        :return:
+        """
+        self.handles = {}
+        self.parents = {}
+        self.children = {}
+        self.roots = []
+        dag_it = om.MItDag(om.MItDag.kDepthFirst, om.MFn.kJoint)
+        while not dag_it.isDone():
+            self.add(dag_it.currentItem())
+            dag_it.next()
+        self.built = True
+
+    def clear(self, client_data=None):
+        """ Empty the index, it is built again on the next lookup. Callback for a new or opened scene.
+        :param client_data: Unused
+        :return:
+        """
+        self.handles = {}
+        self.parents = {}
+        self.children = {}
+        self.roots = []
+        self.built = False
+        self.suspended = False
+
+    def suspend(self, client_data=None):
+        """ Ignore the changes until the scene is cleared, so opening a file does not update the index once per joint.
+        Callback for before a scene is opened.
+        :param client_data: Unused
+        :return:
+        """
+        self.suspended = True
+
+    def add(self, joint):
+        """ Add a joint under its current parent
+        :param joint: MObject containing the joint
+        :return:
+        """
+        key = self.get_key(joint)
+        parent = om.MFnDagNode(joint).parent(0)
+        parent_key = None if parent.hasFn(om.MFn.kWorld) else self.get_key(parent)
+        self.handles[key] = om.MObjectHandle(joint)
+        self.parents[key] = parent_key
+        if parent_key is None:
+            self.roots.append(key)
+        else:
+            self.children.setdefault(parent_key, []).append(key)
+
+    def discard(self, key):
+        """ Take a joint away from its parent
+        :param key: Integer key of the joint
+        :return:
+        """
+        if key not in self.parents:
+            return
+        parent_key = self.parents.pop(key)
+        self.handles.pop(key)
+        siblings = self.roots if parent_key is None else self.children.get(parent_key, [])
+        if key in siblings:
+            siblings.remove(key)
+
+    def is_current(self):
+        """ Check if the callbacks should update the index
+        :return: Boolean
+        """
+        return self.built and not self.suspended
+
+    def node_added(self, node, client_data):
+        """ Callback for a new joint
+        :param node: MObject containing the joint
+        :param client_data: Unused
+        :return:
+        """
+        if self.is_current():
+            self.discard(self.get_key(node))
+            self.add(node)
+
+    def node_removed(self, node, client_data):
+        """ Callback for a deleted joint
+        :param node: MObject containing the joint
+        :param client_data: Unused
+        :return:
+        """
+        if self.is_current():
+            key = self.get_key(node)
+            self.discard(key)
+            self.children.pop(key, None)
+
+    def parent_changed(self, child, parent, client_data):
+        """ Callback for a node that got a new parent or lost one, only joints that still exist are moved
+        :param child: MDagPath of the node
+        :param parent: MDagPath of the parent
+        :param client_data: Unused
+        :return:
+        """
+        if not self.is_current() or child.length() == 0:
+            return
+        node = child.node()
+        if node.hasFn(om.MFn.kJoint) and om.MObjectHandle(node).isAlive():
+            self.discard(self.get_key(node))
+            self.add(node)
+
+    def get_nodes(self, keys):
+        """ Turn keys into an MSelectionList, joints that no longer exist are left out
+        :param keys: List of Integer keys
+        :return: MSelectionList
+        """
+        nodes = om.MSelectionList()
+        for key in keys:
+            handle = self.handles.get(key)
+            if handle is not None and handle.isValid():
+                nodes.add(handle.object())
+        return nodes
+
+    def get_roots(self):
+        """ Get the joints that are directly under the world
+        :return: MSelectionList containing the joints
+        """
+        if not self.built:
+            self.build()
+        return self.get_nodes(self.roots)
+
+    def get_children(self, joint):
+        """ Get the joints directly below a joint
+        :param joint: MObject containing the joint
+        :return: MSelectionList containing the joints
+        """
+        if not self.built:
+            self.build()
+        return self.get_nodes(self.children.get(self.get_key(joint), []))
+
+    def get_descendants(self, joint):
+        """ Get all the joints below a joint, depth first
+        :param joint: MObject containing the joint
+        :return: MSelectionList containing the joints
+        """
+        if not self.built:
+            self.build()
+        keys = []
+        stack = list(reversed(self.children.get(self.get_key(joint), [])))
+        while stack:
+            key = stack.pop()
+            keys.append(key)
+            stack += reversed(self.children.get(key, []))
+        return self.get_nodes(keys)
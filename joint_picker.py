@@ -0,0 +1,293 @@
+from PySide2 import QtCore
+from PySide2 import QtWidgets
+
+from maya import cmds
+from maya.api import OpenMaya as om
+
+
+class JointItem(object):
+    """ A row of the JointTreeModel. The nodes below it are only looked up when the view asks for them.
+    :param path: MDagPath of the joint or group, None for the invisible item at the top of the tree
+    :param parent: JointItem above this one
+    :param row: Integer row of the item under its parent
+    """
+    def __init__(self, path=None, parent=None, row=0):
+        self.path = path
+        self.parent = parent
+        self.row = row
+        self.children = []
+        self.next_child = 0
+        self.child_nodes = None
+        self.full_path = path.fullPathName() if path is not None else ''
+        self.name = self.full_path.rsplit('|', 1)[-1]
+
+    def child_total(self, roots):
+        """ Get the number of dag children that are shown. These are the joints and the groups that joints can be
+        under, shapes are left out so a joint at the end of a chain has none.
+        :param roots: MSelectionList with the roots of the model, which are the children of the top item
+        :return: Integer
+        """
+        if self.path is None:
+            return roots.length()
+        if self.child_nodes is None:
+            dag_node = om.MFnDagNode(self.path)
+            children = [dag_node.child(index) for index in range(dag_node.childCount())]
+            self.child_nodes = [child for child in children if child.hasFn(om.MFn.kTransform)]
+        return len(self.child_nodes)
+
+    def get_child_path(self, index, roots):
+        """ Get the path of a dag child that is shown
+        :param index: Integer index of the child, out of the children counted by child_total
+        :param roots: MSelectionList with the roots of the model
+        :return: MDagPath
+        """
+        if self.path is None:
+            return roots.getDagPath(index)
+        self.child_total(roots)
+        path = om.MDagPath(self.path)
+        path.push(self.child_nodes[index])
+        return path
+
+
+# Filling a QComboBox with every joint of a 2000 joint skeleton froze Maya while the dialog opened. This model only
+# asks Maya for the rows that the view shows, a batch at a time, so opening the dialog takes the same time for any
+# skeleton.
+class JointTreeModel(QtCore.QAbstractItemModel):
+    """ A tree of the joints below a set of roots that is filled in on demand through canFetchMore and fetchMore. Groups
+    are shown as well, so joints that are under a group can be reached.
+    :param roots: MSelectionList containing the root joints
+    :param batch_size: Integer maximum number of joints that are added per fetch
+    """
+    path_role = QtCore.Qt.UserRole
+
+    def __init__(self, roots=om.MSelectionList(), batch_size=256, parent=None):
+        super(JointTreeModel, self).__init__(parent)
+        self.batch_size = batch_size
+        self.roots = om.MSelectionList(roots)
+        self.top = JointItem()
+
+    def set_roots(self, roots):
+        """ Replace the roots of the tree, none of the joints below them are looked up yet
+        :param roots: MSelectionList containing the root joints
+        :return:
+        """
+        self.beginResetModel()
+        self.roots = om.MSelectionList(roots)
+        self.top = JointItem()
+        self.endResetModel()
+
+    def get_item(self, index):
+        """ Get the item of an index
+        :param index: QModelIndex
+        :return: JointItem, the top item for an invalid index
+        """
+        if index.isValid():
+            return index.internalPointer()
+        return self.top
+
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        item = self.get_item(parent)
+        if column != 0 or row < 0 or row >= len(item.children):
+            return QtCore.QModelIndex()
+        return self.createIndex(row, column, item.children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QtCore.QModelIndex()
+        parent = index.internalPointer().parent
+        if parent is None or parent is self.top:
+            return QtCore.QModelIndex()
+        return self.createIndex(parent.row, 0, parent)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return len(self.get_item(parent).children)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 1
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        item = index.internalPointer()
+        if role == QtCore.Qt.DisplayRole:
+            return item.name
+        if role in (QtCore.Qt.ToolTipRole, self.path_role):
+            return item.full_path
+        return None
+
+    def hasChildren(self, parent=QtCore.QModelIndex()):
+        item = self.get_item(parent)
+        return bool(item.children) or item.next_child < item.child_total(self.roots)
+
+    def canFetchMore(self, parent):
+        item = self.get_item(parent)
+        return item.next_child < item.child_total(self.roots)
+
+    def fetchMore(self, parent):
+        item = self.get_item(parent)
+        total = item.child_total(self.roots)
+        paths = []
+        while item.next_child < total and len(paths) < self.batch_size:
+            paths.append(item.get_child_path(item.next_child, self.roots))
+            item.next_child += 1
+        if not paths:
+            return
+        first = len(item.children)
+        self.beginInsertRows(parent, first, first + len(paths) - 1)
+        for offset, path in enumerate(paths):
+            item.children.append(JointItem(path, item, first + offset))
+        self.endInsertRows()
+
+    def find_index(self, full_path):
+        """ Get the index of a joint, fetching only the rows on the way down to it
+        :param full_path: String full path of the joint
+        :return: QModelIndex, invalid if the joint is not in the tree
+        """
+        index = QtCore.QModelIndex()
+        item = self.top
+        while item.full_path != full_path:
+            found = None
+            row = 0
+            while found is None:
+                if row == len(item.children):
+                    if not self.canFetchMore(index):
+                        return QtCore.QModelIndex()
+                    self.fetchMore(index)
+                    continue
+                child = item.children[row]
+                if full_path == child.full_path or full_path.startswith(child.full_path + '|'):
+                    found = child
+                row += 1
+            index = self.index(found.row, 0, index)
+            item = found
+        return index
+
+
+class JointFilterModel(QtCore.QSortFilterProxyModel):
+    """ Hides every joint that is not a search result or above one. Without search results every joint is shown. """
+    def __init__(self, parent=None):
+        super(JointFilterModel, self).__init__(parent)
+        self.paths = None
+
+    def set_paths(self, paths):
+        """ Show only these joints and the joints above them
+        :param paths: List of String full paths, None to show every joint
+        :return:
+        """
+        if paths is None:
+            self.paths = None
+        else:
+            self.paths = set()
+            for path in paths:
+                parts = path.split('|')
+                for index in range(2, len(parts) + 1):
+                    self.paths.add('|'.join(parts[:index]))
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if self.paths is None:
+            return True
+        index = self.sourceModel().index(source_row, 0, source_parent)
+        return self.sourceModel().data(index, JointTreeModel.path_role) in self.paths
+
+
+class JointPicker(QtWidgets.QWidget):
+    """ A search field above a tree of joints. The search is done by Maya with ls, and only the rows on the way to the
+    results are fetched, so the search takes the same time however much of the tree has been opened.
+    :param roots: MSelectionList containing the root joints
+    :param max_results: Integer maximum number of search results that are shown
+    """
+    joint_changed = QtCore.Signal(object)
+
+    def __init__(self, roots=om.MSelectionList(), max_results=200, parent=None):
+        super(JointPicker, self).__init__(parent)
+        self.max_results = max_results
+        self.model = JointTreeModel(roots, parent=self)
+        self.filter_model = JointFilterModel(self)
+        self.filter_model.setSourceModel(self.model)
+        self.search_timer = QtCore.QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(250)
+
+        self.create_widgets()
+        self.create_layouts()
+        self.create_connections()
+
+    def create_widgets(self):
+        self.search_field = QtWidgets.QLineEdit()
+        self.search_field.setPlaceholderText('Search joints')
+        self.search_field.setClearButtonEnabled(True)
+        self.tree_view = QtWidgets.QTreeView()
+        self.tree_view.setHeaderHidden(True)
+        self.tree_view.setUniformRowHeights(True)
+        self.tree_view.setModel(self.filter_model)
+        self.tree_view.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
+        self.tree_view.setMinimumHeight(120)
+
+    def create_layouts(self):
+        main_layout = QtWidgets.QVBoxLayout(self)
+        main_layout.setContentsMargins(0, 0, 0, 0)
+        main_layout.addWidget(self.search_field)
+        main_layout.addWidget(self.tree_view)
+
+    def create_connections(self):
+        self.search_field.textChanged.connect(lambda text: self.search_timer.start())
+        self.search_timer.timeout.connect(self.search)
+        self.tree_view.selectionModel().currentChanged.connect(self.emit_joint_changed)
+
+    def set_roots(self, roots):
+        """ Show the joints below other roots
+        :param roots: MSelectionList containing the root joints
+        :return:
+        """
+        self.model.set_roots(roots)
+        self.search()
+
+    def search(self):
+        """ Show the joints whose name contains the text of the search field
+        :return: List of String full paths of the joints that were found
+        """
+        text = self.search_field.text().strip()
+        if not text:
+            self.filter_model.set_paths(None)
+            return []
+        root_paths = [self.model.roots.getDagPath(index).fullPathName() for index in range(self.model.roots.length())]
+        paths = []
+        for path in cmds.ls('*{0}*'.format(text), type='joint', long=True, recursive=True) or []:
+            if any(path == root or path.startswith(root + '|') for root in root_paths):
+                paths.append(path)
+                if len(paths) == self.max_results:
+                    break
+        indexes = [self.model.find_index(path) for path in paths]
+        self.filter_model.set_paths(paths)
+        for index in indexes:
+            self.tree_view.expand(self.filter_model.mapFromSource(index.parent()))
+        if indexes:
+            self.tree_view.scrollTo(self.filter_model.mapFromSource(indexes[0]))
+        return paths
+
+    def current_joint(self):
+        """ Get the joint that is picked
+        :return: MObject containing the joint, a null object if none is picked
+        """
+        index = self.filter_model.mapToSource(self.tree_view.currentIndex())
+        if not index.isValid():
+            return om.MObject()
+        return index.internalPointer().path.node()
+
+    def set_current_joint(self, full_path):
+        """ Pick a joint
+        :param full_path: String full path of the joint
+        :return: Boolean, true if the joint is in the tree
+        """
+        index = self.filter_model.mapFromSource(self.model.find_index(full_path))
+        if not index.isValid():
+            return False
+        self.tree_view.setCurrentIndex(index)
+        self.tree_view.scrollTo(index)
+        return True
+
+    def emit_joint_changed(self, current, previous):
+        self.joint_changed.emit(self.current_joint())
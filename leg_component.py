@@ -1,36 +1,42 @@
 import names
 from master_component import MasterComponent
 from helper import Helper
-from maya import cmds
-from maya.api import OpenMaya as om
+from backend import om, cmds
 from controller_manager import ControllerManager
+from skin_sizing import SkinSizing
+from build_transaction import BuildTransaction
+from build_profiler import profiled
 
 
 class LegComponent(MasterComponent):
     """
     This is the leg component class which derives from the MasterComponent class.
     :param side: The only argument that the __init__ method requires is a side variable which is used in various methods
+    :param context: BuildContext that is shared with other components, if None a new one is created
     Most use cases of the number 4 will be referring to MSpace.kWorld = 4
     """
-    def __init__(self, side):
-        super(LegComponent, self).__init__()
+    def __init__(self, side, context=None):
+        super(LegComponent, self).__init__(context)
         self.skinned_chain = om.MSelectionList()
         self.ik_chain = om.MSelectionList()
         self.ik_root = om.MObject()
         self.fk_chain = om.MSelectionList()
         self.ik_handle = om.MObject()
-        self.control_manager = ControllerManager()
+        self.ik_mult_matrix = om.MObject()
+        self.control_manager = ControllerManager(context=self.context)
         self.fk_offsets = om.MSelectionList()
         self.fk_controls = om.MSelectionList()
         self.ik_offsets = om.MSelectionList()
         self.ik_controls = om.MSelectionList()
         self.ik_fk_switch = om.MObject()
         self.joints = om.MObject()
+        self.control_sizes = None
         self.side = side
 
     # This creates a parent for the ik and fk joint chain which matches usually the pelvis, necessary because of the way
     # I set up the rig. Initially I set it up differently but that caused the rig to become destructive instead of
     # None destructive which is why I opted to add this method in the class.
+    @profiled
     def create_joints_parent(self, joint=om.MObject(), string=''):
         """ Method to create an offset for the ik and fk chains
         :param joint: expects a joint in the form of an MObject. The joint should be the first joint in the chain that
@@ -40,23 +46,23 @@ class LegComponent(MasterComponent):
         """
         dag_mod = om.MDagModifier()
         self.joints = dag_mod.createNode('transform')
-        joint_name = om.MFnDependencyNode(joint).name()
+        joint_name = self.context.get_name(joint)
         dag_mod.renameNode(self.joints, joint_name+'_'+string+names.joints)
-        joints_transform = om.MFnTransform(om.MFnDagNode(self.joints).getPath())
-        leg_parent = om.MFnDagNode(joint).parent(0)
-        leg_parent_transform = om.MFnTransform(om.MFnDagNode(leg_parent).getPath())
+        leg_parent = self.context.get_dag_node(joint).parent(0)
+        leg_parent_transform = self.context.get_transform(leg_parent)
         leg_parent_translate = leg_parent_transform.translation(4)
         leg_parent_rotate = leg_parent_transform.rotation(4, asQuaternion=True)
         leg_parent_scale = leg_parent_transform.scale()
-        joints_transform.setTranslation(leg_parent_translate, 4)
-        joints_transform.setRotation(leg_parent_rotate, 4)
-        joints_transform.setScale(leg_parent_scale)
-        dag_mod.reparentNode(self.joints, self.joint_group)
-        dag_mod.doIt()
+        Helper.set_plug_values(dag_mod, Helper.get_plug(self.joints, 'translate'), leg_parent_translate)
+        Helper.set_plug_values(dag_mod, Helper.get_plug(self.joints, 'rotate'), leg_parent_rotate.asEulerRotation())
+        Helper.set_plug_values(dag_mod, Helper.get_plug(self.joints, 'scale'), leg_parent_scale)
+        self.context.reparent(dag_mod, self.joints, self.joint_group)
+        BuildTransaction.execute(dag_mod)
         return self.joints
 
     # This method will create an FK Chain from the already existing chain of which the first and last joint are selected
     # for creation
+    @profiled
     def create_fk_chain(self, first_joint=om.MObject(), last_joint=om.MObject(), string=''):
         """ This creates and FK chain by getting the chain from the first and last joint variables.
         :param first_joint: Expects a joint in the form of an MObject
@@ -72,22 +78,23 @@ class LegComponent(MasterComponent):
         while not chain_it.isDone():
             joint = chain_it.getDependNode()
             fk_joint = dag_mod.createNode('joint')
-            dag_mod.renameNode(fk_joint, om.MFnDependencyNode(joint).name()+'_'+string+names.fk)
+            dag_mod.renameNode(fk_joint, self.context.get_name(joint)+'_'+string+names.fk)
             if index == 0:
                 dag_mod.reparentNode(fk_joint, self.joints)
             if index != 0:
                 dag_mod.reparentNode(fk_joint, self.fk_chain.getDependNode(index-1))
-            joint_transform = om.MFnTransform(om.MFnDagNode(joint).getPath())
-            new_joint_transform = om.MFnTransform(om.MFnDagNode(fk_joint).getPath())
+            joint_transform = self.context.get_transform(joint)
             space = 1
-            new_joint_transform.setTranslation(joint_transform.translation(space), space)
-            new_joint_transform.setRotation(joint_transform.rotation(space, asQuaternion=True), space)
+            rotation = joint_transform.rotation(space, asQuaternion=True).asEulerRotation()
+            Helper.set_plug_values(dag_mod, Helper.get_plug(fk_joint, 'translate'), joint_transform.translation(space))
+            Helper.set_plug_values(dag_mod, Helper.get_plug(fk_joint, 'rotate'), rotation)
             self.fk_chain.add(fk_joint)
             index += 1
             chain_it.next()
-        dag_mod.doIt()
+        BuildTransaction.execute(dag_mod)
         return self.fk_chain
 
+    @profiled
     def create_ik_chain(self, first_joint=om.MObject(), last_joint=om.MObject(), string=''):
         """ This creates and IK chain by getting the chain from the first and last joint variables. The difference being
         that in this case the joint orients are used because non-zero joint orients are incompatible with the default
@@ -105,31 +112,26 @@ class LegComponent(MasterComponent):
         while not chain_it.isDone():
             joint = chain_it.getDependNode()
             ik_joint = dag_mod.createNode('joint')
-            dag_mod.renameNode(ik_joint, om.MFnDependencyNode(joint).name()+'_'+string+names.ik)
+            dag_mod.renameNode(ik_joint, self.context.get_name(joint)+'_'+string+names.ik)
             if index == 0:
                 dag_mod.reparentNode(ik_joint, self.joints)
             if index != 0:
                 dag_mod.reparentNode(ik_joint, self.ik_chain.getDependNode(index-1))
-            joint_transform = om.MFnTransform(om.MFnDagNode(joint).getPath())
-            new_joint_transform = om.MFnTransform(om.MFnDagNode(ik_joint).getPath())
+            joint_transform = self.context.get_transform(joint)
             new_joint_orient_plug = om.MFnDependencyNode(ik_joint).findPlug('jointOrient', True)
             space = 1
-            new_joint_transform.setTranslation(joint_transform.translation(space), space)
+            Helper.set_plug_values(dag_mod, Helper.get_plug(ik_joint, 'translate'), joint_transform.translation(space))
             quaternion = joint_transform.rotation(space, asQuaternion=True)
             euler_rotation = quaternion.asEulerRotation()
-            x_angle = om.MAngle(euler_rotation.x, 1)
-            y_angle = om.MAngle(euler_rotation.y, 1)
-            z_angle = om.MAngle(euler_rotation.z, 1)
-            new_joint_orient_plug.child(0).setMAngle(x_angle)
-            new_joint_orient_plug.child(1).setMAngle(y_angle)
-            new_joint_orient_plug.child(2).setMAngle(z_angle)
+            Helper.set_plug_values(dag_mod, new_joint_orient_plug, euler_rotation)
             self.ik_chain.add(ik_joint)
             index += 1
             chain_it.next()
-        dag_mod.doIt()
+        BuildTransaction.execute(dag_mod)
         self.ik_root = self.ik_chain.getDependNode(0)
         return self.ik_chain
 
+    @profiled
     def create_ik_handle(self, start_joint=om.MObject(), last_joint=om.MObject(), pole_vector=om.MObject(),
                          limb=names.leg):
         """ Create ikHandle using the commands module and return the ikHandle as an MObject.
@@ -144,20 +146,43 @@ class LegComponent(MasterComponent):
             start_joint = self.ik_chain.getDependNode(0)
         if last_joint.isNull():
             last_joint = self.ik_chain.getDependNode(self.ik_chain.length()-1)
-        start_joint = om.MFnDependencyNode(start_joint).name()
-        last_joint = om.MFnDependencyNode(last_joint).name()
+        start_joint = self.context.get_name(start_joint)
+        last_joint = self.context.get_name(last_joint)
         ik_handle_name = self.side+'_'+limb+'_'+names.ik_handle
         ik_handle = cmds.ikHandle(startJoint=start_joint, endEffector=last_joint, name=ik_handle_name)
         ik_sel = om.MSelectionList().add(ik_handle[0])
         self.ik_handle = ik_sel.getDependNode(0)
         dag_mod = om.MDagModifier()
-        dag_mod.reparentNode(self.ik_handle, self.ik_group)
-        dag_mod.doIt()
+        self.context.reparent(dag_mod, self.ik_handle, self.ik_group)
+        BuildTransaction.execute(dag_mod)
         if not pole_vector.isNull():
             pole_vector = om.MFnDagNode(pole_vector).fullPathName()
             cmds.poleVectorConstraint(pole_vector, ik_handle[0])
         return self.ik_handle
 
+    def set_context(self, context):
+        """ Use the BuildContext of another component, the control manager uses the same context
+        :param context: BuildContext
+        :return: BuildContext
+        """
+        super(LegComponent, self).set_context(context)
+        self.control_manager.context = context
+        return self.context
+
+    def get_control_sizes(self):
+        """ Get the sizes of the controls of the skinned chain from the skin weights. They are worked out once for the
+        whole chain and reused by the IK, FK and pole vector controls.
+        :return: List of float sizes in the order of the skinned chain, None for joints without vertices
+        """
+        if self.control_sizes is None:
+            joints = [self.skinned_chain.getDependNode(index) for index in range(self.skinned_chain.length())]
+            if not joints:
+                return []
+            skin_cluster = self.get_skin_cluster(joints[0])
+            self.control_sizes = SkinSizing.get_radii(skin_cluster, joints)
+        return self.control_sizes
+
+    @profiled
     def create_fk_controls(self, fk_chain=om.MSelectionList()):
         """ Creates FK controls using the default control defined in the names module.
         :param fk_chain: FK Chain in the form of an MSelectionList is expected. If no list is given the self.fk_chain
@@ -167,42 +192,27 @@ class LegComponent(MasterComponent):
         """
         if fk_chain.isEmpty():
             fk_chain = self.fk_chain
-        fk_it = om.MItSelectionList(fk_chain)
-        index = 0
         dag_mod = om.MDagModifier()
-        while not fk_it.isDone():
-            fk_joint = fk_it.getDependNode()
-            ctrl = self.control_manager.create_control(object1=fk_joint)
-            offset = self.control_manager.create_offset(ctrl)
-            mesh = self.get_skinned_mesh(self.skinned_chain.getDependNode(0))
-            self.fk_controls.add(ctrl)
+        hip_parent = self.context.get_dag_node(self.skinned_chain.getDependNode(0)).parent(0)
+        fk_ctrl_parent = dag_mod.createNode('transform')
+        dag_mod.renameNode(fk_ctrl_parent, self.side+'_'+names.leg+'_'+names.fk+'_'+names.offset)
+        dag_mod.reparentNode(fk_ctrl_parent, self.control_group)
+        hip_parent_transform = self.context.get_transform(hip_parent)
+        Helper.set_transformation(dag_mod, fk_ctrl_parent, hip_parent_transform.transformation().asMatrix())
+        mesh = self.get_skinned_meshes(self.skinned_chain.getDependNode(0))
+        specs = [(fk_chain.getDependNode(index), None, None) for index in range(fk_chain.length())]
+        sizes = self.get_control_sizes()
+        if len(sizes) != len(specs):
+            sizes = None
+        controls, offsets = self.control_manager.create_controls(specs, parent=fk_ctrl_parent, chain=True, space=1,
+                                                                 mesh=mesh, fit=True, sizes=sizes, dag_mod=dag_mod)
+        for control, offset in zip(controls, offsets):
+            self.fk_controls.add(control)
             self.fk_offsets.add(offset)
-            if index == 0:
-                self.control_manager.match_control(fk_joint, offset)
-            else:
-                self.control_manager.match_control(fk_joint, offset, space=4)
-            self.control_manager.resize_control(mesh, control=ctrl)
-            self.control_manager.fit_control(fk_joint, scale=1)
-            self.control_manager.match_control(fk_joint, offset, space=1)
-            if index == 0:
-                hip_parent = om.MFnDagNode(self.skinned_chain.getDependNode(0)).parent(0)
-                fk_ctrl_parent = dag_mod.createNode('transform')
-                dag_mod.renameNode(fk_ctrl_parent, self.side+'_'+names.leg+'_'+names.fk+'_'+names.offset)
-                dag_mod.reparentNode(fk_ctrl_parent, self.control_group)
-                hip_parent_transform = om.MFnTransform(om.MFnDagNode(hip_parent).getPath())
-                fk_ctrl_parent_transform = om.MFnTransform(om.MFnDagNode(fk_ctrl_parent).getPath())
-                fk_ctrl_parent_transform.setTransformation(hip_parent_transform.transformation())
-                dag_mod.reparentNode(offset, fk_ctrl_parent)
-                index += 1
-                fk_it.next()
-                continue
-            dag_mod.reparentNode(offset, self.fk_controls.getDependNode(index-1))
-            index += 1
-            fk_it.next()
-
-        dag_mod.doIt()
+        BuildTransaction.execute(dag_mod)
         return self.fk_offsets, self.fk_controls
 
+    @profiled
     def create_ik_controls(self, control='', ik_chain=om.MSelectionList()):
         """ Creates IK controls using the default control defined in the names module.
         :param control: String is expected. This variable controls what type of control will be used for the IK Handle
@@ -219,41 +229,49 @@ class LegComponent(MasterComponent):
         end_joint = ik_chain.getDependNode(ik_chain.length()-1)
         first_joint = ik_chain.getDependNode(0)
         second_joint = ik_chain.getDependNode(1)
-        mesh = self.get_skinned_mesh(self.skinned_chain.getDependNode(self.skinned_chain.length()-1))
-        helper = Helper()
-        pv_point = helper.pole_vector_position(joint1=first_joint, joint2=second_joint, joint3=end_joint, mult=0.5)
-        ik_control = self.control_manager.create_control(end_joint, control)
-        ik_offset = self.control_manager.create_offset(ik_control)
+        mesh = self.get_skinned_meshes(self.skinned_chain.getDependNode(self.skinned_chain.length()-1))
+        sizes = self.get_control_sizes()
+        ik_size = sizes[ik_chain.length()-1] if len(sizes) == ik_chain.length() else None
+        pv_size = sizes[1] if len(sizes) == ik_chain.length() else None
+        pv_point = Helper().pole_vector_position(joint1=first_joint, joint2=second_joint, joint3=end_joint, mult=0.5)
+        end_transform = self.context.get_transform(end_joint)
+        ik_matrix = om.MTransformationMatrix()
+        ik_matrix.setTranslation(end_transform.translation(4), 4)
+        ik_matrix.setRotation(Helper.straighten_euler(end_transform.rotation(4, asQuaternion=True).asEulerRotation()))
+        ik_matrix = ik_matrix.asMatrix()
+        pv_matrix = om.MTransformationMatrix()
+        pv_matrix.setTranslation(om.MVector(pv_point), 4)
+        controls, offsets = self.control_manager.create_controls([(end_joint, control, None)],
+                                                                 parent=self.control_group, mesh=mesh,
+                                                                 sizes=[ik_size], dag_mod=dag_mod, matrices=[ik_matrix])
+        ik_control, ik_offset = controls[0], offsets[0]
+        controls, offsets = self.control_manager.create_controls([(second_joint, None,
+                                                                   self.side+'_'+names.leg+'_pv')],
+                                                                 parent=self.control_group, rotation=False, mesh=mesh,
+                                                                 scale_modifier=1, sizes=[pv_size], dag_mod=dag_mod,
+                                                                 matrices=[pv_matrix.asMatrix()])
+        pv_control, pv_offset = controls[0], offsets[0]
         ik_match = dag_mod.createNode('locator')
-        dag_mod.renameNode(ik_match, om.MFnDependencyNode(ik_control).name()+'_match')
-        self.control_manager.match_control(end_joint, ik_offset, rotation=True)
-        self.control_manager.resize_control(mesh)
-        helper.straighten_rotation(ik_offset)
-        pv_control = self.control_manager.create_control(object1=second_joint)
-        pv_offset = self.control_manager.create_offset(pv_control)
-        self.control_manager.match_control(second_joint, pv_offset, rotation=False)
-        self.control_manager.resize_control(mesh, scale_modifier=1)
-        self.control_manager.rename_control(pv_control, self.side+'_'+names.leg+'_pv_'+names.control)
-        self.control_manager.rename_control(pv_offset, self.side+'_'+names.leg+'_pv_'+names.control+'_'+names.offset)
-        om.MFnTransform(om.MFnDagNode(pv_offset).getPath()).setTranslation(pv_point, 4)
-        dag_mod.reparentNode(pv_offset, self.control_group)
-        dag_mod.reparentNode(ik_offset, self.control_group)
-        inclusive_mat = om.MFnDagNode(end_joint).getPath().inclusiveMatrix()
-        inclusive_mat_inverse = om.MFnDagNode(ik_control).getPath().inclusiveMatrixInverse()
-        mat_diff = inclusive_mat * inclusive_mat_inverse
-        om.MFnTransform(ik_match).setRotation(om.MTransformationMatrix(mat_diff).rotation(), 1)
-        dag_mod.reparentNode(ik_match, ik_control)
-        dag_mod.doIt()
+        dag_mod.renameNode(ik_match, self.context.get_name(end_joint)+'_'+names.control+'_match')
+        mat_diff = self.context.get_world_matrix(end_joint) * ik_matrix.inverse()
+        Helper.set_plug_values(dag_mod, Helper.get_plug(ik_match, 'rotate'),
+                               om.MTransformationMatrix(mat_diff).rotation())
+        self.context.reparent(dag_mod, ik_match, ik_control)
+        BuildTransaction.execute(dag_mod)
         self.ik_offsets.add(ik_offset)
         self.ik_offsets.add(pv_offset)
         self.ik_controls.add(ik_match)
         self.ik_controls.add(pv_control)
         return self.ik_offsets, self.ik_controls
 
-    def create_fk_nodes_and_connections(self, joint_chain=om.MSelectionList(), joint_controls=om.MSelectionList()):
+    @profiled
+    def create_fk_nodes_and_connections(self, joint_chain=om.MSelectionList(), joint_controls=om.MSelectionList(),
+                                        matrix_drive=False):
         """ This method creates all the nodes and the connections needed for attaching the controls to the joints
         :param joint_chain: MSelectionList expected. The joint chain that the controls need to be connected to
         :param joint_controls: MSelectionList expected. The controls that will be connected to the joint chain
+        :param matrix_drive: Boolean, if true the controls drive the offsetParentMatrix of the joints instead of their
+        translate, rotate and scale
         :return: Nothing
         """
         if joint_chain.isEmpty():
@@ -266,38 +284,28 @@ class LegComponent(MasterComponent):
         fk_it = om.MItSelectionList(joint_chain)
         while not fk_it.isDone():
             fk_joint = fk_it.getDependNode()
-            node_name = om.MFnDependencyNode(fk_it.getDependNode()).name()
+            node_name = self.context.get_name(fk_joint)
             mult_matrix = dg_mod.createNode('multMatrix')
-            decompose = dg_mod.createNode('decomposeMatrix')
             dg_mod.renameNode(mult_matrix, node_name+'_multMatrix')
-            dg_mod.renameNode(decompose, node_name + '_mat_to_srt')
-            control_output = helper.get_plug(joint_controls.getDependNode(index), 'worldMatrix')
+            control_output = self.context.get_plug(joint_controls.getDependNode(index), 'worldMatrix')
             matrix_input = helper.get_plug(mult_matrix, 'matrixIn')
             matrix_output = helper.get_plug(mult_matrix, 'matrixSum')
-            decompose_input = helper.get_plug(decompose, 'inputMatrix')
-            decompose_rotate = helper.get_plug(decompose, 'outputRotate')
-            decompose_translate = helper.get_plug(decompose, 'outputTranslate')
-            decompose_scale = helper.get_plug(decompose, 'outputScale')
-            fk_translate = helper.get_plug(fk_joint, 'translate')
-            fk_rotate = helper.get_plug(fk_joint, 'rotate')
-            fk_scale = helper.get_plug(fk_joint, 'scale')
             dg_mod.connect(control_output.elementByLogicalIndex(0), matrix_input.elementByLogicalIndex(0))
             if index == 0:
-                offset = om.MFnDagNode(joint_controls.getDependNode(0)).parent(0)
-                parent = om.MFnDagNode(offset).parent(0)
-                parent_inverse_output = helper.get_plug(parent, 'worldInverseMatrix')
+                offset = self.context.get_dag_node(joint_controls.getDependNode(0)).parent(0)
+                parent = self.context.get_dag_node(offset).parent(0)
+                parent_inverse_output = self.context.get_plug(parent, 'worldInverseMatrix')
                 dg_mod.connect(parent_inverse_output.elementByLogicalIndex(0), matrix_input.elementByLogicalIndex(1))
             if index != 0:
-                parent_inverse_output = helper.get_plug(joint_controls.getDependNode(index-1), 'worldInverseMatrix')
+                parent_inverse_output = self.context.get_plug(joint_controls.getDependNode(index-1),
+                                                              'worldInverseMatrix')
                 dg_mod.connect(parent_inverse_output.elementByLogicalIndex(0), matrix_input.elementByLogicalIndex(1))
-            dg_mod.connect(matrix_output, decompose_input)
-            dg_mod.connect(decompose_scale, fk_scale)
-            dg_mod.connect(decompose_rotate, fk_rotate)
-            dg_mod.connect(decompose_translate, fk_translate)
-            dg_mod.doIt()
+            self.drive_joint(dg_mod, matrix_output, fk_joint, node_name+'_mat_to_srt', matrix_drive)
             index += 1
             fk_it.next()
+        BuildTransaction.execute(dg_mod)
 
+    @profiled
     def create_ik_nodes_and_connections(self, ik_chain=om.MSelectionList(), ik_control=om.MObject(),
                                         ik_handle=om.MObject()):
         """ This method creates all the nodes and the connections needed for attaching the controls to the joints
@@ -314,22 +322,24 @@ class LegComponent(MasterComponent):
             ik_chain = self.ik_chain
         helper = Helper()
         dg_mod = om.MDGModifier()
-        node_name = om.MFnDependencyNode(ik_chain.getDependNode(ik_chain.length() - 1)).name()
+        node_name = self.context.get_name(ik_chain.getDependNode(ik_chain.length() - 1))
         mult_matrix = dg_mod.createNode('multMatrix')
         decompose_mult = dg_mod.createNode('decomposeMatrix')
         decompose = dg_mod.createNode('decomposeMatrix')
-        ik_ctrl_output = helper.get_plug(ik_control, 'worldMatrix')
-        parent_inverse_output = helper.get_plug(ik_chain.getDependNode(ik_chain.length()-2), 'worldInverseMatrix')
+        ik_ctrl_output = self.context.get_plug(ik_control, 'worldMatrix')
+        parent_inverse_output = self.context.get_plug(ik_chain.getDependNode(ik_chain.length()-2),
+                                                      'worldInverseMatrix')
         matrix_input = helper.get_plug(mult_matrix, 'matrixIn')
         matrix_output = helper.get_plug(mult_matrix, 'matrixSum')
         decompose_input = helper.get_plug(decompose, 'inputMatrix')
         decompose_translate = helper.get_plug(decompose, 'outputTranslate')
         decompose_mult_input = helper.get_plug(decompose_mult, 'inputMatrix')
         decompose_mult_rotate = helper.get_plug(decompose_mult, 'outputRotate')
-        ik_handle_translate = helper.get_plug(ik_handle, 'translate')
-        ik_joint_rotate = helper.get_plug(ik_chain.getDependNode(ik_chain.length()-1), 'rotate')
+        ik_handle_translate = self.context.get_plug(ik_handle, 'translate')
+        ik_joint_rotate = self.context.get_plug(ik_chain.getDependNode(ik_chain.length()-1), 'rotate')
         dg_mod.renameNode(mult_matrix, node_name+'_multMatrix')
-        dg_mod.renameNode(decompose, om.MFnDependencyNode(ik_control).name()+'_world_to_srt')
+        self.ik_mult_matrix = mult_matrix
+        dg_mod.renameNode(decompose, self.context.get_name(ik_control)+'_world_to_srt')
         dg_mod.renameNode(decompose_mult, node_name+'_mat_to_srt')
         dg_mod.connect(ik_ctrl_output.elementByLogicalIndex(0), matrix_input.elementByLogicalIndex(0))
         dg_mod.connect(parent_inverse_output.elementByLogicalIndex(0), matrix_input.elementByLogicalIndex(1))
@@ -337,11 +347,14 @@ class LegComponent(MasterComponent):
         dg_mod.connect(decompose_mult_rotate, ik_joint_rotate)
         dg_mod.connect(ik_ctrl_output.elementByLogicalIndex(0), decompose_input)
         dg_mod.connect(decompose_translate, ik_handle_translate)
-        self.zero_joint_orient(ik_chain.getDependNode(ik_chain.length()-1))
-        dg_mod.doIt()
+        self.zero_joint_orient(ik_chain.getDependNode(ik_chain.length()-1), dg_mod)
+        BuildTransaction.execute(dg_mod)
 
+    @profiled
     def create_ik_fk_switch(self, ik_controls=om.MSelectionList(), fk_controls=om.MSelectionList(), blend=False):
-        """ Creates an IK FK switch in the form of an instanced NURBS curve with an IK attribute.
+        """ Creates an IK FK switch in the form of an instanced NURBS curve with an IK attribute. The curve is created
+        under the last FK control and added to all the other controls as an instance, so no commands are needed and the
+        cost per control stays the same however many controls there are.
         :param ik_controls: MSelectionList containing all the IK controls
         :param fk_controls: MSelectionList containing all the FK controls
         :param blend: Boolean, if false will create an enum attribute, if true will create a float attribute
@@ -351,7 +364,14 @@ class LegComponent(MasterComponent):
             ik_controls = self.ik_controls
         if fk_controls.isEmpty():
             fk_controls = self.fk_controls
-        helper = Helper()
+        ik_ctrls = []
+        for index in range(ik_controls.length()):
+            ik_ctrl = ik_controls.getDependNode(index)
+            if 'match' in self.context.get_name(ik_ctrl):
+                ik_ctrl = self.context.get_dag_node(ik_ctrl).parent(0)
+            ik_ctrls.append(ik_ctrl)
+        fk_ctrls = [fk_controls.getDependNode(index) for index in range(fk_controls.length())]
+        owner = fk_ctrls[-1]
         curve_point = om.MPointArray()
         curve_point.append(om.MPoint(0, 0, 0))
         curve_point.append(om.MPoint(0, 0, 0))
@@ -359,8 +379,10 @@ class LegComponent(MasterComponent):
         double_array.append(0.0)
         double_array.append(0.0)
         dag_mod = om.MDagModifier()
-        transform = dag_mod.createNode('transform')
-        switch_curve = om.MFnNurbsCurve().create(curve_point, double_array, 1, 1, False, True, parent=transform)
+        curve_data = om.MFnNurbsCurveData().create()
+        om.MFnNurbsCurve().create(curve_point, double_array, 1, 1, False, True, parent=curve_data)
+        switch_curve = dag_mod.createNode('nurbsCurve', owner)
+        dag_mod.newPlugValue(Helper.get_plug(switch_curve, 'cached'), curve_data)
         dag_mod.renameNode(switch_curve, self.side+'_leg_ikfk')
         attribute = om.MFnEnumAttribute().create('IKFK', 'IKFK')
         om.MFnEnumAttribute(attribute).addField('IK', 0)
@@ -372,57 +394,38 @@ class LegComponent(MasterComponent):
             om.MFnNumericAttribute(attribute).setMax(1)
             om.MFnNumericAttribute(attribute).keyable = True
         dag_mod.addAttribute(switch_curve, attribute)
-        dag_mod.doIt()
+        for control in ik_ctrls + fk_ctrls:
+            if control != owner:
+                BuildTransaction.add_instance(dag_mod, switch_curve, control)
+        BuildTransaction.execute(dag_mod)
         dg_mod = om.MDGModifier()
         ik_fk_reverse = dg_mod.createNode('reverse')
         dg_mod.renameNode(ik_fk_reverse, self.side+'_leg_ikfk_reverse')
-        ikfk_plug = helper.get_plug(switch_curve, 'IKFK')
-        reverse_input_x = helper.get_plug(ik_fk_reverse, 'inputX')
-        reverse_output_x = helper.get_plug(ik_fk_reverse, 'outputX')
+        ikfk_plug = self.context.get_plug(switch_curve, 'IKFK')
+        reverse_input_x = Helper.get_plug(ik_fk_reverse, 'inputX')
+        reverse_output_x = Helper.get_plug(ik_fk_reverse, 'outputX')
         dg_mod.connect(ikfk_plug, reverse_input_x)
-        ik_ctrl_it = om.MItSelectionList(ik_controls)
-        while not ik_ctrl_it.isDone():
-            switch_curve_name = om.MFnDependencyNode(switch_curve).name()
-            instance = cmds.instance(switch_curve_name)
-            shape = cmds.listRelatives(instance, shapes=True, fullPath=True)[0]
-            ik_ctrl = om.MFnDagNode(ik_ctrl_it.getDependNode()).fullPathName()
-            ik_ctrl_dag_path = om.MFnDagNode(ik_ctrl_it.getDependNode()).getPath()
-            if 'match' in ik_ctrl:
-                ik_match = om.MFnDagNode(ik_ctrl_it.getDependNode())
-                ik_ctrl_dag_path = om.MFnDagNode(ik_match.parent(0)).getPath()
-                ik_ctrl = om.MFnDagNode(ik_match.parent(0)).fullPathName()
-            cmds.parent(shape, ik_ctrl, relative=True, shape=True)
-            cmds.delete(instance)
-            ik_ctrl_dag_path.extendToShape(0)
-            shape_vis = helper.get_plug(ik_ctrl_dag_path.node(), 'visibility')
+        for control in ik_ctrls:
+            shape_vis = Helper.get_plug(ControllerManager.get_control_display(control), 'visibility')
             dg_mod.connect(reverse_output_x, shape_vis)
-            ik_ctrl_it.next()
-        fk_ctrl_it = om.MItSelectionList(fk_controls)
-        while not fk_ctrl_it.isDone():
-            switch_curve_name = om.MFnDependencyNode(switch_curve).name()
-            instance = cmds.instance(switch_curve_name)
-            if fk_ctrl_it.getDependNode() == self.fk_controls.getDependNode(self.fk_controls.length()-1):
-                instance = om.MFnDependencyNode(transform).name()
-            shape = cmds.listRelatives(instance, shapes=True, fullPath=True)[0]
-            fk_ctrl = om.MFnDagNode(fk_ctrl_it.getDependNode()).fullPathName()
-            cmds.parent(shape, fk_ctrl, relative=True, shape=True)
-            cmds.delete(instance)
-            fk_ctrl_dag_path = om.MFnDagNode(fk_ctrl_it.getDependNode()).getPath()
-            fk_ctrl_dag_path.extendToShape(0)
-            shape_vis = helper.get_plug(fk_ctrl_dag_path.node(), 'visibility')
+        for control in fk_ctrls:
+            shape_vis = Helper.get_plug(ControllerManager.get_control_display(control), 'visibility')
             dg_mod.connect(reverse_input_x, shape_vis)
-            fk_ctrl_it.next()
-        dg_mod.doIt()
+        BuildTransaction.execute(dg_mod)
         self.ik_fk_switch = switch_curve
         return switch_curve
 
+    @profiled
     def attach_to_skin_chain(self, ik_chain=om.MSelectionList(), fk_chain=om.MSelectionList(),
-                             skin_chain=om.MSelectionList(), ik_fk_switch=om.MObject()):
+                             skin_chain=om.MSelectionList(), ik_fk_switch=om.MObject(), matrix_drive=False):
         """ This method attaches the IK and FK Chains to the skinned joint chain
         :param ik_chain: MSelectionList containing the joints in the IK Chain
         :param fk_chain: MSelectionList containing the joints in the FK Chain
         :param skin_chain: MSelectionList containing the joints that are attached to the skincluster
         :param ik_fk_switch: MObject containing the object that the IK FK Switch is attached to
+        :param matrix_drive: Boolean, if true the blended matrix drives the offsetParentMatrix of the skinned joints.
+        The FK chain has to be built with matrix_drive as well, because its local matrix is then held by the
+        offsetParentMatrix of the FK joints.
         :return:
         """
         if ik_chain.isEmpty():
@@ -434,45 +437,33 @@ class LegComponent(MasterComponent):
         if ik_fk_switch.isNull():
             ik_fk_switch = self.ik_fk_switch
         helper = Helper()
+        fk_matrix = 'offsetParentMatrix' if matrix_drive else 'matrix'
         skin_chain_it = om.MItSelectionList(skin_chain)
         dg_mod = om.MDGModifier()
         index = 0
         while not skin_chain_it.isDone():
             current_node = skin_chain_it.getDependNode()
-            current_node_name = om.MFnDependencyNode(current_node).name()
+            current_node_name = self.context.get_name(current_node)
             blend = dg_mod.createNode('blendMatrix')
-            mult_matrix = dg_mod.createNode('multMatrix')
-            decompose = dg_mod.createNode('decomposeMatrix')
-            ik_world = helper.get_plug(ik_chain.getDependNode(index), 'matrix')
-            fk_world = helper.get_plug(fk_chain.getDependNode(index), 'matrix')
+            ik_world = self.context.get_plug(ik_chain.getDependNode(index), 'matrix')
+            fk_world = self.context.get_plug(fk_chain.getDependNode(index), fk_matrix)
             blend_target = helper.get_plug(blend, 'target')
             blend_input = helper.get_plug(blend, 'inputMatrix')
             blend_output = helper.get_plug(blend, 'outputMatrix')
-            ik_fk_attribute = helper.get_plug(ik_fk_switch, 'IKFK')
-            decompose_input = helper.get_plug(decompose, 'inputMatrix')
-            decompose_scale = helper.get_plug(decompose, 'outputScale')
-            decompose_rotate = helper.get_plug(decompose, 'outputRotate')
-            decompose_translate = helper.get_plug(decompose, 'outputTranslate')
-            skin_scale = helper.get_plug(current_node, 'scale')
-            skin_rotate = helper.get_plug(current_node, 'rotate')
-            skin_translate = helper.get_plug(current_node, 'translate')
+            ik_fk_attribute = self.context.get_plug(ik_fk_switch, 'IKFK')
             blend_target_index = blend_target.elementByLogicalIndex(0)
             blend_target_input = blend_target_index.child(0)
             blend_target_weight = blend_target_index.child(2)
             dg_mod.connect(ik_world, blend_input)
             dg_mod.connect(fk_world, blend_target_input)
             dg_mod.connect(ik_fk_attribute, blend_target_weight)
-            dg_mod.connect(blend_output, decompose_input)
-            dg_mod.connect(decompose_scale, skin_scale)
-            dg_mod.connect(decompose_rotate, skin_rotate)
-            dg_mod.connect(decompose_translate, skin_translate)
             dg_mod.renameNode(blend, current_node_name+'_blendMatrix')
-            dg_mod.renameNode(mult_matrix, current_node_name+'_blend_multMatrix')
-            dg_mod.renameNode(decompose, current_node_name+'_blend_to_srt')
+            self.drive_joint(dg_mod, blend_output, current_node, current_node_name+'_blend_to_srt', matrix_drive)
             index += 1
             skin_chain_it.next()
-        dg_mod.doIt()
+        BuildTransaction.execute(dg_mod)
 
+    @profiled
     def create_and_connect_messages(self):
         """ This method creates and connects the message attributes that are used for organising
         :return: nothing
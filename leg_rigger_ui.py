@@ -5,8 +5,10 @@ from shiboken2 import wrapInstance
 import maya.OpenMayaUI as omui
 
 from maya.api import OpenMaya as om
-from leg_component import LegComponent
 from foot_component import FootComponent
+from joint_picker import JointPicker
+from build_transaction import BuildTransaction
+from rig_builder import LegRigBuilder
 
 
 def maya_main_window():
@@ -27,21 +29,21 @@ class LegRiggerUI(QtWidgets.QDialog):
         self.create_widgets()
         self.create_layouts()
         self.create_connections()
-        print self.root
         if self.root is not None:
-            self.populate_combo_box()
+            self.populate_pickers()
 
         self.foot = FootComponent('l')
 
     def create_widgets(self):
-        self.instruction = QtWidgets.QLabel('Select start and end of joint chain (e.g. hip and ankle) and fill in '
-                                            'variables. When done press "Create"')
-        self.start_box = QtWidgets.QComboBox()
-        self.end_box = QtWidgets.QComboBox()
+        self.instruction = QtWidgets.QLabel('Pick or select start and end of joint chain (e.g. hip and ankle) and '
+                                            'fill in variables. When done press "Create"')
+        self.start_picker = JointPicker()
+        self.end_picker = JointPicker()
         self.line_group = QtWidgets.QLineEdit("LEG_RIG")
         self.line_side = QtWidgets.QLineEdit("l")
         self.checkbox1 = QtWidgets.QCheckBox()
         self.checkbox2 = QtWidgets.QCheckBox()
+        self.checkbox3 = QtWidgets.QCheckBox()
         self.guide_button = QtWidgets.QPushButton("Create Foot Guides")
         self.foot_instruction = QtWidgets.QLabel('To create the foot roll use a NURBS curve to create a profile of the'
                                                  'foot')
@@ -52,12 +54,13 @@ class LegRiggerUI(QtWidgets.QDialog):
         self.form_layout = QtWidgets.QFormLayout()
         self.instruction.setWordWrap(True)
         self.form_layout.addRow("Instruction:", self.instruction)
-        self.form_layout.addRow("Start Joint:", self.start_box)
-        self.form_layout.addRow("End Joint:", self.end_box)
+        self.form_layout.addRow("Start Joint:", self.start_picker)
+        self.form_layout.addRow("End Joint:", self.end_picker)
         self.form_layout.addRow("Rig Name:", self.line_group)
         self.form_layout.addRow("Side:", self.line_side)
         self.form_layout.addRow("IKFK Blend:", self.checkbox1)
         self.form_layout.addRow("Add Foot:", self.checkbox2)
+        self.form_layout.addRow("Matrix Drive:", self.checkbox3)
         self.foot_instruction.setWordWrap(True)
         self.foot_instruction.setStyleSheet("color: gray")
         self.form_layout.addRow("Foot Instruction:", self.foot_instruction)
@@ -88,67 +91,37 @@ class LegRiggerUI(QtWidgets.QDialog):
         self.guide_button.clicked.connect(self.create_foot_guides)
         self.checkbox2.toggled.connect(self.show_guide_button)
 
-    def populate_combo_box(self):
-        hierarchy_it = om.MItDag()
-        hierarchy_it.reset(self.root)
-        while not hierarchy_it.isDone():
-            name = om.MFnDependencyNode(hierarchy_it.currentItem()).name()
-            self.start_box.addItem(name)
-            self.end_box.addItem(name)
-            hierarchy_it.next()
-
-    def create_leg_rig(self):
-        group_name = self.line_group.text()
-        side = self.line_side.text()
-        blend = self.checkbox1.isChecked()
+    def set_root(self, root):
+        self.root = root
+        if self.root is not None:
+            self.populate_pickers()
+
+    def populate_pickers(self):
+        roots = om.MSelectionList()
+        roots.add(om.MFnDagNode(self.root).getPath())
+        self.start_picker.set_roots(roots)
+        self.end_picker.set_roots(roots)
+
+    def create_builder(self):
         self.sel = om.MGlobal.getActiveSelectionList()
-        self.leg = LegComponent(side)
-        self.leg.construct_rig(group_name)
-        self.leg.create_joints_parent(self.sel.getDependNode(0))
-        fk_chain = self.leg.create_fk_chain(self.sel.getDependNode(0), self.sel.getDependNode(1))
-        ik_chain = self.leg.create_ik_chain(self.sel.getDependNode(0), self.sel.getDependNode(1))
-        fk_controls = self.leg.create_fk_controls()
-        ik_controls = self.leg.create_ik_controls()
-        ik_handle = self.leg.create_ik_handle(pole_vector=ik_controls[1].getDependNode(1))
-        self.leg.create_fk_nodes_and_connections(fk_chain, fk_controls[1])
-        self.leg.create_ik_nodes_and_connections(ik_chain, ik_controls[1].getDependNode(0), ik_handle)
-        self.leg.create_ik_fk_switch(blend=blend)
-        self.leg.attach_to_skin_chain()
-        self.leg.create_and_connect_messages()
-        self.leg.get_root()
-        self.leg.get_groups()
-
-    def create_foot_rig(self):
-        self.foot.base_joint = self.sel.getDependNode(1)
-        self.foot.side = self.line_side.text()
-        self.foot.get_ik_fk_switch(self.foot.base_joint)
-        self.foot.get_root()
-        self.foot.get_groups()
-        self.foot.get_foot_profile()
-        foot_chain = self.foot.get_all_children(self.sel.getDependNode(1))
-        self.foot.create_joints_parent(self.sel.getDependNode(1), string='foot_roll_')
-        first_foot = foot_chain.getDependNode(0)
-        last_foot = foot_chain.getDependNode(foot_chain.length() - 1)
-        fk_chain = self.foot.create_fk_chain(first_foot, last_foot, string='foot_roll_')
-        ik_chain = self.foot.create_ik_chain(first_foot, last_foot, string='foot_roll_')
-        self.foot.create_ik_handle(ik_chain.getDependNode(0), ik_chain.getDependNode(1), limb='foot')
-        self.foot.create_ik_handle(ik_chain.getDependNode(1), ik_chain.getDependNode(2), limb='toes')
-        self.foot.create_foot_roll_control(last_foot, 'foot_roll')
-        fk_controls = self.foot.create_fk_foot_controls(fk_chain)
-        self.foot.create_fk_nodes_and_connections(joint_chain=fk_controls[1], joint_controls=fk_controls[0][1])
-        foot_chain.remove(0)
-        ik_chain.remove(0)
-        self.foot.attach_to_skin_chain(ik_chain=ik_chain, fk_chain=fk_chain, skin_chain=foot_chain,
-                                      ik_fk_switch=self.foot.ik_fk_switch)
-        self.foot.create_foot_roll_setup()
-        self.foot.fix_foot_setup()
+        start_joint = self.start_picker.current_joint()
+        end_joint = self.end_picker.current_joint()
+        if start_joint.isNull() or end_joint.isNull():
+            start_joint = self.sel.getDependNode(0)
+            end_joint = self.sel.getDependNode(1)
+        self.builder = LegRigBuilder(start_joint, end_joint,
+                                     group_name=self.line_group.text(), side=self.line_side.text(),
+                                     blend=self.checkbox1.isChecked(), foot=self.checkbox2.isChecked(),
+                                     guides=self.foot.foot_roll_guides, matrix_drive=self.checkbox3.isChecked())
+        self.leg = self.builder.leg
+        self.foot = self.builder.foot
+        return self.builder
 
     def create_foot_guides(self):
         self.foot = FootComponent(self.line_side.text())
         self.foot.create_foot_roll_guides()
 
     def create_rig(self):
-        self.create_leg_rig()
-        foot = self.checkbox2.isChecked()
-        if foot:
-            self.create_foot_rig()
+        builder = self.create_builder()
+        with BuildTransaction('create_leg_rig'):
+            builder.build()
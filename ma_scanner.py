@@ -0,0 +1,254 @@
+import io
+import os
+import sys
+import json
+import shlex
+import argparse
+import traceback
+import multiprocessing
+import names
+from shape_registry import ShapeRegistry
+
+
+class SceneScan(object):
+    """ The skeleton and the skin clusters that were found in a single Maya ASCII file.
+    :param path: String path of the file
+    """
+    def __init__(self, path):
+        self.path = path
+        self.joints = {}
+        self.joint_order = []
+        self.skin_clusters = {}
+        self.error = None
+
+    def get_roots(self):
+        """ Get the joints that are directly under the world, in the same order as Helper.get_root_joints
+        :return: List of String names
+        """
+        return [path.lstrip('|') for path in self.joint_order if not self.joints[path]['parent']]
+
+    def get_children(self):
+        """ Get the joints under every joint
+        :return: Dictionary with the full path of a joint as key and a list of full paths of its child joints as value
+        """
+        children = dict((path, []) for path in self.joint_order)
+        for path in self.joint_order:
+            parent = self.joints[path]['parent']
+            if parent in children:
+                children[parent].append(path)
+        return children
+
+    def get_leg_chains(self):
+        """ Get the chains that the leg rigger could be used on, which run from a joint with hip in its name to the
+        first joint below it with ankle in its name
+        :return: List of dictionaries with the start and end joint, the side and the number of joints
+        """
+        children = self.get_children()
+        chains = []
+        for path in self.joint_order:
+            if names.hip not in path.rsplit('|', 1)[-1].lower():
+                continue
+            chain = self.find_chain(children, [path])
+            if chain is None or len(chain) < 3:
+                continue
+            start, end = chain[0].rsplit('|', 1)[-1], chain[-1].rsplit('|', 1)[-1]
+            side = start.split('_')[0] if start.split('_')[0] in (names.left, names.right) else ''
+            chains.append({'start_joint': start, 'end_joint': end, 'side': side, 'joints': len(chain)})
+        return chains
+
+    @staticmethod
+    def find_chain(children, chain):
+        """ Walk down from the last joint of a chain, breadth first, to the first joint with ankle in its name
+        :param children: Dictionary made by get_children
+        :param chain: List of full paths, starting with the first joint
+        :return: List of full paths from the first joint to the ankle, or None if there is no ankle below it
+        """
+        queue = [chain]
+        while queue:
+            current = queue.pop(0)
+            for child in children[current[-1]]:
+                if names.ankle in child.rsplit('|', 1)[-1].lower():
+                    return current + [child]
+                queue.append(current + [child])
+        return None
+
+    def as_dict(self):
+        """ Get the scan as something that can be written to json
+        :return: Dictionary
+        """
+        return {'file': self.path, 'error': self.error, 'roots': self.get_roots(),
+                'leg_chains': self.get_leg_chains() if self.error is None else [],
+                'joints': [dict(self.joints[path], path=path) for path in self.joint_order],
+                'skin_clusters': self.skin_clusters}
+
+
+# Checking a delivery in Maya means a license and opening every scene. The joints and skin clusters can be read from
+# the Maya ASCII text just as well, one statement at a time, so even very large scenes never have to be in memory.
+class MaScanner(object):
+    """ This class scans Maya ASCII files for their joint hierarchy, the translate and jointOrient of every joint and
+    the influences and geometry of the skin clusters. Only createNode, setAttr and connectAttr statements are looked
+    at, the statements come from ShapeRegistry.split_statements so only a single statement is held at a time.
+    """
+    joint_attributes = {'.t': 'translate', '.translate': 'translate', '.jo': 'joint_orient',
+                        '.jointOrient': 'joint_orient'}
+    influence_attributes = ('ma[', 'matrix[')
+    geometry_attributes = ('og[', 'outputGeometry[')
+
+    @classmethod
+    def scan(cls, path):
+        """ Scan a single file
+        :param path: String path of the Maya ASCII file
+        :return: SceneScan
+        """
+        result = SceneScan(path)
+        paths = {}
+        current = None
+        influences = []
+        geometry = []
+        try:
+            with io.open(path, 'r', encoding='utf-8', errors='replace') as scene_file:
+                for statement in ShapeRegistry.split_statements(scene_file):
+                    command = statement.lstrip().split(None, 1)[0] if statement.strip() else ''
+                    if command == 'createNode':
+                        current = cls.create_node(result, paths, cls.split(statement))
+                    elif command == 'setAttr' and current in result.joints:
+                        cls.set_joint_attribute(result.joints[current], statement)
+                    elif command == 'connectAttr':
+                        cls.connect(cls.split(statement), influences, geometry)
+                    elif command == 'select':
+                        current = None
+        except Exception:
+            result.error = traceback.format_exc()
+            return result
+        for node, source in influences:
+            if node in result.skin_clusters:
+                result.skin_clusters[node]['influences'].append(source)
+        for node, destination in geometry:
+            if node in result.skin_clusters:
+                result.skin_clusters[node]['geometry'].append(destination)
+        return result
+
+    @staticmethod
+    def split(statement):
+        """ Split a statement into its tokens
+        :param statement: String MEL statement
+        :return: List of String tokens, without the closing semicolon
+        """
+        return shlex.split(statement.strip().rstrip(';'))
+
+    @staticmethod
+    def flag_value(tokens, flags):
+        """ Get the value that follows a flag
+        :param tokens: List of String tokens
+        :param flags: Tuple of the short and long flag
+        :return: String value, or an empty string if the flag is not used
+        """
+        for index, token in enumerate(tokens[:-1]):
+            if token in flags:
+                return tokens[index+1]
+        return ''
+
+    @classmethod
+    def create_node(cls, result, paths, tokens):
+        """ Handle a createNode statement
+        :param result: SceneScan
+        :param paths: Dictionary with short names as keys and lists of the full paths of the nodes as values
+        :param tokens: List of String tokens of the statement
+        :return: String full path of the node, or its name if it is not a dag node
+        """
+        node_type = tokens[1]
+        name = cls.flag_value(tokens, ('-n', '-name'))
+        parent = cls.flag_value(tokens, ('-p', '-parent'))
+        if parent and not parent.startswith('|'):
+            candidates = paths.get(parent.rsplit('|', 1)[-1], [])
+            matches = [path for path in candidates if path.endswith('|' + parent)]
+            parent = matches[-1] if matches else '|' + parent
+        path = parent + '|' + name
+        paths.setdefault(name, []).append(path)
+        if node_type == 'joint':
+            result.joints[path] = {'parent': parent, 'translate': [0.0, 0.0, 0.0], 'joint_orient': [0.0, 0.0, 0.0]}
+            result.joint_order.append(path)
+            return path
+        if node_type == 'skinCluster':
+            result.skin_clusters[name] = {'influences': [], 'geometry': []}
+        return name
+
+    @classmethod
+    def set_joint_attribute(cls, joint, statement):
+        """ Handle a setAttr statement of a joint, only the translate and jointOrient are kept
+        :param joint: Dictionary of the joint
+        :param statement: String MEL statement
+        :return:
+        """
+        for attribute, key in cls.joint_attributes.items():
+            if '"' + attribute + '"' in statement:
+                values = cls.split(statement)[-3:]
+                joint[key] = [float(value) for value in values]
+                return
+
+    @classmethod
+    def connect(cls, tokens, influences, geometry):
+        """ Handle a connectAttr statement, keeping the ones that could belong to a skin cluster
+        :param tokens: List of String tokens of the statement
+        :param influences: List of (node, source node) tuples of the connections into a matrix attribute
+        :param geometry: List of (node, destination node) tuples of the connections out of an outputGeometry attribute
+        :return:
+        """
+        plugs = [token for token in tokens[1:] if not token.startswith('-')]
+        if len(plugs) < 2:
+            return
+        source_node, source_attribute = plugs[0].split('.', 1)
+        destination_node, destination_attribute = plugs[1].split('.', 1)
+        if destination_attribute.startswith(cls.influence_attributes):
+            influences.append((destination_node, source_node))
+        elif source_attribute.startswith(cls.geometry_attributes):
+            geometry.append((source_node, destination_node))
+
+    @classmethod
+    def scan_directory(cls, directory, processes=None):
+        """ Scan every Maya ASCII file in a directory and the directories below it, with a process per core
+        :param directory: String path of the directory
+        :param processes: Integer number of processes, defaults to the number of cores
+        :return: List of dictionaries made by SceneScan.as_dict, sorted by path
+        """
+        paths = []
+        for root, _, files in os.walk(directory):
+            paths += [os.path.join(root, name) for name in files if name.lower().endswith('.ma')]
+        paths.sort()
+        if len(paths) < 2 or processes == 1:
+            return [scan_file(path) for path in paths]
+        pool = multiprocessing.Pool(processes or multiprocessing.cpu_count())
+        try:
+            return pool.map(scan_file, paths, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+
+def scan_file(path):
+    """ Scan a file and return the result as a dictionary, this is what the processes of scan_directory run
+    :param path: String path of the Maya ASCII file
+    :return: Dictionary
+    """
+    return MaScanner.scan(path).as_dict()
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Scan Maya ASCII files for joints, leg chains and skin clusters.')
+    parser.add_argument('directory', help='directory with the .ma files')
+    parser.add_argument('--processes', type=int, help='number of files that are scanned at the same time')
+    parser.add_argument('--output', help='path of the json report')
+    args = parser.parse_args(args)
+    results = MaScanner.scan_directory(args.directory, args.processes)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+    for result in results:
+        status = 'error' if result['error'] else '{0} roots, {1} leg chains, {2} skin clusters'.format(
+            len(result['roots']), len(result['leg_chains']), len(result['skin_clusters']))
+        print('{0}: {1}'.format(result['file'], status))
+    return 1 if any(result['error'] for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
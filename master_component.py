@@ -1,8 +1,10 @@
-import time
 import names
-from maya import cmds
-from maya.api import OpenMaya as om
+from backend import om, cmds
 from helper import Helper
+from build_context import BuildContext
+from skin_index import SkinIndex
+from build_transaction import BuildTransaction
+from build_profiler import profiled
 
 
 # I've decided to set this up with an already existing skeleton in mind. This means that I will make use of an already
@@ -11,17 +13,25 @@ class MasterComponent(object):
     """
     This is the master_component class which is used as a base class for other limbs
     Most use cases of the number 4 will be referring to MSpace.kWorld = 4
+    :param context: BuildContext that is shared with other components, if None a new one is created
     """
-    def __init__(self):
+    # Attribute that marks a joint whose local transformation was moved into its offsetParentMatrix by a matrix_drive
+    # build
+    baked_attribute = 'bakedOffsetParentMatrix'
+
+    def __init__(self, context=None):
+        self.context = context if context is not None else BuildContext()
         self.root = om.MObject()
         self.skin_cluster = om.MObject()
         self.mesh = om.MObject()
+        self.skin_index = None
         self.geo_group = om.MObject()
         self.joint_group = om.MObject()
         self.ik_group = om.MObject()
         self.control_group = om.MObject()
 
     # This method constructs the rig using the API and creates various groups that will be used to organise the rig
+    @profiled
     def construct_rig(self, root_name=names.root_group):
         """ This method creates all the necessary groups that are used by the rig, and is essential for creating
         all other things in the rig. Since maya no longer requires unique names for groups and only for things
@@ -40,48 +50,84 @@ class MasterComponent(object):
         dag_mod.renameNode(self.ik_group, names.ik_group)
         dag_mod.renameNode(self.joint_group, names.joint_group)
         dag_mod.renameNode(self.geo_group, names.geo_group)
-        dag_mod.doIt()
+        BuildTransaction.execute(dag_mod)
         return self.root, self.geo_group, self.joint_group, self.control_group, self.ik_group
 
+    def set_context(self, context):
+        """ Use the BuildContext of another component, so both components share the same cached queries
+        :param context: BuildContext
+        :return: BuildContext
+        """
+        self.context = context
+        return self.context
+
+    def get_skin_index(self, rebuild=False):
+        """ Get the SkinIndex of the scene. It is built the first time it is needed and kept on the context, so every
+        component that shares the context uses the same index.
+        :param rebuild: Boolean, if true the index is built again, for example after skinning a new mesh
+        :return: SkinIndex
+        """
+        if rebuild or self.context.skin_index is None:
+            self.context.skin_index = SkinIndex()
+        self.skin_index = self.context.skin_index
+        return self.skin_index
+
     # This is a method for getting the skincluster from joint object
     def get_skin_cluster(self, joint):
-        """ This method gets the skincluster of the given joint. It makes use of the helper class to get nodes that
-        are connected to a certain plug. In this case "lockInfluenceWeights"
+        """ This method gets the skincluster of the given joint out of the SkinIndex. Should the joint not be in the
+        index, it makes use of the helper class to get nodes that are connected to a certain plug. In this case
+        "lockInfluenceWeights"
         :param joint: Expects a joint in the form of an MObject
         :return: returns the skincluster as an MObject
         """
-        message_attr = om.MFnDependencyNode(joint).attribute('message')
-        joint_plug = om.MPlug(joint, message_attr)
-        skin_cluster = Helper.get_plug_nodes(joint_plug, plug_name='lockInfluenceWeights', source=False)
-        self.skin_cluster = skin_cluster[0]
+        skin_clusters = self.get_skin_index().get_skin_clusters(joint)
+        if not skin_clusters:
+            joint_plug = self.context.get_plug(joint, 'message')
+            skin_clusters = Helper.get_plug_nodes(joint_plug, plug_name='lockInfluenceWeights', source=False)
+        self.skin_cluster = skin_clusters[0]
         return self.skin_cluster
 
     # This is a method for getting the mesh from the joint, it uses the get skincluster method
     def get_skinned_mesh(self, joint):
-        """ This gets the mesh as an MObject using the helper class and a given joint that is skinned to that mesh
+        """ This gets the mesh as an MObject using the SkinIndex and a given joint that is skinned to that mesh
         :param joint: Expects a joint connect to a skincluster so that the mesh can be retrieved
-        :return: returns the mesh as an MObject
+        :return: returns the mesh as an MObject, a null object if no mesh is found
         """
-        skin_cluster = self.get_skin_cluster(joint)
-        mesh = Helper.get_attached_node(skin_cluster, 296, om.MItDependencyGraph.kDownstream)
-        self.mesh = mesh
+        meshes = self.get_skinned_meshes(joint)
+        self.mesh = meshes[0] if meshes else om.MObject()
         return self.mesh
 
-    # Static method to get all the joints in between the two variables
+    def get_skinned_meshes(self, joint):
+        """ This gets all the meshes that a joint is skinned to, for characters that are made of several meshes
+        :param joint: Expects a joint connect to a skincluster so that the meshes can be retrieved
+        :return: returns a list of MObjects containing the meshes, empty if no mesh is found
+        """
+        meshes = self.get_skin_index().get_meshes(joint)
+        if not meshes:
+            skin_cluster = self.get_skin_cluster(joint)
+            mesh = Helper.get_attached_node(skin_cluster, om.MFn.kMesh, direction=om.MItDependencyGraph.kDownstream,
+                                            max_depth=8)
+            meshes = [mesh] if mesh is not None else []
+        return meshes
+
+    # Static method to get all the joints in between the two variables. The chain is found by walking up from the last
+    # joint, so twist joints, helpers and other branches under the first joint are never visited.
     @staticmethod
     def get_chain(first=om.MObject(), last=om.MObject()):
-        """ This method gets all things in the hierarchy between variable first and last
+        """ This method gets all things in the hierarchy between variable first and last, in order from first to last
         :param first: Usually a joint in the form of an MObject
         :param last: Usually a joint in the form of an MObject
         :return: returns the retrieved chain of joints
         """
+        nodes = [last]
+        while nodes[-1] != first:
+            parent = om.MFnDagNode(nodes[-1]).parent(0)
+            if om.MFnDagNode(parent).parentCount() == 0:
+                raise ValueError('{0} is not below {1}'.format(om.MFnDagNode(last).name(), om.MFnDagNode(first).name()))
+            nodes.append(parent)
         chain = om.MSelectionList()
-        dag_it = om.MItDag().reset(first)
-        while not dag_it.isDone():
-            chain.add(dag_it.currentItem())
-            if dag_it.currentItem() == last:
-                break
-            dag_it.next()
+        for node in reversed(nodes):
+            chain.add(node)
         return chain
 
     @staticmethod
@@ -114,23 +160,82 @@ class MasterComponent(object):
             dag_mod.reparentNode(chain_it.getDependNode(), chain.getDependNode(index-1))
             index += 1
             chain_it.next()
-        dag_mod.doIt()
+        BuildTransaction.execute(dag_mod)
         return chain
 
     # Method to zero out joint orient attributes
     @staticmethod
-    def zero_joint_orient(joint=om.MObject()):
+    def zero_joint_orient(joint=om.MObject(), modifier=None):
         """ This method uses the helper class to get the jointOrient plugs and uses empty MAngle objects to set those
         plug values to 0
         :param joint: The joint as an MObject that wants their orient zeroed
+        :param modifier: MDGModifier that the values are set with. If none is given a new modifier is created and
+        executed.
         :return: returns the jointOrient attribute plug as an MPlug
         """
         helper = Helper()
+        execute = modifier is None
+        if execute:
+            modifier = om.MDGModifier()
         m_angle = om.MAngle()
         joint_x = helper.get_plug(joint, 'jointOrientX')
         joint_y = helper.get_plug(joint, 'jointOrientY')
         joint_z = helper.get_plug(joint, 'jointOrientZ')
-        joint_x.setMAngle(m_angle)
-        joint_y.setMAngle(m_angle)
-        joint_z.setMAngle(m_angle)
+        modifier.newPlugValueMAngle(joint_x, m_angle)
+        modifier.newPlugValueMAngle(joint_y, m_angle)
+        modifier.newPlugValueMAngle(joint_z, m_angle)
+        if execute:
+            BuildTransaction.execute(modifier)
         return helper.get_plug(joint, 'jointOrient')
+
+    def drive_joint(self, dg_mod, matrix_output, joint, name, matrix_drive=False):
+        """ Let a matrix drive a joint. By default the matrix goes through a decomposeMatrix into the translate, rotate
+        and scale of the joint. With matrix_drive the matrix is connected to the offsetParentMatrix of the joint
+        instead, which saves the decomposeMatrix and three connections per joint when the rig is evaluated.
+        :param dg_mod: MDGModifier that the nodes and connections are added to
+        :param matrix_output: MPlug containing the local matrix of the joint
+        :param joint: MObject containing the joint
+        :param name: String name of the decomposeMatrix
+        :param matrix_drive: Boolean, if true the offsetParentMatrix is driven
+        :return: MObject containing the decomposeMatrix, a null object when the offsetParentMatrix is driven
+        """
+        offset_parent = self.context.get_plug(joint, 'offsetParentMatrix')
+        if matrix_drive:
+            self.bake_offset_parent_matrix(dg_mod, joint)
+            dg_mod.connect(matrix_output, offset_parent)
+            return om.MObject()
+        dep_node = om.MFnDependencyNode(joint)
+        if dep_node.hasAttribute(self.baked_attribute) and not offset_parent.isDestination:
+            dg_mod.newPlugValue(offset_parent, om.MFnMatrixData().create(om.MMatrix()))
+            dg_mod.removeAttribute(joint, dep_node.attribute(self.baked_attribute))
+        decompose = dg_mod.createNode('decomposeMatrix')
+        dg_mod.renameNode(decompose, name)
+        dg_mod.connect(matrix_output, Helper.get_plug(decompose, 'inputMatrix'))
+        dg_mod.connect(Helper.get_plug(decompose, 'outputScale'), self.context.get_plug(joint, 'scale'))
+        dg_mod.connect(Helper.get_plug(decompose, 'outputRotate'), self.context.get_plug(joint, 'rotate'))
+        dg_mod.connect(Helper.get_plug(decompose, 'outputTranslate'), self.context.get_plug(joint, 'translate'))
+        return decompose
+
+    # Without the baked matrix the joint would jump to its parent until the connection is evaluated, and it would stay
+    # there if the connection is ever removed.
+    def bake_offset_parent_matrix(self, dg_mod, joint):
+        """ Move the local transformation of a joint into its offsetParentMatrix, so translate, rotate and jointOrient
+        can be zeroed without moving the joint. A joint that is already baked stays the same. The joint gets the
+        baked_attribute, so a build without matrix_drive knows it can reset the offsetParentMatrix.
+        :param dg_mod: MDGModifier that the values are set with
+        :param joint: MObject containing the joint
+        :return: MPlug of the offsetParentMatrix
+        """
+        local_matrix = om.MFnMatrixData(self.context.get_plug(joint, 'matrix').asMObject()).matrix()
+        offset_parent = self.context.get_plug(joint, 'offsetParentMatrix')
+        offset_matrix = om.MFnMatrixData(offset_parent.asMObject()).matrix()
+        dg_mod.newPlugValue(offset_parent, om.MFnMatrixData().create(local_matrix * offset_matrix))
+        Helper.set_plug_values(dg_mod, self.context.get_plug(joint, 'translate'), (0.0, 0.0, 0.0))
+        Helper.set_plug_values(dg_mod, self.context.get_plug(joint, 'rotate'), (0.0, 0.0, 0.0))
+        Helper.set_plug_values(dg_mod, self.context.get_plug(joint, 'scale'), (1.0, 1.0, 1.0))
+        self.zero_joint_orient(joint, dg_mod)
+        if not om.MFnDependencyNode(joint).hasAttribute(self.baked_attribute):
+            attribute = om.MFnNumericAttribute().create(self.baked_attribute, self.baked_attribute,
+                                                        om.MFnNumericData.kBoolean, True)
+            dg_mod.addAttribute(joint, attribute)
+        return offset_parent
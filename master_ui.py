@@ -4,10 +4,8 @@ from shiboken2 import wrapInstance
 
 import maya.OpenMayaUI as omui
 from helper import Helper
-from maya.api import OpenMaya as om
 from leg_rigger_ui import LegRiggerUI
-from leg_component import LegComponent
-from foot_component import FootComponent
+from joint_picker import JointPicker
 
 
 def maya_main_window():
@@ -24,25 +22,15 @@ class MasterUI(QtWidgets.QDialog):
         self.setMinimumWidth(200)
         self.setWindowFlags(self.windowFlags() ^ QtCore.Qt.WindowContextHelpButtonHint)
 
-        self.index = None
         self.create_widgets()
         self.set_widget_size()
         self.create_layouts()
-        self.populate_combo_box()
+        self.populate_pickers()
         self.create_connections()
-        try:
-            self.index = self.root_list.currentIndex()
-        except ValueError:
-            pass
-        if self.index is None:
-            print self.index
-            self.leg_ui = LegRiggerUI(root=None)
-        else:
-            print self.index
-            self.leg_ui = LegRiggerUI(root=self.root_joints.getDependNode(self.index))
+        self.leg_ui = LegRiggerUI(root=self.get_root())
 
     def create_widgets(self):
-        self.root_list = QtWidgets.QComboBox()
+        self.root_picker = JointPicker()
         self.name_box = QtWidgets.QLineEdit()
         self.groups_button = QtWidgets.QPushButton('Create Groups')
         self.leg_button = QtWidgets.QPushButton('Leg')
@@ -62,7 +50,7 @@ class MasterUI(QtWidgets.QDialog):
 
     def create_layouts(self):
         self.form_layout = QtWidgets.QFormLayout()
-        self.form_layout.addRow("Root:", self.root_list)
+        self.form_layout.addRow("Root:", self.root_picker)
         self.form_layout.addRow("Name:", self.name_box)
         self.form_layout.addRow(self.groups_button)
 
@@ -79,18 +67,22 @@ class MasterUI(QtWidgets.QDialog):
         main_layout.addLayout(self.button_layout)
         main_layout.addStretch()
 
-    def populate_combo_box(self):
+    def populate_pickers(self):
         helper = Helper()
         self.root_joints = helper.get_root_joints()
-        joints_it = om.MItSelectionList(self.root_joints)
-        while not joints_it.isDone():
-            name = om.MFnDependencyNode(joints_it.getDependNode()).name()
-            # print(name)
-            self.root_list.addItem(name)
-            joints_it.next()
+        self.root_picker.set_roots(self.root_joints)
+        if not self.root_joints.isEmpty():
+            self.root_picker.set_current_joint(self.root_joints.getDagPath(0).fullPathName())
+
+    def get_root(self):
+        root = self.root_picker.current_joint()
+        if root.isNull():
+            return None
+        return root
 
     def create_connections(self):
         self.leg_button.clicked.connect(self.show_leg_rigger)
 
     def show_leg_rigger(self):
+        self.leg_ui.set_root(self.get_root())
         self.leg_ui.show()
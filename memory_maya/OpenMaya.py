@@ -0,0 +1,2593 @@
+""" Stand-in for maya.api.OpenMaya that works on the in-memory scene. Only the classes and methods that the builders in
+this project use are implemented, with the same names, signatures and constants as the real API.
+"""
+import copy
+import math
+from memory_maya import scene as _scene
+from memory_maya.scene import SCENE, TYPE_IDS, AttributeDef
+
+_MISSING = object()
+
+
+class MFn(object):
+    kInvalid = 0
+    kBase = 1
+    kDependencyNode = 4
+    kWorld = 246
+    kDagNode = 107
+    kTransform = 110
+    kJoint = 121
+    kIkHandle = 120
+    kIkEffector = 119
+    kMesh = 296
+    kNurbsCurve = 267
+    kNurbsSurface = 294
+    kLocator = 281
+    kShape = 248
+    kCurve = 266
+    kSurface = 293
+    kGeometryFilt = 341
+    kSkinClusterFilter = 682
+    kMultMatrix = 1127
+    kDecomposeMatrix = 1128
+    kComposeMatrix = 1129
+    kBlendMatrix = 1130
+    kReverse = 466
+    kRemapValue = 933
+    kNearestPointOnCurve = 1126
+    kPointOnCurveInfo = 445
+    kMultiplyDivide = 449
+    kUnitConversion = 526
+    kPoleVectorConstraint = 243
+    kConstraint = 927
+    kParentConstraint = 242
+    kPointConstraint = 240
+    kOrientConstraint = 239
+    kAimConstraint = 111
+    kScaleConstraint = 244
+    kIkRPsolver = 357
+    kIkSCsolver = 358
+    kTime = 516
+    kAttribute = 554
+    kNumericAttribute = 566
+    kUnitAttribute = 567
+    kEnumAttribute = 568
+    kMessageAttribute = 569
+    kTypedAttribute = 570
+    kMatrixAttribute = 571
+    kCompoundAttribute = 572
+    kGenericAttribute = 573
+    kMeshVertComponent = 31
+    kCurveCVComponent = 39
+
+
+_ATTRIBUTE_FN = {'bool': MFn.kNumericAttribute, 'int': MFn.kNumericAttribute, 'float': MFn.kNumericAttribute,
+                 'double': MFn.kNumericAttribute, 'angle': MFn.kUnitAttribute, 'distance': MFn.kUnitAttribute,
+                 'time': MFn.kUnitAttribute, 'enum': MFn.kEnumAttribute, 'message': MFn.kMessageAttribute,
+                 'matrix': MFn.kMatrixAttribute, 'string': MFn.kTypedAttribute, 'geometry': MFn.kTypedAttribute,
+                 'compound': MFn.kCompoundAttribute}
+
+
+class MSpace(object):
+    kInvalid = 0
+    kTransform = 1
+    kPreTransform = 2
+    kObject = 2
+    kPostTransform = 3
+    kWorld = 4
+
+
+def _world_space(space):
+    return space == MSpace.kWorld
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+# Math classes
+# ---------------------------------------------------------------------------------------------------------------------
+class MVector(object):
+    def __init__(self, *args):
+        if len(args) == 1 and not isinstance(args[0], (int, float)):
+            values = list(args[0])[:3]
+        else:
+            values = list(args)[:3]
+        values = [float(value) for value in values] + [0.0] * (3 - len(values))
+        self.x, self.y, self.z = values
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.z))
+
+    def __len__(self):
+        return 3
+
+    def __getitem__(self, index):
+        return (self.x, self.y, self.z)[index]
+
+    def __add__(self, other):
+        return MVector(self.x + other[0], self.y + other[1], self.z + other[2])
+
+    def __sub__(self, other):
+        return MVector(self.x - other[0], self.y - other[1], self.z - other[2])
+
+    def __neg__(self):
+        return MVector(-self.x, -self.y, -self.z)
+
+    def __mul__(self, other):
+        if isinstance(other, MVector):
+            return self.x * other.x + self.y * other.y + self.z * other.z
+        if isinstance(other, MMatrix):
+            point = _scene.transform_point(other.rows(), [self.x, self.y, self.z, 0.0])
+            return MVector(point[:3])
+        if isinstance(other, MQuaternion):
+            return self * other.asMatrix()
+        return MVector(self.x * other, self.y * other, self.z * other)
+
+    def __rmul__(self, other):
+        return MVector(self.x * other, self.y * other, self.z * other)
+
+    def __truediv__(self, other):
+        return MVector(self.x / other, self.y / other, self.z / other)
+
+    __div__ = __truediv__
+
+    def __xor__(self, other):
+        return MVector(self.y * other.z - self.z * other.y, self.z * other.x - self.x * other.z,
+                       self.x * other.y - self.y * other.x)
+
+    def __eq__(self, other):
+        return isinstance(other, MVector) and self.isEquivalent(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = object.__hash__
+
+    def isEquivalent(self, other, tolerance=1e-10):
+        return all(abs(a - b) <= tolerance for a, b in zip(self, other))
+
+    def length(self):
+        return math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
+
+    def normal(self):
+        length = self.length()
+        if not length:
+            return MVector(self)
+        return MVector(self.x / length, self.y / length, self.z / length)
+
+    def normalize(self):
+        normal = self.normal()
+        self.x, self.y, self.z = normal.x, normal.y, normal.z
+        return self
+
+    def __repr__(self):
+        return 'MVector({}, {}, {})'.format(self.x, self.y, self.z)
+
+    kZeroVector = None
+    kXaxisVector = None
+    kYaxisVector = None
+    kZaxisVector = None
+
+
+MVector.kZeroVector = MVector(0, 0, 0)
+MVector.kXaxisVector = MVector(1, 0, 0)
+MVector.kYaxisVector = MVector(0, 1, 0)
+MVector.kZaxisVector = MVector(0, 0, 1)
+
+
+class MPoint(object):
+    def __init__(self, *args):
+        if len(args) == 1 and not isinstance(args[0], (int, float)):
+            source = args[0]
+            values = [source.x, source.y, source.z, getattr(source, 'w', 1.0)] if hasattr(source, 'x') \
+                else list(source)
+        else:
+            values = list(args)
+        values = [float(value) for value in values]
+        if len(values) < 3:
+            values += [0.0] * (3 - len(values))
+        if len(values) < 4:
+            values.append(1.0)
+        self.x, self.y, self.z, self.w = values[:4]
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.z, self.w))
+
+    def __len__(self):
+        return 4
+
+    def __getitem__(self, index):
+        return (self.x, self.y, self.z, self.w)[index]
+
+    def __add__(self, other):
+        return MPoint(self.x + other[0], self.y + other[1], self.z + other[2], self.w)
+
+    def __sub__(self, other):
+        if isinstance(other, MPoint):
+            return MVector(self.x - other.x, self.y - other.y, self.z - other.z)
+        return MPoint(self.x - other[0], self.y - other[1], self.z - other[2], self.w)
+
+    def __mul__(self, other):
+        if isinstance(other, MMatrix):
+            return MPoint(_scene.transform_point(other.rows(), [self.x, self.y, self.z, self.w]))
+        return MPoint(self.x * other, self.y * other, self.z * other, self.w)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        return MPoint(self.x / other, self.y / other, self.z / other, self.w)
+
+    __div__ = __truediv__
+
+    def __eq__(self, other):
+        return isinstance(other, MPoint) and self.isEquivalent(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = object.__hash__
+
+    def isEquivalent(self, other, tolerance=1e-10):
+        return all(abs(a - b) <= tolerance for a, b in zip(self, other))
+
+    def distanceTo(self, other):
+        return math.sqrt((self.x - other.x) ** 2 + (self.y - other.y) ** 2 + (self.z - other.z) ** 2)
+
+    def __repr__(self):
+        return 'MPoint({}, {}, {}, {})'.format(self.x, self.y, self.z, self.w)
+
+    kOrigin = None
+
+
+MPoint.kOrigin = MPoint(0, 0, 0)
+
+
+class MMatrix(object):
+    def __init__(self, values=None):
+        if values is None:
+            self._rows = _scene.identity()
+        elif isinstance(values, MMatrix):
+            self._rows = [list(row) for row in values._rows]
+        else:
+            values = list(values)
+            if len(values) == 16:
+                self._rows = [[float(v) for v in values[i * 4:i * 4 + 4]] for i in range(4)]
+            else:
+                self._rows = [[float(v) for v in row] for row in values]
+
+    def rows(self):
+        return self._rows
+
+    def __mul__(self, other):
+        if isinstance(other, MMatrix):
+            return MMatrix(_scene.mat_mult(self._rows, other._rows))
+        return MMatrix([[value * other for value in row] for row in self._rows])
+
+    def __getitem__(self, index):
+        return self._rows[index // 4][index % 4]
+
+    def __len__(self):
+        return 16
+
+    def __iter__(self):
+        return iter([value for row in self._rows for value in row])
+
+    def __eq__(self, other):
+        return isinstance(other, MMatrix) and self.isEquivalent(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = object.__hash__
+
+    def isEquivalent(self, other, tolerance=1e-10):
+        return all(abs(a - b) <= tolerance for a, b in zip(self, other))
+
+    def inverse(self):
+        return MMatrix(_scene.mat_inverse(self._rows))
+
+    def transpose(self):
+        return MMatrix([[self._rows[j][i] for j in range(4)] for i in range(4)])
+
+    def getElement(self, row, column):
+        return self._rows[row][column]
+
+    def setElement(self, row, column, value):
+        self._rows[row][column] = value
+        return self
+
+    def __repr__(self):
+        return 'MMatrix({})'.format(list(self))
+
+    kIdentity = None
+
+
+MMatrix.kIdentity = MMatrix()
+
+
+class MQuaternion(object):
+    def __init__(self, *args):
+        if len(args) == 4:
+            self.x, self.y, self.z, self.w = [float(value) for value in args]
+        elif len(args) == 1 and isinstance(args[0], MQuaternion):
+            self.x, self.y, self.z, self.w = args[0].x, args[0].y, args[0].z, args[0].w
+        else:
+            self.x, self.y, self.z, self.w = 0.0, 0.0, 0.0, 1.0
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.z, self.w))
+
+    def __getitem__(self, index):
+        return (self.x, self.y, self.z, self.w)[index]
+
+    def asMatrix(self):
+        return MMatrix(_scene.quaternion_to_matrix(self.normal()))
+
+    def asEulerRotation(self):
+        return MEulerRotation(_scene.matrix_to_euler(self.asMatrix().rows()))
+
+    def normal(self):
+        length = math.sqrt(sum(value * value for value in self)) or 1.0
+        return MQuaternion(*[value / length for value in self])
+
+    def inverse(self):
+        return MQuaternion(-self.x, -self.y, -self.z, self.w).normal()
+
+    conjugate = inverse
+
+    def __mul__(self, other):
+        return MQuaternion(*_scene.matrix_to_quaternion(_scene.mat_mult(self.asMatrix().rows(),
+                                                                         other.asMatrix().rows())))
+
+    def __repr__(self):
+        return 'MQuaternion({}, {}, {}, {})'.format(self.x, self.y, self.z, self.w)
+
+
+class MEulerRotation(object):
+    kXYZ = 0
+    kYZX = 1
+    kZXY = 2
+    kXZY = 3
+    kYXZ = 4
+    kZYX = 5
+
+    def __init__(self, *args):
+        self.order = MEulerRotation.kXYZ
+        if len(args) == 1 and isinstance(args[0], MEulerRotation):
+            self.x, self.y, self.z, self.order = args[0].x, args[0].y, args[0].z, args[0].order
+        elif len(args) >= 1 and not isinstance(args[0], (int, float)):
+            self.x, self.y, self.z = [float(value) for value in list(args[0])[:3]]
+            if len(args) > 1:
+                self.order = args[1]
+        elif len(args) >= 3:
+            self.x, self.y, self.z = float(args[0]), float(args[1]), float(args[2])
+            if len(args) > 3:
+                self.order = args[3]
+        else:
+            self.x, self.y, self.z = 0.0, 0.0, 0.0
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.z))
+
+    def __getitem__(self, index):
+        return (self.x, self.y, self.z)[index]
+
+    def asMatrix(self):
+        return MMatrix(_scene.euler_matrix([self.x, self.y, self.z], self.order))
+
+    def asQuaternion(self):
+        return MQuaternion(*_scene.matrix_to_quaternion(self.asMatrix().rows()))
+
+    def asVector(self):
+        return MVector(self.x, self.y, self.z)
+
+    def __repr__(self):
+        return 'MEulerRotation({}, {}, {})'.format(self.x, self.y, self.z)
+
+
+class MAngle(object):
+    kInvalid = 0
+    kRadians = 1
+    kDegrees = 2
+    kAngMinutes = 3
+    kAngSeconds = 4
+
+    def __init__(self, value=0.0, unit=1):
+        self.unit = unit
+        self.value = float(value)
+
+    def asRadians(self):
+        if self.unit == MAngle.kDegrees:
+            return math.radians(self.value)
+        return self.value
+
+    def asDegrees(self):
+        return math.degrees(self.asRadians())
+
+
+class MDistance(object):
+    kInvalid = 0
+    kInches = 1
+    kFeet = 2
+    kYards = 3
+    kMiles = 4
+    kMillimeters = 5
+    kCentimeters = 6
+    kKilometers = 7
+    kMeters = 8
+
+    def __init__(self, value=0.0, unit=6):
+        self.unit = unit
+        self.value = float(value)
+
+    def asCentimeters(self):
+        factors = {1: 2.54, 2: 30.48, 3: 91.44, 4: 160934.4, 5: 0.1, 6: 1.0, 7: 100000.0, 8: 100.0}
+        return self.value * factors.get(self.unit, 1.0)
+
+    @staticmethod
+    def uiUnit():
+        return MDistance.kCentimeters
+
+
+class MTransformationMatrix(object):
+    def __init__(self, matrix=None):
+        rows = matrix.rows() if isinstance(matrix, MMatrix) else _scene.identity()
+        translation, rotation, scale = _scene.decompose(rows)
+        self._translation = MVector(translation)
+        self._rotation = _scene.matrix_to_quaternion(rotation)
+        self._scale = scale
+
+    def asMatrix(self):
+        matrix = _scene.mat_mult(_scene.scale_matrix(self._scale), _scene.quaternion_to_matrix(self._rotation))
+        return MMatrix(_scene.mat_mult(matrix, _scene.translation_matrix(self._translation)))
+
+    def translation(self, space=MSpace.kTransform):
+        return MVector(self._translation)
+
+    def setTranslation(self, vector, space=MSpace.kTransform):
+        self._translation = MVector(vector)
+        return self
+
+    def rotation(self, asQuaternion=False):
+        quaternion = MQuaternion(*self._rotation)
+        if asQuaternion:
+            return quaternion
+        return quaternion.asEulerRotation()
+
+    def setRotation(self, rotation):
+        if isinstance(rotation, MEulerRotation):
+            rotation = rotation.asQuaternion()
+        self._rotation = list(rotation)
+        return self
+
+    def scale(self, space=MSpace.kTransform):
+        return list(self._scale)
+
+    def setScale(self, scale, space=MSpace.kTransform):
+        self._scale = [float(value) for value in scale]
+        return self
+
+    def rotationOrder(self):
+        return MEulerRotation.kXYZ
+
+
+class MBoundingBox(object):
+    def __init__(self, minimum=None, maximum=None):
+        self._empty = minimum is None
+        self._min = MPoint(minimum) if minimum is not None else MPoint(0, 0, 0)
+        self._max = MPoint(maximum) if maximum is not None else MPoint(0, 0, 0)
+
+    def expand(self, item):
+        if isinstance(item, MBoundingBox):
+            if item._empty:
+                return self
+            self.expand(item.min)
+            return self.expand(item.max)
+        if self._empty:
+            self._min, self._max, self._empty = MPoint(item), MPoint(item), False
+            return self
+        self._min = MPoint(min(self._min.x, item[0]), min(self._min.y, item[1]), min(self._min.z, item[2]))
+        self._max = MPoint(max(self._max.x, item[0]), max(self._max.y, item[1]), max(self._max.z, item[2]))
+        return self
+
+    @property
+    def min(self):
+        return MPoint(self._min)
+
+    @property
+    def max(self):
+        return MPoint(self._max)
+
+    @property
+    def center(self):
+        return MPoint((self._min.x + self._max.x) / 2, (self._min.y + self._max.y) / 2,
+                      (self._min.z + self._max.z) / 2)
+
+    @property
+    def width(self):
+        return self._max.x - self._min.x
+
+    @property
+    def height(self):
+        return self._max.y - self._min.y
+
+    @property
+    def depth(self):
+        return self._max.z - self._min.z
+
+    def transformUsing(self, matrix):
+        corners = [MPoint(x, y, z) * matrix for x in (self._min.x, self._max.x) for y in (self._min.y, self._max.y)
+                   for z in (self._min.z, self._max.z)]
+        self._empty = True
+        for corner in corners:
+            self.expand(corner)
+        return self
+
+
+class _Array(list):
+    def length(self):
+        return len(self)
+
+    def clear(self):
+        del self[:]
+
+    def setLength(self, length):
+        del self[length:]
+
+
+class MPointArray(_Array):
+    def __init__(self, values=None):
+        super(MPointArray, self).__init__([MPoint(value) for value in values or []])
+
+    def append(self, value):
+        super(MPointArray, self).append(MPoint(value))
+
+
+class MVectorArray(_Array):
+    pass
+
+
+class MDoubleArray(_Array):
+    pass
+
+
+class MFloatArray(_Array):
+    pass
+
+
+class MIntArray(_Array):
+    pass
+
+
+class MObjectArray(_Array):
+    pass
+
+
+class MDagPathArray(_Array):
+    pass
+
+
+class MPlugArray(_Array):
+    pass
+
+
+class MUuid(object):
+    def __init__(self, value=''):
+        self._value = str(value)
+
+    def asString(self):
+        return self._value
+
+    def valid(self):
+        return bool(self._value)
+
+    def __eq__(self, other):
+        return isinstance(other, MUuid) and other._value == self._value
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._value)
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+# Objects, handles and paths
+# ---------------------------------------------------------------------------------------------------------------------
+class _World(object):
+    """ The world node that sits above all top level DAG nodes """
+    name = 'world'
+    type_name = 'world'
+    api_type = MFn.kWorld
+    parents = []
+    alive = True
+    is_dag = True
+    is_shape = False
+
+    @property
+    def children(self):
+        return [node for node in SCENE.nodes if node.is_dag and not node.parents and node.alive]
+
+    def has_fn(self, type_id):
+        return type_id in (MFn.kWorld, MFn.kDagNode, MFn.kBase, MFn.kDependencyNode)
+
+    def world_matrix(self, path_index=0):
+        return _scene.identity()
+
+
+WORLD = _World()
+
+
+class MObject(object):
+    kNullObj = None
+
+    def __init__(self, other=None):
+        self._node = None
+        self._attribute = None
+        if isinstance(other, MObject):
+            self._node = other._node
+            self._attribute = other._attribute
+
+    @classmethod
+    def _wrap(cls, node=None, attribute=None):
+        m_obj = cls()
+        m_obj._node = node
+        m_obj._attribute = attribute
+        return m_obj
+
+    def isNull(self):
+        if self._attribute is not None:
+            return False
+        return self._node is None or not self._node.alive
+
+    def apiType(self):
+        if self._attribute is not None:
+            return _ATTRIBUTE_FN[self._attribute.kind]
+        if self._node is None:
+            return MFn.kInvalid
+        return self._node.api_type
+
+    def hasFn(self, type_id):
+        if self._attribute is not None:
+            return type_id in (MFn.kAttribute, _ATTRIBUTE_FN[self._attribute.kind])
+        if self._node is None:
+            return False
+        return self._node.has_fn(type_id)
+
+    def __eq__(self, other):
+        if not isinstance(other, MObject):
+            return False
+        if self._attribute is not None or other._attribute is not None:
+            return self._attribute is other._attribute
+        return self._node is other._node
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return id(self._node or self._attribute)
+
+    def __repr__(self):
+        if self._node is not None:
+            return '<MObject {} ({})>'.format(self._node.name, self._node.type_name)
+        return '<MObject null>'
+
+
+MObject.kNullObj = MObject()
+
+
+def _node_of(item):
+    """ Get the scene node out of an MObject or MDagPath, raises like the API does for null objects """
+    if isinstance(item, MDagPath):
+        item = item.node()
+    if not isinstance(item, MObject) or item._node is None or not item._node.alive:
+        raise RuntimeError('(kInvalidParameter): Object is incompatible with this method')
+    return item._node
+
+
+class MObjectHandle(object):
+    def __init__(self, m_obj=None):
+        self._m_obj = MObject(m_obj) if m_obj is not None else MObject()
+
+    def object(self):
+        return MObject(self._m_obj)
+
+    def isValid(self):
+        return not self._m_obj.isNull()
+
+    def isAlive(self):
+        return self._m_obj._node is not None and self._m_obj._node.alive
+
+    def hashCode(self):
+        return id(self._m_obj._node)
+
+    def __eq__(self, other):
+        return isinstance(other, MObjectHandle) and self._m_obj == other._m_obj
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return self.hashCode()
+
+
+class MDagPath(object):
+    def __init__(self, other=None):
+        self._nodes = list(other._nodes) if isinstance(other, MDagPath) else []
+
+    @classmethod
+    def _from_nodes(cls, nodes):
+        path = cls()
+        path._nodes = list(nodes)
+        return path
+
+    @staticmethod
+    def getAPathTo(m_obj):
+        return MFnDagNode(m_obj).getPath()
+
+    @staticmethod
+    def getAllPathsTo(m_obj):
+        return MDagPathArray([MDagPath._from_nodes(path) for path in SCENE.paths(_node_of(m_obj))])
+
+    def isValid(self):
+        return bool(self._nodes) and all(node.alive for node in self._nodes)
+
+    def node(self):
+        if not self._nodes:
+            return MObject._wrap(WORLD)
+        return MObject._wrap(self._nodes[-1])
+
+    def transform(self):
+        for node in reversed(self._nodes):
+            if not node.is_shape:
+                return MObject._wrap(node)
+        return MObject._wrap(WORLD)
+
+    def apiType(self):
+        return self.node().apiType()
+
+    def hasFn(self, type_id):
+        return self.node().hasFn(type_id)
+
+    def length(self):
+        return len(self._nodes)
+
+    def pop(self, count=1):
+        del self._nodes[-count:]
+        return self
+
+    def push(self, child):
+        self._nodes.append(_node_of(child))
+        return self
+
+    def child(self, index):
+        return MObject._wrap(self._nodes[-1].children[index])
+
+    def childCount(self):
+        return len(self._nodes[-1].children) if self._nodes else len(WORLD.children)
+
+    def numberOfShapesDirectlyBelow(self):
+        return len([child for child in self._nodes[-1].children if child.is_shape])
+
+    def extendToShape(self, index=0):
+        shapes = [child for child in self._nodes[-1].children if child.is_shape]
+        if not shapes:
+            raise RuntimeError('(kFailure): No shapes below this path')
+        self._nodes.append(shapes[index])
+        return self
+
+    def instanceNumber(self):
+        if not self._nodes:
+            return 0
+        return SCENE.paths(self._nodes[-1]).index(self._nodes) if self._nodes in SCENE.paths(self._nodes[-1]) \
+            else 0
+
+    def inclusiveMatrix(self):
+        matrix = _scene.identity()
+        for node in reversed(self._nodes):
+            matrix = _scene.mat_mult(matrix, node.local_matrix())
+            if 'offsetParentMatrix' in node.attribute_map:
+                matrix = _scene.mat_mult(matrix, node.get_value((('offsetParentMatrix', None),)))
+        return MMatrix(matrix)
+
+    def inclusiveMatrixInverse(self):
+        return self.inclusiveMatrix().inverse()
+
+    def exclusiveMatrix(self):
+        parent = MDagPath._from_nodes(self._nodes[:-1]).inclusiveMatrix()
+        if self._nodes and 'offsetParentMatrix' in self._nodes[-1].attribute_map:
+            return MMatrix(self._nodes[-1].get_value((('offsetParentMatrix', None),))) * parent
+        return parent
+
+    def exclusiveMatrixInverse(self):
+        return self.exclusiveMatrix().inverse()
+
+    def fullPathName(self):
+        return ''.join('|' + node.name for node in self._nodes)
+
+    def partialPathName(self):
+        if not self._nodes:
+            return ''
+        for start in range(len(self._nodes) - 1, -1, -1):
+            name = '|'.join(node.name for node in self._nodes[start:])
+            if len(SCENE.find(name)) <= 1:
+                return name
+        return self.fullPathName()
+
+    def __eq__(self, other):
+        return isinstance(other, MDagPath) and [id(n) for n in self._nodes] == [id(n) for n in other._nodes]
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = object.__hash__
+
+    def __repr__(self):
+        return '<MDagPath {}>'.format(self.fullPathName())
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+# Plugs
+# ---------------------------------------------------------------------------------------------------------------------
+class MPlug(object):
+    def __init__(self, node=None, attribute=None):
+        self._node = None
+        self._path = ()
+        if isinstance(node, MPlug):
+            self._node, self._path = node._node, node._path
+        elif node is not None and attribute is not None:
+            self._node = _node_of(node)
+            definition = attribute._attribute
+            chain = []
+            while definition is not None:
+                chain.insert(0, (definition.name, None))
+                definition = definition.parent
+            self._path = tuple(chain)
+
+    @classmethod
+    def _make(cls, node, path):
+        plug = cls()
+        plug._node = node
+        plug._path = tuple(path)
+        return plug
+
+    def _definition(self):
+        return self._node.attribute_map[self._path[-1][0]]
+
+    def _key(self):
+        return self._node, self._path
+
+    def isNull(self):
+        return self._node is None
+
+    def node(self):
+        if self._node is None:
+            return MObject()
+        return MObject._wrap(self._node)
+
+    def attribute(self):
+        return MObject._wrap(attribute=self._definition())
+
+    @property
+    def isArray(self):
+        return self._definition().array and self._path[-1][1] is None
+
+    @property
+    def isElement(self):
+        return self._definition().array and self._path[-1][1] is not None
+
+    @property
+    def isCompound(self):
+        return self._definition().kind == 'compound'
+
+    @property
+    def isChild(self):
+        return len(self._path) > 1 and not self.isElement
+
+    def logicalIndex(self):
+        return self._path[-1][1]
+
+    def numChildren(self):
+        return len(self._definition().children)
+
+    def child(self, index):
+        definition = self._definition()
+        if isinstance(index, MObject):
+            child = index._attribute
+        else:
+            child = definition.children[index]
+        return MPlug._make(self._node, self._path + ((child.name, None),))
+
+    def parent(self):
+        return MPlug._make(self._node, self._path[:-1])
+
+    def array(self):
+        return MPlug._make(self._node, self._path[:-1] + ((self._path[-1][0], None),))
+
+    def elementByLogicalIndex(self, index):
+        return MPlug._make(self._node, self._path[:-1] + ((self._path[-1][0], int(index)),))
+
+    def elementByPhysicalIndex(self, index):
+        return self.elementByLogicalIndex(self.getExistingArrayAttributeIndices()[index])
+
+    def getExistingArrayAttributeIndices(self):
+        return self._node.existing_indices(self._path)
+
+    def numElements(self):
+        return len(self.getExistingArrayAttributeIndices())
+
+    evaluateNumElements = numElements
+
+    def name(self):
+        return self._node.name + '.' + self.partialName()
+
+    def partialName(self, includeNodeName=False, includeNonMandatoryIndices=False, includeInstancedIndices=False,
+                    useAlias=False, useFullAttributePath=False, useLongNames=False):
+        parts = []
+        for name, index in self._path:
+            definition = self._node.attribute_map[name]
+            part = definition.name if useLongNames else definition.short
+            if index is not None:
+                part += '[{}]'.format(index)
+            parts.append(part)
+        if not useFullAttributePath:
+            parts = [part for i, part in enumerate(parts) if i == len(parts) - 1 or '[' in part]
+        name = '.'.join(parts)
+        if includeNodeName:
+            name = self._node.name + '.' + name
+        return name
+
+    @property
+    def info(self):
+        return self.name()
+
+    # Connections
+    def source(self):
+        source = SCENE.source_of(self._key())
+        if source is None:
+            return MPlug()
+        return MPlug._make(*source)
+
+    def destinations(self):
+        return MPlugArray([MPlug._make(*destination) for destination in SCENE.destinations_of(self._key())])
+
+    def connectedTo(self, asDst, asSrc):
+        plugs = MPlugArray()
+        if asDst and not self.source().isNull():
+            plugs.append(self.source())
+        if asSrc:
+            plugs.extend(self.destinations())
+        return plugs
+
+    @property
+    def isConnected(self):
+        return self.isDestination or self.isSource
+
+    @property
+    def isDestination(self):
+        return SCENE.source_of(self._key()) is not None
+
+    @property
+    def isSource(self):
+        return bool(SCENE.destinations_of(self._key()))
+
+    @property
+    def isKeyable(self):
+        return self._node.data.get('keyable', {}).get(self._path, self._definition().keyable)
+
+    @isKeyable.setter
+    def isKeyable(self, value):
+        self._node.data.setdefault('keyable', {})[self._path] = bool(value)
+
+    @property
+    def isLocked(self):
+        return self._node.data.get('locked', {}).get(self._path, False)
+
+    @isLocked.setter
+    def isLocked(self, value):
+        self._node.data.setdefault('locked', {})[self._path] = bool(value)
+
+    # Values
+    def _get(self):
+        definition = self._definition()
+        if definition.kind == 'compound':
+            return [self.child(index)._get() for index in range(len(definition.children))]
+        return self._node.get_value(self._path)
+
+    def _set(self, value):
+        definition = self._definition()
+        if definition.kind == 'compound':
+            for index, child_value in enumerate(value):
+                self.child(index)._set(child_value)
+            return
+        self._node.set_value(self._path, value)
+
+    def asDouble(self):
+        return float(self._get())
+
+    asFloat = asDouble
+
+    def asInt(self):
+        return int(self._get())
+
+    asShort = asInt
+
+    def asBool(self):
+        return bool(self._get())
+
+    def asString(self):
+        return str(self._get())
+
+    def asMAngle(self):
+        return MAngle(self._get(), MAngle.kRadians)
+
+    def asMDistance(self):
+        return MDistance(self._get(), MDistance.kCentimeters)
+
+    def asMObject(self):
+        value = self._get()
+        if self._definition().kind == 'matrix':
+            data = MObject()
+            data._matrix = MMatrix(value)
+            return data
+        return value if isinstance(value, MObject) else MObject()
+
+    def setDouble(self, value):
+        self._set(float(value))
+
+    setFloat = setDouble
+
+    def setInt(self, value):
+        self._set(int(value))
+
+    setShort = setInt
+
+    def setBool(self, value):
+        self._set(bool(value))
+
+    def setString(self, value):
+        self._set(str(value))
+
+    def setMAngle(self, angle):
+        self._set(angle.asRadians())
+
+    def setMDistance(self, distance):
+        self._set(distance.asCentimeters())
+
+    def setMObject(self, data):
+        if hasattr(data, '_matrix'):
+            self._set(data._matrix.rows())
+
+    def __eq__(self, other):
+        return isinstance(other, MPlug) and self._node is other._node and self._path == other._path
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((id(self._node), self._path))
+
+    def __repr__(self):
+        return '<MPlug {}>'.format(self.name() if self._node else 'null')
+
+
+def _find_plug(node, name):
+    """ Resolve an attribute path such as 'value[2].value_Position' or 'wm[0]' to a plug """
+    path = []
+    definition = None
+    for part in name.split('.'):
+        index = None
+        if '[' in part:
+            part, index = part[:-1].split('[')
+            index = int(index)
+        if definition is None:
+            definition = node.attribute_map.get(part)
+        else:
+            definition = definition.find_child(part)
+        if definition is None:
+            raise RuntimeError('(kInvalidParameter): No such attribute: {}'.format(name))
+        path.append((definition.name, index))
+    return MPlug._make(node, path)
+
+
+class MFnMatrixData(object):
+    kMatrix = 5
+
+    def __init__(self, data=None):
+        self._data = data
+
+    def matrix(self):
+        return MMatrix(getattr(self._data, '_matrix', None))
+
+    def create(self, matrix=None):
+        data = MObject()
+        data._matrix = MMatrix(matrix)
+        self._data = data
+        return data
+
+
+class MFnNurbsCurveData(object):
+    """ Curve data holds the geometry that MFnNurbsCurve.create writes into it until it is set on a shape """
+    def create(self):
+        data = MObject()
+        data._geometry = ('curve', None)
+        return data
+
+
+class MFnNurbsSurfaceData(object):
+    def create(self):
+        data = MObject()
+        data._geometry = ('surface', None)
+        return data
+
+
+class MFnData(object):
+    kInvalid = 0
+    kNumeric = 1
+    kPlugin = 2
+    kPluginGeometry = 3
+    kString = 4
+    kMatrix = 5
+    kStringArray = 6
+    kDoubleArray = 7
+    kIntArray = 9
+    kNurbsCurve = 15
+    kMesh = 13
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+# Attribute function sets
+# ---------------------------------------------------------------------------------------------------------------------
+class MFnNumericData(object):
+    kInvalid = 0
+    kBoolean = 1
+    kByte = 2
+    kChar = 3
+    kShort = 4
+    k2Short = 5
+    k3Short = 6
+    kLong = 7
+    kInt = 7
+    k2Long = 8
+    k2Int = 8
+    k3Long = 9
+    k3Int = 9
+    kInt64 = 10
+    kFloat = 11
+    k2Float = 12
+    k3Float = 13
+    kDouble = 14
+    k2Double = 15
+    k3Double = 16
+    k4Double = 17
+    kAddr = 18
+
+
+_NUMERIC_KINDS = {MFnNumericData.kBoolean: 'bool', MFnNumericData.kByte: 'int', MFnNumericData.kChar: 'int',
+                  MFnNumericData.kShort: 'int', MFnNumericData.kInt: 'int', MFnNumericData.kInt64: 'int',
+                  MFnNumericData.kFloat: 'float', MFnNumericData.kDouble: 'double'}
+
+
+class MFnAttribute(object):
+    def __init__(self, m_obj=None):
+        self._attribute = m_obj._attribute if isinstance(m_obj, MObject) else None
+
+    def _wrap(self, definition):
+        definition.dynamic = True
+        self._attribute = definition
+        return MObject._wrap(attribute=definition)
+
+    def object(self):
+        return MObject._wrap(attribute=self._attribute)
+
+    @property
+    def name(self):
+        return self._attribute.name
+
+    @property
+    def shortName(self):
+        return self._attribute.short
+
+    @property
+    def keyable(self):
+        return self._attribute.keyable
+
+    @keyable.setter
+    def keyable(self, value):
+        self._attribute.keyable = bool(value)
+
+    @property
+    def array(self):
+        return self._attribute.array
+
+    @array.setter
+    def array(self, value):
+        self._attribute.array = bool(value)
+
+    def _flag(name, default=True):
+        def getter(self):
+            return getattr(self._attribute, '_' + name, default)
+
+        def setter(self, value):
+            setattr(self._attribute, '_' + name, value)
+        return property(getter, setter)
+
+    readable = _flag('readable')
+    writable = _flag('writable')
+    storable = _flag('storable')
+    hidden = _flag('hidden', False)
+    channelBox = _flag('channelBox', False)
+    connectable = _flag('connectable')
+    usesArrayDataBuilder = _flag('usesArrayDataBuilder', False)
+    del _flag
+
+
+class MFnMessageAttribute(MFnAttribute):
+    def create(self, long_name, short_name):
+        return self._wrap(AttributeDef(long_name, short_name, 'message'))
+
+
+class MFnEnumAttribute(MFnAttribute):
+    def create(self, long_name, short_name, default=0):
+        return self._wrap(AttributeDef(long_name, short_name, 'enum', default))
+
+    def addField(self, name, value):
+        self._attribute.fields.append((name, value))
+        return self
+
+    def fieldName(self, value):
+        for name, field_value in self._attribute.fields:
+            if field_value == value:
+                return name
+        raise RuntimeError('(kInvalidParameter): No field with that value')
+
+
+class MFnNumericAttribute(MFnAttribute):
+    def create(self, long_name, short_name, numeric_type, default=0):
+        return self._wrap(AttributeDef(long_name, short_name, _NUMERIC_KINDS.get(numeric_type, 'double'),
+                                       default))
+
+    def numericType(self):
+        kinds = {'bool': MFnNumericData.kBoolean, 'int': MFnNumericData.kInt, 'enum': MFnNumericData.kShort,
+                 'float': MFnNumericData.kFloat}
+        return kinds.get(self._attribute.kind, MFnNumericData.kDouble)
+
+    def setMin(self, value):
+        self._attribute.minimum = value
+        return self
+
+    def setMax(self, value):
+        self._attribute.maximum = value
+        return self
+
+    def getMin(self):
+        return self._attribute.minimum
+
+    def getMax(self):
+        return self._attribute.maximum
+
+
+class MFnUnitAttribute(MFnAttribute):
+    kInvalid = 0
+    kAngle = 1
+    kDistance = 2
+    kTime = 3
+
+    def create(self, long_name, short_name, unit_type, default=0.0):
+        kinds = {MFnUnitAttribute.kAngle: 'angle', MFnUnitAttribute.kDistance: 'distance',
+                 MFnUnitAttribute.kTime: 'time'}
+        return self._wrap(AttributeDef(long_name, short_name, kinds[unit_type], default))
+
+    def unitType(self):
+        kinds = {'angle': MFnUnitAttribute.kAngle, 'distance': MFnUnitAttribute.kDistance,
+                 'time': MFnUnitAttribute.kTime}
+        return kinds.get(self._attribute.kind, MFnUnitAttribute.kInvalid)
+
+
+class MFnTypedAttribute(MFnAttribute):
+    def create(self, long_name, short_name, data_type, default=None):
+        kind = 'string' if data_type == MFnData.kString else 'matrix' if data_type == MFnData.kMatrix else 'geometry'
+        return self._wrap(AttributeDef(long_name, short_name, kind, default))
+
+
+class MFnMatrixAttribute(MFnAttribute):
+    kFloat = 0
+    kDouble = 1
+
+    def create(self, long_name, short_name, matrix_type=1):
+        return self._wrap(AttributeDef(long_name, short_name, 'matrix'))
+
+
+class MFnCompoundAttribute(MFnAttribute):
+    def create(self, long_name, short_name):
+        return self._wrap(AttributeDef(long_name, short_name, 'compound'))
+
+    def addChild(self, child):
+        definition = child._attribute
+        definition.parent = self._attribute
+        self._attribute.children.append(definition)
+        return self
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+# Node function sets
+# ---------------------------------------------------------------------------------------------------------------------
+class MFnBase(object):
+    def __init__(self, item=None):
+        self._node = None
+        self._path = None
+        if item is not None:
+            self.setObject(item)
+
+    def setObject(self, item):
+        if isinstance(item, MDagPath):
+            self._path = MDagPath(item)
+            self._node = _node_of(item)
+        else:
+            self._node = _node_of(item)
+            self._path = None
+        return self
+
+    def object(self):
+        return MObject._wrap(self._node)
+
+    def hasObj(self, item):
+        return not item.isNull()
+
+
+class MFnDependencyNode(MFnBase):
+    def name(self):
+        return self._node.name
+
+    def absoluteName(self):
+        return ':' + self._node.name
+
+    def setName(self, name):
+        self._node.name = SCENE.unique_name(name, self._node, self._node.parents[0] if self._node.parents else None)
+        return self._node.name
+
+    @property
+    def typeName(self):
+        return self._node.type_name
+
+    def uuid(self):
+        return MUuid(self._node.uuid)
+
+    def findPlug(self, attribute, wantNetworkedPlug=True):
+        if isinstance(attribute, MObject):
+            return MPlug(MObject._wrap(self._node), attribute)
+        return _find_plug(self._node, attribute)
+
+    def attribute(self, name):
+        definition = self._node.attribute_map.get(name)
+        if definition is None:
+            return MObject()
+        return MObject._wrap(attribute=definition)
+
+    def hasAttribute(self, name):
+        return name in self._node.attribute_map
+
+    def attributeCount(self):
+        return len(self._node.attributes)
+
+    def addAttribute(self, attribute):
+        _add_attribute(self._node, attribute._attribute)
+
+    def removeAttribute(self, attribute):
+        self._node.remove_attribute(attribute._attribute)
+
+    def create(self, type_name, name=None):
+        node = SCENE.create_node(type_name, name)
+        self._node = node
+        return MObject._wrap(node)
+
+    def getConnections(self):
+        plugs = MPlugArray()
+        for node, path in SCENE.connected_plugs(self._node):
+            plug = MPlug._make(node, path)
+            if plug not in plugs:
+                plugs.append(plug)
+        return plugs
+
+    @property
+    def isDefaultNode(self):
+        return False
+
+    @property
+    def isLocked(self):
+        return False
+
+
+def _add_attribute(node, definition):
+    if definition.name in node.attribute_map:
+        raise RuntimeError('(kFailure): Attribute already exists: {}'.format(definition.name))
+    copy = _copy_definition(definition)
+    node.attributes.append(copy)
+    node.register_attribute(copy)
+
+
+def _copy_definition(definition):
+    copy = AttributeDef(definition.name, definition.short, definition.kind, definition.default,
+                        [_copy_definition(child) for child in definition.children], definition.array,
+                        definition.keyable, list(definition.fields), definition.minimum, definition.maximum)
+    copy.dynamic = True
+    return copy
+
+
+class MFnDagNode(MFnDependencyNode):
+    kNextPos = 255
+
+    def getPath(self):
+        if self._path is not None:
+            return MDagPath(self._path)
+        if self._node is WORLD:
+            return MDagPath()
+        return MDagPath._from_nodes(SCENE.paths(self._node)[0])
+
+    dagPath = getPath
+
+    def fullPathName(self):
+        return self.getPath().fullPathName()
+
+    def partialPathName(self):
+        return self.getPath().partialPathName()
+
+    def parentCount(self):
+        return max(len(self._node.parents), 1) if self._node is not WORLD else 0
+
+    def parent(self, index=0):
+        if not self._node.parents:
+            if index == 0:
+                return MObject._wrap(WORLD)
+            raise RuntimeError('(kInvalidParameter): Index out of range')
+        return MObject._wrap(self._node.parents[index])
+
+    def childCount(self):
+        return len(self._node.children)
+
+    def child(self, index):
+        return MObject._wrap(self._node.children[index])
+
+    def addChild(self, child, index=255, keepExistingParents=False):
+        SCENE.reparent(_node_of(child), self._node, keepExistingParents)
+
+    def removeChild(self, child):
+        node = _node_of(child)
+        if self._node in node.parents:
+            node.parents.remove(self._node)
+            self._node.children.remove(node)
+            SCENE.revision += 1
+
+    def isChildOf(self, other):
+        return _node_of(other) in self._node.parents
+
+    def isParentOf(self, other):
+        return self._node in _node_of(other).parents
+
+    def isInstanced(self, indirect=True):
+        return len(SCENE.paths(self._node)) > 1
+
+    def instanceCount(self, indirect=True):
+        return len(SCENE.paths(self._node))
+
+    def transformationMatrix(self):
+        return MMatrix(self._node.local_matrix())
+
+    @property
+    def boundingBox(self):
+        return _bounding_box(self._node, _scene.identity())
+
+    def create(self, type_name, name=None, parent=None):
+        parent_node = _node_of(parent) if parent is not None and not parent.isNull() else None
+        node = _create_dag_node(type_name, parent_node)
+        if name:
+            node.name = SCENE.unique_name(name, node, parent_node)
+        self._node = node
+        return MObject._wrap(node)
+
+
+def _bounding_box(node, matrix):
+    box = MBoundingBox()
+    points = node.data.get('points') or node.data.get('curve', {}).get('cvs') or \
+        node.data.get('surface', {}).get('cvs')
+    if node.type_name == 'locator':
+        points = [(-1, -1, -1), (1, 1, 1)]
+    if points:
+        rows = matrix
+        for point in points:
+            box.expand(_scene.transform_point(rows, list(point[:3]) + [1.0]))
+    for child in node.children:
+        child_matrix = _scene.mat_mult(child.local_matrix(), matrix)
+        box.expand(_bounding_box(child, child_matrix))
+    return box
+
+
+def _create_dag_node(type_name, parent=None, shape_name=None):
+    """ Create a DAG node like MDagModifier.createNode does, shapes without a parent get a transform """
+    definition = _scene.NODE_TYPES.get(type_name)
+    if definition is None:
+        raise RuntimeError('(kInvalidParameter): Unknown node type {}'.format(type_name))
+    if definition.get('shape') and parent is None:
+        transform = SCENE.create_node('transform', type_name + '1')
+        SCENE.create_node(type_name, shape_name or _shape_name(transform.name, type_name), transform)
+        return transform
+    if definition.get('shape'):
+        return SCENE.create_node(type_name, shape_name or _shape_name(parent.name, type_name), parent)
+    return SCENE.create_node(type_name, None, parent)
+
+
+def _shape_name(transform_name, type_name):
+    base = transform_name.rstrip('0123456789')
+    digits = transform_name[len(base):]
+    return base + 'Shape' + digits
+
+
+class MFnTransform(MFnDagNode):
+    def _world(self):
+        return self.getPath()
+
+    def translation(self, space=MSpace.kTransform):
+        if _world_space(space):
+            matrix = self.getPath().inclusiveMatrix().rows()
+            return MVector(matrix[3][0], matrix[3][1], matrix[3][2])
+        return MVector(self._node.vector_value('translate'))
+
+    def setTranslation(self, vector, space=MSpace.kTransform):
+        vector = MVector(vector)
+        if _world_space(space):
+            parent = self.getPath().exclusiveMatrixInverse()
+            point = MPoint(vector) * parent
+            vector = MVector(point.x, point.y, point.z)
+        self._node.set_vector_value('translate', list(vector))
+        return self
+
+    def _rotation_matrix(self, space):
+        if _world_space(space):
+            _, rotation, _ = _scene.decompose(self.getPath().inclusiveMatrix().rows())
+            return rotation
+        return _scene.euler_matrix(self._node.vector_value('rotate'), self._node.get_value((('rotateOrder', None),)))
+
+    def rotation(self, space=MSpace.kTransform, asQuaternion=False):
+        rotation = self._rotation_matrix(space)
+        if asQuaternion:
+            return MQuaternion(*_scene.matrix_to_quaternion(rotation))
+        return MEulerRotation(_scene.matrix_to_euler(rotation))
+
+    def setRotation(self, rotation, space=MSpace.kTransform):
+        if isinstance(rotation, MEulerRotation):
+            matrix = rotation.asMatrix().rows()
+        else:
+            matrix = MQuaternion(*rotation).asMatrix().rows()
+        if _world_space(space):
+            _, parent_rotation, _ = _scene.decompose(self.getPath().exclusiveMatrix().rows())
+            matrix = _scene.mat_mult(matrix, _scene.mat_mult(_scene.identity(), _scene.mat_inverse(parent_rotation)))
+            if self._node.type_name == 'joint':
+                orient = _scene.euler_matrix(self._node.vector_value('jointOrient'))
+                matrix = _scene.mat_mult(matrix, _scene.mat_inverse(orient))
+        self._node.set_vector_value('rotate', _scene.matrix_to_euler(matrix))
+        return self
+
+    def scale(self):
+        return list(self._node.vector_value('scale'))
+
+    def setScale(self, scale):
+        self._node.set_vector_value('scale', [float(value) for value in scale])
+        return self
+
+    def transformation(self):
+        return MTransformationMatrix(MMatrix(self._node.local_matrix()))
+
+    def setTransformation(self, transformation):
+        matrix = transformation.asMatrix().rows()
+        translation, rotation, scale = _scene.decompose(matrix)
+        if self._node.type_name == 'joint':
+            orient = _scene.euler_matrix(self._node.vector_value('jointOrient'))
+            rotation = _scene.mat_mult(rotation, _scene.mat_inverse(orient))
+        self._node.set_vector_value('translate', translation)
+        self._node.set_vector_value('rotate', _scene.matrix_to_euler(rotation))
+        self._node.set_vector_value('scale', scale)
+        return self
+
+    def rotatePivot(self, space=MSpace.kTransform):
+        pivot = MPoint(self._node.vector_value('rotatePivot'))
+        if _world_space(space):
+            return pivot * self.getPath().inclusiveMatrix()
+        return pivot
+
+    def rotateOrientation(self, space=MSpace.kTransform):
+        return MQuaternion()
+
+    def rotationOrder(self):
+        return self._node.get_value((('rotateOrder', None),))
+
+
+class MFnNurbsCurve(MFnDagNode):
+    kInvalid = 0
+    kOpen = 1
+    kClosed = 2
+    kPeriodic = 3
+
+    def setObject(self, item):
+        super(MFnNurbsCurve, self).setObject(item)
+        if self._node.type_name != 'nurbsCurve':
+            shapes = [child for child in self._node.children if child.type_name == 'nurbsCurve']
+            if not shapes:
+                raise RuntimeError('(kInvalidParameter): Object is incompatible with this method')
+            if self._path is not None:
+                self._path = MDagPath(self._path).push(MObject._wrap(shapes[0]))
+            self._node = shapes[0]
+        return self
+
+    def create(self, cvs, knots, degree, form, is2D, rational, parent=None):
+        curve = {'cvs': [tuple(MPoint(cv))[:3] for cv in cvs], 'knots': [float(k) for k in knots], 'degree': degree,
+                 'form': form}
+        if hasattr(parent, '_geometry'):
+            parent._geometry = ('curve', curve)
+            return parent
+        parent_node = _node_of(parent) if parent is not None and not parent.isNull() else None
+        if parent_node is None:
+            transform = SCENE.create_node('transform', 'curve1')
+            shape = SCENE.create_node('nurbsCurve', _shape_name(transform.name, 'nurbsCurve'), transform)
+            result = transform
+        else:
+            shape = SCENE.create_node('nurbsCurve', 'curveShape1', parent_node)
+            result = shape
+        shape.data['curve'] = curve
+        self._node = shape
+        return MObject._wrap(result)
+
+    def _curve(self):
+        return self._node.data.setdefault('curve', {'cvs': [], 'knots': [], 'degree': 1, 'form': 1})
+
+    def _matrix(self):
+        if self._path is not None:
+            return MDagPath(self._path).inclusiveMatrix()
+        return self.getPath().inclusiveMatrix()
+
+    def cvPositions(self, space=MSpace.kObject):
+        points = MPointArray([MPoint(cv) for cv in self._curve()['cvs']])
+        if _world_space(space):
+            matrix = self._matrix()
+            return MPointArray([point * matrix for point in points])
+        return points
+
+    def setCVPositions(self, points, space=MSpace.kObject):
+        if _world_space(space):
+            inverse = self._matrix().inverse()
+            points = [MPoint(point) * inverse for point in points]
+        self._curve()['cvs'] = [tuple(MPoint(point))[:3] for point in points]
+
+    def cvPosition(self, index, space=MSpace.kObject):
+        return self.cvPositions(space)[index]
+
+    def setCVPosition(self, index, point, space=MSpace.kObject):
+        points = self.cvPositions(space)
+        points[index] = MPoint(point)
+        self.setCVPositions(points, space)
+
+    @property
+    def numCVs(self):
+        return len(self._curve()['cvs'])
+
+    @property
+    def degree(self):
+        return self._curve()['degree']
+
+    @property
+    def form(self):
+        return self._curve()['form']
+
+    @property
+    def numSpans(self):
+        return max(len(self._curve()['cvs']) - self.degree, 0)
+
+    def knots(self):
+        return MDoubleArray(self._curve()['knots'])
+
+    def updateCurve(self):
+        return self
+
+
+class MFnNurbsSurface(MFnDagNode):
+    kInvalid = 0
+    kOpen = 1
+    kClosed = 2
+    kPeriodic = 3
+
+    def create(self, cvs, u_knots, v_knots, u_degree, v_degree, u_form, v_form, rational, parent=None):
+        surface = {'cvs': [tuple(MPoint(cv))[:3] for cv in cvs], 'knots': (list(u_knots), list(v_knots)),
+                   'degree': (u_degree, v_degree), 'form': (u_form, v_form)}
+        if hasattr(parent, '_geometry'):
+            parent._geometry = ('surface', surface)
+            return parent
+        parent_node = _node_of(parent) if parent is not None and not parent.isNull() else None
+        if parent_node is None:
+            transform = SCENE.create_node('transform', 'surface1')
+            shape = SCENE.create_node('nurbsSurface', _shape_name(transform.name, 'nurbsSurface'), transform)
+            result = transform
+        else:
+            shape = SCENE.create_node('nurbsSurface', 'surfaceShape1', parent_node)
+            result = shape
+        shape.data['surface'] = surface
+        self._node = shape
+        return MObject._wrap(result)
+
+    def setObject(self, item):
+        super(MFnNurbsSurface, self).setObject(item)
+        if self._node.type_name != 'nurbsSurface':
+            shapes = [child for child in self._node.children if child.type_name == 'nurbsSurface']
+            if not shapes:
+                raise RuntimeError('(kInvalidParameter): Object is incompatible with this method')
+            if self._path is not None:
+                self._path = MDagPath(self._path).push(MObject._wrap(shapes[0]))
+            self._node = shapes[0]
+        return self
+
+    def _surface(self):
+        return self._node.data.setdefault('surface', {'cvs': [], 'knots': ([], []), 'degree': (1, 1),
+                                                      'form': (1, 1)})
+
+    def _matrix(self):
+        return (MDagPath(self._path) if self._path is not None else self.getPath()).inclusiveMatrix()
+
+    def cvPositions(self, space=MSpace.kObject):
+        points = MPointArray([MPoint(cv) for cv in self._surface()['cvs']])
+        if _world_space(space):
+            matrix = self._matrix()
+            return MPointArray([point * matrix for point in points])
+        return points
+
+    def setCVPositions(self, points, space=MSpace.kObject):
+        if _world_space(space):
+            inverse = self._matrix().inverse()
+            points = [MPoint(point) * inverse for point in points]
+        self._surface()['cvs'] = [tuple(MPoint(point))[:3] for point in points]
+
+    def knotsInU(self):
+        return MDoubleArray(self._surface()['knots'][0])
+
+    def knotsInV(self):
+        return MDoubleArray(self._surface()['knots'][1])
+
+    @property
+    def degreeInU(self):
+        return self._surface()['degree'][0]
+
+    @property
+    def degreeInV(self):
+        return self._surface()['degree'][1]
+
+    @property
+    def formInU(self):
+        return self._surface()['form'][0]
+
+    @property
+    def formInV(self):
+        return self._surface()['form'][1]
+
+    def updateSurface(self):
+        return self
+
+
+class MFnSingleIndexedComponent(object):
+    """ Only keeps track of the element count, the stand-in functions treat every component as complete """
+    def __init__(self, item=None):
+        self._count = 0
+
+    def create(self, type_id):
+        return MObject()
+
+    def setCompleteData(self, count):
+        self._count = count
+        return self
+
+    @property
+    def elementCount(self):
+        return self._count
+
+
+class MFnMesh(MFnDagNode):
+    def setObject(self, item):
+        super(MFnMesh, self).setObject(item)
+        if self._node.type_name != 'mesh':
+            shapes = [child for child in self._node.children if child.type_name == 'mesh']
+            if not shapes:
+                raise RuntimeError('(kInvalidParameter): Object is incompatible with this method')
+            if self._path is not None:
+                self._path = MDagPath(self._path).push(MObject._wrap(shapes[0]))
+            self._node = shapes[0]
+        return self
+
+    def _matrix(self):
+        return (MDagPath(self._path) if self._path is not None else self.getPath()).inclusiveMatrix()
+
+    @property
+    def numVertices(self):
+        return len(self._node.data.get('points', []))
+
+    @property
+    def numPolygons(self):
+        return len(self._node.data.get('faces', []))
+
+    def getVertices(self):
+        faces = self._node.data.get('faces', [])
+        return MIntArray([len(face) for face in faces]), MIntArray([vertex for face in faces for vertex in face])
+
+    def getPoints(self, space=MSpace.kObject):
+        points = MPointArray([MPoint(point) for point in self._node.data.get('points', [])])
+        if _world_space(space):
+            matrix = self._matrix()
+            return MPointArray([point * matrix for point in points])
+        return points
+
+    def setPoints(self, points, space=MSpace.kObject):
+        if _world_space(space):
+            inverse = self._matrix().inverse()
+            points = [MPoint(point) * inverse for point in points]
+        self._node.data['points'] = [tuple(MPoint(point))[:3] for point in points]
+
+    def getPoint(self, index, space=MSpace.kObject):
+        return self.getPoints(space)[index]
+
+    def getClosestPoint(self, point, space=MSpace.kObject):
+        """ The stand-in returns the closest vertex instead of the closest point on the surface """
+        points = self.getPoints(space)
+        if not points:
+            return MPoint(), -1
+        closest = min(points, key=lambda candidate: candidate.distanceTo(point))
+        return closest, 0
+
+    def create(self, points, counts, connects, parent=None):
+        parent_node = _node_of(parent) if parent is not None and not parent.isNull() else None
+        if parent_node is None:
+            transform = SCENE.create_node('transform', 'polySurface1')
+            shape = SCENE.create_node('mesh', _shape_name(transform.name, 'mesh'), transform)
+            result = transform
+        else:
+            shape = SCENE.create_node('mesh', 'polySurfaceShape1', parent_node)
+            result = shape
+        shape.data['points'] = [tuple(MPoint(point))[:3] for point in points]
+        faces = []
+        index = 0
+        for count in counts:
+            faces.append(list(connects[index:index + count]))
+            index += count
+        shape.data['faces'] = faces
+        self._node = shape
+        return MObject._wrap(result)
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+# Modifiers
+# ---------------------------------------------------------------------------------------------------------------------
+def _restore(node):
+    """ Redo of a createNode, brings back the node and the shape it was created with after an undo deleted them """
+    parent = node.parents[0] if node.parents else None
+    shapes = list(node.children)
+
+    def do():
+        if node.alive:
+            return
+        SCENE.restore_node(node, parent)
+        for shape in shapes:
+            SCENE.restore_node(shape, node)
+    return do
+
+
+class MDGModifier(object):
+    def __init__(self):
+        self._pending = []
+        self._done = []
+
+    def _queue(self, do, undo):
+        self._pending.append((do, undo))
+        return self
+
+    def createNode(self, type_name):
+        if _scene.NODE_TYPES.get(type_name, {}).get('dag'):
+            raise RuntimeError('(kInvalidParameter): Use MDagModifier for DAG nodes')
+        node = SCENE.create_node(type_name)
+        self._done.append((_restore(node), lambda: SCENE.delete_node(node) if node.alive else None))
+        return MObject._wrap(node)
+
+    def renameNode(self, m_obj, name):
+        node = _node_of(m_obj)
+        state = {}
+
+        def do():
+            state['old'] = node.name
+            node.name = SCENE.unique_name(name, node, node.parents[0] if node.parents else None)
+
+        def undo():
+            node.name = state['old']
+        return self._queue(do, undo)
+
+    def deleteNode(self, m_obj):
+        node = _node_of(m_obj)
+        return self._queue(lambda: SCENE.delete_node(node) if node.alive else None, lambda: None)
+
+    def connect(self, source, destination):
+        source_key = source._key()
+        destination_key = destination._key()
+        return self._queue(lambda: SCENE.connect(source_key, destination_key),
+                           lambda: SCENE.disconnect(source_key, destination_key))
+
+    def disconnect(self, source, destination):
+        source_key = source._key()
+        destination_key = destination._key()
+        return self._queue(lambda: SCENE.disconnect(source_key, destination_key),
+                           lambda: SCENE.connect(source_key, destination_key))
+
+    def addAttribute(self, m_obj, attribute):
+        node = _node_of(m_obj)
+        definition = attribute._attribute
+
+        def undo():
+            copy = node.attribute_map.get(definition.name)
+            if copy is not None:
+                node.remove_attribute(copy)
+        return self._queue(lambda: _add_attribute(node, definition), undo)
+
+    def removeAttribute(self, m_obj, attribute):
+        node = _node_of(m_obj)
+        definition = attribute._attribute
+        return self._queue(lambda: node.remove_attribute(node.attribute_map[definition.name]), lambda: None)
+
+    def _set_value(self, plug, value):
+        plug = MPlug(plug)
+        state = {}
+
+        def do():
+            state['old'] = plug._get()
+            plug._set(value)
+        return self._queue(do, lambda: plug._set(state['old']))
+
+    def newPlugValueDouble(self, plug, value):
+        return self._set_value(plug, float(value))
+
+    newPlugValueFloat = newPlugValueDouble
+
+    def newPlugValueInt(self, plug, value):
+        return self._set_value(plug, int(value))
+
+    newPlugValueShort = newPlugValueInt
+
+    def newPlugValueBool(self, plug, value):
+        return self._set_value(plug, bool(value))
+
+    def newPlugValueString(self, plug, value):
+        return self._set_value(plug, str(value))
+
+    def newPlugValueMAngle(self, plug, angle):
+        return self._set_value(plug, angle.asRadians())
+
+    def newPlugValueMDistance(self, plug, distance):
+        return self._set_value(plug, distance.asCentimeters())
+
+    def newPlugValue(self, plug, data):
+        if hasattr(data, '_matrix'):
+            return self._set_value(plug, data._matrix.rows())
+        if hasattr(data, '_geometry'):
+            node = _node_of(plug.node())
+            key, geometry = data._geometry
+            state = {}
+
+            def do():
+                state['old'] = node.data.get(key)
+                node.data[key] = copy.deepcopy(geometry)
+
+            def undo():
+                if state['old'] is None:
+                    node.data.pop(key, None)
+                else:
+                    node.data[key] = state['old']
+            return self._queue(do, undo)
+        return self
+
+    def commandToExecute(self, command):
+        from memory_maya import mel
+        return self._queue(lambda: mel.eval(command), lambda: None)
+
+    def pythonCommandToExecute(self, command):
+        return self._queue(lambda: exec_command(command), lambda: None)
+
+    def doIt(self):
+        pending, self._pending = self._pending, []
+        for do, undo in pending:
+            do()
+            self._done.append((do, undo))
+        SCENE.emit('doIt', None, self)
+        return self
+
+    def undoIt(self):
+        for do, undo in reversed(self._done):
+            undo()
+        self._pending = list(self._done) + self._pending
+        self._done = []
+        return self
+
+
+def exec_command(command):
+    exec(command, {})
+
+
+class MDagModifier(MDGModifier):
+    def createNode(self, type_name, parent=None):
+        parent_node = _node_of(parent) if parent is not None and not parent.isNull() and \
+            parent._node is not WORLD else None
+        node = _create_dag_node(type_name, parent_node) if _scene.NODE_TYPES.get(type_name, {}).get('dag') \
+            else SCENE.create_node(type_name)
+        self._done.append((_restore(node), lambda: SCENE.delete_node(node) if node.alive else None))
+        return MObject._wrap(node)
+
+    def reparentNode(self, m_obj, new_parent=None):
+        node = _node_of(m_obj)
+        parent = _node_of(new_parent) if new_parent is not None and not new_parent.isNull() and \
+            new_parent._node is not WORLD else None
+        state = {}
+
+        def do():
+            state['old'] = list(node.parents)
+            SCENE.reparent(node, parent)
+
+        def undo():
+            SCENE.reparent(node, state['old'][0] if state['old'] else None)
+        return self._queue(do, undo)
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+# Selection and iterators
+# ---------------------------------------------------------------------------------------------------------------------
+class MSelectionList(object):
+    kMergeNormal = 0
+    kXORWithList = 1
+    kRemoveFromList = 2
+
+    def __init__(self, other=None):
+        self._items = list(other._items) if isinstance(other, MSelectionList) else []
+
+    def _item(self, item):
+        if isinstance(item, MDagPath):
+            return ('path', MDagPath(item))
+        if isinstance(item, MObject):
+            if item.isNull():
+                raise RuntimeError('(kInvalidParameter): Object is null')
+            return ('object', MObject(item))
+        if isinstance(item, MPlug):
+            return ('plug', MPlug(item))
+        raise RuntimeError('(kInvalidParameter): Unsupported item')
+
+    def add(self, item, mergeWithExisting=True):
+        if isinstance(item, MUuid):
+            item = item.asString()
+        if isinstance(item, str) or type(item).__name__ == 'unicode':
+            name = str(item)
+            attribute = None
+            if '.' in name:
+                name, attribute = name.split('.', 1)
+            nodes = SCENE.find(name)
+            if not nodes:
+                raise RuntimeError('(kInvalidParameter): Object does not exist: {}'.format(item))
+            if len(nodes) > 1 and '*' not in name:
+                raise RuntimeError('(kInvalidParameter): More than one object matches name: {}'.format(item))
+            for node in nodes:
+                if attribute:
+                    new = ('plug', _find_plug(node, attribute))
+                elif node.is_dag:
+                    paths = SCENE.paths(node)
+                    if '|' in name:
+                        parts = [part for part in name.split('|') if part]
+                        paths = [path for path in paths if [n.name for n in path][-len(parts):] == parts]
+                    new = ('path', MDagPath._from_nodes(paths[0]))
+                else:
+                    new = ('object', MObject._wrap(node))
+                if not (mergeWithExisting and self._contains(new)):
+                    self._items.append(new)
+            return self
+        new = self._item(item)
+        if not (mergeWithExisting and self._contains(new)):
+            self._items.append(new)
+        return self
+
+    def _contains(self, new):
+        for kind, value in self._items:
+            if kind == new[0] and value == new[1]:
+                return True
+        return False
+
+    def length(self):
+        return len(self._items)
+
+    def isEmpty(self):
+        return not self._items
+
+    def clear(self):
+        self._items = []
+        return self
+
+    def remove(self, index):
+        del self._items[index]
+        return self
+
+    def _node_at(self, index):
+        kind, value = self._items[index]
+        if kind == 'path':
+            return value.node()
+        if kind == 'plug':
+            return value.node()
+        return MObject(value)
+
+    def getDependNode(self, index):
+        if index < 0 or index >= len(self._items):
+            raise IndexError('(kInvalidParameter): Index not in valid range')
+        node = self._node_at(index)
+        if node.isNull():
+            raise RuntimeError('(kInvalidParameter): Object does not exist')
+        return node
+
+    def getDagPath(self, index):
+        kind, value = self._items[index]
+        if kind == 'path':
+            return MDagPath(value)
+        return MFnDagNode(self._node_at(index)).getPath()
+
+    def getPlug(self, index):
+        kind, value = self._items[index]
+        if kind != 'plug':
+            raise RuntimeError('(kInvalidParameter): Item is not a plug')
+        return MPlug(value)
+
+    def hasItem(self, item):
+        try:
+            return self._contains(self._item(item))
+        except RuntimeError:
+            return False
+
+    def merge(self, other, strategy=0):
+        for item in other._items:
+            if not self._contains(item):
+                self._items.append(item)
+        return self
+
+    def getSelectionStrings(self, index=None):
+        names = []
+        for i, (kind, value) in enumerate(self._items):
+            if index is not None and i != index:
+                continue
+            if kind == 'path':
+                names.append(value.partialPathName())
+            elif kind == 'plug':
+                names.append(value.name())
+            else:
+                names.append(value._node.name)
+        return names
+
+
+class MItSelectionList(object):
+    def __init__(self, selection, filter=MFn.kInvalid):
+        self._list = selection
+        self._filter = filter
+        self._index = 0
+        self._skip()
+
+    def _skip(self):
+        while self._filter and self._index < self._list.length() and \
+                not self._list.getDependNode(self._index).hasFn(self._filter):
+            self._index += 1
+
+    def isDone(self):
+        return self._index >= self._list.length()
+
+    def next(self):
+        self._index += 1
+        self._skip()
+        return self
+
+    def reset(self):
+        self._index = 0
+        self._skip()
+        return self
+
+    def getDependNode(self):
+        return self._list.getDependNode(self._index)
+
+    def getDagPath(self):
+        return self._list.getDagPath(self._index)
+
+    def getStrings(self):
+        return self._list.getSelectionStrings(self._index)
+
+
+class MItDag(object):
+    kDepthFirst = 1
+    kBreadthFirst = 2
+
+    def __init__(self, traversalType=1, filterType=MFn.kInvalid):
+        self._traversal = traversalType
+        self._filter = filterType
+        self.reset()
+
+    def reset(self, root=None, traversalType=None, filterType=None):
+        if traversalType is not None:
+            self._traversal = traversalType
+        if filterType is not None:
+            self._filter = filterType
+        if root is None or (isinstance(root, MObject) and root._node is WORLD):
+            start = []
+        elif isinstance(root, MDagPath):
+            start = list(root._nodes)
+        else:
+            start = SCENE.paths(_node_of(root))[0]
+        self._items = []
+        self._pruned = set()
+        self._collect(start)
+        self._index = 0
+        self._skip()
+        return self
+
+    def _collect(self, start):
+        queue = [start]
+        while queue:
+            path = queue.pop(0) if self._traversal == MItDag.kBreadthFirst else queue.pop()
+            self._items.append(path)
+            node = path[-1] if path else WORLD
+            children = [path + [child] for child in node.children if child.alive]
+            if self._traversal == MItDag.kBreadthFirst:
+                queue.extend(children)
+            else:
+                queue.extend(reversed(children))
+
+    def _matches(self, path):
+        if not self._filter:
+            return True
+        node = path[-1] if path else WORLD
+        return node.has_fn(self._filter)
+
+    def _skip(self):
+        while self._index < len(self._items) and (not self._matches(self._items[self._index]) or
+                                                  self._is_pruned(self._items[self._index])):
+            self._index += 1
+
+    def _is_pruned(self, path):
+        for length in range(1, len(path)):
+            if tuple(id(node) for node in path[:length]) in self._pruned:
+                return True
+        return False
+
+    def isDone(self):
+        return self._index >= len(self._items)
+
+    def next(self):
+        self._index += 1
+        self._skip()
+        return self
+
+    def prune(self):
+        path = self._items[self._index]
+        self._pruned.add(tuple(id(node) for node in path))
+        return self
+
+    def currentItem(self):
+        path = self._items[self._index]
+        return MObject._wrap(path[-1] if path else WORLD)
+
+    def getPath(self):
+        return MDagPath._from_nodes(self._items[self._index])
+
+    def fullPathName(self):
+        return self.getPath().fullPathName()
+
+    def partialPathName(self):
+        return self.getPath().partialPathName()
+
+    def depth(self):
+        return len(self._items[self._index])
+
+
+class MItDependencyGraph(object):
+    kDownstream = 0
+    kUpstream = 1
+    kDepthFirst = 0
+    kBreadthFirst = 1
+    kNodeLevel = 0
+    kPlugLevel = 1
+
+    def __init__(self, root, filter=MFn.kInvalid, direction=0, traversal=0, level=0):
+        if isinstance(root, MPlug):
+            root = root.node()
+        self._root = _node_of(root)
+        self._filter = filter
+        self._direction = direction
+        self._traversal = traversal
+        self._level = level
+        self.reset()
+
+    def reset(self):
+        self._items = []
+        self._depths = {}
+        visited = set()
+        queue = [(self._root, 0)]
+        while queue:
+            node, depth = queue.pop(0) if self._traversal == MItDependencyGraph.kBreadthFirst else queue.pop()
+            if id(node) in visited:
+                continue
+            visited.add(id(node))
+            self._items.append(node)
+            self._depths[id(node)] = depth
+            neighbours = SCENE.node_connections(node, upstream=self._direction == MItDependencyGraph.kUpstream,
+                                                downstream=self._direction == MItDependencyGraph.kDownstream)
+            items = [(neighbour, depth + 1) for neighbour in neighbours if id(neighbour) not in visited]
+            if self._traversal == MItDependencyGraph.kBreadthFirst:
+                queue.extend(items)
+            else:
+                queue.extend(reversed(items))
+        self._index = 0
+        self._pruned = set()
+        self._skip()
+        return self
+
+    def _skip(self):
+        while self._index < len(self._items) and self._filter and self._filter != MFn.kBase and \
+                not self._items[self._index].has_fn(self._filter):
+            self._index += 1
+
+    def isDone(self):
+        return self._index >= len(self._items)
+
+    def next(self):
+        self._index += 1
+        self._skip()
+        return self
+
+    def currentNode(self):
+        return MObject._wrap(self._items[self._index])
+
+    def currentDepth(self):
+        return self._depths[id(self._items[self._index])]
+
+    def prune(self):
+        return self
+
+    def getNodePath(self):
+        return MObjectArray([MObject._wrap(self._root)] * self.currentDepth() +
+                            [MObject._wrap(self._items[self._index])])
+
+
+class MItDependencyNodes(object):
+    def __init__(self, filter=MFn.kInvalid):
+        self._filter = filter
+        self.reset()
+
+    def reset(self, filter=None):
+        if filter is not None:
+            self._filter = filter
+        self._items = [node for node in SCENE.live_nodes() if not self._filter or node.has_fn(self._filter)]
+        self._index = 0
+        return self
+
+    def isDone(self):
+        return self._index >= len(self._items)
+
+    def next(self):
+        self._index += 1
+        return self
+
+    def thisNode(self):
+        return MObject._wrap(self._items[self._index])
+
+
+class MItGeometry(object):
+    def __init__(self, item):
+        fn = MFnNurbsCurve(item)
+        self._fn = fn
+        self._points = fn.cvPositions()
+        self._index = 0
+
+    def isDone(self):
+        return self._index >= len(self._points)
+
+    def next(self):
+        self._index += 1
+        return self
+
+    def position(self, space=MSpace.kObject):
+        return MPoint(self._points[self._index])
+
+    def setPosition(self, point, space=MSpace.kObject):
+        self._points[self._index] = MPoint(point)
+        self._fn.setCVPositions(self._points)
+
+    def index(self):
+        return self._index
+
+    def count(self):
+        return len(self._points)
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+# Global state and messages
+# ---------------------------------------------------------------------------------------------------------------------
+class MGlobal(object):
+    kReplaceList = 0
+    kAddToList = 2
+
+    @staticmethod
+    def getActiveSelectionList(orderedSelectionIfAvailable=False):
+        selection = MSelectionList()
+        for item in SCENE.selection:
+            if item.alive:
+                selection.add(MObject._wrap(item))
+        return selection
+
+    @staticmethod
+    def setActiveSelectionList(selection, listAdjustment=0):
+        nodes = [selection.getDependNode(index)._node for index in range(selection.length())]
+        if listAdjustment == MGlobal.kAddToList:
+            SCENE.selection.extend(nodes)
+        else:
+            SCENE.selection = nodes
+
+    @staticmethod
+    def getSelectionListByName(name):
+        return MSelectionList().add(name)
+
+    @staticmethod
+    def displayWarning(message):
+        print('# Warning: {}'.format(message))
+
+    @staticmethod
+    def displayInfo(message):
+        print(message)
+
+    @staticmethod
+    def displayError(message):
+        print('# Error: {}'.format(message))
+
+    @staticmethod
+    def executeCommand(command, displayEnabled=False, undoEnabled=False):
+        from memory_maya import mel
+        return mel.eval(command)
+
+    @staticmethod
+    def mayaState():
+        return 1
+
+
+class MMessage(object):
+    @staticmethod
+    def removeCallback(callback_id):
+        SCENE.remove_callback(callback_id)
+
+    @staticmethod
+    def removeCallbacks(callback_ids):
+        for callback_id in callback_ids:
+            SCENE.remove_callback(callback_id)
+
+
+class MDGMessage(MMessage):
+    @staticmethod
+    def addNodeAddedCallback(function, nodeType='dependNode', clientData=None):
+        node_filter = None if nodeType == 'dependNode' else nodeType
+        return SCENE.add_callback('nodeAdded', lambda node, data: function(MObject._wrap(node), data), node_filter,
+                                  clientData)
+
+    @staticmethod
+    def addNodeRemovedCallback(function, nodeType='dependNode', clientData=None):
+        node_filter = None if nodeType == 'dependNode' else nodeType
+        return SCENE.add_callback('nodeRemoved', lambda node, data: function(MObject._wrap(node), data),
+                                  node_filter, clientData)
+
+    @staticmethod
+    def addConnectionCallback(function, clientData=None):
+        def callback(source, destination, made, data):
+            function(MPlug._make(*source), MPlug._make(*destination), made, data)
+        return SCENE.add_callback('connection', callback, None, clientData)
+
+
+class MDagMessage(MMessage):
+    @staticmethod
+    def addParentAddedCallback(function, clientData=None):
+        def callback(child, parent, data):
+            child_path = MDagPath._from_nodes(SCENE.paths(child)[0])
+            parent_path = MDagPath._from_nodes(SCENE.paths(parent)[0]) if parent is not None else MDagPath()
+            function(child_path, parent_path, data)
+        return SCENE.add_callback('parentAdded', callback, None, clientData)
+
+    @staticmethod
+    def addParentRemovedCallback(function, clientData=None):
+        def callback(child, parent, data):
+            child_path = MDagPath._from_nodes(SCENE.paths(child)[0]) if child.alive else MDagPath()
+            parent_path = MDagPath._from_nodes(SCENE.paths(parent)[0]) if parent is not None else MDagPath()
+            function(child_path, parent_path, data)
+        return SCENE.add_callback('parentRemoved', callback, None, clientData)
+
+
+class MSceneMessage(MMessage):
+    kSceneUpdate = 0
+    kBeforeNew = 1
+    kAfterNew = 2
+    kBeforeImport = 3
+    kAfterImport = 4
+    kBeforeOpen = 5
+    kAfterOpen = 6
+
+    @staticmethod
+    def addCallback(message, function, clientData=None):
+        return SCENE.add_callback('scene{}'.format(message), lambda data: function(data), None, clientData)
+
+
+class MArgList(object):
+    def __init__(self, args=None):
+        self._args = list(args or [])
+
+    def length(self):
+        return len(self._args)
+
+    def asString(self, index):
+        return str(self._args[index])
+
+    def asDouble(self, index):
+        return float(self._args[index])
+
+    def asInt(self, index):
+        return int(self._args[index])
+
+    def asBool(self, index):
+        return bool(self._args[index])
+
+
+class MSyntax(object):
+    kString = 5
+    kDouble = 4
+    kLong = 3
+    kBoolean = 2
+    kNoArg = 1
+
+    def addFlag(self, *args):
+        return self
+
+    def addArg(self, *args):
+        return self
+
+
+class MArgParser(object):
+    def __init__(self, syntax, args):
+        self._args = args
+
+
+class MPxCommand(object):
+    def __init__(self):
+        pass
+
+    def isUndoable(self):
+        return False
+
+    def doIt(self, args):
+        pass
+
+    def redoIt(self):
+        pass
+
+    def undoIt(self):
+        pass
+
+    @staticmethod
+    def setResult(value):
+        MPxCommand._result = value
+
+    @staticmethod
+    def clearResult():
+        MPxCommand._result = None
+
+    _result = None
+
+
+class MFnPlugin(object):
+    def __init__(self, m_obj=None, vendor='', version='', apiVersion='Any'):
+        self._object = m_obj
+
+    def registerCommand(self, name, creator, syntax=None):
+        from memory_maya import cmds
+        cmds.register_command(name, creator)
+
+    def deregisterCommand(self, name):
+        from memory_maya import cmds
+        cmds.deregister_command(name)
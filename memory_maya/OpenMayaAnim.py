@@ -0,0 +1,84 @@
+""" Stand-in for maya.api.OpenMayaAnim, covering the skin cluster and joint function sets """
+from memory_maya import OpenMaya as om
+from memory_maya.scene import SCENE
+
+
+class MFnSkinCluster(om.MFnDependencyNode):
+    def influenceObjects(self):
+        paths = om.MDagPathArray()
+        for index in self._node.existing_indices((('matrix', None),)):
+            source = SCENE.source_of((self._node, (('matrix', index),)))
+            if source is not None:
+                paths.append(om.MDagPath._from_nodes(SCENE.paths(source[0])[0]))
+        return paths
+
+    def indexForInfluenceObject(self, path):
+        node = om._node_of(path)
+        for index in self._node.existing_indices((('matrix', None),)):
+            source = SCENE.source_of((self._node, (('matrix', index),)))
+            if source is not None and source[0] is node:
+                return index
+        raise RuntimeError('(kInvalidParameter): Influence object not found')
+
+    def getOutputGeometry(self):
+        objects = om.MObjectArray()
+        for destination in SCENE.destinations_of((self._node, (('outputGeometry', 0),))):
+            objects.append(om.MObject._wrap(destination[0]))
+        return objects
+
+    def getInputGeometry(self):
+        return self.getOutputGeometry()
+
+    def _influence_indices(self):
+        return [index for index in self._node.existing_indices((('matrix', None),))
+                if SCENE.source_of((self._node, (('matrix', index),))) is not None]
+
+    def getWeights(self, shape, components=None, influence=None):
+        """ Returns the flat weights of all vertices and the number of influences, like the real call with a
+        complete component object, or the weights of a single influence index list """
+        mesh = om.MFnMesh(shape)
+        indices = self._influence_indices()
+        weights = om.MDoubleArray()
+        for vertex in range(mesh.numVertices):
+            for index in indices:
+                weights.append(float(self._node.get_value((('weightList', vertex), ('weights', index)))))
+        if influence is not None:
+            column = indices.index(influence) if not isinstance(influence, list) else None
+            if column is not None:
+                return om.MDoubleArray(weights[column::len(indices)])
+        return weights, len(indices)
+
+    def setWeights(self, shape, components, influences, values, normalize=True, returnOldWeights=False):
+        indices = list(influences)
+        for offset, value in enumerate(values):
+            vertex, column = divmod(offset, len(indices))
+            self._node.set_value((('weightList', vertex), ('weights', indices[column])), float(value))
+
+
+class MFnIkJoint(om.MFnTransform):
+    def orientation(self):
+        return om.MEulerRotation(self._node.vector_value('jointOrient')).asQuaternion()
+
+    def setOrientation(self, rotation):
+        if isinstance(rotation, om.MQuaternion):
+            rotation = rotation.asEulerRotation()
+        self._node.set_vector_value('jointOrient', list(rotation))
+        return self
+
+    def create(self, parent=None):
+        node = SCENE.create_node('joint', 'joint1', om._node_of(parent) if parent is not None and
+                                 not parent.isNull() else None)
+        self._node = node
+        return om.MObject._wrap(node)
+
+
+class MAnimControl(object):
+    _time = 1.0
+
+    @staticmethod
+    def currentTime():
+        return om.MTime(MAnimControl._time) if hasattr(om, 'MTime') else MAnimControl._time
+
+    @staticmethod
+    def setCurrentTime(time):
+        MAnimControl._time = float(getattr(time, 'value', time))
@@ -0,0 +1,43 @@
+""" An in-memory stand-in for the parts of Maya that the rig builders use. It makes it possible to run a build outside
+of Maya, to count the nodes a build creates and to benchmark the Python side of a build without a Maya licence.
+
+Call install() before anything imports maya, after that 'import maya.cmds' and 'from maya.api import OpenMaya' resolve
+to the modules in this package. Nothing is installed when the real Maya modules can be imported. The modules of the
+builders go through backend.py, which uses this package as its memory backend without installing it.
+"""
+import sys
+import types
+
+
+def install(force=False):
+    """ Register the stand-in modules under the maya package names
+    :param force: Boolean, if true replaces the real Maya modules even when they are available
+    :return: Boolean, true if the stand-in was installed
+    """
+    if not force:
+        try:
+            import maya.cmds  # noqa: F401
+            return False
+        except ImportError:
+            pass
+    from memory_maya import OpenMaya, OpenMayaAnim, cmds, mel
+    maya = types.ModuleType('maya')
+    api = types.ModuleType('maya.api')
+    maya.cmds = cmds
+    maya.mel = mel
+    maya.api = api
+    maya.standalone = types.ModuleType('maya.standalone')
+    maya.standalone.initialize = lambda name='python': None
+    maya.standalone.uninitialize = lambda: None
+    api.OpenMaya = OpenMaya
+    api.OpenMayaAnim = OpenMayaAnim
+    sys.modules.update({'maya': maya, 'maya.cmds': cmds, 'maya.mel': mel, 'maya.api': api,
+                        'maya.api.OpenMaya': OpenMaya, 'maya.api.OpenMayaAnim': OpenMayaAnim,
+                        'maya.standalone': maya.standalone})
+    return True
+
+
+def reset():
+    """ Throw away the current scene and start with an empty one """
+    from memory_maya.scene import SCENE
+    SCENE.clear()
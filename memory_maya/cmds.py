@@ -0,0 +1,572 @@
+""" Stand-in for maya.cmds that works on the in-memory scene. Only the commands and flags used by the builders in this
+project are implemented, names are returned the way Maya returns them (shortest unique path for DAG nodes).
+"""
+import math
+from memory_maya import scene as _scene
+from memory_maya.scene import SCENE
+from memory_maya import OpenMaya as om
+
+_COMMANDS = {}
+_undo_chunks = []
+
+
+def _flag(kwargs, long_name, short_name=None, default=None):
+    if long_name in kwargs:
+        return kwargs[long_name]
+    if short_name is not None and short_name in kwargs:
+        return kwargs[short_name]
+    return default
+
+
+def _node(name):
+    nodes = SCENE.find(str(name))
+    if not nodes:
+        raise ValueError('No object matches name: {}'.format(name))
+    if len(nodes) > 1:
+        raise ValueError('More than one object matches name: {}'.format(name))
+    return nodes[0]
+
+
+def _name(node, long_name=False):
+    if node.is_dag:
+        path = om.MDagPath._from_nodes(SCENE.paths(node)[0])
+        return path.fullPathName() if long_name else path.partialPathName()
+    return node.name
+
+
+def _split_plug(plug_name):
+    node_name, attribute = str(plug_name).split('.', 1)
+    return _node(node_name), attribute
+
+
+def _plug(plug_name):
+    node, attribute = _split_plug(plug_name)
+    return om._find_plug(node, attribute)
+
+
+def _to_ui(plug, value):
+    kind = plug._definition().kind
+    if kind == 'angle':
+        return math.degrees(value)
+    return value
+
+
+def _from_ui(plug, value):
+    kind = plug._definition().kind
+    if kind == 'angle':
+        return math.radians(value)
+    if kind == 'bool':
+        return bool(value)
+    if kind in ('int', 'enum'):
+        return int(value)
+    return value
+
+
+def _names(values):
+    if values is None:
+        return []
+    if isinstance(values, (list, tuple)):
+        return [str(value) for value in values]
+    return [str(values)]
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+# Nodes
+# ---------------------------------------------------------------------------------------------------------------------
+def createNode(type_name, name=None, n=None, parent=None, p=None, skipSelect=False, ss=False, shared=False):
+    name = name or n
+    parent = parent or p
+    parent_node = _node(parent) if parent else None
+    node = om._create_dag_node(type_name, parent_node) if _scene.NODE_TYPES.get(type_name, {}).get('dag') \
+        else SCENE.create_node(type_name)
+    if name:
+        node.name = SCENE.unique_name(name, node, parent_node)
+    if not (skipSelect or ss):
+        SCENE.selection = [node]
+    if node.type_name != type_name:
+        return _name(node.children[0])
+    return _name(node)
+
+
+def delete(*names, **kwargs):
+    for name in _names(list(names) if len(names) != 1 else names[0]):
+        nodes = SCENE.find(name)
+        for node in nodes:
+            if node.alive:
+                SCENE.delete_node(node)
+
+
+def rename(old, new, **kwargs):
+    node = _node(old)
+    node.name = SCENE.unique_name(new, node, node.parents[0] if node.parents else None)
+    return _name(node)
+
+
+def objExists(name):
+    try:
+        if '.' in str(name):
+            _plug(name)
+            return True
+        return bool(SCENE.find(str(name)))
+    except (ValueError, RuntimeError):
+        return False
+
+
+def nodeType(name, **kwargs):
+    return _node(name).type_name
+
+
+def ls(*names, **kwargs):
+    selection = _flag(kwargs, 'selection', 'sl', False)
+    type_filter = _flag(kwargs, 'type', None)
+    long_name = _flag(kwargs, 'long', 'l', False)
+    uuid = _flag(kwargs, 'uuid', None, False)
+    if selection:
+        nodes = [node for node in SCENE.selection if node.alive]
+    elif names:
+        nodes = []
+        for name in _names(names[0] if len(names) == 1 else list(names)):
+            for node in SCENE.find(name):
+                if node not in nodes:
+                    nodes.append(node)
+    else:
+        nodes = SCENE.live_nodes()
+    if type_filter:
+        types = _names(type_filter)
+        nodes = [node for node in nodes if any(node.type_name == t or node.has_fn(_scene.TYPE_IDS.get(t, -1))
+                                               for t in types)]
+    if uuid:
+        return [node.uuid for node in nodes]
+    return [_name(node, long_name) for node in nodes]
+
+
+def select(*names, **kwargs):
+    if _flag(kwargs, 'clear', 'cl', False):
+        SCENE.selection = []
+        return
+    nodes = [_node(name) for name in _names(names[0] if len(names) == 1 else list(names))]
+    if _flag(kwargs, 'add', None, False):
+        SCENE.selection.extend(nodes)
+    else:
+        SCENE.selection = nodes
+
+
+def listRelatives(name, **kwargs):
+    node = _node(_names(name)[0])
+    full_path = _flag(kwargs, 'fullPath', 'f', False)
+    type_filter = _flag(kwargs, 'type', None)
+    if _flag(kwargs, 'parent', 'p', False) or _flag(kwargs, 'allParents', 'ap', False):
+        result = list(node.parents)
+    elif _flag(kwargs, 'allDescendents', 'ad', False):
+        result = []
+        stack = list(node.children)
+        while stack:
+            child = stack.pop()
+            result.append(child)
+            stack.extend(child.children)
+    else:
+        result = list(node.children)
+        if _flag(kwargs, 'shapes', 's', False):
+            result = [child for child in result if child.is_shape]
+    if type_filter:
+        result = [child for child in result if child.type_name in _names(type_filter)]
+    if not result:
+        return None
+    if full_path:
+        names = []
+        for child in result:
+            for path in SCENE.paths(child):
+                if node in path[:-1] or node in child.parents:
+                    if node in child.parents and path[-2] is not node:
+                        continue
+                    names.append(om.MDagPath._from_nodes(path).fullPathName())
+        return names
+    return [_name(child) for child in result]
+
+
+def parent(*args, **kwargs):
+    args = [str(arg) for arg in args]
+    world = _flag(kwargs, 'world', 'w', False)
+    relative = _flag(kwargs, 'relative', 'r', False)
+    add = _flag(kwargs, 'addObject', 'add', False)
+    if world:
+        children, new_parent = args, None
+    else:
+        children, new_parent = args[:-1], _node(args[-1])
+    result = []
+    for child_name in children:
+        node = _node(child_name)
+        if '|' in child_name and len(node.parents) > 1:
+            parent_name = [part for part in child_name.split('|') if part][-2]
+            old_parent = [p for p in node.parents if p.name == parent_name][0]
+        else:
+            old_parent = node.parents[0] if node.parents else None
+        world_matrix = node.world_matrix(node.parents.index(old_parent) if old_parent in node.parents else 0)
+        if add:
+            SCENE.reparent(node, new_parent, True)
+        elif len(node.parents) > 1:
+            node.parents.remove(old_parent)
+            old_parent.children.remove(node)
+            SCENE.reparent(node, new_parent, True)
+        else:
+            SCENE.reparent(node, new_parent)
+        if not relative and not node.is_shape and node.has_fn(_scene.TYPE_IDS['transform']):
+            _set_world_matrix(node, world_matrix)
+        result.append(_name(node))
+    return result
+
+
+def _set_world_matrix(node, world_matrix):
+    local = _scene.mat_mult(world_matrix, _scene.mat_inverse(node.parent_matrix()))
+    translation, rotation, scale = _scene.decompose(local)
+    if node.type_name == 'joint':
+        orient = _scene.euler_matrix(node.vector_value('jointOrient'))
+        rotation = _scene.mat_mult(rotation, _scene.mat_inverse(orient))
+    node.set_vector_value('translate', translation)
+    node.set_vector_value('rotate', _scene.matrix_to_euler(rotation))
+    node.set_vector_value('scale', scale)
+
+
+def instance(name, **kwargs):
+    node = _node(_names(name)[0])
+    if node.is_shape:
+        transform = SCENE.create_node('transform', node.parents[0].name if node.parents else 'transform1')
+        SCENE.reparent(node, transform, True)
+        return [_name(transform)]
+    copy = SCENE.create_node(node.type_name, node.name, node.parents[0] if node.parents else None)
+    copy.values = dict(node.values)
+    for child in node.children:
+        SCENE.reparent(child, copy, True)
+    return [_name(copy)]
+
+
+def hide(*names):
+    for name in _names(names[0] if len(names) == 1 else list(names)):
+        om._find_plug(_node(name), 'visibility')._set(False)
+
+
+def showHidden(*names):
+    for name in _names(names[0] if len(names) == 1 else list(names)):
+        om._find_plug(_node(name), 'visibility')._set(True)
+
+
+def warning(message):
+    print('# Warning: {}'.format(message))
+
+
+def error(message):
+    raise RuntimeError(message)
+
+
+def file(*args, **kwargs):
+    if _flag(kwargs, 'new', 'new', False):
+        SCENE.clear()
+        SCENE.emit('scene{}'.format(om.MSceneMessage.kAfterNew), None)
+    return ''
+
+
+_undo_queue = []
+_redo_queue = []
+_plugins = {}
+
+
+def undoInfo(**kwargs):
+    """ Only undoable plugin commands end up in the queue, a chunk becomes one entry """
+    if _flag(kwargs, 'openChunk', 'ock', False):
+        if not _undo_chunks:
+            _undo_queue.append([])
+        _undo_chunks.append(_flag(kwargs, 'chunkName', 'cn', ''))
+    elif _flag(kwargs, 'closeChunk', 'cck', False) and _undo_chunks:
+        _undo_chunks.pop()
+        if not _undo_chunks and _undo_queue and _undo_queue[-1] == []:
+            _undo_queue.pop()
+    elif _flag(kwargs, 'query', 'q', False):
+        return True
+    return None
+
+
+def undo(*args, **kwargs):
+    if not _undo_queue:
+        return None
+    entry = _undo_queue.pop()
+    for command in reversed(entry if isinstance(entry, list) else [entry]):
+        command.undoIt()
+    _redo_queue.append(entry)
+    return None
+
+
+def redo(*args, **kwargs):
+    if not _redo_queue:
+        return None
+    entry = _redo_queue.pop()
+    for command in entry if isinstance(entry, list) else [entry]:
+        command.redoIt()
+    _undo_queue.append(entry)
+    return None
+
+
+def _record_undo(instance):
+    if not instance.isUndoable():
+        return
+    del _redo_queue[:]
+    if _undo_chunks:
+        _undo_queue[-1].append(instance)
+    else:
+        _undo_queue.append(instance)
+
+
+def refresh(**kwargs):
+    pass
+
+
+def loadPlugin(path, **kwargs):
+    """ Python plugins are imported from their file and initialised """
+    if path in _plugins:
+        return [path]
+    import imp
+    import os
+    module = imp.load_source('_plugin_' + os.path.splitext(os.path.basename(path))[0], path)
+    module.initializePlugin(om.MObject())
+    _plugins[path] = module
+    return [path]
+
+
+def pluginInfo(name, **kwargs):
+    return name in _plugins
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+# Attributes
+# ---------------------------------------------------------------------------------------------------------------------
+def getAttr(plug_name, **kwargs):
+    plug = _plug(plug_name)
+    definition = plug._definition()
+    if _flag(kwargs, 'type', None, False):
+        return definition.kind
+    if definition.kind == 'matrix':
+        return list(om.MMatrix(plug._get()))
+    if definition.kind == 'compound':
+        return [tuple(_to_ui(plug.child(i), value) for i, value in enumerate(plug._get()))]
+    return _to_ui(plug, plug._get())
+
+
+def setAttr(plug_name, *values, **kwargs):
+    plug = _plug(plug_name)
+    keyable = _flag(kwargs, 'keyable', 'k', None)
+    lock = _flag(kwargs, 'lock', 'l', None)
+    if keyable is not None:
+        plug.isKeyable = keyable
+    if lock is not None:
+        plug.isLocked = lock
+    if not values:
+        return
+    definition = plug._definition()
+    attribute_type = _flag(kwargs, 'type', None)
+    if definition.kind == 'matrix' or attribute_type == 'matrix':
+        flat = list(values[0]) if len(values) == 1 else list(values)
+        plug._set([[float(value) for value in flat[i * 4:i * 4 + 4]] for i in range(4)])
+    elif definition.kind == 'compound':
+        flat = list(values[0]) if len(values) == 1 and isinstance(values[0], (list, tuple)) else list(values)
+        for index, value in enumerate(flat):
+            child = plug.child(index)
+            child._set(_from_ui(child, value))
+    elif attribute_type == 'string' or definition.kind == 'string':
+        plug._set(str(values[0]))
+    else:
+        plug._set(_from_ui(plug, values[0]))
+
+
+def connectAttr(source, destination, force=False, f=False, **kwargs):
+    source_plug = _plug(source)
+    destination_plug = _plug(destination)
+    existing = SCENE.source_of(destination_plug._key())
+    if existing is not None:
+        if not (force or f):
+            raise RuntimeError('{} is already connected'.format(destination))
+        SCENE.disconnect(existing, destination_plug._key())
+    SCENE.connect(source_plug._key(), destination_plug._key())
+
+
+def disconnectAttr(source, destination):
+    SCENE.disconnect(_plug(source)._key(), _plug(destination)._key())
+
+
+def listConnections(name, **kwargs):
+    source = _flag(kwargs, 'source', 's', True)
+    destination = _flag(kwargs, 'destination', 'd', True)
+    plugs = _flag(kwargs, 'plugs', 'p', False)
+    if '.' in str(name):
+        plug = _plug(name)
+        keys = [plug._key()]
+        node = plug._node
+    else:
+        node = _node(name)
+        keys = None
+    result = []
+    for dst, src in SCENE.connections.items():
+        dst_match = dst[0] is node and (keys is None or dst in [(k[0], _scene.Node.value_key(k[1])) for k in keys])
+        src_match = src[0] is node and (keys is None or src in [(k[0], _scene.Node.value_key(k[1])) for k in keys])
+        if source and dst_match:
+            result.append(om.MPlug._make(*src).name() if plugs else _name(src[0]))
+        if destination and src_match:
+            result.append(om.MPlug._make(*dst).name() if plugs else _name(dst[0]))
+    return result or None
+
+
+def addAttr(name, **kwargs):
+    node = _node(name)
+    long_name = _flag(kwargs, 'longName', 'ln')
+    short_name = _flag(kwargs, 'shortName', 'sn', long_name)
+    kinds = {'double': 'double', 'float': 'float', 'bool': 'bool', 'long': 'int', 'short': 'int', 'enum': 'enum',
+             'message': 'message', 'doubleAngle': 'angle', 'doubleLinear': 'distance', 'matrix': 'matrix'}
+    kind = kinds.get(_flag(kwargs, 'attributeType', 'at', None) or 'double', 'double')
+    if _flag(kwargs, 'dataType', 'dt', None) == 'string':
+        kind = 'string'
+    definition = _scene.AttributeDef(long_name, short_name, kind, _flag(kwargs, 'defaultValue', 'dv'),
+                                     keyable=_flag(kwargs, 'keyable', 'k', False),
+                                     minimum=_flag(kwargs, 'minValue', 'min'), maximum=_flag(kwargs, 'maxValue', 'max'))
+    om._add_attribute(node, definition)
+
+
+def attributeQuery(attribute, **kwargs):
+    node = _node(_flag(kwargs, 'node', 'n'))
+    if _flag(kwargs, 'exists', 'ex', False):
+        return attribute in node.attribute_map
+    return None
+
+
+def xform(name, **kwargs):
+    node = _node(name)
+    query = _flag(kwargs, 'query', 'q', False)
+    world = _flag(kwargs, 'worldSpace', 'ws', False)
+    fn = om.MFnTransform(om.MObject._wrap(node))
+    if query:
+        if _flag(kwargs, 'rotatePivot', 'rp', False):
+            point = fn.rotatePivot(om.MSpace.kWorld if world else om.MSpace.kTransform)
+            return [point.x, point.y, point.z]
+        if _flag(kwargs, 'translation', 't', False):
+            vector = fn.translation(om.MSpace.kWorld if world else om.MSpace.kTransform)
+            return [vector.x, vector.y, vector.z]
+        if _flag(kwargs, 'rotation', 'ro', False):
+            rotation = fn.rotation(om.MSpace.kWorld if world else om.MSpace.kTransform)
+            return [math.degrees(value) for value in rotation]
+        if _flag(kwargs, 'matrix', 'm', False):
+            matrix = node.world_matrix() if world else node.local_matrix()
+            return list(om.MMatrix(matrix))
+        return None
+    translation = _flag(kwargs, 'translation', 't')
+    if translation is not None:
+        fn.setTranslation(om.MVector(translation), om.MSpace.kWorld if world else om.MSpace.kTransform)
+    rotation = _flag(kwargs, 'rotation', 'ro')
+    if rotation is not None:
+        euler = om.MEulerRotation([math.radians(value) for value in rotation])
+        fn.setRotation(euler, om.MSpace.kWorld if world else om.MSpace.kTransform)
+    matrix = _flag(kwargs, 'matrix', 'm')
+    if matrix is not None:
+        rows = om.MMatrix(matrix).rows()
+        if world:
+            _set_world_matrix(node, rows)
+        else:
+            _set_world_matrix(node, _scene.mat_mult(rows, node.parent_matrix()))
+    return None
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+# Rigging
+# ---------------------------------------------------------------------------------------------------------------------
+def joint(*args, **kwargs):
+    parent_node = SCENE.selection[-1] if SCENE.selection and SCENE.selection[-1].type_name == 'joint' else None
+    node = SCENE.create_node('joint', _flag(kwargs, 'name', 'n') or 'joint1', parent_node)
+    position = _flag(kwargs, 'position', 'p')
+    if position is not None:
+        om.MFnTransform(om.MObject._wrap(node)).setTranslation(om.MVector(position), om.MSpace.kWorld)
+    SCENE.selection = [node]
+    return _name(node)
+
+
+def ikHandle(startJoint=None, endEffector=None, name=None, sj=None, ee=None, n=None, solver='ikRPsolver',
+             sol=None, **kwargs):
+    start = _node(startJoint or sj)
+    end = _node(endEffector or ee)
+    solver = sol or solver
+    effector = SCENE.create_node('ikEffector', 'effector1', end.parents[0] if end.parents else None)
+    handle = SCENE.create_node('ikHandle', name or n or 'ikHandle1')
+    world = end.world_matrix()
+    handle.set_vector_value('translate', [world[3][0], world[3][1], world[3][2]])
+    om._find_plug(handle, 'startJoint')
+    SCENE.connect((start, (('message', None),)), (handle, (('startJoint', None),)))
+    SCENE.connect((effector, (('handlePath', 0),)), (handle, (('endEffector', None),)))
+    solvers = SCENE.find(solver + '1') or [SCENE.create_node(solver, solver + '1')]
+    SCENE.connect((solvers[0], (('message', None),)), (handle, (('ikSolver', None),)))
+    return [_name(handle), _name(effector)]
+
+
+def _constraint(constraint_type, args, kwargs):
+    args = _names(list(args))
+    targets, constrained = args[:-1], _node(args[-1])
+    name = _flag(kwargs, 'name', 'n') or '{}_{}1'.format(constrained.name, constraint_type)
+    node = SCENE.create_node(constraint_type, name, constrained)
+    for index, target_name in enumerate(targets):
+        target = _node(target_name)
+        SCENE.connect((target, (('worldMatrix', 0),)), (node, (('target', index), ('targetParentMatrix', None))))
+    return [_name(node)]
+
+
+def poleVectorConstraint(*args, **kwargs):
+    result = _constraint('poleVectorConstraint', args, kwargs)
+    node = _node(result[0])
+    handle = node.parents[0]
+    for index, child in enumerate(handle.attribute_map['poleVector'].children):
+        SCENE.connect((node, ((node.attribute_map['constraintTranslate'].children[index].name, None),)),
+                      (handle, ((child.name, None),)))
+    return result
+
+
+def parentConstraint(*args, **kwargs):
+    return _constraint('parentConstraint', args, kwargs)
+
+
+def pointConstraint(*args, **kwargs):
+    return _constraint('pointConstraint', args, kwargs)
+
+
+def orientConstraint(*args, **kwargs):
+    return _constraint('orientConstraint', args, kwargs)
+
+
+def skinCluster(*args, **kwargs):
+    """ Binds the geometry, the last argument, to the joints. Every vertex is fully weighted to the closest joint """
+    args = _names(list(args) if len(args) != 1 else args[0])
+    joints = [_node(name) for name in args[:-1]]
+    geometry = _node(args[-1])
+    shape = geometry if geometry.is_shape else [child for child in geometry.children if child.is_shape][0]
+    node = SCENE.create_node('skinCluster', _flag(kwargs, 'name', 'n') or 'skinCluster1')
+    for index, joint_node in enumerate(joints):
+        SCENE.connect((joint_node, (('worldMatrix', 0),)), (node, (('matrix', index),)))
+        SCENE.connect((joint_node, (('lockInfluenceWeights', None),)), (node, (('lockWeights', index),)))
+    SCENE.connect((node, (('outputGeometry', 0),)), (shape, (('inMesh', None),)))
+    positions = [joint_node.world_matrix()[3][:3] for joint_node in joints]
+    world = om.MMatrix(shape.world_matrix())
+    for vertex, point in enumerate(shape.data.get('points', [])):
+        point = om.MPoint(point) * world
+        closest = min(range(len(joints)), key=lambda index: om.MPoint(positions[index]).distanceTo(point))
+        node.set_value((('weightList', vertex), ('weights', closest)), 1.0)
+    return [_name(node)]
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+# Commands registered by plug-ins
+# ---------------------------------------------------------------------------------------------------------------------
+def register_command(name, creator):
+    def command(*args, **kwargs):
+        instance = creator()
+        instance.doIt(om.MArgList(args))
+        _record_undo(instance)
+        return om.MPxCommand._result
+    _COMMANDS[name] = command
+    globals()[name] = command
+
+
+def deregister_command(name):
+    _COMMANDS.pop(name, None)
+    globals().pop(name, None)
@@ -0,0 +1,135 @@
+""" Stand-in for maya.mel that evaluates the handful of MEL commands that the builders and the Maya ASCII templates
+use, on the in-memory scene.
+"""
+import shlex
+from memory_maya import cmds
+from memory_maya.scene import SCENE
+
+
+def _flags(tokens):
+    """ Split MEL tokens into positional arguments and a dictionary of flags """
+    args = []
+    flags = {}
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        if token.startswith('-') and not _is_number(token):
+            if index + 1 < len(tokens) and (not tokens[index + 1].startswith('-') or _is_number(tokens[index + 1])):
+                flags[token[1:]] = tokens[index + 1]
+                index += 1
+            else:
+                flags[token[1:]] = True
+        else:
+            args.append(token)
+        index += 1
+    return args, flags
+
+
+def _is_number(token):
+    try:
+        float(token)
+    except ValueError:
+        return False
+    return True
+
+
+def _value(token):
+    if token in ('yes', 'on', 'true'):
+        return True
+    if token in ('no', 'off', 'false'):
+        return False
+    try:
+        return int(token)
+    except ValueError:
+        try:
+            return float(token)
+        except ValueError:
+            return token
+
+
+def _set_attr(tokens):
+    flags = {}
+    values = []
+    attribute = None
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        if token in ('-k', '-l', '-cb', '-type', '-s', '-av', '-ca'):
+            flags[token[1:]] = tokens[index + 1] if index + 1 < len(tokens) else True
+            index += 1
+        elif attribute is None:
+            attribute = token
+        else:
+            values.append(_value(token))
+        index += 1
+    if attribute.startswith('.'):
+        selected = SCENE.selection[-1]
+        attribute = cmds._name(selected) + attribute
+    if flags.get('type') not in (None, 'double2', 'double3', 'float2', 'float3', 'matrix', 'string'):
+        return None
+    if '[' in attribute.split('.')[-1] and ':' in attribute:
+        return None
+    kwargs = {}
+    if 'k' in flags:
+        kwargs['keyable'] = _value(flags['k'])
+    if 'l' in flags:
+        kwargs['lock'] = _value(flags['l'])
+    if 'type' in flags:
+        kwargs['type'] = flags['type']
+    try:
+        cmds.setAttr(attribute, *values, **kwargs)
+    except (ValueError, RuntimeError, IndexError):
+        pass
+    return None
+
+
+def _evaluate(statement):
+    tokens = shlex.split(statement)
+    if not tokens:
+        return None
+    command = tokens[0]
+    if command == 'createNode':
+        args, flags = _flags(tokens[1:])
+        name = cmds.createNode(args[0], name=flags.get('n'), parent=flags.get('p'))
+        return name
+    if command == 'setAttr':
+        return _set_attr(tokens[1:])
+    if command == 'rename':
+        args, flags = _flags(tokens[1:])
+        if 'uid' in flags:
+            return None
+        return cmds.rename(args[0], args[1])
+    if command == 'parent':
+        flags = set(token[1:] for token in tokens[1:] if token.startswith('-'))
+        args = [token for token in tokens[1:] if not token.startswith('-')]
+        return cmds.parent(*args, relative=bool(flags & {'r', 'relative'}), shape=bool(flags & {'s', 'shape'}),
+                           addObject=bool(flags & {'add', 'addObject'}))
+    if command == 'select':
+        args, flags = _flags(tokens[1:])
+        if 'cl' in flags:
+            return cmds.select(clear=True)
+        if 'ne' in flags:
+            SCENE.selection = [cmds._node(flags['ne'])]
+            return None
+        return cmds.select(args, add='add' in flags)
+    if command == 'CBdeleteConnection':
+        plug = cmds._plug(tokens[1])
+        source = SCENE.source_of(plug._key())
+        if source is not None:
+            SCENE.disconnect(source, plug._key())
+        return None
+    if command in ('requires', 'currentUnit', 'fileInfo', 'file', 'lockNode', 'connectAttr', 'relationship',
+                   'dataStructure'):
+        if command == 'connectAttr':
+            args, flags = _flags(tokens[1:])
+            cmds.connectAttr(args[0], args[1], force='f' in flags)
+        return None
+    raise RuntimeError('Cannot find procedure "{}".'.format(command))
+
+
+def eval(command):
+    result = None
+    for statement in command.split(';'):
+        if statement.strip():
+            result = _evaluate(statement.strip())
+    return result
@@ -0,0 +1,802 @@
+""" This module contains the in-memory scene graph that the stand-in for the Maya API works on. It only holds what the
+builders in this project need: nodes with typed attributes, a DAG with instancing, plug connections and the local and
+world matrices of transforms and joints. The dependency graph is not evaluated, connected plugs keep their own value.
+"""
+import math
+import uuid as uuid_module
+
+
+# Function set types, these match the values of MFn.Type in the real API.
+TYPE_IDS = {
+    'base': 0, 'dependNode': 4, 'dagNode': 107, 'transform': 110, 'joint': 121, 'ikHandle': 120, 'ikEffector': 119,
+    'mesh': 296, 'nurbsCurve': 267, 'nurbsSurface': 294, 'locator': 281, 'skinCluster': 682, 'multMatrix': 1127,
+    'decomposeMatrix': 1128, 'composeMatrix': 1129, 'blendMatrix': 1130, 'reverse': 466, 'remapValue': 933,
+    'nearestPointOnCurve': 1126, 'pointOnCurveInfo': 445, 'animBlendNodeAdditiveRotation': 1015,
+    'multiplyDivide': 449, 'unitConversion': 526, 'poleVectorConstraint': 243, 'ikRPsolver': 357,
+    'ikSCsolver': 358, 'time': 516, 'pickMatrix': 1131, 'plusMinusAverage': 459, 'network': 1008,
+    'geometryFilter': 341, 'shape': 248, 'curve': 266, 'surface': 293, 'constraint': 927,
+    'parentConstraint': 242, 'pointConstraint': 240, 'orientConstraint': 239, 'aimConstraint': 111,
+    'scaleConstraint': 244, 'objectSet': 1009, 'script': 634,
+}
+
+
+class AttributeDef(object):
+    """ Definition of an attribute on a node type or a dynamic attribute on a node
+    :param name: String long name
+    :param short: String short name
+    :param kind: String kind of data, e.g. 'double', 'bool', 'angle', 'matrix', 'message' or 'compound'
+    :param default: Default value
+    :param children: List of AttributeDefs for compound attributes
+    :param array: Boolean, true if the attribute is a multi
+    """
+    def __init__(self, name, short, kind='double', default=None, children=None, array=False, keyable=False,
+                 fields=None, minimum=None, maximum=None):
+        self.name = name
+        self.short = short
+        self.kind = kind
+        self.default = default
+        self.children = children or []
+        self.array = array
+        self.keyable = keyable
+        self.fields = fields or []
+        self.minimum = minimum
+        self.maximum = maximum
+        self.parent = None
+        self.dynamic = False
+        for child in self.children:
+            child.parent = self
+
+    def find_child(self, name):
+        for child in self.children:
+            if name in (child.name, child.short):
+                return child
+        return None
+
+    def default_value(self):
+        if self.default is not None:
+            return self.default
+        if self.kind == 'matrix':
+            return identity()
+        if self.kind in ('bool',):
+            return False
+        if self.kind in ('int', 'enum'):
+            return 0
+        if self.kind == 'string':
+            return ''
+        if self.kind in ('message', 'compound', 'geometry'):
+            return None
+        return 0.0
+
+
+def attr(name, short, kind='double', default=None, keyable=False, **kwargs):
+    return AttributeDef(name, short, kind, default, keyable=keyable, **kwargs)
+
+
+def vector(name, short, kind='double', default=0.0, suffixes='XYZ', short_suffixes='xyz', keyable=False, array=False):
+    """ Make a compound attribute with three children, like translate or outputRotate """
+    children = [AttributeDef(name + upper, short + lower, kind, default, keyable=keyable)
+                for upper, lower in zip(suffixes, short_suffixes)]
+    return AttributeDef(name, short, 'compound', children=children, keyable=keyable, array=array)
+
+
+def compound(name, short, children, array=False):
+    return AttributeDef(name, short, 'compound', children=children, array=array)
+
+
+def node_attributes(type_name):
+    """ Build the attribute definitions of a node type, including the attributes of the types it derives from """
+    definition = NODE_TYPES[type_name]
+    attributes = []
+    if definition.get('base'):
+        attributes.extend(node_attributes(definition['base']))
+    attributes.extend(definition.get('attributes', lambda: [])())
+    return attributes
+
+
+def _depend_node():
+    return [attr('message', 'msg', 'message'), attr('caching', 'cch', 'bool'),
+            attr('isHistoricallyInteresting', 'ihi', 'int', 2), attr('nodeState', 'nds', 'enum')]
+
+
+def _dag_node():
+    return [attr('visibility', 'v', 'bool', True, keyable=True),
+            attr('worldMatrix', 'wm', 'matrix', array=True), attr('worldInverseMatrix', 'wim', 'matrix', array=True),
+            attr('parentMatrix', 'pm', 'matrix', array=True),
+            attr('parentInverseMatrix', 'pim', 'matrix', array=True), attr('matrix', 'm', 'matrix'),
+            attr('inverseMatrix', 'im', 'matrix'), attr('offsetParentMatrix', 'opm', 'matrix'),
+            attr('overrideEnabled', 'ove', 'bool'), attr('overrideDisplayType', 'ovdt', 'enum'),
+            attr('overrideColor', 'ovc', 'int'), attr('overrideRGBColors', 'ovrgbf', 'bool'),
+            vector('overrideColorRGB', 'ovrgb', 'float', suffixes='RGB', short_suffixes='rgb'),
+            attr('intermediateObject', 'io', 'bool'), attr('template', 'tmp', 'bool'),
+            vector('ghostColorPre', 'gcp', 'float', suffixes='RGB', short_suffixes='rgb'),
+            compound('instObjGroups', 'iog', [], array=True)]
+
+
+def _transform():
+    return [vector('translate', 't', 'distance', keyable=True), vector('rotate', 'r', 'angle', keyable=True),
+            vector('scale', 's', 'double', 1.0, keyable=True), vector('shear', 'sh'),
+            vector('rotatePivot', 'rp', 'distance'), vector('scalePivot', 'sp', 'distance'),
+            vector('rotateAxis', 'ra', 'angle'), attr('rotateOrder', 'ro', 'enum'),
+            attr('inheritsTransform', 'it', 'bool', True), attr('displayHandle', 'dh', 'bool'),
+            vector('minTransLimit', 'mntl', 'distance', -1.0), vector('maxTransLimit', 'mxtl', 'distance', 1.0),
+            attr('minTransXLimitEnable', 'mtxe', 'bool'), attr('minTransYLimitEnable', 'mtye', 'bool'),
+            attr('minTransZLimitEnable', 'mtze', 'bool'), attr('maxTransXLimitEnable', 'xtxe', 'bool'),
+            attr('maxTransYLimitEnable', 'xtye', 'bool'), attr('maxTransZLimitEnable', 'xtze', 'bool')]
+
+
+def _joint():
+    return [vector('jointOrient', 'jo', 'angle'), attr('segmentScaleCompensate', 'ssc', 'bool', True),
+            vector('inverseScale', 'is', 'double', 1.0), attr('lockInfluenceWeights', 'liw', 'bool'),
+            attr('radius', 'radi', 'double', 1.0), attr('drawStyle', 'ds', 'enum'),
+            vector('preferredAngle', 'pa', 'angle'), attr('bindPose', 'bps', 'matrix'),
+            vector('stiffness', 'st')]
+
+
+def _shape():
+    return [attr('localPosition', 'lp', 'double')]
+
+
+def _geometry_shape():
+    return [attr('create', 'cr', 'geometry'), attr('cached', 'cc', 'geometry'), attr('local', 'l', 'geometry'),
+            attr('worldSpace', 'ws', 'geometry', array=True), attr('dispCV', 'dcv', 'bool'),
+            attr('visibleInReflections', 'vir', 'bool'), attr('visibleInRefractions', 'vif', 'bool'),
+            attr('divisionsU', 'dvu', 'int'), attr('divisionsV', 'dvv', 'int'),
+            attr('curvePrecision', 'cpr', 'int', 4), attr('curvePrecisionShaded', 'cps', 'int', 4),
+            attr('normalsDisplayScale', 'ndt', 'double', 1.0), attr('numberU', 'nufa', 'double', 1.5),
+            attr('numberV', 'nvfa', 'double', 1.5)]
+
+
+def _mesh():
+    return [attr('inMesh', 'i', 'geometry'), attr('outMesh', 'o', 'geometry'),
+            attr('worldMesh', 'w', 'geometry', array=True)]
+
+
+def _locator():
+    return [vector('localPosition', 'lp', 'distance'), compound('worldPosition', 'wp', [
+        attr('worldPositionX', 'wpx'), attr('worldPositionY', 'wpy'), attr('worldPositionZ', 'wpz')], array=True),
+            vector('localScale', 'los', 'double', 1.0)]
+
+
+def _mult_matrix():
+    return [attr('matrixIn', 'i', 'matrix', array=True), attr('matrixSum', 'o', 'matrix')]
+
+
+def _decompose_matrix():
+    return [attr('inputMatrix', 'imat', 'matrix'), attr('inputRotateOrder', 'ro', 'enum'),
+            vector('outputTranslate', 'ot', 'distance'), vector('outputRotate', 'or', 'angle'),
+            vector('outputScale', 'os', 'double', 1.0), vector('outputShear', 'osh'),
+            compound('outputQuat', 'oq', [attr('outputQuatX', 'oqx'), attr('outputQuatY', 'oqy'),
+                                          attr('outputQuatZ', 'oqz'), attr('outputQuatW', 'oqw', default=1.0)])]
+
+
+def _compose_matrix():
+    return [vector('inputTranslate', 'it', 'distance'), vector('inputRotate', 'ir', 'angle'),
+            vector('inputScale', 'is', 'double', 1.0), vector('inputShear', 'ish'),
+            attr('inputRotateOrder', 'iro', 'enum'), attr('useEulerRotation', 'uer', 'bool', True),
+            attr('outputMatrix', 'omat', 'matrix')]
+
+
+def _blend_matrix():
+    return [attr('inputMatrix', 'imat', 'matrix'), attr('envelope', 'env', 'double', 1.0),
+            compound('target', 'tgt', [attr('targetMatrix', 'tmat', 'matrix'), attr('useMatrix', 'umt', 'bool'),
+                                       attr('weight', 'wgt', 'double', 1.0),
+                                       attr('scaleWeight', 'sw', 'double', 1.0),
+                                       attr('translateWeight', 'tw', 'double', 1.0),
+                                       attr('rotateWeight', 'rw', 'double', 1.0),
+                                       attr('shearWeight', 'shw', 'double', 1.0)], array=True),
+            attr('outputMatrix', 'omat', 'matrix')]
+
+
+def _pick_matrix():
+    return [attr('inputMatrix', 'imat', 'matrix'), attr('useTranslate', 'ut', 'bool', True),
+            attr('useRotate', 'ur', 'bool', True), attr('useScale', 'us', 'bool', True),
+            attr('useShear', 'ush', 'bool', True), attr('outputMatrix', 'omat', 'matrix')]
+
+
+def _reverse():
+    return [vector('input', 'i'), vector('output', 'o')]
+
+
+def _remap_value():
+    return [attr('inputValue', 'i'), attr('inputMin', 'imn'), attr('inputMax', 'imx', default=1.0),
+            attr('outputMin', 'omn'), attr('outputMax', 'omx', default=1.0),
+            compound('value', 'vl', [attr('value_Position', 'vlp', 'float'),
+                                     attr('value_FloatValue', 'vlfv', 'float'),
+                                     attr('value_Interp', 'vli', 'enum')], array=True),
+            attr('outValue', 'ov'), vector('outColor', 'oc', 'float', suffixes='RGB', short_suffixes='rgb')]
+
+
+def _nearest_point_on_curve():
+    return [attr('inputCurve', 'ic', 'geometry'), vector('inPosition', 'ip', 'distance'),
+            compound('result', 'r', [vector('position', 'p', 'distance'), attr('parameter', 'pr'),
+                                     attr('resultNormal', 'rn')])]
+
+
+def _point_on_curve_info():
+    return [attr('inputCurve', 'ic', 'geometry'), attr('parameter', 'pr'), attr('turnOnPercentage', 'top', 'bool'),
+            compound('result', 'r', [vector('position', 'p', 'distance'), vector('normal', 'n'),
+                                     vector('tangent', 't'), attr('curvatureRadius', 'cr')])]
+
+
+def _anim_blend_rotation():
+    return [vector('inputA', 'ia', 'angle'), vector('inputB', 'ib', 'angle'), attr('weightA', 'wa', default=1.0),
+            attr('weightB', 'wb', default=1.0), attr('accumulationMode', 'am', 'enum'),
+            attr('rotateOrder', 'ro', 'enum'), vector('output', 'o', 'angle')]
+
+
+def _multiply_divide():
+    return [attr('operation', 'op', 'enum', 1), vector('input1', 'i1'), vector('input2', 'i2', default=1.0),
+            vector('output', 'o')]
+
+
+def _plus_minus_average():
+    return [attr('operation', 'op', 'enum', 1), attr('input1D', 'i1', array=True), attr('output1D', 'o1')]
+
+
+def _unit_conversion():
+    return [attr('input', 'i'), attr('output', 'o'), attr('conversionFactor', 'cf', default=1.0)]
+
+
+def _ik_handle():
+    return [attr('startJoint', 'hsj', 'message'), attr('endEffector', 'hee', 'message'),
+            attr('ikSolver', 'hsv', 'message'), vector('poleVector', 'pv', default=0.0), attr('twist', 'twi', 'angle'),
+            attr('ikBlend', 'ikb', default=1.0)]
+
+
+def _ik_effector():
+    return [attr('handlePath', 'hp', 'message', array=True)]
+
+
+def _constraint():
+    return [compound('target', 'tg', [attr('targetTranslate', 'tt'), attr('targetWeight', 'tw', default=1.0),
+                                      attr('targetParentMatrix', 'tpm', 'matrix')], array=True),
+            vector('constraintTranslate', 'ct', 'distance'), vector('constraintRotate', 'cr', 'angle'),
+            attr('constraintParentInverseMatrix', 'cpim', 'matrix')]
+
+
+def _geometry_filter():
+    return [attr('envelope', 'en', default=1.0),
+            compound('input', 'ip', [attr('inputGeometry', 'ig', 'geometry'), attr('groupId', 'gi', 'int')],
+                     array=True),
+            attr('outputGeometry', 'og', 'geometry', array=True), attr('originalGeometry', 'orig', 'geometry',
+                                                                      array=True)]
+
+
+def _skin_cluster():
+    return [compound('weightList', 'wl', [attr('weights', 'w', array=True)], array=True),
+            attr('matrix', 'ma', 'matrix', array=True), attr('bindPreMatrix', 'pm', 'matrix', array=True),
+            attr('lockWeights', 'lw', 'bool', array=True), attr('maxInfluences', 'mi', 'int', 5),
+            attr('skinningMethod', 'sm', 'enum'), attr('geomMatrix', 'gm', 'matrix')]
+
+
+def _time():
+    return [attr('outTime', 'o', 'time')]
+
+
+NODE_TYPES = {
+    'dependNode': {'attributes': _depend_node},
+    'dagNode': {'base': 'dependNode', 'attributes': _dag_node, 'dag': True},
+    'transform': {'base': 'dagNode', 'attributes': _transform, 'dag': True},
+    'joint': {'base': 'transform', 'attributes': _joint, 'dag': True},
+    'ikHandle': {'base': 'transform', 'attributes': _ik_handle, 'dag': True},
+    'ikEffector': {'base': 'transform', 'attributes': _ik_effector, 'dag': True},
+    'poleVectorConstraint': {'base': 'transform', 'attributes': _constraint, 'dag': True},
+    'parentConstraint': {'base': 'transform', 'attributes': _constraint, 'dag': True},
+    'pointConstraint': {'base': 'transform', 'attributes': _constraint, 'dag': True},
+    'orientConstraint': {'base': 'transform', 'attributes': _constraint, 'dag': True},
+    'aimConstraint': {'base': 'transform', 'attributes': _constraint, 'dag': True},
+    'scaleConstraint': {'base': 'transform', 'attributes': _constraint, 'dag': True},
+    'shape': {'base': 'dagNode', 'attributes': _shape, 'dag': True, 'shape': True},
+    'nurbsCurve': {'base': 'dagNode', 'attributes': _geometry_shape, 'dag': True, 'shape': True},
+    'nurbsSurface': {'base': 'dagNode', 'attributes': _geometry_shape, 'dag': True, 'shape': True},
+    'mesh': {'base': 'dagNode', 'attributes': _mesh, 'dag': True, 'shape': True},
+    'locator': {'base': 'dagNode', 'attributes': _locator, 'dag': True, 'shape': True},
+    'multMatrix': {'base': 'dependNode', 'attributes': _mult_matrix},
+    'decomposeMatrix': {'base': 'dependNode', 'attributes': _decompose_matrix},
+    'composeMatrix': {'base': 'dependNode', 'attributes': _compose_matrix},
+    'blendMatrix': {'base': 'dependNode', 'attributes': _blend_matrix},
+    'pickMatrix': {'base': 'dependNode', 'attributes': _pick_matrix},
+    'reverse': {'base': 'dependNode', 'attributes': _reverse},
+    'remapValue': {'base': 'dependNode', 'attributes': _remap_value},
+    'nearestPointOnCurve': {'base': 'dependNode', 'attributes': _nearest_point_on_curve},
+    'pointOnCurveInfo': {'base': 'dependNode', 'attributes': _point_on_curve_info},
+    'animBlendNodeAdditiveRotation': {'base': 'dependNode', 'attributes': _anim_blend_rotation},
+    'multiplyDivide': {'base': 'dependNode', 'attributes': _multiply_divide},
+    'plusMinusAverage': {'base': 'dependNode', 'attributes': _plus_minus_average},
+    'unitConversion': {'base': 'dependNode', 'attributes': _unit_conversion},
+    'ikRPsolver': {'base': 'dependNode'},
+    'ikSCsolver': {'base': 'dependNode'},
+    'skinCluster': {'base': 'dependNode', 'attributes': lambda: _geometry_filter() + _skin_cluster()},
+    'network': {'base': 'dependNode'},
+    'objectSet': {'base': 'dependNode'},
+    'time': {'base': 'dependNode', 'attributes': _time},
+}
+
+TYPE_BASES = {
+    'transform': ['dagNode'], 'joint': ['transform', 'dagNode'], 'ikHandle': ['transform', 'dagNode'],
+    'ikEffector': ['transform', 'dagNode'], 'nurbsCurve': ['curve', 'shape', 'dagNode'],
+    'nurbsSurface': ['surface', 'shape', 'dagNode'], 'mesh': ['surface', 'shape', 'dagNode'],
+    'locator': ['shape', 'dagNode'], 'skinCluster': ['geometryFilter'],
+    'poleVectorConstraint': ['constraint', 'transform', 'dagNode'],
+    'parentConstraint': ['constraint', 'transform', 'dagNode'],
+    'pointConstraint': ['constraint', 'transform', 'dagNode'],
+    'orientConstraint': ['constraint', 'transform', 'dagNode'],
+    'aimConstraint': ['constraint', 'transform', 'dagNode'],
+    'scaleConstraint': ['constraint', 'transform', 'dagNode'],
+}
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+# Matrix math, matrices are 4x4 lists of rows and use row vectors like Maya does.
+# ---------------------------------------------------------------------------------------------------------------------
+def identity():
+    return [[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0], [0.0, 0.0, 1.0, 0.0], [0.0, 0.0, 0.0, 1.0]]
+
+
+def mat_mult(a, b):
+    return [[sum(a[i][k] * b[k][j] for k in range(4)) for j in range(4)] for i in range(4)]
+
+
+def mat_inverse(m):
+    size = 4
+    a = [list(row) + [1.0 if i == j else 0.0 for j in range(size)] for i, row in enumerate(m)]
+    for column in range(size):
+        pivot = max(range(column, size), key=lambda r: abs(a[r][column]))
+        if abs(a[pivot][column]) < 1e-15:
+            return identity()
+        a[column], a[pivot] = a[pivot], a[column]
+        factor = a[column][column]
+        a[column] = [value / factor for value in a[column]]
+        for row in range(size):
+            if row != column and a[row][column] != 0.0:
+                scale = a[row][column]
+                a[row] = [value - scale * pivot_value for value, pivot_value in zip(a[row], a[column])]
+    return [row[size:] for row in a]
+
+
+def transform_point(m, point):
+    x, y, z = point[0], point[1], point[2]
+    w = point[3] if len(point) > 3 else 1.0
+    return [x * m[0][j] + y * m[1][j] + z * m[2][j] + w * m[3][j] for j in range(4)]
+
+
+def translation_matrix(t):
+    m = identity()
+    m[3][0], m[3][1], m[3][2] = t[0], t[1], t[2]
+    return m
+
+
+def scale_matrix(s):
+    m = identity()
+    m[0][0], m[1][1], m[2][2] = s[0], s[1], s[2]
+    return m
+
+
+def euler_matrix(rotation, order=0):
+    """ Rotation matrix from euler angles in radians. Order 0 is xyz, which is applied x first. """
+    x, y, z = rotation
+    cx, sx, cy, sy, cz, sz = math.cos(x), math.sin(x), math.cos(y), math.sin(y), math.cos(z), math.sin(z)
+    rx = [[1, 0, 0, 0], [0, cx, sx, 0], [0, -sx, cx, 0], [0, 0, 0, 1]]
+    ry = [[cy, 0, -sy, 0], [0, 1, 0, 0], [sy, 0, cy, 0], [0, 0, 0, 1]]
+    rz = [[cz, sz, 0, 0], [-sz, cz, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]
+    axes = {'x': rx, 'y': ry, 'z': rz}
+    orders = ['xyz', 'yzx', 'zxy', 'xzy', 'yxz', 'zyx']
+    result = identity()
+    for axis in orders[order]:
+        result = mat_mult(result, axes[axis])
+    return [[float(value) for value in row] for row in result]
+
+
+def matrix_to_quaternion(m):
+    """ Quaternion (x, y, z, w) of the rotation part of an orthonormal matrix """
+    trace = m[0][0] + m[1][1] + m[2][2]
+    if trace > 0:
+        s = math.sqrt(trace + 1.0) * 2
+        w = 0.25 * s
+        x = (m[1][2] - m[2][1]) / s
+        y = (m[2][0] - m[0][2]) / s
+        z = (m[0][1] - m[1][0]) / s
+    elif m[0][0] > m[1][1] and m[0][0] > m[2][2]:
+        s = math.sqrt(1.0 + m[0][0] - m[1][1] - m[2][2]) * 2
+        w = (m[1][2] - m[2][1]) / s
+        x = 0.25 * s
+        y = (m[1][0] + m[0][1]) / s
+        z = (m[2][0] + m[0][2]) / s
+    elif m[1][1] > m[2][2]:
+        s = math.sqrt(1.0 + m[1][1] - m[0][0] - m[2][2]) * 2
+        w = (m[2][0] - m[0][2]) / s
+        x = (m[1][0] + m[0][1]) / s
+        y = 0.25 * s
+        z = (m[2][1] + m[1][2]) / s
+    else:
+        s = math.sqrt(1.0 + m[2][2] - m[0][0] - m[1][1]) * 2
+        w = (m[0][1] - m[1][0]) / s
+        x = (m[2][0] + m[0][2]) / s
+        y = (m[2][1] + m[1][2]) / s
+        z = 0.25 * s
+    return [x, y, z, w]
+
+
+def quaternion_to_matrix(q):
+    x, y, z, w = q
+    return [[1 - 2 * (y * y + z * z), 2 * (x * y + z * w), 2 * (x * z - y * w), 0.0],
+            [2 * (x * y - z * w), 1 - 2 * (x * x + z * z), 2 * (y * z + x * w), 0.0],
+            [2 * (x * z + y * w), 2 * (y * z - x * w), 1 - 2 * (x * x + y * y), 0.0],
+            [0.0, 0.0, 0.0, 1.0]]
+
+
+def matrix_to_euler(m):
+    """ Euler angles in xyz order of the rotation part of an orthonormal matrix """
+    sy = -m[0][2]
+    sy = max(-1.0, min(1.0, sy))
+    y = math.asin(sy)
+    if abs(sy) < 0.999999:
+        x = math.atan2(m[1][2], m[2][2])
+        z = math.atan2(m[0][1], m[0][0])
+    else:
+        x = math.atan2(-m[2][1], m[1][1])
+        z = 0.0
+    return [x, y, z]
+
+
+def decompose(m):
+    """ Split a matrix into translation, rotation matrix and scale """
+    rows = [m[i][:3] for i in range(3)]
+    scale = [math.sqrt(sum(value * value for value in row)) for row in rows]
+    rotation = identity()
+    for i in range(3):
+        for j in range(3):
+            rotation[i][j] = rows[i][j] / scale[i] if scale[i] else 0.0
+    return [m[3][0], m[3][1], m[3][2]], rotation, scale
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+# Scene graph
+# ---------------------------------------------------------------------------------------------------------------------
+class Node(object):
+    """ A node in the scene """
+    def __init__(self, scene, type_name, name):
+        self.scene = scene
+        self.type_name = type_name
+        self.name = name
+        self.uuid = str(uuid_module.uuid4()).upper()
+        self.attributes = node_attributes(type_name)
+        self.attribute_map = {}
+        for attribute in self.attributes:
+            self.register_attribute(attribute)
+        self.values = {}
+        self.parents = []
+        self.children = []
+        self.alive = True
+        self.data = {}
+        self.cache = {}
+        self.cache_revision = -1
+
+    def register_attribute(self, attribute):
+        self.attribute_map[attribute.name] = attribute
+        self.attribute_map[attribute.short] = attribute
+        for child in attribute.children:
+            self.register_attribute(child)
+
+    def remove_attribute(self, attribute):
+        self.attributes.remove(attribute)
+        for name in (attribute.name, attribute.short):
+            self.attribute_map.pop(name, None)
+
+    @property
+    def is_dag(self):
+        return NODE_TYPES[self.type_name].get('dag', False)
+
+    @property
+    def is_shape(self):
+        return NODE_TYPES[self.type_name].get('shape', False)
+
+    @property
+    def api_type(self):
+        return TYPE_IDS.get(self.type_name, TYPE_IDS['dependNode'])
+
+    def has_fn(self, type_id):
+        if type_id in (TYPE_IDS['base'], TYPE_IDS['dependNode']):
+            return True
+        if type_id == self.api_type:
+            return True
+        for base in TYPE_BASES.get(self.type_name, ['dagNode'] if self.is_dag else []):
+            if TYPE_IDS.get(base) == type_id:
+                return True
+        return False
+
+    # Values are stored by plug path, which is a tuple of (attribute name, logical index or None) pairs.
+    def get_value(self, path):
+        key = self.value_key(path)
+        if key in self.values:
+            return self.values[key]
+        attribute = self.attribute_map[path[-1][0]]
+        if self.is_dag and attribute.name in ('worldMatrix', 'worldInverseMatrix', 'matrix', 'inverseMatrix',
+                                              'parentMatrix', 'parentInverseMatrix'):
+            return self.computed_matrix(attribute.name)
+        return attribute.default_value()
+
+    def set_value(self, path, value):
+        self.values[self.value_key(path)] = value
+        self.scene.revision += 1
+
+    @staticmethod
+    def value_key(path):
+        """ Children of plain compounds are stored under their own name, only array elements keep their parent """
+        path = tuple(path)
+        return tuple((name, index) for position, (name, index) in enumerate(path)
+                     if index is not None or position == len(path) - 1)
+
+    def existing_indices(self, path):
+        """ Logical indices that have a value or connection below the given array plug path """
+        path = self.value_key(path)
+        prefix = tuple(path[:-1])
+        name = path[-1][0]
+        indices = set()
+        depth = len(path) - 1
+        for key in list(self.values) + [plug[1] for plug in self.scene.connected_plugs(self)]:
+            if len(key) > depth and tuple(key[:depth]) == prefix and key[depth][0] == name \
+                    and key[depth][1] is not None:
+                indices.add(key[depth][1])
+        return sorted(indices)
+
+    # Transform helpers
+    def vector_value(self, name):
+        attribute = self.attribute_map[name]
+        return [self.get_value(((child.name, None),)) for child in attribute.children]
+
+    def set_vector_value(self, name, values):
+        attribute = self.attribute_map[name]
+        for child, value in zip(attribute.children, values):
+            self.set_value(((child.name, None),), value)
+
+    # Matrices are kept until anything in the scene changes, deep hierarchies would be quadratic to query otherwise.
+    def cached(self, key, function):
+        if self.cache_revision != self.scene.revision:
+            self.cache = {}
+            self.cache_revision = self.scene.revision
+        if key not in self.cache:
+            self.cache[key] = function()
+        return self.cache[key]
+
+    def is_cached(self, key):
+        return self.cache_revision == self.scene.revision and key in self.cache
+
+    def local_matrix(self):
+        return self.cached('local', self.compute_local_matrix)
+
+    def compute_local_matrix(self):
+        if not self.has_fn(TYPE_IDS['transform']):
+            return identity()
+        matrix = scale_matrix(self.vector_value('scale'))
+        matrix = mat_mult(matrix, euler_matrix(self.vector_value('rotate'), self.get_value((('rotateOrder', None),))))
+        if self.type_name == 'joint':
+            matrix = mat_mult(matrix, euler_matrix(self.vector_value('jointOrient')))
+        matrix = mat_mult(matrix, translation_matrix(self.vector_value('translate')))
+        return matrix
+
+    def parent_matrix(self, path_index=0):
+        matrix = self.get_value((('offsetParentMatrix', None),)) if self.is_dag else identity()
+        if self.parents:
+            parent = self.parents[min(path_index, len(self.parents) - 1)]
+            matrix = mat_mult(matrix, parent.world_matrix())
+        return matrix
+
+    def world_matrix(self, path_index=0):
+        # The parents are filled in from the top down, so a deep hierarchy does not recurse once per level
+        ancestors = []
+        parent = self.parents[min(path_index, len(self.parents) - 1)] if self.parents else None
+        while parent is not None and not parent.is_cached(('world', 0)):
+            ancestors.append(parent)
+            parent = parent.parents[0] if parent.parents else None
+        for ancestor in reversed(ancestors):
+            ancestor.world_matrix()
+        return self.cached(('world', path_index),
+                           lambda: mat_mult(self.local_matrix(), self.parent_matrix(path_index)))
+
+    def computed_matrix(self, name):
+        if name == 'worldMatrix':
+            return self.world_matrix()
+        if name == 'worldInverseMatrix':
+            return mat_inverse(self.world_matrix())
+        if name == 'matrix':
+            return self.local_matrix()
+        if name == 'inverseMatrix':
+            return mat_inverse(self.local_matrix())
+        if name == 'parentMatrix':
+            return self.parent_matrix()
+        return mat_inverse(self.parent_matrix())
+
+
+class Scene(object):
+    """ The scene holds all nodes and the connections between their plugs """
+    def __init__(self):
+        self.nodes = []
+        self.connections = {}
+        self.destinations = {}
+        self.callbacks = {}
+        self.next_callback = 1
+        self.selection = []
+        self.revision = 0
+        self.create_node('time', 'time1')
+
+    def clear(self):
+        # Like in Maya the callbacks outlive the scene, so they keep working after a new scene
+        callbacks, next_callback = self.callbacks, self.next_callback
+        self.__init__()
+        self.callbacks, self.next_callback = callbacks, next_callback
+
+    # Callbacks are stored per event name, every callback is (id, function, filter, client data)
+    def add_callback(self, event, function, node_filter=None, client_data=None):
+        callback_id = self.next_callback
+        self.next_callback += 1
+        self.callbacks.setdefault(event, []).append((callback_id, function, node_filter, client_data))
+        return callback_id
+
+    def remove_callback(self, callback_id):
+        for event in self.callbacks:
+            self.callbacks[event] = [callback for callback in self.callbacks[event] if callback[0] != callback_id]
+
+    def emit(self, event, node_filter, *args):
+        for callback_id, function, callback_filter, client_data in list(self.callbacks.get(event, [])):
+            if callback_filter and node_filter and callback_filter != node_filter:
+                continue
+            function(*(args + (client_data,)))
+
+    # Nodes
+    def unique_name(self, name, node=None, parent=None):
+        name = name.split('|')[-1]
+        siblings = None
+        if node is not None and node.is_dag:
+            siblings = [n for n in self.nodes if n is not node and n.alive and
+                        ((n.parents[:1] == [parent]) if parent else not n.parents)]
+        taken = set(n.name for n in (siblings if siblings is not None else self.nodes) if n is not node and n.alive)
+        if node is not None and node.is_dag:
+            taken |= set(n.name for n in self.nodes if n.alive and not n.is_dag)
+        else:
+            taken |= set(n.name for n in self.nodes if n.alive and n is not node)
+        if name not in taken:
+            return name
+        base = name.rstrip('0123456789')
+        digits = name[len(base):]
+        number = int(digits) + 1 if digits else 1
+        while base + str(number) in taken:
+            number += 1
+        return base + str(number)
+
+    def create_node(self, type_name, name=None, parent=None):
+        if type_name not in NODE_TYPES:
+            raise RuntimeError('Unknown node type: {}'.format(type_name))
+        node = Node(self, type_name, '')
+        self.revision += 1
+        if parent is not None:
+            node.parents.append(parent)
+            parent.children.append(node)
+        self.nodes.append(node)
+        node.name = self.unique_name(name or type_name + '1', node, parent)
+        self.emit('nodeAdded', type_name, node)
+        return node
+
+    def restore_node(self, node, parent=None):
+        """ Bring a node back that delete_node removed, the way a redo of its creation does """
+        self.revision += 1
+        node.alive = True
+        self.nodes.append(node)
+        if parent is not None:
+            node.parents.append(parent)
+            parent.children.append(node)
+        self.emit('nodeAdded', node.type_name, node)
+
+    def delete_node(self, node):
+        self.revision += 1
+        for child in list(node.children):
+            if len(child.parents) > 1:
+                child.parents.remove(node)
+                node.children.remove(child)
+            else:
+                self.delete_node(child)
+        for parent in list(node.parents):
+            parent.children.remove(node)
+        node.parents = []
+        for destination, source in list(self.connections.items()):
+            if destination[0] is node or source[0] is node:
+                self.disconnect(source, destination)
+        node.alive = False
+        self.nodes.remove(node)
+        self.emit('nodeRemoved', node.type_name, node)
+
+    def reparent(self, node, parent, keep_existing=False):
+        self.revision += 1
+        old_parents = list(node.parents)
+        if not keep_existing:
+            for old in old_parents:
+                old.children.remove(node)
+                self.emit('parentRemoved', None, node, old)
+            node.parents = []
+        if parent is not None and parent not in node.parents:
+            node.parents.append(parent)
+            parent.children.append(node)
+            self.emit('parentAdded', None, node, parent)
+        elif parent is None and old_parents and not keep_existing:
+            self.emit('parentAdded', None, node, None)
+
+    def live_nodes(self):
+        return [node for node in self.nodes if node.alive]
+
+    def find(self, name):
+        """ Find nodes by name, full path or uuid. Supports '*' wildcards. """
+        import fnmatch
+        if '|' in name:
+            parts = [part for part in name.split('|') if part]
+            matches = []
+            for node in self.live_nodes():
+                if node.name != parts[-1]:
+                    continue
+                for path in self.paths(node):
+                    names = [n.name for n in path]
+                    if names == parts if name.startswith('|') else names[-len(parts):] == parts:
+                        matches.append(node)
+                        break
+            return matches
+        if '*' in name or '?' in name:
+            return [node for node in self.live_nodes() if fnmatch.fnmatchcase(node.name, name)]
+        return [node for node in self.live_nodes() if node.name == name or node.uuid == name]
+
+    def paths(self, node):
+        """ All DAG paths (lists of nodes from the top) to a node """
+        if not node.parents:
+            return [[node]]
+        result = []
+        for parent in node.parents:
+            for path in self.paths(parent):
+                result.append(path + [node])
+        return result
+
+    # Connections, plugs are (node, path) pairs where path is a tuple of (attribute name, index) pairs
+    def connect(self, source, destination):
+        source = (source[0], Node.value_key(source[1]))
+        destination = (destination[0], Node.value_key(destination[1]))
+        if destination in self.connections:
+            raise RuntimeError('Plug is already connected')
+        self.connections[destination] = source
+        self.destinations.setdefault(source, []).append(destination)
+        self.emit('connection', None, source, destination, True)
+
+    def disconnect(self, source, destination):
+        source = (source[0], Node.value_key(source[1]))
+        destination = (destination[0], Node.value_key(destination[1]))
+        if self.connections.get(destination) != source:
+            raise RuntimeError('Plugs are not connected')
+        del self.connections[destination]
+        self.destinations[source].remove(destination)
+        if not self.destinations[source]:
+            del self.destinations[source]
+        self.emit('connection', None, source, destination, False)
+
+    def source_of(self, plug):
+        return self.connections.get((plug[0], Node.value_key(plug[1])))
+
+    def destinations_of(self, plug):
+        return list(self.destinations.get((plug[0], Node.value_key(plug[1])), []))
+
+    def connected_plugs(self, node):
+        plugs = []
+        for destination, source in self.connections.items():
+            if destination[0] is node:
+                plugs.append(destination)
+            if source[0] is node:
+                plugs.append(source)
+        return plugs
+
+    def node_connections(self, node, upstream=True, downstream=True):
+        """ Nodes directly connected to a node """
+        result = []
+        for destination, source in self.connections.items():
+            if upstream and destination[0] is node and source[0] not in result:
+                result.append(source[0])
+            if downstream and source[0] is node and destination[0] not in result:
+                result.append(destination[0])
+        return result
+
+
+SCENE = Scene()
@@ -0,0 +1,177 @@
+import math
+from backend import om
+
+
+# Sizing controls used to ask Maya for the closest point on the mesh once for every control, which is slow on dense
+# meshes. The index is built once per build and answers all the distance queries in Python.
+class MeshIndex(object):
+    """ This class keeps the world space vertices of one or more meshes in a uniform grid, so the distance from a point
+    to the closest vertex can be found by only looking at the cells around that point. Indices are cached per set of
+    meshes and are built again when one of the meshes has changed.
+    :param meshes: List of MObjects containing the meshes
+    :param max_points: Integer, if given the vertices are decimated to about this many points
+    """
+    # Average number of points in a cell of the grid
+    points_per_cell = 8
+    indices = {}
+
+    def __init__(self, meshes, max_points=None):
+        self.meshes = [om.MObjectHandle(mesh) for mesh in meshes]
+        self.signature = self.get_signature(meshes)
+        self.points = []
+        for mesh in meshes:
+            mesh_points = om.MFnMesh(om.MFnDagNode(mesh).getPath()).getPoints(4)
+            self.points.extend([(point.x, point.y, point.z) for point in mesh_points])
+        if max_points and len(self.points) > max_points:
+            step = int(math.ceil(len(self.points) / float(max_points)))
+            self.points = self.points[::step]
+        self.origin = (0.0, 0.0, 0.0)
+        self.cell_size = 1.0
+        self.cells = {}
+        if self.points:
+            self.build_grid()
+
+    @classmethod
+    def get(cls, meshes, max_points=None):
+        """ Get the index of the given meshes. The cached index is used as long as the meshes still exist and have not
+        changed.
+        :param meshes: MObject or list of MObjects containing the meshes, null objects are ignored
+        :param max_points: Integer, if given the vertices are decimated to about this many points
+        :return: MeshIndex or None if there are no meshes
+        """
+        if isinstance(meshes, om.MObject):
+            meshes = [meshes]
+        meshes = [mesh for mesh in meshes if not mesh.isNull()]
+        if not meshes:
+            return None
+        key = (tuple(om.MObjectHandle(mesh).hashCode() for mesh in meshes), max_points)
+        index = cls.indices.get(key)
+        if index is None or not index.is_valid(meshes):
+            index = cls(meshes, max_points)
+            cls.indices[key] = index
+        return index
+
+    @classmethod
+    def clear(cls):
+        """ Remove all the cached indices
+        :return:
+        """
+        cls.indices = {}
+
+    @staticmethod
+    def get_signature(meshes):
+        """ Get a cheap description of the meshes that changes when the meshes are edited or moved
+        :param meshes: List of MObjects containing the meshes
+        :return: Tuple with the vertex count, world matrix and bounding box of every mesh
+        """
+        signature = []
+        for mesh in meshes:
+            mesh_dag_path = om.MFnDagNode(mesh).getPath()
+            bounding_box = om.MFnDagNode(mesh_dag_path).boundingBox
+            signature.append((om.MFnMesh(mesh_dag_path).numVertices, tuple(mesh_dag_path.inclusiveMatrix()),
+                              tuple(bounding_box.min), tuple(bounding_box.max)))
+        return tuple(signature)
+
+    def is_valid(self, meshes):
+        """ Check if the index still matches the meshes
+        :param meshes: List of MObjects containing the meshes
+        :return: Boolean
+        """
+        if not all(handle.isValid() for handle in self.meshes):
+            return False
+        return self.signature == self.get_signature(meshes)
+
+    def build_grid(self):
+        """ Sort the points into the cells of the grid. The size of the cells is picked so that every cell holds about
+        points_per_cell points.
+        :return:
+        """
+        minimum = [min(point[axis] for point in self.points) for axis in range(3)]
+        maximum = [max(point[axis] for point in self.points) for axis in range(3)]
+        extent = [maximum[axis] - minimum[axis] for axis in range(3)]
+        largest = max(extent)
+        volume = 1.0
+        for size in extent:
+            volume *= max(size, largest / 256.0, 1e-6)
+        self.cell_size = max((volume * self.points_per_cell / len(self.points)) ** (1.0 / 3.0), largest / 256.0,
+                             1e-6)
+        self.origin = tuple(minimum)
+        cells = {}
+        for point in self.points:
+            cells.setdefault(self.get_cell(point), []).append(point)
+        self.cells = cells
+
+    def get_cell(self, point):
+        """ Get the cell of the grid that a point falls in
+        :param point: Tuple or MPoint
+        :return: Tuple of three integers
+        """
+        return (int(math.floor((point[0] - self.origin[0]) / self.cell_size)),
+                int(math.floor((point[1] - self.origin[1]) / self.cell_size)),
+                int(math.floor((point[2] - self.origin[2]) / self.cell_size)))
+
+    def closest_distance(self, point):
+        """ Get the distance from a point to the closest vertex. The cells are searched in rings around the cell of the
+        point, and the search stops once no unsearched cell can hold a closer vertex.
+        :param point: MPoint or tuple in world space
+        :return: Float distance, or None if the index is empty
+        """
+        if not self.cells:
+            return None
+        x, y, z = point[0], point[1], point[2]
+        center = self.get_cell(point)
+        best = None
+        ring = 0
+        searched = 0
+        while True:
+            for cell in self.get_ring(center, ring):
+                cell_points = self.cells.get(cell)
+                if cell_points is None:
+                    continue
+                searched += 1
+                for cell_point in cell_points:
+                    distance = (cell_point[0] - x) ** 2 + (cell_point[1] - y) ** 2 + (cell_point[2] - z) ** 2
+                    if best is None or distance < best:
+                        best = distance
+            if best is not None and best <= (ring * self.cell_size) ** 2:
+                break
+            if searched == len(self.cells) or (2 * ring + 1) ** 3 > len(self.cells) * 27:
+                best = min(best if best is not None else float('inf'), self.brute_force(point))
+                break
+            ring += 1
+        return math.sqrt(best)
+
+    def closest_distances(self, points):
+        """ Get the distance to the closest vertex for a whole list of points at once
+        :param points: List of MPoints or tuples in world space
+        :return: List of float distances in the same order as the points
+        """
+        return [self.closest_distance(point) for point in points]
+
+    def brute_force(self, point):
+        """ Compare a point against every vertex in the index, used when the point is far outside of the grid
+        :param point: MPoint or tuple in world space
+        :return: Float squared distance
+        """
+        x, y, z = point[0], point[1], point[2]
+        return min((cell_point[0] - x) ** 2 + (cell_point[1] - y) ** 2 + (cell_point[2] - z) ** 2
+                   for cell_point in self.points)
+
+    @staticmethod
+    def get_ring(center, ring):
+        """ Get the cells that are exactly ring cells away from the center cell
+        :param center: Tuple of three integers
+        :param ring: Integer
+        :return: Generator of tuples of three integers
+        """
+        if ring == 0:
+            yield center
+            return
+        for i in range(-ring, ring + 1):
+            for j in range(-ring, ring + 1):
+                if abs(i) == ring or abs(j) == ring:
+                    for k in range(-ring, ring + 1):
+                        yield center[0] + i, center[1] + j, center[2] + k
+                else:
+                    yield center[0] + i, center[1] + j, center[2] - ring
+                    yield center[0] + i, center[1] + j, center[2] + ring
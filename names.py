@@ -13,6 +13,7 @@ joints = 'joints'
 ik_handle = 'ikHandle'
 control = 'ctrl'
 offset = 'offset'
+shape = 'shape'
 leg = 'leg'
 left = 'l'
 right = 'r'
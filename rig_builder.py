@@ -0,0 +1,200 @@
+import traceback
+import names
+from backend import Backend, om
+from helper import Helper
+from leg_component import LegComponent
+from foot_component import FootComponent
+from build_pipeline import BuildStep, BuildPipeline
+from build_profiler import profiled
+
+
+# The leg rigger used to call the component methods one after the other, so when one of them failed halfway the whole
+# rig had to be deleted and built again. The calls are now the steps of a BuildPipeline, with the checkpoint on the
+# root of the rig, so pressing create again continues where the build stopped.
+class LegRigBuilder(object):
+    """ This class builds a leg, and optionally a foot, as a resumable BuildPipeline. The root of an earlier build with
+    the same group name is found by name, and the build continues from the first step that is invalid. Changing the
+    side or one of the other parameters rebuilds the steps that depend on it and every step after them.
+    :param start_joint: MObject containing the first joint of the leg, e.g. the hip
+    :param end_joint: MObject containing the last joint of the leg, e.g. the ankle
+    :param group_name: String name of the root group of the rig
+    :param side: String side that is used for the names
+    :param blend: Boolean, if true the IK FK switch is a float attribute instead of an enum
+    :param foot: Boolean, if true the foot is built after the leg
+    :param matrix_drive: Boolean, if true the FK and skinned joints are driven through their offsetParentMatrix instead
+    of a decomposeMatrix per joint
+    :param guides: MSelectionList containing the front, back and center foot roll guides, if it is empty they are
+    looked up by name
+    """
+    def __init__(self, start_joint, end_joint, group_name='LEG_RIG', side=names.left, blend=False, foot=False,
+                 guides=om.MSelectionList(), matrix_drive=False):
+        self.start_joint = start_joint
+        self.end_joint = end_joint
+        self.leg = LegComponent(side)
+        self.foot = FootComponent(side, context=self.leg.context)
+        self.foot.base_joint = end_joint
+        self.foot.foot_roll_guides = guides
+        self.build_foot = foot
+        self.parameters = {'start_joint': start_joint, 'end_joint': end_joint, 'group_name': group_name,
+                           'side': side, 'blend': blend, 'matrix_drive': matrix_drive}
+        self.pipeline = BuildPipeline(self.get_steps(foot), self.parameters, holder=lambda: self.leg.root)
+
+    @profiled
+    def build(self):
+        """ Build the rig, resuming the build that is stored on a root with the same group name
+        :return: List of the names of the steps that were executed
+        """
+        return self.pipeline.run(self.find_root())
+
+    def dry_run(self):
+        """ Build the rig on a copy of the skeleton in an in-memory scene, without touching the scene itself. This
+        checks the inputs and tells how many nodes the build would create. The foot profile and the foot roll guides are
+        copied as well when the foot is built.
+        :return: Dictionary with the number of nodes, the nodes per type, the time the build took and the error, which
+        is None when the build succeeded
+        """
+        guides = self.foot.foot_roll_guides
+        inputs = [self.start_joint, self.end_joint] + [guides.getDependNode(index) for index in range(guides.length())]
+        if self.build_foot:
+            side = self.parameters['side']
+            inputs += [Helper.get_node(name) for name in [side+'_foot_profile'] +
+                       [side+'_'+guide+'_foot_roll_guide' for guide in ('front', 'back', 'center')]]
+        inputs = [node for node in inputs if not node.isNull()]
+        paths = [om.MFnDagNode(node).fullPathName() for node in inputs]
+        error = None
+        with Backend.dry_run(inputs) as dry_run:
+            nodes = [Helper.get_node(path) for path in paths]
+            dry_guides = om.MSelectionList()
+            for guide in nodes[2:2+guides.length()]:
+                dry_guides.add(guide)
+            builder = LegRigBuilder(nodes[0], nodes[1], group_name=self.parameters['group_name'],
+                                    side=self.parameters['side'], blend=self.parameters['blend'],
+                                    foot=self.build_foot, guides=dry_guides,
+                                    matrix_drive=self.parameters['matrix_drive'])
+            try:
+                builder.build()
+            except Exception:
+                error = traceback.format_exc()
+        report = dry_run.report()
+        report['error'] = error
+        return report
+
+    def find_root(self):
+        """ Find the root of an earlier build of this rig
+        :return: MObject containing the root, a null object if there is none
+        """
+        root = Helper.get_node(self.parameters['group_name'])
+        if root.isNull() or not om.MFnDependencyNode(root).hasAttribute(BuildPipeline.attribute):
+            return om.MObject()
+        return root
+
+    def get_steps(self, foot=False):
+        """ Get the steps of the leg and, if asked for, of the foot
+        :param foot: Boolean, if true the foot steps are added
+        :return: List of BuildSteps
+        """
+        leg = self.leg
+        groups = ['root', 'geo_group', 'joint_group', 'control_group', 'ik_group']
+        steps = [
+            BuildStep('construct_rig', lambda: leg.construct_rig(self.parameters['group_name']), leg,
+                      ['group_name', 'side'], groups),
+            BuildStep('create_joints_parent', lambda: leg.create_joints_parent(self.start_joint), leg,
+                      ['start_joint'], ['joints']),
+            BuildStep('create_fk_chain', lambda: leg.create_fk_chain(self.start_joint, self.end_joint), leg,
+                      ['start_joint', 'end_joint'], ['fk_chain', 'skinned_chain']),
+            BuildStep('create_ik_chain', lambda: leg.create_ik_chain(self.start_joint, self.end_joint), leg,
+                      ['start_joint', 'end_joint'], ['ik_chain', 'ik_root', 'skinned_chain']),
+            BuildStep('create_fk_controls', leg.create_fk_controls, leg,
+                      outputs=['fk_offsets', 'fk_controls', 'control_sizes']),
+            BuildStep('create_ik_controls', leg.create_ik_controls, leg, outputs=['ik_offsets', 'ik_controls']),
+            BuildStep('create_ik_handle', lambda: leg.create_ik_handle(pole_vector=leg.ik_controls.getDependNode(1)),
+                      leg, outputs=['ik_handle']),
+            BuildStep('create_fk_nodes_and_connections',
+                      lambda: leg.create_fk_nodes_and_connections(leg.fk_chain, leg.fk_controls,
+                                                                  self.parameters['matrix_drive']), leg,
+                      ['matrix_drive']),
+            BuildStep('create_ik_nodes_and_connections',
+                      lambda: leg.create_ik_nodes_and_connections(leg.ik_chain, leg.ik_controls.getDependNode(0),
+                                                                  leg.ik_handle), leg,
+                      outputs=['ik_mult_matrix']),
+            BuildStep('create_ik_fk_switch', lambda: leg.create_ik_fk_switch(blend=self.parameters['blend']), leg,
+                      ['blend'], ['ik_fk_switch']),
+            BuildStep('attach_to_skin_chain',
+                      lambda: leg.attach_to_skin_chain(matrix_drive=self.parameters['matrix_drive']), leg,
+                      ['matrix_drive']),
+            BuildStep('create_and_connect_messages', leg.create_and_connect_messages, leg),
+        ]
+        if foot:
+            steps += self.get_foot_steps()
+        return steps
+
+    def get_foot_steps(self):
+        """ Get the steps of the foot, which is built on the ankle of the leg
+        :return: List of BuildSteps
+        """
+        foot = self.foot
+        groups = ['root', 'geo_group', 'joint_group', 'control_group', 'ik_group']
+        return [
+            BuildStep('get_foot_rig', self.get_foot_rig, foot, outputs=['ik_fk_switch'] + groups),
+            BuildStep('create_foot_joints_parent', lambda: foot.create_joints_parent(self.end_joint, 'foot_roll_'),
+                      foot, outputs=['joints']),
+            BuildStep('create_foot_fk_chain',
+                      lambda: foot.create_fk_chain(*self.get_foot_ends(), string='foot_roll_'), foot,
+                      outputs=['fk_chain', 'skinned_chain']),
+            BuildStep('create_foot_ik_chain',
+                      lambda: foot.create_ik_chain(*self.get_foot_ends(), string='foot_roll_'), foot,
+                      outputs=['ik_chain', 'ik_root', 'skinned_chain']),
+            BuildStep('create_foot_ik_handles', self.create_foot_ik_handles, foot,
+                      outputs=['ik_handle', 'foot_ik_handles']),
+            BuildStep('create_foot_roll_control',
+                      lambda: foot.create_foot_roll_control(self.get_foot_ends()[1], 'foot_roll'), foot,
+                      outputs=['foot_roll_control', 'foot_roll_circle']),
+            BuildStep('create_fk_foot_controls', self.create_fk_foot_controls, foot, ['matrix_drive'],
+                      outputs=['fk_chain', 'fk_offsets', 'fk_controls', 'control_sizes']),
+            BuildStep('attach_foot_to_skin_chain', self.attach_foot_to_skin_chain, foot, ['matrix_drive'],
+                      outputs=['ik_chain']),
+            BuildStep('create_foot_roll_setup', foot.create_foot_roll_setup, foot, outputs=['foot_roll_nodes']),
+            BuildStep('fix_foot_setup', lambda: foot.fix_foot_setup(self.leg.ik_mult_matrix), foot),
+        ]
+
+    def get_foot_rig(self):
+        """ Let the foot find the switch and the groups of the leg it is attached to
+        :return:
+        """
+        self.foot.get_ik_fk_switch(self.foot.base_joint)
+        self.foot.get_root()
+        self.foot.get_groups()
+
+    def get_foot_ends(self):
+        """ Get the first and last joint under the ankle
+        :return: Tuple of MObjects
+        """
+        foot_chain = self.foot.get_all_children(self.end_joint)
+        return foot_chain.getDependNode(0), foot_chain.getDependNode(foot_chain.length() - 1)
+
+    def create_foot_ik_handles(self):
+        """ Create the ikHandles of the foot and the toes
+        :return:
+        """
+        ik_chain = self.foot.ik_chain
+        self.foot.create_ik_handle(ik_chain.getDependNode(0), ik_chain.getDependNode(1), limb='foot')
+        self.foot.create_ik_handle(ik_chain.getDependNode(1), ik_chain.getDependNode(2), limb='toes')
+
+    def create_fk_foot_controls(self):
+        """ Create the FK controls of the foot and connect them to the FK chain
+        :return:
+        """
+        fk_controls = self.foot.create_fk_foot_controls(self.foot.fk_chain)
+        self.foot.create_fk_nodes_and_connections(joint_chain=fk_controls[1], joint_controls=fk_controls[0][1],
+                                                  matrix_drive=self.parameters['matrix_drive'])
+
+    def attach_foot_to_skin_chain(self):
+        """ Attach the foot chains, without the ankle, to the skinned joints
+        :return:
+        """
+        foot_chain = self.foot.get_all_children(self.end_joint)
+        foot_chain.remove(0)
+        self.foot.ik_chain.remove(0)
+        self.foot.attach_to_skin_chain(ik_chain=self.foot.ik_chain, fk_chain=self.foot.fk_chain,
+                                       skin_chain=foot_chain, ik_fk_switch=self.foot.ik_fk_switch,
+                                       matrix_drive=self.parameters['matrix_drive'])
@@ -0,0 +1,236 @@
+import os
+import json
+import math
+from backend import om
+from helper import Helper
+from build_context import BuildContext
+from build_transaction import BuildTransaction
+
+
+# Setting up a network of utility nodes with cmds takes a call for every node, every attribute and every connection,
+# and every call looks its nodes up by name again. A network like the foot roll is now written down as data in the
+# graphs folder and built by this class with a single modifier, keeping hold of every node by its MObject.
+class RigGraph(object):
+    """ This class compiles a node graph that is described in a json file. The file contains a dictionary with:
+    inputs: List of ids of existing nodes that have to be handed to build as MObjects
+    nodes: List of nodes that are created in the given order. Every node has an id and a type, optionally a name in
+    which {side} is replaced, "dag": true and a parent id for dag nodes, and attributes which map a plug path to a
+    value. A list of values sets the children of a compound plug in order, so "value[2]": [0.5, 1, 1] sets the
+    position, value and interpolation of a ramp point.
+    connections: List of source and destination plug paths, e.g. "center.worldInverseMatrix[0]". A connection replaces
+    the one that the destination already has. A unitConversion node is put between plain numbers and angles.
+    disconnect: List of plug paths of which the incoming connection is broken
+    parents: List of node and parent ids, nodes that existed before the build keep their position in the world
+    hide: List of node ids that are hidden
+    positions: List of node and input ids, the node is moved to the world rotate pivot of the input
+    :param spec: Dictionary describing the graph
+    :param name: String name of the graph, used in errors
+    :param context: BuildContext that reparenting goes through, if None a new one is created
+    """
+    path = os.path.dirname(os.path.abspath(__file__)) + '/graphs/'
+
+    def __init__(self, spec, name='graph', context=None):
+        self.spec = spec
+        self.name = name
+        self.context = context if context is not None else BuildContext()
+
+    @classmethod
+    def load(cls, name, context=None):
+        """ Load a graph out of the graphs folder
+        :param name: String name of the json file without its extension
+        :param context: BuildContext that is passed on to the graph
+        :return: RigGraph
+        """
+        with open(cls.path + name + '.json') as graph_file:
+            return cls(json.load(graph_file), name, context)
+
+    def build(self, inputs=None, side=''):
+        """ Create the nodes, values, connections and parents of the graph in one modifier pass
+        :param inputs: Dictionary with the input ids as keys and MObjects as values
+        :param side: String that replaces {side} in the names of the nodes
+        :return: Dictionary with the ids of the inputs and of the created nodes as keys and MObjects as values
+        """
+        nodes = dict(inputs or {})
+        missing = [node_id for node_id in self.spec.get('inputs', []) if node_id not in nodes or nodes[node_id].isNull()]
+        if missing:
+            raise ValueError('The {0} graph is missing the inputs: {1}'.format(self.name, ', '.join(missing)))
+        dag_mod = om.MDagModifier()
+        for node in self.spec.get('nodes', []):
+            if node.get('dag'):
+                parent = nodes[node['parent']] if node.get('parent') else om.MObject.kNullObj
+                m_obj = dag_mod.createNode(node['type'], parent)
+            else:
+                # MDagModifier only creates dag nodes itself, the base class is used for the utility nodes so
+                # everything stays in the same modifier.
+                m_obj = om.MDGModifier.createNode(dag_mod, node['type'])
+            if node.get('name'):
+                dag_mod.renameNode(m_obj, node['name'].format(side=side))
+            for attribute, value in node.get('attributes', {}).items():
+                self.set_value(dag_mod, self.find_plug(m_obj, attribute), value)
+            nodes[node['id']] = m_obj
+        for plug_path in self.spec.get('disconnect', []):
+            plug = self.get_plug(nodes, plug_path)
+            if plug.isDestination:
+                dag_mod.disconnect(plug.source(), plug)
+        for connection in self.spec.get('connections', []):
+            self.connect(dag_mod, self.get_plug(nodes, connection[0]), self.get_plug(nodes, connection[1]))
+        # The positions and parents are worked out before anything is executed, so they are set by the same
+        # modifier. The world matrix of a created node comes from the parents and values the graph gives it.
+        parent_ids = dict((node['id'], node.get('parent')) for node in self.spec.get('nodes', []) if node.get('dag'))
+        local_matrices = {}
+        for node_id, parent_id in self.spec.get('parents', []):
+            if node_id in self.spec.get('inputs', []):
+                parent_matrix = self.get_world_matrix(nodes, parent_id, parent_ids, local_matrices)
+                self.keep_world_matrix(dag_mod, nodes[node_id], self.context.get_world_matrix(nodes[node_id]),
+                                       parent_matrix)
+            else:
+                parent_ids[node_id] = parent_id
+            self.context.reparent(dag_mod, nodes[node_id], nodes[parent_id])
+        for node_id, input_id in self.spec.get('positions', []):
+            pivot = om.MFnTransform(self.context.get_path(nodes[input_id])).rotatePivot(om.MSpace.kWorld)
+            parent_matrix = self.get_world_matrix(nodes, parent_ids.get(node_id), parent_ids, local_matrices)
+            translation = om.MVector(pivot * parent_matrix.inverse())
+            Helper.set_plug_values(dag_mod, Helper.get_plug(nodes[node_id], 'translate'), translation)
+            local_matrices[node_id] = om.MTransformationMatrix().setTranslation(translation,
+                                                                                om.MSpace.kTransform).asMatrix()
+        for node_id in self.spec.get('hide', []):
+            Helper.set_plug_value(dag_mod, Helper.get_plug(nodes[node_id], 'visibility'), False)
+        BuildTransaction.execute(dag_mod)
+        return nodes
+
+    def connect(self, dag_mod, source, destination):
+        """ Add a connection to the modifier, replacing the incoming connection of the destination and converting
+        between plain numbers and angles
+        :param dag_mod: MDagModifier
+        :param source: MPlug
+        :param destination: MPlug
+        :return:
+        """
+        if destination.isDestination:
+            dag_mod.disconnect(destination.source(), destination)
+        factor = self.get_conversion_factor(source, destination)
+        if factor is None:
+            dag_mod.connect(source, destination)
+            return
+        unit_conversion = om.MDGModifier.createNode(dag_mod, 'unitConversion')
+        dag_mod.newPlugValueDouble(Helper.get_plug(unit_conversion, 'conversionFactor'), factor)
+        dag_mod.connect(source, Helper.get_plug(unit_conversion, 'input'))
+        dag_mod.connect(Helper.get_plug(unit_conversion, 'output'), destination)
+
+    def keep_world_matrix(self, dag_mod, m_obj, world_matrix, parent_matrix):
+        """ Add the values to the modifier that keep a node where it is in the world when it is reparented. Nodes with
+        a connected translate are left alone, just like the parent command does.
+        :param dag_mod: MDagModifier
+        :param m_obj: MObject containing the node
+        :param world_matrix: MMatrix the node has before it is reparented
+        :param parent_matrix: MMatrix the new parent has in the world after the build
+        :return:
+        """
+        if Helper.get_plug(m_obj, 'translate').isDestination:
+            return
+        Helper.set_transformation(dag_mod, m_obj, world_matrix * parent_matrix.inverse())
+
+    def get_world_matrix(self, nodes, node_id, parent_ids, local_matrices):
+        """ Get the world matrix a node has after the build. Inputs keep theirs, a created node is placed by its
+        local matrix under its parent.
+        :param nodes: Dictionary with node ids as keys and MObjects as values
+        :param node_id: String id of the node, None for the world
+        :param parent_ids: Dictionary with the ids of the created dag nodes as keys and the ids of their parents as
+        values
+        :param local_matrices: Dictionary with the ids of created nodes as keys and the MMatrix they are given relative
+        to their parent as values
+        :return: MMatrix
+        """
+        if node_id is None:
+            return om.MMatrix()
+        if node_id not in parent_ids:
+            return self.context.get_world_matrix(nodes[node_id])
+        local_matrix = local_matrices.get(node_id)
+        if local_matrix is None:
+            local_matrix = self.get_driven_matrix(nodes, node_id)
+        return local_matrix * self.get_world_matrix(nodes, parent_ids[node_id], parent_ids, local_matrices)
+
+    def get_driven_matrix(self, nodes, node_id):
+        """ Get the local matrix of a created node that is not positioned by the graph. When its translate, rotate and
+        scale come from a decomposeMatrix of the world matrix of an input, that is the matrix it gets, otherwise
+        it stays at rest.
+        :param nodes: Dictionary with node ids as keys and MObjects as values
+        :param node_id: String id of the node
+        :return: MMatrix
+        """
+        sources = dict((destination, source) for source, destination in self.spec.get('connections', []))
+        outputs = [sources.get('{0}.{1}'.format(node_id, name), '').split('.')
+                   for name in ('translate', 'rotate', 'scale')]
+        if [output[-1] for output in outputs] != ['outputTranslate', 'outputRotate', 'outputScale'] or \
+                len(set(output[0] for output in outputs)) != 1:
+            return om.MMatrix()
+        input_id, _, plug_path = sources.get(outputs[0][0] + '.inputMatrix', '').partition('.')
+        if plug_path != 'worldMatrix[0]' or input_id not in self.spec.get('inputs', []):
+            return om.MMatrix()
+        return self.context.get_world_matrix(nodes[input_id])
+
+    @staticmethod
+    def get_conversion_factor(source, destination):
+        """ Get the factor of the unitConversion node that is needed between two plugs
+        :param source: MPlug
+        :param destination: MPlug
+        :return: Float factor, or None if the plugs can be connected directly
+        """
+        source_angle = RigGraph.is_angle(source)
+        destination_angle = RigGraph.is_angle(destination)
+        if source_angle == destination_angle or source.isCompound or destination.isCompound:
+            return None
+        if destination_angle:
+            return math.pi / 180.0
+        return 180.0 / math.pi
+
+    @staticmethod
+    def is_angle(plug):
+        """ Check if a plug holds an angle
+        :param plug: MPlug
+        :return: Boolean
+        """
+        attribute = plug.attribute()
+        return attribute.hasFn(om.MFn.kUnitAttribute) and \
+            om.MFnUnitAttribute(attribute).unitType() == om.MFnUnitAttribute.kAngle
+
+    @staticmethod
+    def get_plug(nodes, plug_path):
+        """ Get the plug that a path like "node_id.result.parameter" points to
+        :param nodes: Dictionary with node ids as keys and MObjects as values
+        :param plug_path: String id of the node followed by the path of the plug
+        :return: MPlug
+        """
+        node_id, attribute_path = plug_path.split('.', 1)
+        return RigGraph.find_plug(nodes[node_id], attribute_path)
+
+    @staticmethod
+    def find_plug(m_obj, attribute_path):
+        """ Find a plug on a node by its path, array elements are given as "matrixIn[1]" and children are separated by
+        dots
+        :param m_obj: MObject containing the node
+        :param attribute_path: String path of the plug
+        :return: MPlug
+        """
+        dep_node = om.MFnDependencyNode(m_obj)
+        plug = None
+        for part in attribute_path.split('.'):
+            name, _, index = part.partition('[')
+            plug = dep_node.findPlug(name, True) if plug is None else plug.child(dep_node.attribute(name))
+            if index:
+                plug = plug.elementByLogicalIndex(int(index.rstrip(']')))
+        return plug
+
+    @staticmethod
+    def set_value(dag_mod, plug, value):
+        """ Set the value of a plug, a list of values is spread over the children of a compound plug
+        :param dag_mod: MDagModifier
+        :param plug: MPlug
+        :param value: Number or list of numbers
+        :return:
+        """
+        if isinstance(value, list):
+            for index, child_value in enumerate(value):
+                RigGraph.set_value(dag_mod, plug.child(index), child_value)
+            return
+        Helper.set_plug_value(dag_mod, plug, value)
@@ -0,0 +1,284 @@
+import sys
+import json
+import argparse
+from backend import om, cmds
+from helper import Helper
+
+
+# Whether a rig is cheap to animate with only shows once it is in the hands of the animators. This report is made
+# straight after a build instead, from the nodes and connections of the rig, so the cost of every asset can be tracked
+# from build to build.
+class RigReport(object):
+    """ This class walks a rig that was built by the leg rigger and reports what it will cost to evaluate. The rig is
+    found through the messages that create_and_connect_messages adds: the groups point at the root, the root at the IK
+    FK switch and the switch at the joints, controls and ikHandles. All the nodes below the root, the skinned joints and
+    every node upstream of them make up the rig. The report holds:
+    nodes: the number of nodes and the number of nodes per type
+    connections: the connections that carry data, message connections are counted separately
+    message_attributes: the attributes that receive a message, which only organise the rig and are never evaluated
+    longest_path: the longest chain of dependencies from a control to a skinned joint, following the connections and
+    the transforms below each other. Shapes are left out of the hierarchy, as they do not depend on their parent.
+    flags: the nodes of a type that is known to be slow to evaluate
+    :param root: MObject containing the root group of the rig
+    """
+    slow_types = {
+        'ikHandle': 'ikHandle solved by the {solver}, the joints are solved outside of the matrix network',
+        'nearestPointOnCurve': 'nearestPointOnCurve samples the whole curve on every evaluation',
+        'constraint': '{type} is evaluated as a separate node per constrained transform',
+    }
+
+    def __init__(self, root):
+        self.root = root
+        self.nodes = {}
+        self.edges = {}
+        self.connections = 0
+        self.message_attributes = set()
+        self.skinned_joints = []
+        self.controls = []
+        self.flags = []
+        self.longest_path = []
+
+    @classmethod
+    def create(cls, node):
+        """ Make the report of the rig that a node belongs to
+        :param node: MObject containing the root of the rig, or a node that is connected to it through messages
+        :return: RigReport
+        """
+        report = cls(cls.find_root(node))
+        report.collect()
+        return report
+
+    @staticmethod
+    def get_key(node):
+        """ Get the key that a node is stored with
+        :param node: MObject
+        :return: Integer
+        """
+        return om.MObjectHandle(node).hashCode()
+
+    @staticmethod
+    def is_message(plug):
+        """ Check if a connection comes from a message attribute
+        :param plug: MPlug on the source side of the connection
+        :return: Boolean
+        """
+        return plug.partialName(useLongNames=True) == 'message'
+
+    @classmethod
+    def find_root(cls, node):
+        """ Follow the messages of a node until the root is found. The root is the node whose message is connected to
+        the Root attribute of the groups.
+        :param node: MObject
+        :return: MObject containing the root
+        """
+        visited = set()
+        nodes = [node]
+        while nodes:
+            current = nodes.pop(0)
+            if cls.get_key(current) in visited:
+                continue
+            visited.add(cls.get_key(current))
+            dep_node = om.MFnDependencyNode(current)
+            if dep_node.hasAttribute('Root') and dep_node.findPlug('Root', False).isDestination:
+                return dep_node.findPlug('Root', False).source().node()
+            destinations = Helper.get_plug(current, 'message').destinations()
+            if any(plug.partialName(useLongNames=True) == 'Root' for plug in destinations):
+                return current
+            nodes += [plug.node() for plug in destinations]
+        raise ValueError('{0} is not part of a rig'.format(om.MFnDependencyNode(node).name()))
+
+    def collect(self):
+        """ Walk the rig and fill in the report
+        :return:
+        """
+        pending = []
+        dag_it = om.MItDag().reset(self.root)
+        while not dag_it.isDone():
+            pending.append(dag_it.currentItem())
+            dag_it.next()
+        pending += self.get_messages(self.root)
+        for switch in self.get_messages(self.root):
+            pending += self.get_messages(switch)
+        while pending:
+            node = pending.pop()
+            key = self.get_key(node)
+            if key in self.nodes:
+                continue
+            self.nodes[key] = node
+            pending += self.collect_connections(node)
+        for key, node in self.nodes.items():
+            self.collect_node(key, node)
+        self.longest_path = self.find_longest_path()
+
+    def get_messages(self, node):
+        """ Get the nodes whose message is connected to a node
+        :param node: MObject
+        :return: List of MObjects
+        """
+        nodes = []
+        for plug in om.MFnDependencyNode(node).getConnections():
+            if plug.isDestination and self.is_message(plug.source()):
+                nodes.append(plug.source().node())
+        return nodes
+
+    def collect_connections(self, node):
+        """ Count the incoming connections of a node and add them to the edges
+        :param node: MObject
+        :return: List of MObjects containing the nodes that the data connections come from
+        """
+        sources = []
+        key = self.get_key(node)
+        for plug in om.MFnDependencyNode(node).getConnections():
+            if not plug.isDestination:
+                continue
+            source = plug.source()
+            if self.is_message(source):
+                self.message_attributes.add(plug.name())
+                continue
+            self.connections += 1
+            self.edges.setdefault(self.get_key(source.node()), set()).add(key)
+            sources.append(source.node())
+        return sources
+
+    def collect_node(self, key, node):
+        """ Add the hierarchy of a node to the edges, and find out if the node is a control, a skinned joint or a slow
+        node
+        :param key: Integer key of the node
+        :param node: MObject
+        :return:
+        """
+        dep_node = om.MFnDependencyNode(node)
+        type_name = dep_node.typeName
+        if node.hasFn(om.MFn.kDagNode):
+            dag_node = om.MFnDagNode(node)
+            for index in range(dag_node.childCount()):
+                child = dag_node.child(index)
+                if child.hasFn(om.MFn.kTransform) and self.get_key(child) in self.nodes:
+                    self.edges.setdefault(key, set()).add(self.get_key(child))
+            if type_name == 'transform' and any(dag_node.child(index).hasFn(om.MFn.kNurbsCurve)
+                                                for index in range(dag_node.childCount())):
+                self.controls.append(key)
+        if type_name == 'joint':
+            world_matrix = dep_node.findPlug('worldMatrix', False).elementByLogicalIndex(0)
+            if any(om.MFnDependencyNode(plug.node()).typeName == 'skinCluster' for plug in world_matrix.destinations()):
+                self.skinned_joints.append(key)
+        elif type_name == 'ikHandle':
+            start_joint = dep_node.findPlug('startJoint', False).source()
+            if not start_joint.isNull() and self.get_key(start_joint.node()) in self.nodes:
+                self.edges.setdefault(key, set()).add(self.get_key(start_joint.node()))
+            solver = dep_node.findPlug('ikSolver', False).source()
+            solver_type = 'default solver' if solver.isNull() else om.MFnDependencyNode(solver.node()).typeName
+            self.add_flag(node, 'ikHandle', solver=solver_type)
+        elif type_name == 'nearestPointOnCurve':
+            self.add_flag(node, 'nearestPointOnCurve')
+        elif type_name.endswith('Constraint'):
+            self.add_flag(node, 'constraint', type=type_name)
+
+    def add_flag(self, node, kind, **values):
+        """ Add a slow node to the flags
+        :param node: MObject
+        :param kind: String key of slow_types
+        :param values: Values that are filled in in the reason
+        :return:
+        """
+        self.flags.append({'node': self.get_name(node), 'type': om.MFnDependencyNode(node).typeName,
+                           'reason': self.slow_types[kind].format(**values)})
+
+    def find_longest_path(self):
+        """ Find the longest path from a control to a skinned joint. The edges are walked depth first without
+        recursion, so the long chains of a rig do not run into the recursion limit.
+        :return: List of keys of the nodes on the path, empty if no control drives a skinned joint
+        """
+        skinned = set(self.skinned_joints)
+        lengths = {}
+        following = {}
+        for control in self.controls:
+            stack = [(control, False)]
+            visiting = set()
+            while stack:
+                key, expanded = stack.pop()
+                if key in lengths:
+                    continue
+                if not expanded:
+                    visiting.add(key)
+                    stack.append((key, True))
+                    stack += [(child, False) for child in self.edges.get(key, ())
+                              if child not in lengths and child not in visiting]
+                    continue
+                visiting.discard(key)
+                lengths[key] = 0 if key in skinned else None
+                for child in self.edges.get(key, ()):
+                    if lengths.get(child) is not None and (lengths[key] is None or lengths[child] + 1 > lengths[key]):
+                        lengths[key] = lengths[child] + 1
+                        following[key] = child
+        starts = [control for control in self.controls if lengths.get(control) is not None]
+        if not starts:
+            return []
+        path = [max(starts, key=lambda control: lengths[control])]
+        while lengths[path[-1]] > 0:
+            path.append(following[path[-1]])
+        return path
+
+    def get_name(self, node):
+        """ Get the name of a node as it is shown in the report
+        :param node: MObject or Integer key
+        :return: String name
+        """
+        if not isinstance(node, om.MObject):
+            node = self.nodes[node]
+        if node.hasFn(om.MFn.kDagNode):
+            return om.MFnDagNode(node).partialPathName()
+        return om.MFnDependencyNode(node).name()
+
+    def as_dict(self):
+        """ Get the report in a form that can be written to json
+        :return: Dictionary
+        """
+        types = {}
+        for node in self.nodes.values():
+            type_name = om.MFnDependencyNode(node).typeName
+            types[type_name] = types.get(type_name, 0) + 1
+        return {'root': self.get_name(self.root), 'nodes': len(self.nodes), 'types': types,
+                'connections': self.connections, 'message_attributes': len(self.message_attributes),
+                'controls': len(self.controls), 'skinned_joints': len(self.skinned_joints),
+                'longest_path': {'length': max(len(self.longest_path) - 1, 0),
+                                 'nodes': [self.get_name(key) for key in self.longest_path]},
+                'flags': self.flags}
+
+    def write(self, path):
+        """ Write the report to a json file
+        :param path: String path of the file
+        :return: Dictionary that was written
+        """
+        report = self.as_dict()
+        with open(path, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+        return report
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Report the evaluation cost of the rigs in a Maya scene.')
+    parser.add_argument('roots', nargs='+', help='names of the root groups, or of other nodes of the rigs')
+    parser.add_argument('--file', help='Maya scene to open first')
+    parser.add_argument('--output', help='path of the json report')
+    args = parser.parse_args(args)
+    if args.file:
+        cmds.file(args.file, open=True, force=True)
+    reports = []
+    for name in args.roots:
+        node = Helper.get_node(name)
+        if node.isNull():
+            raise ValueError('{0} does not exist'.format(name))
+        reports.append(RigReport.create(node).as_dict())
+        report = reports[-1]
+        print('{0}: {1} nodes, {2} connections, longest path {3}, {4} flags'.format(
+            report['root'], report['nodes'], report['connections'], report['longest_path']['length'],
+            len(report['flags'])))
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(reports, output_file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,303 @@
+import shlex
+import struct
+
+
+class CurveData(object):
+    """ The geometry of a NURBS curve as it is stored in the '.cc' attribute
+    :param degree: Integer degree of the curve
+    :param spans: Integer number of spans
+    :param form: Integer form of the curve, 0 = open, 1 = closed and 2 = periodic
+    :param knots: List of floats containing the knot vector
+    :param cvs: List of (x, y, z) tuples containing the CV positions
+    """
+    def __init__(self, degree, spans, form, knots, cvs):
+        self.degree = degree
+        self.spans = spans
+        self.form = form
+        self.knots = knots
+        self.cvs = cvs
+
+
+class SurfaceData(object):
+    """ The geometry of a NURBS surface as it is stored in the '.cc' attribute
+    :param degree: Tuple of the U and V degree
+    :param form: Tuple of the U and V form, 0 = open, 1 = closed and 2 = periodic
+    :param knots: Tuple of the U and V knot vectors as lists of floats
+    :param cvs: List of (x, y, z) tuples containing the CV positions
+    """
+    def __init__(self, degree, form, knots, cvs):
+        self.degree = degree
+        self.form = form
+        self.knots = knots
+        self.cvs = cvs
+
+
+class ShapeNode(object):
+    """ A node (transform or shape) out of a control shape.
+    :param node_type: String type of the node, either 'transform', 'nurbsCurve' or 'nurbsSurface'
+    :param name: String name of the node
+    :param parent: String name of the parent, empty if the node has no parent
+    """
+    def __init__(self, node_type, name, parent=''):
+        self.node_type = node_type
+        self.name = name
+        self.parent = parent
+        self.attributes = []
+        self.geometry = None
+
+
+# The cache is a packed binary file that sits next to the templates. Every number is stored as a little endian double
+# so that loading the library is one read followed by struct unpacking, instead of parsing the text of every curve.
+class ShapeCache(object):
+    """ This class writes and reads the compiled shape cache. The cache stores the hash of the templates file it was
+    generated from, and is ignored when that hash no longer matches. The hash of every shape is stored with it, so the
+    registry can be filled from the cache alone.
+    """
+    magic = b'BBSC'
+    version = 2
+    node_types = ['transform', 'nurbsCurve', 'nurbsSurface']
+
+    @classmethod
+    def write(cls, path, digest, shapes, shape_digests):
+        """ Write the cache file
+        :param path: String path of the cache file
+        :param digest: String hex digest of the templates file that the shapes come from
+        :param shapes: Dictionary of shape names and lists of ShapeNodes
+        :param shape_digests: Dictionary of shape names and String hex digests of the lines of every shape
+        :return: Boolean, false if the file could not be written (e.g. a read-only tools share)
+        """
+        data = [cls.magic, struct.pack('<H40sI', cls.version, digest.encode('ascii'), len(shapes))]
+        for name in sorted(shapes):
+            data.append(cls.pack_string(name))
+            data.append(struct.pack('<40sH', shape_digests[name].encode('ascii'), len(shapes[name])))
+            for node in shapes[name]:
+                data.append(struct.pack('<B', cls.node_types.index(node.node_type)))
+                data.append(cls.pack_string(node.name))
+                data.append(cls.pack_string(node.parent))
+                data.append(struct.pack('<H', len(node.attributes)))
+                for attribute, values, keyable in node.attributes:
+                    data.append(cls.pack_string(attribute))
+                    data.append(struct.pack('<bB%dd' % len(values), keyable, len(values), *values))
+                geometry = node.geometry
+                if isinstance(geometry, CurveData):
+                    data.append(struct.pack('<BBI', geometry.degree, geometry.form, geometry.spans))
+                    data.append(cls.pack_doubles(geometry.knots))
+                    data.append(cls.pack_doubles([value for cv in geometry.cvs for value in cv]))
+                elif isinstance(geometry, SurfaceData):
+                    data.append(struct.pack('<4B', geometry.degree[0], geometry.degree[1], geometry.form[0],
+                                            geometry.form[1]))
+                    data.append(cls.pack_doubles(geometry.knots[0]))
+                    data.append(cls.pack_doubles(geometry.knots[1]))
+                    data.append(cls.pack_doubles([value for cv in geometry.cvs for value in cv]))
+        try:
+            with open(path, 'wb') as cache_file:
+                cache_file.write(b''.join(data))
+        except (IOError, OSError):
+            return False
+        return True
+
+    @classmethod
+    def read(cls, path, digest):
+        """ Read the cache file with a single read. The hash stored in the file has to match the given hash.
+        :param path: String path of the cache file
+        :param digest: String hex digest of the current templates file
+        :return: Dictionary of shape names and lists of ShapeNodes and a dictionary of shape names and String hex
+        digests, or None if the cache is missing or out of date
+        """
+        try:
+            with open(path, 'rb') as cache_file:
+                data = cache_file.read()
+        except (IOError, OSError):
+            return None
+        if data[:4] != cls.magic:
+            return None
+        version, cache_digest, count = struct.unpack_from('<H40sI', data, 4)
+        if version != cls.version or cache_digest != digest.encode('ascii'):
+            return None
+        offset = 4 + struct.calcsize('<H40sI')
+        shapes = {}
+        shape_digests = {}
+        for _ in range(count):
+            name, offset = cls.unpack_string(data, offset)
+            shape_digest, node_count = struct.unpack_from('<40sH', data, offset)
+            shape_digests[name] = shape_digest.decode('ascii')
+            offset += 42
+            nodes = []
+            for _ in range(node_count):
+                node_type = cls.node_types[struct.unpack_from('<B', data, offset)[0]]
+                node_name, offset = cls.unpack_string(data, offset + 1)
+                parent, offset = cls.unpack_string(data, offset)
+                node = ShapeNode(node_type, node_name, parent)
+                attribute_count, = struct.unpack_from('<H', data, offset)
+                offset += 2
+                for _ in range(attribute_count):
+                    attribute, offset = cls.unpack_string(data, offset)
+                    keyable, value_count = struct.unpack_from('<bB', data, offset)
+                    values = struct.unpack_from('<%dd' % value_count, data, offset + 2)
+                    offset += 2 + 8 * value_count
+                    node.attributes.append((attribute, values, keyable))
+                if node_type == 'nurbsCurve':
+                    degree, form, spans = struct.unpack_from('<BBI', data, offset)
+                    knots, offset = cls.unpack_doubles(data, offset + 6)
+                    cvs, offset = cls.unpack_doubles(data, offset)
+                    node.geometry = CurveData(degree, spans, form, list(knots), cls.to_points(cvs))
+                elif node_type == 'nurbsSurface':
+                    degree_u, degree_v, form_u, form_v = struct.unpack_from('<4B', data, offset)
+                    knots_u, offset = cls.unpack_doubles(data, offset + 4)
+                    knots_v, offset = cls.unpack_doubles(data, offset)
+                    cvs, offset = cls.unpack_doubles(data, offset)
+                    node.geometry = SurfaceData((degree_u, degree_v), (form_u, form_v),
+                                                (list(knots_u), list(knots_v)), cls.to_points(cvs))
+                nodes.append(node)
+            shapes[name] = nodes
+        return shapes, shape_digests
+
+    @classmethod
+    def parse_nodes(cls, statements):
+        """ Parse the MEL statements of a control shape into ShapeNodes. Only createNode and setAttr statements are
+        used, attributes that are not numeric or boolean are skipped.
+        :param statements: List of MEL statements of a single control shape
+        :return: List of ShapeNodes
+        """
+        nodes = []
+        for statement in statements:
+            tokens = shlex.split(statement.strip().rstrip(';'))
+            if not tokens:
+                continue
+            if tokens[0] == 'createNode':
+                node = ShapeNode(tokens[1], cls.flag_value(tokens, '-n'), cls.flag_value(tokens, '-p'))
+                if node.node_type in cls.node_types:
+                    nodes.append(node)
+            elif tokens[0] == 'setAttr' and nodes:
+                cls.parse_attribute(nodes[-1], tokens[1:])
+        return nodes
+
+    @classmethod
+    def parse_attribute(cls, node, tokens):
+        """ Parse the tokens of a setAttr statement and add the value to the node
+        :param node: ShapeNode that the attribute belongs to
+        :param tokens: List of the tokens of the statement, without the setAttr command
+        :return: Nothing
+        """
+        attribute = None
+        attribute_type = None
+        keyable = 0
+        values = []
+        index = 0
+        while index < len(tokens):
+            token = tokens[index]
+            if token == '-k':
+                keyable = 1 if tokens[index+1] in ('on', 'true', 'yes', '1') else -1
+                index += 1
+            elif token == '-type':
+                attribute_type = tokens[index+1]
+                index += 1
+            elif token in ('-s', '-l', '-cb', '-av', '-ca'):
+                index += 1
+            elif attribute is None and token.startswith('.'):
+                attribute = token.lstrip('.')
+            else:
+                values.append(token)
+            index += 1
+        if attribute is None or '[' in attribute:
+            return
+        if attribute == 'cc' and attribute_type == 'nurbsCurve':
+            node.geometry = cls.parse_curve(values)
+        elif attribute == 'cc' and attribute_type == 'nurbsSurface':
+            node.geometry = cls.parse_surface(values)
+        elif attribute_type in (None, 'double2', 'double3', 'float2', 'float3'):
+            try:
+                numbers = tuple(1.0 if value == 'yes' else 0.0 if value == 'no' else float(value) for value in values)
+            except ValueError:
+                return
+            if numbers or keyable:
+                node.attributes.append((attribute, numbers, keyable))
+
+    @classmethod
+    def parse_curve(cls, values):
+        """ Parse the values of a nurbsCurve '.cc' attribute
+        :param values: List of string values
+        :return: CurveData
+        """
+        degree, spans, form = int(values[0]), int(values[1]), int(values[2])
+        stride = int(values[4]) + (1 if values[3] == 'yes' else 0)
+        knot_count = int(values[5])
+        knots = [float(value) for value in values[6:6+knot_count]]
+        cv_count = int(values[6+knot_count])
+        cvs = cls.parse_points(values[7+knot_count:], cv_count, stride)
+        return CurveData(degree, spans, form, knots, cvs)
+
+    @classmethod
+    def parse_surface(cls, values):
+        """ Parse the values of a nurbsSurface '.cc' attribute
+        :param values: List of string values
+        :return: SurfaceData
+        """
+        degree = (int(values[0]), int(values[1]))
+        form = (int(values[2]), int(values[3]))
+        stride = 4 if values[4] == 'yes' else 3
+        knot_count_u = int(values[5])
+        knots_u = [float(value) for value in values[6:6+knot_count_u]]
+        index = 6 + knot_count_u
+        knot_count_v = int(values[index])
+        knots_v = [float(value) for value in values[index+1:index+1+knot_count_v]]
+        index += 1 + knot_count_v
+        cv_count = int(values[index])
+        cvs = cls.parse_points(values[index+1:], cv_count, stride)
+        return SurfaceData(degree, form, (knots_u, knots_v), cvs)
+
+    @staticmethod
+    def parse_points(values, count, stride):
+        """ Turn a flat list of string values into (x, y, z) tuples, 2D points get a z of 0
+        :param values: List of string values
+        :param count: Integer number of points
+        :param stride: Integer number of values per point
+        :return: List of tuples
+        """
+        points = []
+        for index in range(count):
+            point = [float(value) for value in values[index*stride:index*stride+stride]][:3]
+            points.append(tuple(point + [0.0] * (3 - len(point))))
+        return points
+
+    @staticmethod
+    def flag_value(tokens, flag):
+        """ Get the value that comes after a flag in a list of tokens
+        :param tokens: List of string tokens
+        :param flag: String flag, e.g. '-n'
+        :return: String value or an empty string if the flag is not used
+        """
+        if flag in tokens[:-1]:
+            return tokens[tokens.index(flag)+1]
+        return ''
+
+    @staticmethod
+    def to_points(values):
+        """ Group a flat sequence of floats into (x, y, z) tuples
+        :param values: Sequence of floats
+        :return: List of tuples
+        """
+        return list(zip(values[0::3], values[1::3], values[2::3]))
+
+    @staticmethod
+    def pack_string(string):
+        """ Pack a string with its length in front of it """
+        encoded = string.encode('utf-8')
+        return struct.pack('<H', len(encoded)) + encoded
+
+    @staticmethod
+    def unpack_string(data, offset):
+        """ Unpack a string that was packed with pack_string, returns the string and the new offset """
+        length, = struct.unpack_from('<H', data, offset)
+        return data[offset+2:offset+2+length].decode('utf-8'), offset + 2 + length
+
+    @staticmethod
+    def pack_doubles(values):
+        """ Pack a list of floats as doubles with the count in front of it """
+        return struct.pack('<I%dd' % len(values), len(values), *values)
+
+    @staticmethod
+    def unpack_doubles(data, offset):
+        """ Unpack doubles that were packed with pack_doubles, returns a tuple of floats and the new offset """
+        count, = struct.unpack_from('<I', data, offset)
+        return struct.unpack_from('<%dd' % count, data, offset + 4), offset + 4 + 8 * count
@@ -0,0 +1,172 @@
+import hashlib
+import os
+import names
+from shape_cache import ShapeCache
+
+
+class ControlShape(object):
+    """ A single control shape out of the templates file. It holds the raw lines of the shape so the template files can
+    be written from it, the MEL statements that are needed to rebuild the control in the scene and the compiled nodes
+    that come from the ShapeCache. A shape that is loaded from the cache only has its digest and nodes, the lines and
+    statements are filled in by ShapeRegistry.read_lines when they are needed.
+    :param name: String name of the template transform (e.g. 'cube_template')
+    :param lines: List of the raw lines that make up the shape in the templates file, None if they are not read yet
+    :param digest: String hex digest of the lines, only used when no lines are given
+    """
+    def __init__(self, name, lines=None, digest=None):
+        self.name = name
+        self.lines = None
+        self.digest = digest
+        self.statements = None
+        self.nodes = []
+        if lines is not None:
+            self.set_lines(lines)
+
+    def set_lines(self, lines):
+        """ Set the raw lines of the shape, the digest and the MEL statements are worked out from them
+        :param lines: List of the raw lines that make up the shape in the templates file
+        :return:
+        """
+        self.lines = lines
+        block = ''.join(lines)
+        if not isinstance(block, bytes):
+            block = block.encode('utf-8')
+        self.digest = hashlib.sha1(block).hexdigest()
+        self.statements = [statement for statement in ShapeRegistry.split_statements(lines)
+                           if 'rename -uid' not in statement]
+
+
+# The registry is shared by everything in the Maya session. Before this every ControllerManager would split up the
+# templates file on its own, which happened several times for a single rig.
+class ShapeRegistry(object):
+    """ This class parses the '__templates__' file once per session and keeps all the control shapes in memory, keyed
+    by the exact template name. The file is only parsed again when it has been changed on disk. When the ShapeCache
+    matches the file the shapes come from the cache alone, and the text is only split up if the raw lines are asked for
+    with read_lines.
+    """
+    path = os.path.dirname(os.path.abspath(__file__)) + '/controllers/'
+    template = names.controller_templates
+    header = []
+    shapes = {}
+    mtime = None
+    digest = None
+
+    @classmethod
+    def load(cls, force=False):
+        """ Load the shapes from the templates file. The modified time of the file is checked first, and when that has
+        changed the content hash is compared, so saving the file without changes does not cause a new parse.
+        :param force: Boolean, if true will always parse the file again and write a new cache
+        :return: Boolean, true if the shapes were loaded again
+        """
+        template_path = cls.path + cls.template + '.ma'
+        mtime = os.path.getmtime(template_path)
+        if not force and cls.shapes and mtime == cls.mtime:
+            return False
+        with open(template_path, 'rb') as template_file:
+            digest = hashlib.sha1(template_file.read()).hexdigest()
+        cls.mtime = mtime
+        if not force and cls.shapes and digest == cls.digest:
+            return False
+        cache_path = cls.path + cls.template + '.cache'
+        cache = None if force else ShapeCache.read(cache_path, digest)
+        if cache is not None:
+            nodes, shape_digests = cache
+            cls.header = []
+            cls.shapes = dict((name, ControlShape(name, digest=shape_digests[name])) for name in nodes)
+        else:
+            with open(template_path, 'r') as template_file:
+                lines = template_file.readlines()
+            cls.header = lines[:5]
+            cls.shapes = dict((name, ControlShape(name, lines[start:end]))
+                              for name, start, end in cls.split_blocks(lines))
+            nodes = dict((name, ShapeCache.parse_nodes(shape.statements)) for name, shape in cls.shapes.items())
+            shape_digests = dict((name, shape.digest) for name, shape in cls.shapes.items())
+            ShapeCache.write(cache_path, digest, nodes, shape_digests)
+        for name, shape in cls.shapes.items():
+            shape.nodes = nodes[name]
+        cls.digest = digest
+        return True
+
+    @classmethod
+    def read_lines(cls):
+        """ Split the templates file into the header and the raw lines of every shape, which are needed to write the
+        template files. Shapes that came from the cache get their lines and statements, this is only done once per load.
+        :return:
+        """
+        cls.load()
+        if cls.header:
+            return
+        with open(cls.path + cls.template + '.ma', 'r') as template_file:
+            lines = template_file.readlines()
+        cls.header = lines[:5]
+        for name, start, end in cls.split_blocks(lines):
+            if name in cls.shapes:
+                cls.shapes[name].set_lines(lines[start:end])
+
+    @classmethod
+    def get(cls, name):
+        """ Get a shape from the registry, the file will be loaded if that has not happened yet.
+        :param name: String name of the control, with or without the '_template' suffix and '.ma' extension
+        :return: ControlShape or None if there is no shape with that name
+        """
+        cls.load()
+        return cls.shapes.get(cls.resolve_name(name))
+
+    @classmethod
+    def shape_names(cls):
+        """ Get the names of all the shapes in the registry
+        :return: Sorted list of the template names
+        """
+        cls.load()
+        return sorted(cls.shapes)
+
+    @staticmethod
+    def resolve_name(name):
+        """ Turns the different ways controls are asked for (e.g. 'cube', 'cube_template' or 'cube_template.ma') into
+        the key that is used by the registry.
+        :param name: String name of the control
+        :return: String name of the template
+        """
+        if name.endswith('.ma'):
+            name = name[:-3]
+        if not name.endswith('_template'):
+            name += '_template'
+        return name
+
+    @staticmethod
+    def split_blocks(lines):
+        """ Splits the lines of the templates file into the blocks that belong to each shape. A block starts at the
+        transform of the shape and ends where the next shape starts, or at the lightLinker which comes after the shapes.
+        :param lines: List of lines of the templates file
+        :return: List of tuples containing the name, start line and end line of each shape
+        """
+        line_numbers = []
+        for number, line in enumerate(lines):
+            if 'transform' in line and 'template' in line:
+                line_numbers.append(number)
+            elif 'createNode lightLinker' in line:
+                line_numbers.append(number)
+                break
+        blocks = []
+        for start, end in zip(line_numbers, line_numbers[1:]):
+            name = lines[start].split(' ')[-1].strip().rstrip('";\n').lstrip('"')
+            blocks.append((name, start, end))
+        return blocks
+
+    @staticmethod
+    def split_statements(lines):
+        """ Joins the lines of a Maya ASCII file into complete MEL statements, as some statements (such as the curve
+        data) are spread over multiple lines. A statement ends at the first line that ends with a semicolon, comments
+        in between statements are skipped. Only one statement is held at a time, so a file object can be passed in to
+        stream large files.
+        :param lines: List or iterable of lines
+        :return: Generator of the statements
+        """
+        statement = ''
+        for line in lines:
+            if not statement and line.lstrip().startswith('//'):
+                continue
+            statement += line
+            if line.rstrip().endswith(';'):
+                yield statement
+                statement = ''
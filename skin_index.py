@@ -0,0 +1,56 @@
+from backend import om, oma
+
+
+# Finding the skin cluster of a joint used to mean walking the dependency graph from that joint, and finding the mesh
+# meant another walk from the skin cluster. In heavy scenes a single one of those walks can take seconds, so instead
+# every skin cluster in the scene is visited once and the results are kept.
+class SkinIndex(object):
+    """ This class maps every influence joint in the scene to its skin clusters, and every skin cluster to the meshes
+    it deforms. It is built in a single pass over all the skinCluster nodes, so characters that are made of several
+    skinned meshes are supported.
+    """
+    def __init__(self):
+        self.skin_clusters = {}
+        self.meshes = {}
+        self.build()
+
+    def build(self):
+        """ Visit all the skin clusters in the scene and store their influences and output meshes
+        :return:
+        """
+        self.skin_clusters = {}
+        self.meshes = {}
+        skin_it = om.MItDependencyNodes(om.MFn.kSkinClusterFilter)
+        while not skin_it.isDone():
+            skin_cluster = skin_it.thisNode()
+            skin_fn = oma.MFnSkinCluster(skin_cluster)
+            for influence in skin_fn.influenceObjects():
+                key = om.MObjectHandle(influence.node()).hashCode()
+                self.skin_clusters.setdefault(key, []).append(skin_cluster)
+            output_geometry = skin_fn.getOutputGeometry()
+            self.meshes[om.MObjectHandle(skin_cluster).hashCode()] = [output_geometry[index] for index in
+                                                                      range(len(output_geometry))
+                                                                      if output_geometry[index].hasFn(om.MFn.kMesh)]
+            skin_it.next()
+
+    def get_skin_clusters(self, joint):
+        """ Get the skin clusters that a joint is an influence of
+        :param joint: MObject containing the joint
+        :return: List of MObjects containing the skin clusters
+        """
+        return list(self.skin_clusters.get(om.MObjectHandle(joint).hashCode(), []))
+
+    def get_meshes(self, joint):
+        """ Get the meshes that a joint deforms, through all of its skin clusters
+        :param joint: MObject containing the joint
+        :return: List of MObjects containing the meshes, without doubles
+        """
+        meshes = []
+        handles = set()
+        for skin_cluster in self.get_skin_clusters(joint):
+            for mesh in self.meshes.get(om.MObjectHandle(skin_cluster).hashCode(), []):
+                key = om.MObjectHandle(mesh).hashCode()
+                if key not in handles:
+                    handles.add(key)
+                    meshes.append(mesh)
+        return meshes
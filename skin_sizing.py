@@ -0,0 +1,74 @@
+from backend import om, oma
+
+
+# Sizing a control by the closest vertex goes wrong on thin or concave meshes, where the closest vertex can belong to a
+# completely different part of the body. The skin weights tell which vertices actually move with a joint.
+class SkinSizing(object):
+    """ This class works out the size of the controls of a whole joint chain from a skin cluster. The weights and the
+    points of the skinned mesh are read once, every vertex is given to the influence with the highest weight and the
+    radius of a joint is the median distance from its vertices to the bone.
+    """
+    @classmethod
+    def get_radii(cls, skin_cluster, joints):
+        """ Get the cross-section radius of every joint
+        :param skin_cluster: MObject containing the skin cluster
+        :param joints: List of MObjects containing the joints, usually the skinned chain
+        :return: List of float radii in the same order as the joints, None for a joint without any vertices
+        """
+        skin_fn = oma.MFnSkinCluster(skin_cluster)
+        output_geometry = skin_fn.getOutputGeometry()
+        if not len(output_geometry):
+            return [None] * len(joints)
+        mesh_dag_path = om.MFnDagNode(output_geometry[0]).getPath()
+        mesh_fn = om.MFnMesh(mesh_dag_path)
+        component_fn = om.MFnSingleIndexedComponent()
+        components = component_fn.create(om.MFn.kMeshVertComponent)
+        component_fn.setCompleteData(mesh_fn.numVertices)
+        weights, influence_count = skin_fn.getWeights(mesh_dag_path, components)
+        points = mesh_fn.getPoints(4)
+        influences = skin_fn.influenceObjects()
+        columns = {}
+        for column in range(len(influences)):
+            for index, joint in enumerate(joints):
+                if influences[column].node() == joint:
+                    columns[column] = index
+        vertices = [[] for _ in joints]
+        weights = list(weights)
+        for vertex in range(len(points)):
+            row = weights[vertex * influence_count:(vertex + 1) * influence_count]
+            if not row:
+                continue
+            index = columns.get(row.index(max(row)))
+            if index is not None:
+                vertices[index].append(points[vertex])
+        return [cls.get_radius(joint, joint_vertices) for joint, joint_vertices in zip(joints, vertices)]
+
+    @staticmethod
+    def get_radius(joint, points):
+        """ Get the median distance from a list of points to the bone that starts at the joint. A joint without a child
+        is treated as a single point.
+        :param joint: MObject containing the joint
+        :param points: List of MPoints in world space
+        :return: Float radius, or None if there are no points
+        """
+        if not points:
+            return None
+        joint_dag_node = om.MFnDagNode(joint)
+        start = om.MPoint(om.MFnTransform(joint_dag_node.getPath()).translation(4))
+        bone = om.MVector()
+        if joint_dag_node.childCount() > 0:
+            child_path = om.MFnDagNode(joint_dag_node.child(0)).getPath()
+            bone = om.MPoint(om.MFnTransform(child_path).translation(4)) - start
+        bone_length = bone * bone
+        distances = []
+        for point in points:
+            offset = point - start
+            if bone_length > 0:
+                parameter = min(max((offset * bone) / bone_length, 0.0), 1.0)
+                offset -= bone * parameter
+            distances.append(offset.length())
+        distances.sort()
+        middle = len(distances) // 2
+        if len(distances) % 2:
+            return distances[middle]
+        return (distances[middle - 1] + distances[middle]) * 0.5